@@ -0,0 +1,77 @@
+import time
+import logging
+
+from app.core.logging_config import run_context
+from app.core.metrics import HTTP_REQUEST_DURATION
+from app.core.tracing import start_span
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que registra a duração de cada requisição HTTP por método,
+    rota (o template, ex.: /qpe/verify/{file_name}) e status. Cada requisição também
+    abre o span raiz do trace, do qual descendem os spans dos pipelines e etapas.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        inicio = time.perf_counter()
+        status = 500
+
+        async def send_com_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        with start_span(f"HTTP {scope['method']}", method=scope["method"], path=scope["path"]) as span:
+            try:
+                await self.app(scope, receive, send_com_status)
+            finally:
+                # O roteador grava a rota encontrada no scope; rotas inexistentes são agrupadas
+                # para não criar uma série por URL
+                rota = getattr(scope.get("route"), "path", "unmatched")
+                HTTP_REQUEST_DURATION.observe(
+                    time.perf_counter() - inicio,
+                    method=scope["method"],
+                    route=rota,
+                    status=str(status)
+                )
+                span.update_name(f"{scope['method']} {rota}")
+                span.set_attributes({"route": rota, "status": status})
+
+
+class RunContextMiddleware:
+    """
+    Middleware ASGI que define o run_id dos logs de cada requisição. Usa o cabeçalho
+    X-Run-ID (ou X-Request-ID) enviado pelo cliente, ou gera um novo, e o devolve
+    no cabeçalho X-Run-ID da resposta.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        recebido = headers.get(b"x-run-id") or headers.get(b"x-request-id")
+
+        with run_context(recebido.decode("latin-1")[:64] if recebido else None) as run_id:
+            async def send_com_run_id(message):
+                if message["type"] == "http.response.start":
+                    message.setdefault("headers", [])
+                    message["headers"] = list(message["headers"]) + [(b"x-run-id", run_id.encode("latin-1"))]
+                await send(message)
+
+            await self.app(scope, receive, send_com_run_id)
@@ -0,0 +1,90 @@
+import os
+import hmac
+import logging
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import FileResponse, PlainTextResponse
+from pydantic import BaseModel
+
+from app.core.profiling import MODOS, get_profiling_manager
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+logger = logging.getLogger(__name__)
+
+
+def verificar_admin(x_admin_token: Optional[str] = Header(default=None)):
+    """
+    Exige o cabeçalho X-Admin-Token igual à variável ADMIN_TOKEN.
+    Sem ADMIN_TOKEN configurado, os endpoints administrativos ficam desabilitados.
+    """
+    esperado = os.getenv("ADMIN_TOKEN")
+    if not esperado:
+        raise HTTPException(status_code=403, detail="Endpoints administrativos desabilitados (ADMIN_TOKEN não configurado)")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, esperado):
+        raise HTTPException(status_code=401, detail="Token de administrador inválido")
+
+
+class ProfilingRequest(BaseModel):
+    pipeline: str
+    runs: int = 1
+    mode: str = "cprofile"
+    interval_ms: float = 5.0
+
+
+@router.post("/profiling", dependencies=[Depends(verificar_admin)])
+async def habilitar_profiling(request: ProfilingRequest):
+    """
+    Habilita o profiling das próximas 'runs' execuções de um pipeline, pelo nome das
+    métricas (ex.: report_nfserv_r189) ou por Classe.metodo (ex.: DivergenceReportNFSERVR189.generate_report).
+    Modos: cprofile (determinístico, arquivo .prof) ou sampling (pilhas amostradas, arquivo .folded).
+    """
+    if request.mode not in MODOS:
+        raise HTTPException(status_code=400, detail=f"Modo inválido: {request.mode}. Use um de {list(MODOS)}")
+    if request.runs < 1:
+        raise HTTPException(status_code=400, detail="A quantidade de execuções deve ser maior que zero")
+
+    armado = get_profiling_manager().arm(request.pipeline, request.runs, request.mode, request.interval_ms)
+    return {"success": True, "armed": armado}
+
+
+@router.get("/profiling", dependencies=[Depends(verificar_admin)])
+async def profiling_pendente():
+    """Lista os pipelines com profiling habilitado e as execuções restantes."""
+    return {"success": True, "armed": get_profiling_manager().pending()}
+
+
+@router.delete("/profiling/{pipeline}", dependencies=[Depends(verificar_admin)])
+async def desabilitar_profiling(pipeline: str):
+    if not get_profiling_manager().disarm(pipeline):
+        raise HTTPException(status_code=404, detail=f"Nenhum profiling habilitado para {pipeline}")
+    return {"success": True}
+
+
+@router.get("/profiles", dependencies=[Depends(verificar_admin)])
+async def listar_perfis():
+    """Lista os perfis gravados, do mais recente para o mais antigo."""
+    return {"success": True, "profiles": get_profiling_manager().list_profiles()}
+
+
+@router.get("/profiles/{nome}", dependencies=[Depends(verificar_admin)])
+async def baixar_perfil(nome: str, format: str = "raw", limit: int = 50, sort: str = "cumulative"):
+    """
+    Baixa um perfil. Com format=text, perfis cProfile são devolvidos como resumo
+    das funções mais custosas (pstats), ordenado por 'sort'.
+    """
+    manager = get_profiling_manager()
+    caminho = manager.profile_path(nome)
+    if caminho is None:
+        raise HTTPException(status_code=404, detail="Perfil não encontrado")
+
+    if format == "text":
+        if not nome.endswith(".prof"):
+            with open(caminho, encoding="utf-8") as arquivo:
+                return PlainTextResponse(arquivo.read())
+        try:
+            return PlainTextResponse(manager.summary(nome, limit=limit, sort=sort))
+        except KeyError:
+            raise HTTPException(status_code=400, detail=f"Ordenação inválida: {sort}")
+
+    return FileResponse(path=caminho, filename=nome, media_type="application/octet-stream")
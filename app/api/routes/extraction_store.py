@@ -0,0 +1,23 @@
+from fastapi import APIRouter
+import logging
+
+from app.core.extraction_store import get_extraction_store
+from app.core.extractors.pdf_engine import engine_stats
+
+router = APIRouter(prefix="/extraction_store", tags=["Extraction Store"])
+logger = logging.getLogger(__name__)
+
+@router.get("/stats")
+async def extraction_store_stats():
+    """
+    Retorna as métricas de extração de PDFs: uso do armazenamento local
+    (hit rate, registros, remoções) e páginas analisadas/puladas por tipo de documento.
+    """
+    store = get_extraction_store()
+
+    return {
+        "success": True,
+        "enabled": store is not None,
+        "stats": store.stats() if store is not None else None,
+        "pages": engine_stats()
+    }
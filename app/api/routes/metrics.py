@@ -0,0 +1,16 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+import logging
+
+from app.core.metrics import REGISTRY
+
+router = APIRouter(tags=["Metrics"])
+logger = logging.getLogger(__name__)
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Exporta as métricas do processo no formato texto do Prometheus: latência HTTP
+    por rota e status, chamadas e bytes do SharePoint e duração das etapas dos pipelines.
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,79 @@
+import asyncio
+import logging
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+
+from app.core.logging_config import new_run_id
+from app.core.services.month_close import MonthClose
+from app.core.services.orchestrator import caminho_execucao, load_manifest
+
+router = APIRouter(prefix="/api/month_close", tags=["Month Close"])
+logger = logging.getLogger(__name__)
+
+# Execuções em andamento, para não serem coletadas antes de terminar
+_execucoes: dict = {}
+
+
+class MonthCloseRequest(BaseModel):
+    r189_file: Optional[str] = None
+    qpe_files: Optional[List[str]] = None
+    nfserv_files: Optional[List[str]] = None
+    spb_files: Optional[List[str]] = None
+    publish: bool = True
+    run_id: Optional[str] = None
+
+
+@router.post("/run")
+async def executar_fechamento(request: MonthCloseRequest, wait: bool = False):
+    """
+    Executa o fechamento do mês (processamento, validações e relatório consolidado) como um DAG.
+    Por padrão a execução segue em segundo plano e o run_id é devolvido imediatamente;
+    o andamento fica em GET /api/month_close/runs/{run_id}. Com wait=true, devolve o manifesto final.
+    """
+    run_id = request.run_id or new_run_id()
+    if caminho_execucao(run_id) is None:
+        raise HTTPException(status_code=400, detail="run_id inválido")
+    # Duas execuções com o mesmo run_id gravariam o mesmo manifesto e os mesmos checkpoints
+    if run_id in _execucoes:
+        raise HTTPException(status_code=409, detail="Execução ainda em andamento")
+
+    opcoes = request.model_dump(exclude={"run_id"})
+    return await _executar(run_id, MonthClose().run(run_id, **opcoes), wait)
+
+
+@router.post("/runs/{run_id}/resume")
+async def retomar_fechamento(run_id: str, wait: bool = False):
+    """
+    Retoma uma execução com as mesmas opções: as etapas concluídas cujas entradas não mudaram
+    são reaproveitadas dos checkpoints e só executam as que falharam ou foram afetadas por
+    arquivos alterados no SharePoint.
+    """
+    if load_manifest(run_id) is None:
+        raise HTTPException(status_code=404, detail="Execução não encontrada")
+    if run_id in _execucoes:
+        raise HTTPException(status_code=409, detail="Execução ainda em andamento")
+    return await _executar(run_id, MonthClose().run(run_id, resume=True), wait)
+
+
+async def _executar(run_id: str, execucao, wait: bool):
+    # Com wait=true a execução também fica registrada, para que o mesmo run_id seja recusado
+    tarefa = asyncio.create_task(execucao)
+    _execucoes[run_id] = tarefa
+    tarefa.add_done_callback(lambda _: _execucoes.pop(run_id, None))
+    if wait:
+        manifesto = await tarefa
+        return {"success": manifesto["status"] == "success", "run_id": run_id, "manifest": manifesto}
+
+    logger.info(f"Fechamento {run_id} iniciado em segundo plano")
+    return {"success": True, "run_id": run_id}
+
+
+@router.get("/runs/{run_id}")
+async def consultar_fechamento(run_id: str):
+    """Manifesto da execução: status, duração e resumo de cada etapa."""
+    manifesto = load_manifest(run_id)
+    if manifesto is None:
+        raise HTTPException(status_code=404, detail="Execução não encontrada")
+    return {"success": True, "manifest": manifesto}
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, HTTPException, status, UploadFile, File
+from fastapi.responses import StreamingResponse
 from typing import List, Dict, Any
 from io import BytesIO
 import logging
@@ -8,6 +9,7 @@ from app.core.sharepoint import SharePointClient
 from app.core.extractors.r189_extractor import R189Extractor
 from app.core.config import settings
 from app.core.auth import SharePointAuth
+from app.core.records import iter_json
 
 router = APIRouter(prefix="/r189", tags=["R189"])
 logger = logging.getLogger(__name__)
@@ -191,6 +193,28 @@ async def download_file(file_name: str):
             detail=str(e)
         )
 
+@router.get("/records/{file_name}")
+async def r189_records(file_name: str):
+    """
+    Registros de um arquivo R189 consolidado (campos de R189_FIELDS) como array JSON,
+    enviado em blocos conforme é gerado.
+    """
+    content = await sharepoint_client.download_file(settings.CONSOLIDATED_FOLDER, file_name)
+    if not content:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Arquivo {file_name} não encontrado"
+        )
+
+    resultado = await r189_extractor.extract_data(content)
+    if not resultado["success"]:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=resultado["error"]
+        )
+
+    return StreamingResponse(iter_json(resultado["data"]), media_type="application/json")
+
 PASTAS = {
     'R189': "/teams/BR-TI-TIN/AutomaoFinanas/R189",
     'QPE': "/teams/BR-TI-TIN/AutomaoFinanas/QPE",
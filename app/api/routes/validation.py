@@ -1,7 +1,7 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 import logging
 import traceback
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 from app.core.reports.report_mun_code_r189 import ReportMunCodeR189
 from app.core.reports.divergence_report_qpe_r189 import DivergenceReportQPER189
@@ -9,18 +9,31 @@ from app.core.reports.divergence_report_spb_r189 import DivergenceReportSPBR189
 from app.core.reports.divergence_report_nfserv_r189 import DivergenceReportNFSERVR189
 from app.core.reports.divergence_report_r189 import DivergenceReportR189
 from app.core.reports.consolidated_report import ConsolidatedReport
+from app.core.reports.report_writer import FORMATOS_EXPORTACAO, validar_formato_exportacao
+from app.core.services.validation_engine import ValidationEngine
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+
+def formato_exportacao(
+    export_format: Optional[str] = Query(
+        None, description=f"Exporta também o relatório em um destes formatos: {', '.join(FORMATOS_EXPORTACAO)}")
+) -> Optional[str]:
+    """Formato adicional do relatório, salvo ao lado do .xlsx na mesma pasta de RELATÓRIOS."""
+    erro = validar_formato_exportacao(export_format)
+    if erro:
+        raise HTTPException(status_code=400, detail=erro)
+    return export_format
+
 @router.post("/mun_code_r189")
-async def validate_mun_code_r189():
+async def validate_mun_code_r189(export_format: Optional[str] = Depends(formato_exportacao)):
     """
     Executa a validação entre MUN_CODE e R189
     """
     try:
         logger.info("=== INICIANDO VALIDAÇÃO MUN_CODE vs R189 ===")
-        validator = ReportMunCodeR189()
+        validator = ReportMunCodeR189(export_format=export_format)
         
         # Adicionar await aqui para obter o resultado real
         result = await validator.generate_report()
@@ -36,13 +49,13 @@ async def validate_mun_code_r189():
         }
 
 @router.post("/r189")
-async def validate_r189():
+async def validate_r189(export_format: Optional[str] = Depends(formato_exportacao)):
     """
     Valida os dados do R189 e gera relatório de divergências.
     """
     logger.info("=== INICIANDO VALIDAÇÃO R189 ===")
     try:
-        validator = DivergenceReportR189()
+        validator = DivergenceReportR189(export_format=export_format)
         result = await validator.generate_report()
         
         if result["success"]:
@@ -56,13 +69,13 @@ async def validate_r189():
         return {"success": False, "error": f"Erro na validação R189: {str(e)}"}
 
 @router.post("/qpe_r189", response_model=Dict[str, Any])
-async def validate_qpe_r189():
+async def validate_qpe_r189(export_format: Optional[str] = Depends(formato_exportacao)):
     """
     Valida divergências entre QPE e R189.
     """
     try:
         logger.info("Iniciando validação QPE vs R189")
-        validator = DivergenceReportQPER189()
+        validator = DivergenceReportQPER189(export_format=export_format)
         
         result = await validator.generate_report()
         
@@ -77,13 +90,13 @@ async def validate_qpe_r189():
         }
 
 @router.post("/spb_r189", response_model=Dict[str, Any])
-async def validate_spb_r189():
+async def validate_spb_r189(export_format: Optional[str] = Depends(formato_exportacao)):
     """
     Valida divergências entre SPB e R189.
     """
     try:
         logger.info("Iniciando validação SPB vs R189")
-        validator = DivergenceReportSPBR189()
+        validator = DivergenceReportSPBR189(export_format=export_format)
         result = await validator.generate_report()
         
         logger.info(f"Validação SPB vs R189 concluída: {result}")
@@ -97,13 +110,13 @@ async def validate_spb_r189():
         }
 
 @router.post("/nfserv_r189")
-async def validate_nfserv_r189():
+async def validate_nfserv_r189(export_format: Optional[str] = Depends(formato_exportacao)):
     """
     Valida divergências entre NFSERV e R189.
     """
     try:
         logger.info("Iniciando validação NFSERV vs R189")
-        validator = DivergenceReportNFSERVR189()
+        validator = DivergenceReportNFSERVR189(export_format=export_format)
         result = await validator.generate_report()
         
         logger.info(f"Validação NFSERV vs R189 concluída: {result}")
@@ -135,4 +148,30 @@ async def consolidate_reports():
             "success": False,
             "error": f"Erro ao consolidar relatórios: {str(e)}",
             "show_popup": True
-        }
\ No newline at end of file
+        }
+
+@router.post("/all", response_model=Dict[str, Any])
+async def validate_all(export_format: Optional[str] = Depends(formato_exportacao)):
+    """
+    Executa as cinco validações de uma vez: cada arquivo consolidado é baixado e lido
+    uma única vez, as validações executam em paralelo e o relatório consolidado é gerado ao final.
+    """
+    logger.info("=== INICIANDO VALIDAÇÃO COMPLETA ===")
+    try:
+        result = await ValidationEngine(export_format=export_format).run()
+        falhas = [nome for nome, validacao in result["validations"].items() if not validacao.get("success")]
+        if falhas:
+            result["message"] = f"Validações concluídas com falha em: {', '.join(falhas)}"
+        else:
+            result["message"] = "Todas as validações foram concluídas e o relatório consolidado foi gerado."
+        result["show_popup"] = True
+
+        logger.info(f"Validação completa concluída: {result['message']}")
+        return result
+    except Exception as e:
+        logger.exception(f"Erro na validação completa: {str(e)}")
+        return {
+            "success": False,
+            "error": f"Erro na validação: {str(e)}",
+            "show_popup": True
+        }
@@ -1,4 +1,5 @@
 import os
+import asyncio
 from dotenv import load_dotenv
 import requests
 import logging
@@ -8,11 +9,26 @@ import traceback
 import json
 import aiohttp
 from typing import Dict, Any
+from app.core.metrics import stage, record_sharepoint_call
+from app.core.tracing import set_span_attributes
 
-# Configurar logging mais detalhado
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# Tamanho máximo do corpo das respostas do SharePoint incluído nos logs
+MAX_RESPOSTA_LOG = 500
+
+
+def _headers_para_log(headers: Dict[str, str]) -> Dict[str, str]:
+    """Headers da requisição com o token de acesso mascarado, para os logs."""
+    return {chave: "Bearer ***" if chave.lower() == "authorization" else valor for chave, valor in headers.items()}
+
+
+def _resposta_para_log(texto: str) -> str:
+    """Corpo da resposta truncado em MAX_RESPOSTA_LOG caracteres, para os logs."""
+    if len(texto) <= MAX_RESPOSTA_LOG:
+        return texto
+    return f"{texto[:MAX_RESPOSTA_LOG]}... [truncado: {len(texto)} caracteres]"
+
 class SharePointAuth:
     def __init__(self):
         load_dotenv()
@@ -44,7 +60,9 @@ class SharePointAuth:
         self.site_url = os.getenv("SITE_URL", "").rstrip('/')
         logger.debug(f"SITE_URL configurada: {self.site_url}")
         
-        self.token_url = f"https://accounts.accesscontrol.windows.net/{self.tenant_id}/tokens/OAuth/2"
+        # SHAREPOINT_TOKEN_URL permite apontar para outro servidor de token (ex.: benchmarks.sharepoint_standin)
+        self.token_url = os.getenv("SHAREPOINT_TOKEN_URL") or \
+            f"https://accounts.accesscontrol.windows.net/{self.tenant_id}/tokens/OAuth/2"
         logger.debug(f"Token URL configurada: {self.token_url}")
         
         self._validate_credentials()
@@ -91,7 +109,7 @@ class SharePointAuth:
             }
             
             logger.info(f"Fazendo requisição para obter token em: {self.token_url}")
-            logger.debug(f"Payload da requisição: {json.dumps(payload, default=str)}")
+            logger.debug(f"Payload da requisição: {json.dumps({**payload, 'client_secret': '***'}, default=str)}")
             
             response = requests.post(
                 self.token_url,
@@ -101,22 +119,24 @@ class SharePointAuth:
             )
             
             logger.debug(f"Status code: {response.status_code}")
-            logger.debug(f"Resposta completa: {response.text}")
             
+            record_sharepoint_call("token", response.status_code == 200)
             if response.status_code == 200:
                 token_data = response.json()
                 logger.info("Token obtido com sucesso!")
                 return token_data.get('access_token')
             else:
                 logger.error(f"Erro na autenticação: {response.status_code}")
-                logger.error(f"Detalhes do erro: {response.text}")
+                logger.error(f"Detalhes do erro: {_resposta_para_log(response.text)}")
                 return None
                 
         except Exception as e:
+            record_sharepoint_call("token", False)
             logger.error(f"Erro durante autenticação: {str(e)}")
             logger.error(f"Traceback: {traceback.format_exc()}")
             return None
 
+    @stage("download")
     def baixar_arquivo_sharepoint(self, nome_arquivo: str, pasta_r189: str) -> Optional[bytes]:
         """
         Baixa um arquivo específico do SharePoint.
@@ -128,6 +148,7 @@ class SharePointAuth:
         Returns:
             bytes contendo o arquivo ou None se houver erro
         """
+        set_span_attributes(file_name=nome_arquivo, folder=pasta_r189)
         token = self.acquire_token()
         if not token:
             logger.error("Falha ao obter token para download")
@@ -142,6 +163,7 @@ class SharePointAuth:
         try:
             logger.info(f"Baixando arquivo: {url}")
             response = requests.get(url, headers=headers)
+            record_sharepoint_call("download", response.status_code == 200, bytes_received=len(response.content))
             if response.status_code == 200:
                 logger.info(f"Arquivo baixado com sucesso: {nome_arquivo}")
                 return response.content
@@ -149,9 +171,11 @@ class SharePointAuth:
                 logger.error(f"Erro ao baixar arquivo: {response.status_code}")
                 return None
         except Exception as e:
+            record_sharepoint_call("download", False)
             logger.error(f"Erro durante o download: {str(e)}")
             return None
 
+    @stage("upload")
     def enviar_para_sharepoint(self, conteudo_arquivo: BytesIO, nome_destino: str, pasta_r189: str) -> bool:
         """
         Envia um arquivo para o SharePoint, substituindo o arquivo existente se já estiver presente.
@@ -164,6 +188,7 @@ class SharePointAuth:
         Returns:
             bool indicando sucesso ou falha
         """
+        set_span_attributes(file_name=nome_destino, folder=pasta_r189)
         token = self.acquire_token()
         if not token:
             logger.error("Falha ao obter token para upload")
@@ -187,15 +212,18 @@ class SharePointAuth:
                 headers=headers,
                 data=conteudo_arquivo.getvalue()
             )
+            record_sharepoint_call("upload", response.status_code in [200, 201],
+                                   bytes_sent=conteudo_arquivo.getbuffer().nbytes)
             
             if response.status_code in [200, 201]:
                 logger.info(f"Arquivo {nome_destino} enviado com sucesso")
                 return True
             else:
                 logger.error(f"Erro ao enviar arquivo. Status: {response.status_code}")
-                logger.error(f"Resposta: {response.text}")
+                logger.error(f"Resposta: {_resposta_para_log(response.text)}")
                 return False
         except Exception as e:
+            record_sharepoint_call("upload", False)
             logger.error(f"Erro durante upload: {str(e)}")
             logger.error(traceback.format_exc())
             return False
@@ -221,11 +249,71 @@ class SharePointAuth:
 
         try:
             response = requests.post(url, headers=headers)
+            record_sharepoint_call("delete", response.status_code in [200, 204])
             return response.status_code in [200, 204]
         except Exception as e:
+            record_sharepoint_call("delete", False)
             logger.error(f"Erro ao excluir arquivo: {str(e)}")
             return False
 
+    @stage("list")
+    async def listar_arquivos_sharepoint(self, pasta: str, extensoes: Optional[tuple] = None,
+                                         top: Optional[int] = None) -> list:
+        """
+        Lista os arquivos de uma pasta do SharePoint, do mais recente para o mais antigo.
+        A ordenação é feita pelo SharePoint ($orderby); com 'top', só os 'top' mais recentes
+        são retornados pelo servidor ($top), antes do filtro de extensões.
+
+        Args:
+            pasta: Caminho relativo da pasta no SharePoint
+            extensoes: Extensões aceitas (ex.: ('.pdf',)); None lista todos os arquivos
+            top: Quantidade máxima de arquivos (ex.: 1 para o mais recente)
+
+        Returns:
+            Lista de dicts com nome, tamanho e modificado; lista vazia se houver erro
+        """
+        set_span_attributes(folder=pasta)
+        # O token é obtido fora do event loop para que listagens concorrentes não se bloqueiem
+        token = await asyncio.to_thread(self.acquire_token)
+        if not token:
+            logger.error("Falha ao obter token para listagem")
+            return []
+
+        url = f"{self.site_url}/_api/web/GetFolderByServerRelativeUrl('{pasta}')/Files"
+        headers = {
+            "Authorization": f"Bearer {token}",
+            "Accept": "application/json;odata=verbose"
+        }
+        parametros = {"$orderby": "TimeLastModified desc"}
+        if top:
+            parametros["$top"] = str(top)
+
+        try:
+            async with aiohttp.ClientSession() as session:
+                async with session.get(url, headers=headers, params=parametros) as response:
+                    record_sharepoint_call("list", response.status == 200)
+                    if response.status != 200:
+                        logger.error(f"Erro ao listar arquivos de {pasta}: {response.status}")
+                        return []
+                    dados = await response.json(content_type=None)
+        except Exception as e:
+            record_sharepoint_call("list", False)
+            logger.error(f"Erro ao listar arquivos de {pasta}: {str(e)}")
+            return []
+
+        arquivos = [
+            {
+                "nome": arquivo["Name"],
+                "tamanho": arquivo["Length"],
+                "modificado": arquivo["TimeLastModified"]
+            }
+            for arquivo in dados.get('d', {}).get('results', [])
+            if not extensoes or arquivo["Name"].lower().endswith(extensoes)
+        ]
+        arquivos.sort(key=lambda arquivo: arquivo["modificado"], reverse=True)
+        set_span_attributes(files=len(arquivos))
+        return arquivos
+
     def _get_request_digest(self, token: str) -> str:
         """
         Obtém o request digest necessário para operações de escrita no SharePoint
@@ -238,10 +326,12 @@ class SharePointAuth:
         
         try:
             response = requests.post(url, headers=headers)
+            record_sharepoint_call("contextinfo", response.status_code == 200)
             if response.status_code == 200:
                 return response.json()['d']['GetContextWebInformation']['FormDigestValue']
             return ""
         except Exception as e:
+            record_sharepoint_call("contextinfo", False)
             logger.error(f"Erro ao obter request digest: {str(e)}")
             return ""
 
@@ -249,13 +339,14 @@ class SharePointAuth:
         """Faz uma requisição ao SharePoint usando aiohttp."""
         try:
             logger.debug(f"Iniciando requisição para URL: {url}")
-            logger.debug(f"Headers: {headers}")
+            logger.debug(f"Headers: {_headers_para_log(headers)}")
             
             async with aiohttp.ClientSession() as session:
                 async with session.get(url, headers=headers) as response:
                     logger.debug(f"Status code recebido: {response.status}")
                     texto = await response.text()
-                    logger.debug(f"Resposta recebida: {texto}")
+                    record_sharepoint_call("request", response.status == 200, bytes_received=len(texto))
+                    logger.debug(f"Resposta recebida: {_resposta_para_log(texto)}")
                     
                     return {
                         'status_code': response.status,
@@ -264,9 +355,11 @@ class SharePointAuth:
                     }
                     
         except Exception as e:
+            record_sharepoint_call("request", False)
             logger.error(f"Erro na requisição SharePoint: {str(e)}")
             raise
 
+    @stage("upload")
     async def enviar_arquivo_sharepoint(self, conteudo: bytes, nome_arquivo: str, pasta: str) -> bool:
         """
         Envia um arquivo para o SharePoint com sobrescrita explícita.
@@ -279,6 +372,7 @@ class SharePointAuth:
         Returns:
             bool indicando sucesso ou falha
         """
+        set_span_attributes(file_name=nome_arquivo, folder=pasta)
         try:
             logger.info(f"=== INICIANDO UPLOAD PARA SHAREPOINT ===")
             logger.info(f"Nome do arquivo: {nome_arquivo}")
@@ -301,26 +395,28 @@ class SharePointAuth:
             }
 
             logger.info(f"URL de upload: {url}")
-            logger.info(f"Headers: {headers}")
+            logger.info(f"Headers: {_headers_para_log(headers)}")
             
             async with aiohttp.ClientSession() as session:
                 logger.info("Iniciando requisição POST")
                 async with session.post(url, headers=headers, data=conteudo) as response:
                     status = response.status
+                    record_sharepoint_call("upload", status in [200, 201], bytes_sent=len(conteudo))
                     logger.info(f"Status da resposta: {status}")
                     
                     texto = await response.text()
-                    logger.info(f"Resposta: {texto[:500]}..." if len(texto) > 500 else texto)
+                    logger.info(f"Resposta: {_resposta_para_log(texto)}")
                     
                     if status in [200, 201]:
                         logger.info(f"Upload do arquivo {nome_arquivo} concluído com sucesso")
                         return True
                     else:
                         logger.error(f"Erro ao enviar arquivo {nome_arquivo}. Status: {status}")
-                        logger.error(f"Resposta completa: {texto}")
+                        logger.error(f"Resposta: {_resposta_para_log(texto)}")
                         return False
 
         except Exception as e:
+            record_sharepoint_call("upload", False)
             logger.error(f"Exceção ao enviar arquivo para SharePoint: {str(e)}")
             logger.error(traceback.format_exc())
             return False
\ No newline at end of file
@@ -0,0 +1,184 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Optional, Dict, Any, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class ExtractionStore:
+    """
+    Armazenamento persistente (SQLite) dos resultados de extração de PDFs.
+
+    Cada registro é indexado pelo SHA-256 do conteúdo do PDF, pelo nome do
+    extrator e pela versão do extrator. Assim o mesmo documento não é analisado
+    novamente quando um lote é reprocessado, e uma mudança de versão do extrator
+    invalida automaticamente os resultados antigos.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, max_age_days: Optional[float] = None,
+                 max_entries: Optional[int] = None):
+        data_dir = os.getenv("EXTRACTION_STORE_DIR", "data")
+        self.db_path = db_path or os.path.join(data_dir, "extraction_store.sqlite3")
+        self.max_age_seconds = float(
+            max_age_days if max_age_days is not None else os.getenv("EXTRACTION_STORE_MAX_AGE_DAYS", "90")
+        ) * 86400
+        self.max_entries = int(
+            max_entries if max_entries is not None else os.getenv("EXTRACTION_STORE_MAX_ENTRIES", "50000")
+        )
+
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+        diretorio = os.path.dirname(self.db_path)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS extraction_results (
+                sha256 TEXT NOT NULL,
+                extractor TEXT NOT NULL,
+                version TEXT NOT NULL,
+                data TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (sha256, extractor, version)
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_extraction_last_access ON extraction_results (last_access)"
+        )
+        self._conn.commit()
+        logger.info(f"ExtractionStore inicializado em {self.db_path}")
+
+    @staticmethod
+    def content_hash(conteudo: bytes) -> str:
+        """Calcula o SHA-256 do conteúdo do PDF."""
+        return hashlib.sha256(conteudo).hexdigest()
+
+    def get(self, conteudo: bytes, extractor: str, version: str) -> Optional[Dict[str, Any]]:
+        """Retorna o resultado armazenado para o PDF ou None se não existir (ou estiver expirado)."""
+        sha256 = self.content_hash(conteudo)
+        agora = time.time()
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, created_at FROM extraction_results WHERE sha256 = ? AND extractor = ? AND version = ?",
+                (sha256, extractor, version)
+            ).fetchone()
+
+            if row is None or agora - row[1] > self.max_age_seconds:
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE extraction_results SET last_access = ? WHERE sha256 = ? AND extractor = ? AND version = ?",
+                (agora, sha256, extractor, version)
+            )
+            self._conn.commit()
+            self.hits += 1
+
+        return json.loads(row[0])
+
+    def put(self, conteudo: bytes, extractor: str, version: str, dados: Dict[str, Any]) -> None:
+        """Armazena o resultado da extração e aplica a política de expiração."""
+        sha256 = self.content_hash(conteudo)
+        agora = time.time()
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO extraction_results "
+                "(sha256, extractor, version, data, created_at, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                (sha256, extractor, version, json.dumps(dados, default=str), agora, agora)
+            )
+            self.writes += 1
+            self._evict(agora)
+            self._conn.commit()
+
+    def get_or_extract(self, conteudo: bytes, extractor: str, version: str,
+                       extrair: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """Busca o resultado no armazenamento; se não existir, executa a extração e grava o resultado."""
+        dados = self.get(conteudo, extractor, version)
+        if dados is not None:
+            logger.info(f"Resultado de extração {extractor} obtido do armazenamento local")
+            return dados
+
+        dados = extrair()
+        if dados:
+            self.put(conteudo, extractor, version, dados)
+        return dados
+
+    def _evict(self, agora: float) -> None:
+        """Remove registros expirados e os menos acessados quando o limite de registros é excedido."""
+        cursor = self._conn.execute(
+            "DELETE FROM extraction_results WHERE created_at < ?",
+            (agora - self.max_age_seconds,)
+        )
+        removidos = cursor.rowcount
+
+        total = self._conn.execute("SELECT COUNT(*) FROM extraction_results").fetchone()[0]
+        excesso = total - self.max_entries
+        if excesso > 0:
+            cursor = self._conn.execute(
+                "DELETE FROM extraction_results WHERE rowid IN ("
+                "SELECT rowid FROM extraction_results ORDER BY last_access ASC LIMIT ?)",
+                (excesso,)
+            )
+            removidos += cursor.rowcount
+
+        if removidos:
+            self.evictions += removidos
+            logger.info(f"ExtractionStore: {removidos} registros removidos")
+
+    def stats(self) -> Dict[str, Any]:
+        """Retorna as métricas de uso do armazenamento."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM extraction_results").fetchone()[0]
+            consultas = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / consultas, 4) if consultas else 0.0,
+                "writes": self.writes,
+                "evictions": self.evictions,
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "max_age_days": self.max_age_seconds / 86400,
+                "db_path": self.db_path
+            }
+
+    def clear(self) -> None:
+        """Remove todos os registros armazenados."""
+        with self._lock:
+            self._conn.execute("DELETE FROM extraction_results")
+            self._conn.commit()
+
+
+_store: Optional[ExtractionStore] = None
+_store_lock = threading.Lock()
+
+
+def get_extraction_store() -> Optional[ExtractionStore]:
+    """
+    Retorna a instância compartilhada do ExtractionStore.
+    Retorna None quando o armazenamento está desabilitado (EXTRACTION_STORE_ENABLED=false).
+    """
+    global _store
+    if os.getenv("EXTRACTION_STORE_ENABLED", "true").lower() in ("false", "0", "no"):
+        return None
+
+    with _store_lock:
+        if _store is None:
+            _store = ExtractionStore()
+        return _store
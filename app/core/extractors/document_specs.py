@@ -0,0 +1,50 @@
+import re
+
+from app.core.extractors.pdf_engine import DocumentSpec, FieldSpec, normalizar_texto, normalizar_valor
+
+# Padrões comuns aos documentos
+PADRAO_VALOR_DOCUMENTO = r'VALOR DO DOCUMENTO\s*([\d.,]+)'
+
+
+def _normalizar_cidade_spb(valor: str) -> str:
+    """Remove o separador '----' que acompanha a cidade nos PDFs SPB."""
+    return re.sub(r'----$', '', valor).strip()
+
+
+# Os campos são declarados na ordem das colunas do consolidado de cada documento
+
+QPE_SPEC = DocumentSpec(
+    name="QPE",
+    fields=(
+        FieldSpec("CNPJ", r'TOMADOR DE SERVIÇOS.*?\n.*?(\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2})', re.DOTALL),
+        FieldSpec("QPE_ID", r'(QPE-\d+)'),
+        FieldSpec("NOTA_FISCAL", r'GERADOR(\d{7})'),
+        FieldSpec("VALOR_TOTAL", PADRAO_VALOR_DOCUMENTO, normalizer=normalizar_valor, default=0.0),
+        FieldSpec("CIDADE", r'.*,\s*([A-Z\s]+)\s*-', normalizer=normalizar_texto),
+    )
+)
+
+NFSERV_SPEC = DocumentSpec(
+    name="NFSERV",
+    fields=(
+        FieldSpec("CNPJ", r'CNPJ:\s*(\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2})', re.DOTALL),
+        FieldSpec("NFSERV_ID", r'N\.\s*CONTROLE:\s*(?:[A-Z]{3}_)?([A-Z]{3}-\d{6})', default="ID NÃO ENCONTRADO"),
+        FieldSpec("VALOR_TOTAL", PADRAO_VALOR_DOCUMENTO, normalizer=normalizar_valor, default=0.0),
+        FieldSpec("CIDADE", r'CIDADE\s+([A-ZÀ-Ú\s]+)\s+ESTADO', normalizer=normalizar_texto),
+    )
+)
+
+SPB_SPEC = DocumentSpec(
+    name="SPB",
+    fields=(
+        FieldSpec("CNPJ", r'TOMADOR DE SERVIÇOS.*?\n.*?CPF/CNPJ:\s*(\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2})', re.DOTALL),
+        FieldSpec("SPB_ID", r'(SPB-\d+)'),
+        FieldSpec("Num_Nota", r'Código de Verificação(0000\d{5})'),
+        FieldSpec("VALOR_TOTAL", PADRAO_VALOR_DOCUMENTO, normalizer=normalizar_valor, default=0.0),
+        FieldSpec(
+            "CIDADE",
+            r'CEP:\s*\d{5}-\d{3}\s*(.*?)\s*INTERMEDIÁRIO DE SERVIÇOS',
+            normalizer=_normalizar_cidade_spb
+        ),
+    )
+)
@@ -4,14 +4,17 @@ import pandas as pd
 import logging
 import traceback
 from app.core.auth import SharePointAuth
-from typing import List, Dict, Any
+from app.core.extractors.r189_extractor import ler_planilha_r189
+from app.core.metrics import pipeline, track_stage
+from app.core.tracing import set_span_attributes
+from typing import List, Dict, Any, Optional
 
 logger = logging.getLogger(__name__)
 
 class MunicipalityCodeExtractor:
-    def __init__(self):
+    def __init__(self, sharepoint_auth: Optional[SharePointAuth] = None):
         logger.info("=== INICIALIZANDO MUNICIPALITY CODE EXTRACTOR ===")
-        self.sharepoint_auth = SharePointAuth()
+        self.sharepoint_auth = sharepoint_auth or SharePointAuth()
         logger.info("SharePointAuth inicializado no MunicipalityCodeExtractor")
 
     async def process_file(self, file_content: BytesIO) -> dict:
@@ -50,49 +53,11 @@ class MunicipalityCodeExtractor:
             logger.info("Iniciando consolidação do Municipality Code")
             
             # Lê o arquivo Excel
-            df = pd.read_excel(
-                conteudo,
-                sheet_name=None,
-                na_values=['', ' '],
-                keep_default_na=True,
-                header=12
-            )
-
-            if 'BRASIL' not in df:
-                raise ValueError("Aba 'BRASIL' não encontrada no arquivo")
-            
-            df_brasil = df['BRASIL']
-
-            # Colunas necessárias
-            colunas_necessarias = [
-                'CNPJ - WEG',
-                'Invoice number',
-                'Municipality Code',
-                'Invoice Type',
-                'Site Name - WEG 2',
-                'Total Geral'
-            ]
-            
-            # Validação das colunas
-            colunas_faltantes = [col for col in colunas_necessarias if col not in df_brasil.columns]
-            if colunas_faltantes:
-                raise ValueError(f"Colunas faltantes: {colunas_faltantes}")
-            
-            df_consolidado = df_brasil[colunas_necessarias].copy()
-
-            # Tratamento dos dados
-            df_consolidado[['CNPJ - WEG', 'Invoice number', 'Site Name - WEG 2']] = \
-                df_consolidado[['CNPJ - WEG', 'Invoice number', 'Site Name - WEG 2']].ffill()
-
-            df_resultado = df_consolidado[df_consolidado['Invoice Type'] == 'SRV'].copy()
-            df_resultado = df_resultado.dropna(subset=[
-                'CNPJ - WEG', 'Invoice number', 'Municipality Code', 'Total Geral'
-            ])
-            df_resultado = df_resultado.drop('Invoice Type', axis=1)
+            df_resultado = self.consolidar_municipality_code_dataframe(ler_planilha_r189(conteudo))
 
             # Gerar arquivo consolidado
             arquivo_consolidado = BytesIO()
-            with pd.ExcelWriter(arquivo_consolidado, engine='xlsxwriter') as writer:
+            with track_stage("write_xlsx", rows=len(df_resultado)), pd.ExcelWriter(arquivo_consolidado, engine='xlsxwriter') as writer:
                 df_resultado.to_excel(writer, index=False, sheet_name='Municipality_Code_consolidado')
             
             arquivo_consolidado.seek(0)
@@ -129,6 +94,44 @@ class MunicipalityCodeExtractor:
             logger.error(f"Erro na consolidação do Municipality Code: {str(e)}")
             raise
 
+    def consolidar_municipality_code_dataframe(self, planilhas: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+        """
+        Seleciona as notas de serviço (SRV) da aba BRASIL, lida por ler_planilha_r189,
+        com o código do município de cada uma.
+        """
+        if 'BRASIL' not in planilhas:
+            raise ValueError("Aba 'BRASIL' não encontrada no arquivo")
+        
+        df_brasil = planilhas['BRASIL']
+
+        # Colunas necessárias
+        colunas_necessarias = [
+            'CNPJ - WEG',
+            'Invoice number',
+            'Municipality Code',
+            'Invoice Type',
+            'Site Name - WEG 2',
+            'Total Geral'
+        ]
+        
+        # Validação das colunas
+        colunas_faltantes = [col for col in colunas_necessarias if col not in df_brasil.columns]
+        if colunas_faltantes:
+            raise ValueError(f"Colunas faltantes: {colunas_faltantes}")
+        
+        df_consolidado = df_brasil[colunas_necessarias].copy()
+
+        # Tratamento dos dados
+        df_consolidado[['CNPJ - WEG', 'Invoice number', 'Site Name - WEG 2']] = \
+            df_consolidado[['CNPJ - WEG', 'Invoice number', 'Site Name - WEG 2']].ffill()
+
+        df_resultado = df_consolidado[df_consolidado['Invoice Type'] == 'SRV'].copy()
+        df_resultado = df_resultado.dropna(subset=[
+            'CNPJ - WEG', 'Invoice number', 'Municipality Code', 'Total Geral'
+        ])
+        return df_resultado.drop('Invoice Type', axis=1)
+
+    @pipeline("extract_mun_code")
     async def process_selected_files(self, selected_files: List[str]) -> Dict[str, Any]:
         """
         Processa os arquivos Municipality Code selecionados, consolida e envia para o SharePoint.
@@ -136,6 +139,7 @@ class MunicipalityCodeExtractor:
         try:
             logger.info(f"=== INICIANDO PROCESSAMENTO DE {len(selected_files)} ARQUIVOS MUNICIPALITY CODE ===")
             logger.info(f"Arquivos selecionados: {selected_files}")
+            set_span_attributes(files=len(selected_files), file_names=", ".join(selected_files))
             
             if not selected_files:
                 logger.error("Nenhum arquivo selecionado para processamento")
@@ -0,0 +1,127 @@
+import os
+import logging
+import importlib.util
+from io import BytesIO
+from typing import Dict, List, Optional, Type
+
+logger = logging.getLogger(__name__)
+
+
+class PDFDocument:
+    """Documento aberto por um backend: expõe a quantidade de páginas e o texto de cada página."""
+
+    @property
+    def page_count(self) -> int:
+        raise NotImplementedError
+
+    def page_text(self, index: int) -> str:
+        raise NotImplementedError
+
+
+class PDFTextBackend:
+    """
+    Interface dos backends de extração de texto de PDF.
+
+    Cada backend declara o módulo de que depende; backends cuja dependência
+    não está instalada não aparecem em available_backends().
+    """
+    name = ""
+    module = ""
+
+    @classmethod
+    def is_available(cls) -> bool:
+        return importlib.util.find_spec(cls.module) is not None
+
+    def open(self, pdf_file: BytesIO) -> PDFDocument:
+        raise NotImplementedError
+
+
+class _PagesDocument(PDFDocument):
+    """Documento de backends cujas páginas possuem extract_text() (PyPDF2, pypdf, pdfplumber)."""
+
+    def __init__(self, pages):
+        self._pages = pages
+
+    @property
+    def page_count(self) -> int:
+        return len(self._pages)
+
+    def page_text(self, index: int) -> str:
+        return self._pages[index].extract_text() or ""
+
+
+class PyPDF2Backend(PDFTextBackend):
+    """Backend padrão, o mesmo usado originalmente pelos extratores."""
+    name = "pypdf2"
+    module = "PyPDF2"
+
+    def open(self, pdf_file: BytesIO) -> PDFDocument:
+        import PyPDF2
+        return _PagesDocument(PyPDF2.PdfReader(pdf_file).pages)
+
+
+class PypdfBackend(PDFTextBackend):
+    name = "pypdf"
+    module = "pypdf"
+
+    def open(self, pdf_file: BytesIO) -> PDFDocument:
+        import pypdf
+        return _PagesDocument(pypdf.PdfReader(pdf_file).pages)
+
+
+class PdfPlumberBackend(PDFTextBackend):
+    name = "pdfplumber"
+    module = "pdfplumber"
+
+    def open(self, pdf_file: BytesIO) -> PDFDocument:
+        import pdfplumber
+        return _PagesDocument(pdfplumber.open(pdf_file).pages)
+
+
+class _PyMuPDFDocument(PDFDocument):
+    def __init__(self, documento):
+        self._documento = documento
+
+    @property
+    def page_count(self) -> int:
+        return self._documento.page_count
+
+    def page_text(self, index: int) -> str:
+        return self._documento[index].get_text()
+
+
+class PyMuPDFBackend(PDFTextBackend):
+    name = "pymupdf"
+    module = "fitz"
+
+    def open(self, pdf_file: BytesIO) -> PDFDocument:
+        import fitz
+        return _PyMuPDFDocument(fitz.open(stream=pdf_file.getvalue(), filetype="pdf"))
+
+
+BACKENDS: Dict[str, Type[PDFTextBackend]] = {
+    backend.name: backend
+    for backend in (PyPDF2Backend, PypdfBackend, PdfPlumberBackend, PyMuPDFBackend)
+}
+
+
+def available_backends() -> List[str]:
+    """Lista os backends cuja dependência está instalada."""
+    return [nome for nome, backend in BACKENDS.items() if backend.is_available()]
+
+
+def get_backend(name: Optional[str] = None) -> PDFTextBackend:
+    """
+    Retorna o backend informado ou o configurado em PDF_TEXT_BACKEND (padrão: pypdf2).
+    """
+    nome = (name or os.getenv("PDF_TEXT_BACKEND", PyPDF2Backend.name)).lower()
+
+    if nome not in BACKENDS:
+        raise ValueError(f"Backend de PDF desconhecido: {nome}. Disponíveis: {', '.join(BACKENDS)}")
+
+    backend = BACKENDS[nome]
+    if not backend.is_available():
+        raise ValueError(f"Backend de PDF '{nome}' requer o pacote '{backend.module}', que não está instalado")
+
+    logger.info(f"Backend de extração de texto de PDF: {nome}")
+    return backend()
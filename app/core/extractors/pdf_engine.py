@@ -0,0 +1,181 @@
+import re
+import logging
+import threading
+import weakref
+from collections import namedtuple
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.extractors.pdf_backends import PDFTextBackend, get_backend
+
+logger = logging.getLogger(__name__)
+
+
+def normalizar_texto(valor: str) -> str:
+    """Remove espaços nas extremidades do texto capturado."""
+    return valor.strip()
+
+
+def normalizar_valor(valor: str) -> float:
+    """Converte um valor no formato brasileiro (1.234,56) para float."""
+    return float(valor.replace('.', '').replace(',', '.'))
+
+
+@dataclass(frozen=True)
+class FieldSpec:
+    """
+    Declaração de um campo extraído do texto do PDF.
+
+    Attributes:
+        name: Nome do campo no registro extraído
+        pattern: Expressão regular com o grupo de captura do valor
+        flags: Flags do módulo re (ex.: re.DOTALL)
+        normalizer: Função aplicada ao valor capturado
+        default: Valor usado quando o padrão não é encontrado
+        group: Grupo de captura com o valor
+        required: Se o campo ausente justifica ler as páginas seguintes
+        pages: Quantidade de páginas em que o campo é procurado (None = todas as lidas)
+    """
+    name: str
+    pattern: str
+    flags: int = 0
+    normalizer: Optional[Callable[[str], Any]] = None
+    default: Any = None
+    group: int = 1
+    required: bool = True
+    pages: Optional[int] = None
+
+
+@dataclass(frozen=True)
+class DocumentSpec:
+    """
+    Declaração de um tipo de documento: os campos (na ordem do registro) e
+    quantas páginas do PDF são lidas.
+    """
+    name: str
+    fields: Tuple[FieldSpec, ...]
+    max_pages: int = 2
+
+
+# Marcador de campo ainda não encontrado
+_AUSENTE = object()
+
+# Motores vivos no processo, para consolidar as estatísticas de páginas; as referências
+# fracas não mantêm vivos os motores temporários (testes, benchmarks)
+_engines: "weakref.WeakSet[PDFExtractionEngine]" = weakref.WeakSet()
+
+
+class PDFExtractionEngine:
+    """
+    Extrai os campos de um tipo de documento a partir da sua DocumentSpec.
+
+    Os padrões são compilados uma única vez, na criação do motor, e o resultado
+    é um registro compacto (namedtuple) com os campos na ordem declarada.
+
+    O texto é extraído página a página, pelo backend configurado (PyPDF2 por
+    padrão): a página seguinte só é lida quando ainda falta algum campo
+    obrigatório que pode estar nela.
+    """
+
+    def __init__(self, spec: DocumentSpec, backend: Optional[PDFTextBackend] = None):
+        self.spec = spec
+        self.backend = backend or get_backend()
+        self.record_type = namedtuple(f"{spec.name}Record", [field.name for field in spec.fields])
+        self._compiled = [
+            (field, re.compile(field.pattern, field.flags))
+            for field in spec.fields
+        ]
+
+        self._lock = threading.Lock()
+        self.documents = 0
+        self.pages_parsed = 0
+        self.pages_skipped = 0
+        _engines.add(self)
+
+    def join_pages(self, textos: List[str]) -> str:
+        """Concatena os textos das páginas; páginas não lidas contam como texto vazio, como na extração original."""
+        return "\n".join(textos + [""] * (self.spec.max_pages - len(textos)))
+
+    def _buscar(self, texto: str, valores: list, indice_pagina: int) -> None:
+        """Procura no texto os campos ainda não encontrados cujo escopo inclui a página."""
+        for posicao, (field, padrao) in enumerate(self._compiled):
+            if valores[posicao] is not _AUSENTE:
+                continue
+            if field.pages is not None and indice_pagina >= field.pages:
+                continue
+
+            match = padrao.search(texto)
+            if match:
+                valor = match.group(field.group)
+                valores[posicao] = field.normalizer(valor) if field.normalizer else valor
+
+    def _precisa_pagina(self, valores: list, indice_pagina: int) -> bool:
+        """Indica se algum campo obrigatório ausente ainda pode estar na página informada."""
+        return any(
+            valores[posicao] is _AUSENTE
+            and field.required
+            and (field.pages is None or indice_pagina < field.pages)
+            for posicao, (field, _) in enumerate(self._compiled)
+        )
+
+    def _montar_registro(self, valores: list):
+        """Aplica os valores padrão aos campos não encontrados e monta o registro."""
+        for posicao, (field, _) in enumerate(self._compiled):
+            if valores[posicao] is _AUSENTE:
+                valores[posicao] = field.default
+            logger.debug(f"{self.spec.name}.{field.name} extraído: {valores[posicao]}")
+        return self.record_type(*valores)
+
+    def extract_fields(self, texto: str):
+        """Aplica os padrões compilados a um texto já extraído e monta o registro."""
+        valores = [_AUSENTE] * len(self._compiled)
+        self._buscar(texto, valores, 0)
+        return self._montar_registro(valores)
+
+    def extract(self, pdf_file: BytesIO):
+        """Extrai o texto do PDF página a página e retorna o registro do documento."""
+        documento = self.backend.open(pdf_file)
+        total_paginas = min(documento.page_count, self.spec.max_pages)
+
+        valores = [_AUSENTE] * len(self._compiled)
+        textos: List[str] = []
+        for indice in range(total_paginas):
+            if indice > 0 and not self._precisa_pagina(valores, indice):
+                break
+            textos.append(documento.page_text(indice))
+            self._buscar(self.join_pages(textos), valores, indice)
+
+        paginas_lidas = len(textos)
+        with self._lock:
+            self.documents += 1
+            self.pages_parsed += paginas_lidas
+            self.pages_skipped += total_paginas - paginas_lidas
+
+        logger.debug(f"{self.spec.name}: {paginas_lidas} de {total_paginas} páginas analisadas")
+        return self._montar_registro(valores)
+
+    def stats(self) -> Dict[str, Any]:
+        """Retorna os contadores de documentos e páginas analisadas/puladas."""
+        with self._lock:
+            return {
+                "documents": self.documents,
+                "pages_parsed": self.pages_parsed,
+                "pages_skipped": self.pages_skipped,
+                "pages_per_document": round(self.pages_parsed / self.documents, 3) if self.documents else 0.0
+            }
+
+
+def engine_stats() -> Dict[str, Dict[str, Any]]:
+    """Retorna as estatísticas de páginas dos motores vivos, somadas por tipo de documento."""
+    totais: Dict[str, Dict[str, int]] = {}
+    for engine in list(_engines):
+        estatisticas = engine.stats()
+        total = totais.setdefault(engine.spec.name, {"documents": 0, "pages_parsed": 0, "pages_skipped": 0})
+        for chave in total:
+            total[chave] += estatisticas[chave]
+    return {
+        nome: {**total, "pages_per_document": round(total["pages_parsed"] / total["documents"], 3)
+               if total["documents"] else 0.0}
+        for nome, total in totais.items()
+    }
@@ -1,20 +1,32 @@
 import os
 from io import BytesIO
 import pandas as pd
-import PyPDF2
-import re
 import traceback
 import logging
 from app.core.auth import SharePointAuth
-from typing import List, Dict, Any
+from app.core.metrics import pipeline, stage, track_stage
+from app.core.tracing import set_span_attributes
+from app.core.extraction_store import get_extraction_store
+from app.core.extractors.pdf_engine import PDFExtractionEngine
+from app.core.extractors.document_specs import QPE_SPEC
+from app.core.records import document_batch
+from typing import List, Dict, Any, Optional
 
 logger = logging.getLogger(__name__)
 
+# Motor de extração compartilhado: os padrões da spec são compilados uma única vez
+_engine = PDFExtractionEngine(QPE_SPEC)
+
 class QPEExtractor:
-    def __init__(self):
+    # Versão da lógica de extração. Incrementar sempre que a extração mudar,
+    # para invalidar os resultados gravados no ExtractionStore.
+    EXTRACTOR_VERSION = "1"
+
+    def __init__(self, sharepoint_auth: Optional[SharePointAuth] = None):
         logger.info("=== INICIALIZANDO QPE EXTRACTOR ===")
-        self.sharepoint_auth = SharePointAuth()
+        self.sharepoint_auth = sharepoint_auth or SharePointAuth()
         logger.info("SharePointAuth inicializado no QPEExtractor")
+        self.extraction_store = get_extraction_store()
 
     async def process_file(self, file_content: BytesIO) -> dict:
         """
@@ -42,64 +54,31 @@ class QPEExtractor:
                 "error": str(e)
             }
 
+    @stage("parse")
     def extrair_dados_pdf(self, pdf_file: BytesIO) -> dict:
         """
         Extrai os dados necessários do arquivo PDF.
+        Consulta antes o armazenamento local de extrações, indexado pelo hash do PDF.
+        """
+        if self.extraction_store is None:
+            return self._extrair_dados_pdf(pdf_file)
+
+        return self.extraction_store.get_or_extract(
+            pdf_file.getvalue(),
+            "QPE",
+            # O backend de texto faz parte da versão: backends diferentes podem gerar textos diferentes
+            f"{self.EXTRACTOR_VERSION}:{_engine.backend.name}",
+            lambda: self._extrair_dados_pdf(pdf_file)
+        )
+
+    def _extrair_dados_pdf(self, pdf_file: BytesIO) -> dict:
+        """
+        Analisa o PDF e extrai os campos declarados em QPE_SPEC.
         """
         try:
             logger.info("Iniciando extração de dados do PDF")
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
-            
-            # Extrair texto da primeira página
-            texto_pagina1 = pdf_reader.pages[0].extract_text()
-            
-            # Extrair texto da segunda página (se existir)
-            texto_pagina2 = pdf_reader.pages[1].extract_text() if len(pdf_reader.pages) > 1 else ""
-            
-            # Texto combinado para busca
-            texto_combinado = texto_pagina1 + "\n" + texto_pagina2
-
-            logger.info("=== TEXTO EXTRAÍDO DO PDF ===")
-            logger.info(texto_combinado[:500] + "..." if len(texto_combinado) > 500 else texto_combinado)
-            logger.info("============================")
-            
-            # Extrair CNPJ do Tomador de Serviços
-            padrao_cnpj = r'TOMADOR DE SERVIÇOS.*?\n.*?(\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2})'
-            cnpj_match = re.search(padrao_cnpj, texto_combinado, re.DOTALL)
-            cnpj = cnpj_match.group(1) if cnpj_match else None
-            logger.info(f"CNPJ extraído: {cnpj}")
-            
-            # Extrair Cidade
-            padrao_cidade = r'.*,\s*([A-Z\s]+)\s*-'
-            cidade_match = re.search(padrao_cidade, texto_combinado)
-            cidade = cidade_match.group(1).strip() if cidade_match else None
-            logger.info(f"Cidade extraída: {cidade}")
-            
-            # Extrair QPE_ID 
-            padrao_qpe = r'(QPE-\d+)'
-            qpe_match = re.search(padrao_qpe, texto_combinado)
-            qpe_id = qpe_match.group(1) if qpe_match else None
-            logger.info(f"QPE_ID extraído: {qpe_id}")
-            
-            # Extrair Valor Total
-            padrao_valor = r'VALOR DO DOCUMENTO\s*([\d.,]+)'
-            valor_match = re.search(padrao_valor, texto_combinado)
-            valor_total = valor_match.group(1).replace('.', '').replace(',', '.') if valor_match else 0.00
-            logger.info(f"Valor Total extraído: {valor_total}")
-            
-            # Extrair Número da Nota Fiscal
-            padrao_nota_fiscal = r'GERADOR(\d{7})'
-            nota_fiscal_match = re.search(padrao_nota_fiscal, texto_combinado)
-            nota_fiscal = nota_fiscal_match.group(1) if nota_fiscal_match else None
-            logger.info(f"Nota Fiscal extraída: {nota_fiscal}")
-            
-            dados = {
-                'CNPJ': cnpj,
-                'QPE_ID': qpe_id,
-                'NOTA_FISCAL': nota_fiscal,
-                'VALOR_TOTAL': float(valor_total),
-                'CIDADE': cidade
-            }
+            registro = _engine.extract(pdf_file)
+            dados = registro._asdict()
             
             logger.info(f"Dados extraídos com sucesso: {dados}")
             return dados
@@ -108,13 +87,34 @@ class QPEExtractor:
             logger.error(f"Erro ao extrair dados do PDF: {str(e)}")
             logger.error(traceback.format_exc())
             raise
+    
+    def extrair_dataframe(self, pdf_files: List[BytesIO]) -> pd.DataFrame:
+        """
+        Extrai os campos de cada PDF e retorna os registros em um DataFrame,
+        sem gerar a planilha nem enviar ao SharePoint.
+        """
+        dados_consolidados = document_batch(QPE_SPEC)
+        for i, pdf_file in enumerate(pdf_files):
+            try:
+                dados = self.extrair_dados_pdf(pdf_file)
+                if dados:
+                    dados_consolidados.append(dados)
+                else:
+                    logger.warning(f"Nenhum dado extraído do arquivo {i+1}")
+            except Exception as e:
+                logger.error(f"Erro ao processar arquivo {i+1}: {str(e)}")
+                continue
+
+        if not dados_consolidados:
+            raise ValueError("Nenhum dado foi extraído dos PDFs")
+        return dados_consolidados.to_frame()
 
     async def consolidar_qpe(self, pdf_files: list) -> BytesIO:
         """
         Consolida os dados dos PDFs selecionados em um novo arquivo Excel.
         """
         logger.info(f"=== INICIANDO CONSOLIDAÇÃO DE {len(pdf_files)} ARQUIVOS QPE ===")
-        dados_consolidados = []
+        dados_consolidados = document_batch(QPE_SPEC)
         pasta_qpe = '/teams/BR-TI-TIN/AutomaoFinanas/QPE'
         pasta_consolidado = '/teams/BR-TI-TIN/AutomaoFinanas/CONSOLIDADO'
         
@@ -168,11 +168,11 @@ class QPEExtractor:
 
         # Criar DataFrame e arquivo Excel
         logger.info(f"Criando DataFrame com {len(dados_consolidados)} registros")
-        df = pd.DataFrame(dados_consolidados)
+        df = dados_consolidados.to_frame()
         excel_output = BytesIO()
         
         logger.info("Criando arquivo Excel")
-        with pd.ExcelWriter(excel_output, engine='xlsxwriter') as writer:
+        with track_stage("write_xlsx", rows=len(df)), pd.ExcelWriter(excel_output, engine='xlsxwriter') as writer:
             df.to_excel(writer, index=False, sheet_name='QPE_Consolidado')
         
         excel_output.seek(0)
@@ -203,6 +203,7 @@ class QPEExtractor:
         excel_output.seek(0)
         return excel_output
 
+    @pipeline("extract_qpe")
     async def process_selected_files(self, selected_files: List[str]) -> Dict[str, Any]:
         """
         Processa os arquivos QPE selecionados, consolida e envia para o SharePoint.
@@ -210,6 +211,7 @@ class QPEExtractor:
         try:
             logger.info(f"=== INICIANDO PROCESSAMENTO DE {len(selected_files)} ARQUIVOS QPE ===")
             logger.info(f"Arquivos selecionados: {selected_files}")
+            set_span_attributes(files=len(selected_files), file_names=", ".join(selected_files))
             
             if not selected_files:
                 logger.error("Nenhum arquivo selecionado para processamento")
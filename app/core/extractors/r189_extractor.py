@@ -4,6 +4,11 @@ from io import BytesIO
 import pandas as pd
 from pyxlsb import open_workbook
 from app.core.auth import SharePointAuth  # Importa a classe SharePointAuth
+from app.core.metrics import pipeline, track_stage
+from app.core.tracing import set_span_attributes
+from app.core.records import ColumnBatch, R189_FIELDS, R189_FLOAT_FIELDS
+from app.core.money import from_cents, to_cents
+from app.core.extractors.r189_schema import aplicar_schema_planilhas
 import uuid
 import logging
 import traceback
@@ -11,16 +16,59 @@ from typing import List, Dict, Any, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
+
+def ler_planilha_r189(conteudo) -> Dict[str, pd.DataFrame]:
+    """
+    Lê todas as abas da planilha R189 de origem (cabeçalho na linha 13), com as colunas
+    repetitivas já no dtype category. Usada pela consolidação do R189 e do Municipality Code,
+    que partem do mesmo arquivo.
+    """
+    with track_stage("parse") as span:
+        planilhas = pd.read_excel(
+            conteudo,
+            sheet_name=None,
+            na_values=['', ' '],
+            keep_default_na=True,
+            header=12
+        )
+        span.set_attributes({"sheets": len(planilhas), "rows": sum(len(aba) for aba in planilhas.values())})
+    # CNPJ, site, tipo de nota e código do município como category (ver r189_schema)
+    return aplicar_schema_planilhas(planilhas)
+
+
+def normalizar_r189_consolidado(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Registros do R189 consolidado com os campos de R189_FIELDS, convertidos coluna a coluna:
+    CNPJ, nota e site como texto (str de cada valor) e o total (4ª coluna) como float,
+    arredondado ao centavo (money.to_cents). Totais vazios ou inválidos ficam NaN, para não
+    serem comparados como zero nas conciliações; os inválidos são registrados no log.
+    """
+    totais = df.iloc[:, 3]
+    centavos = to_cents(totais)
+    invalidos = int((centavos.isna() & totais.notna()).sum())
+    if invalidos:
+        logger.warning(f"{invalidos} totais do R189 consolidado não puderam ser convertidos e ficaram vazios")
+    return pd.DataFrame({
+        "cnpj_fornecedor": df['CNPJ - WEG'].astype(str),
+        "nota_fiscal": df['Invoice number'].astype(str),
+        "site_name": df['Site Name - WEG 2'].astype(str),
+        "valor_total": from_cents(centavos),
+    }, columns=list(R189_FIELDS))
+
+
 class R189Extractor:
-    def __init__(self):
-        self.sharepoint_auth = SharePointAuth()
+    def __init__(self, sharepoint_auth: Optional[SharePointAuth] = None):
+        self.sharepoint_auth = sharepoint_auth or SharePointAuth()
         logger.info("R189Extractor inicializado")
 
-    async def process_file(self, file_content: BytesIO) -> Dict[str, Any]:
-        """Processa um arquivo R189"""
+    async def process_file(self, file_content: BytesIO, as_dataframe: bool = False) -> Dict[str, Any]:
+        """
+        Processa um arquivo R189: consolida a planilha e devolve o arquivo consolidado e os
+        registros consolidados (ver extract_data).
+        """
         try:
-            self.logger.info("Iniciando processamento do arquivo R189")
-            consolidated_data = await self.consolidar_r189(file_content)
+            logger.info("Iniciando processamento do arquivo R189")
+            consolidated_data = self.consolidar_r189_dataframe(ler_planilha_r189(file_content))
             
             if consolidated_data is None:
                 return {
@@ -30,48 +78,52 @@ class R189Extractor:
 
             # Gera o arquivo consolidado em formato BytesIO
             arquivo_consolidado = BytesIO()
-            with pd.ExcelWriter(arquivo_consolidado, engine='xlsxwriter') as writer:
+            with track_stage("write_xlsx", rows=len(consolidated_data)), pd.ExcelWriter(arquivo_consolidado, engine='xlsxwriter') as writer:
                 consolidated_data.to_excel(writer, index=False, sheet_name='Consolidado_R189')
             
             arquivo_consolidado.seek(0)
 
             return {
                 "success": True,
-                "data": consolidated_data,
+                "data": self._registros(consolidated_data, as_dataframe),
                 "consolidated_file": arquivo_consolidado
             }
 
         except Exception as e:
-            self.logger.error(f"Erro no processamento do arquivo R189: {str(e)}")
+            logger.error(f"Erro no processamento do arquivo R189: {str(e)}")
             return {
                 "success": False,
                 "error": f"Erro ao processar arquivo: {str(e)}"
             }
 
-    async def extract_data(self, file_content: BytesIO) -> Dict[str, Any]:
+    @staticmethod
+    def _registros(df_consolidado: pd.DataFrame, as_dataframe: bool):
+        """Registros do R189 consolidado como DataFrame ou como ColumnBatch (colunas)."""
+        registros = normalizar_r189_consolidado(df_consolidado)
+        if as_dataframe:
+            return registros
+        return ColumnBatch.from_columns({campo: registros[campo] for campo in R189_FIELDS}, R189_FLOAT_FIELDS)
+
+    async def extract_data(self, file_content: BytesIO, as_dataframe: bool = False) -> Dict[str, Any]:
         """
         Extrai dados do arquivo R189 consolidado
         
         Args:
             file_content: BytesIO contendo o arquivo Excel consolidado
+            as_dataframe: devolve os registros como DataFrame em vez de ColumnBatch
             
         Returns:
-            Dicionário com status de sucesso e dados extraídos ou mensagem de erro
+            Dicionário com status de sucesso e dados extraídos (ColumnBatch com os campos
+            de R189_FIELDS, ou o DataFrame normalizado) ou mensagem de erro. Para respostas
+            JSON, records.iter_json gera os registros sob demanda.
         """
         try:
             logger.info("Iniciando extração de dados do arquivo consolidado")
             # Lê o arquivo consolidado
             df = pd.read_excel(file_content, sheet_name='Consolidado_R189')
             
-            # Converte os dados para o formato esperado
-            dados = []
-            for _, row in df.iterrows():
-                dados.append({
-                    'cnpj_fornecedor': str(row['CNPJ - WEG']),
-                    'nota_fiscal': str(row['Invoice number']),
-                    'site_name': str(row['Site Name - WEG 2']),
-                    'valor_total': float(row.iloc[3]) if pd.notna(row.iloc[3]) else 0.0,
-                })
+            # Converte os dados para o formato esperado coluna a coluna (sem percorrer as linhas)
+            dados = self._registros(df, as_dataframe)
             
             logger.info(f"Dados extraídos com sucesso: {len(dados)} registros")
             return {
@@ -94,62 +146,11 @@ class R189Extractor:
             logger.info("Iniciando consolidação do arquivo R189")
             
             # Lê o arquivo Excel
-            df = pd.read_excel(
-                conteudo,
-                sheet_name=None,
-                na_values=['', ' '],
-                keep_default_na=True,
-                header=12
-            )
-            
-            # Verifica se a aba 'BRASIL' existe
-            if 'BRASIL' not in df:
-                raise ValueError("A aba 'BRASIL' não foi encontrada no arquivo Excel.")
-            
-            # Obtém os dados apenas da aba 'BRASIL'
-            df_brasil = df['BRASIL']
-
-            # Combina todas as abas em um único DataFrame
-            df_consolidado = df_brasil.copy()
-
-            # Seleciona apenas as colunas necessárias
-            colunas_necessarias = [
-                'CNPJ - WEG',
-                'Invoice number',
-                'Site Name - WEG 2',
-                'Total Geral',
-                'Account number'
-            ]
-            
-            # Verifica se todas as colunas necessárias existem
-            colunas_faltantes = [col for col in colunas_necessarias if col not in df_consolidado.columns]
-            if colunas_faltantes:
-                raise ValueError(f"Colunas faltantes no arquivo Excel: {colunas_faltantes}")
-            
-            # Seleciona apenas as colunas necessárias
-            df_resultado = df_consolidado[colunas_necessarias].copy()
-            
-            # Identifica linhas onde Account number NÃO contém a string 'Total'
-            linhas_sem_total = ~df_resultado['Account number'].astype(str).str.contains('Total', na=True)
-            
-            # Aplica o ffill apenas nas linhas onde Account number NÃO contém 'Total'
-            df_resultado.loc[linhas_sem_total, 'Invoice number'] = df_resultado.loc[linhas_sem_total, 'Invoice number'].ffill()
-            
-            # Preenche outros valores vazios
-            df_resultado[['CNPJ - WEG', 'Site Name - WEG 2']] = df_resultado[['CNPJ - WEG', 'Site Name - WEG 2']].ffill()
-            
-            # Remove linhas que ainda possuem valores NaN nas colunas principais
-            df_resultado = df_resultado.dropna(subset=['CNPJ - WEG', 'Invoice number', 'Site Name - WEG 2', 'Total Geral'])
-
-            # Remove a coluna Account number antes do agrupamento
-            df_resultado = df_resultado.drop('Account number', axis=1)
-
-            # Agrupa por todas as colunas exceto 'Total Geral' e soma os valores
-            df_resultado = df_resultado.groupby(['CNPJ - WEG', 'Invoice number', 'Site Name - WEG 2'], as_index=False)['Total Geral'].sum()
+            df_resultado = self.consolidar_r189_dataframe(ler_planilha_r189(conteudo))
 
             # Gera o arquivo consolidado em formato BytesIO
             arquivo_consolidado = BytesIO()
-            with pd.ExcelWriter(arquivo_consolidado, engine='xlsxwriter') as writer:
+            with track_stage("write_xlsx", rows=len(df_resultado)), pd.ExcelWriter(arquivo_consolidado, engine='xlsxwriter') as writer:
                 df_resultado.to_excel(writer, index=False, sheet_name='Consolidado_R189')
             
             arquivo_consolidado.seek(0)
@@ -160,9 +161,63 @@ class R189Extractor:
             logger.error(traceback.format_exc())
             raise
 
+    def consolidar_r189_dataframe(self, planilhas: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+        """
+        Consolida as abas lidas por ler_planilha_r189: uma linha por CNPJ, nota fiscal e site,
+        com o 'Total Geral' somado.
+        """
+        # Verifica se a aba 'BRASIL' existe
+        if 'BRASIL' not in planilhas:
+            raise ValueError("A aba 'BRASIL' não foi encontrada no arquivo Excel.")
+        
+        # Obtém os dados apenas da aba 'BRASIL'
+        df_brasil = planilhas['BRASIL']
+
+        # Combina todas as abas em um único DataFrame
+        df_consolidado = df_brasil.copy()
+
+        # Seleciona apenas as colunas necessárias
+        colunas_necessarias = [
+            'CNPJ - WEG',
+            'Invoice number',
+            'Site Name - WEG 2',
+            'Total Geral',
+            'Account number'
+        ]
+        
+        # Verifica se todas as colunas necessárias existem
+        colunas_faltantes = [col for col in colunas_necessarias if col not in df_consolidado.columns]
+        if colunas_faltantes:
+            raise ValueError(f"Colunas faltantes no arquivo Excel: {colunas_faltantes}")
+        
+        # Seleciona apenas as colunas necessárias
+        df_resultado = df_consolidado[colunas_necessarias].copy()
+        
+        # Identifica linhas onde Account number NÃO contém a string 'Total'
+        linhas_sem_total = ~df_resultado['Account number'].astype(str).str.contains('Total', na=True)
+        
+        # Aplica o ffill apenas nas linhas onde Account number NÃO contém 'Total'
+        df_resultado.loc[linhas_sem_total, 'Invoice number'] = df_resultado.loc[linhas_sem_total, 'Invoice number'].ffill()
+        
+        # Preenche outros valores vazios
+        df_resultado[['CNPJ - WEG', 'Site Name - WEG 2']] = df_resultado[['CNPJ - WEG', 'Site Name - WEG 2']].ffill()
+        
+        # Remove linhas que ainda possuem valores NaN nas colunas principais
+        df_resultado = df_resultado.dropna(subset=['CNPJ - WEG', 'Invoice number', 'Site Name - WEG 2', 'Total Geral'])
+
+        # Remove a coluna Account number antes do agrupamento
+        df_resultado = df_resultado.drop('Account number', axis=1)
+
+        # Agrupa por todas as colunas exceto 'Total Geral' e soma os valores
+        # observed=True: com as colunas category, agrupa só as combinações existentes
+        return df_resultado.groupby(['CNPJ - WEG', 'Invoice number', 'Site Name - WEG 2'],
+                                    as_index=False, observed=True)['Total Geral'].sum()
+
+    @pipeline("extract_r189")
     async def process_selected_files(self, selected_files: List[str]) -> Dict[str, Any]:
         try:
             logger.info(f"Iniciando processamento de {len(selected_files)} arquivos R189")
+            set_span_attributes(files=len(selected_files), file_names=", ".join(selected_files))
             
             if not selected_files:
                 return {
@@ -251,5 +306,6 @@ class R189Extractor:
         # Agrupar e somar
         return df.groupby(
             ['CNPJ - WEG', 'Invoice number', 'Site Name - WEG 2'],
-            as_index=False
+            as_index=False,
+            observed=True
         )[total_column].sum()
\ No newline at end of file
@@ -0,0 +1,39 @@
+import logging
+import os
+from typing import Dict, Optional
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Colunas do R189 com poucas dezenas de valores distintos repetidos em todas as linhas
+COLUNAS_CATEGORICAS = ("CNPJ - WEG", "Site Name - WEG 2", "Invoice Type", "Municipality Code")
+
+# Com R189_CATEGORICAL_DTYPES=false as colunas continuam como object (comparação no benchmark)
+DTYPES_CATEGORICOS = os.getenv("R189_CATEGORICAL_DTYPES", "true").lower() not in ("0", "false", "no")
+
+
+def aplicar_schema_r189(df: pd.DataFrame, categorico: Optional[bool] = None) -> pd.DataFrame:
+    """
+    Converte as colunas de COLUNAS_CATEGORICAS presentes na aba para o dtype category.
+
+    Cada valor distinto é guardado uma vez e as linhas passam a ter só o código (int8/int16),
+    então ffill, dropna, filtros e groupby trabalham sobre os códigos. Os valores das células
+    não mudam: as categorias são os próprios valores lidos (textos ou números). Nos
+    agrupamentos por essas colunas, use observed=True para não gerar as combinações ausentes.
+    """
+    if not (DTYPES_CATEGORICOS if categorico is None else categorico):
+        return df
+    colunas = [col for col in COLUNAS_CATEGORICAS
+               if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype)]
+    if colunas:
+        df[colunas] = df[colunas].astype("category")
+    return df
+
+
+def aplicar_schema_planilhas(planilhas: Dict[str, pd.DataFrame],
+                             categorico: Optional[bool] = None) -> Dict[str, pd.DataFrame]:
+    """Aplica aplicar_schema_r189 em todas as abas lidas da planilha R189."""
+    for aba in planilhas.values():
+        aplicar_schema_r189(aba, categorico)
+    return planilhas
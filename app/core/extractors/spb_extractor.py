@@ -1,20 +1,32 @@
 import os
 from io import BytesIO
 import pandas as pd
-import PyPDF2
-import re
 import traceback
 import logging
 from app.core.auth import SharePointAuth
-from typing import List, Dict, Any
+from app.core.metrics import pipeline, stage, track_stage
+from app.core.tracing import set_span_attributes
+from app.core.extraction_store import get_extraction_store
+from app.core.extractors.pdf_engine import PDFExtractionEngine
+from app.core.extractors.document_specs import SPB_SPEC
+from app.core.records import document_batch
+from typing import List, Dict, Any, Optional
 
 logger = logging.getLogger(__name__)
 
+# Motor de extração compartilhado: os padrões da spec são compilados uma única vez
+_engine = PDFExtractionEngine(SPB_SPEC)
+
 class SPBExtractor:
-    def __init__(self):
+    # Versão da lógica de extração. Incrementar sempre que a extração mudar,
+    # para invalidar os resultados gravados no ExtractionStore.
+    EXTRACTOR_VERSION = "1"
+
+    def __init__(self, sharepoint_auth: Optional[SharePointAuth] = None):
         logger.info("=== INICIALIZANDO SPB EXTRACTOR ===")
-        self.sharepoint_auth = SharePointAuth()
+        self.sharepoint_auth = sharepoint_auth or SharePointAuth()
         logger.info("SharePointAuth inicializado no SPBExtractor")
+        self.extraction_store = get_extraction_store()
 
     async def process_file(self, file_content: BytesIO) -> dict:
         """
@@ -42,59 +54,31 @@ class SPBExtractor:
                 "error": str(e)
             }
 
+    @stage("parse")
     def extrair_dados_pdf(self, pdf_file: BytesIO) -> dict:
         """
         Extrai os dados necessários do arquivo PDF.
+        Consulta antes o armazenamento local de extrações, indexado pelo hash do PDF.
+        """
+        if self.extraction_store is None:
+            return self._extrair_dados_pdf(pdf_file)
+
+        return self.extraction_store.get_or_extract(
+            pdf_file.getvalue(),
+            "SPB",
+            # O backend de texto faz parte da versão: backends diferentes podem gerar textos diferentes
+            f"{self.EXTRACTOR_VERSION}:{_engine.backend.name}",
+            lambda: self._extrair_dados_pdf(pdf_file)
+        )
+
+    def _extrair_dados_pdf(self, pdf_file: BytesIO) -> dict:
+        """
+        Analisa o PDF e extrai os campos declarados em SPB_SPEC.
         """
         try:
             logger.info("Iniciando extração de dados do PDF")
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
-            
-            texto_pagina1 = pdf_reader.pages[0].extract_text()
-            texto_pagina2 = pdf_reader.pages[1].extract_text() if len(pdf_reader.pages) > 1 else ""
-            texto_combinado = texto_pagina1 + "\n" + texto_pagina2
-            
-            logger.info("=== TEXTO EXTRAÍDO DO PDF ===")
-            logger.info(texto_combinado[:500] + "..." if len(texto_combinado) > 500 else texto_combinado)
-            logger.info("============================")
-            
-            # Extrair CNPJ
-            padrao_cnpj = r'TOMADOR DE SERVIÇOS.*?\n.*?CPF/CNPJ:\s*(\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2})'
-            cnpj_match = re.search(padrao_cnpj, texto_combinado, re.DOTALL)
-            cnpj = cnpj_match.group(1) if cnpj_match else None
-            logger.info(f"CNPJ extraído: {cnpj}")
-            
-            # Extrair SPB_ID
-            padrao_spb = r'(SPB-\d+)'
-            spb_match = re.search(padrao_spb, texto_combinado)
-            spb_id = spb_match.group(1) if spb_match else None
-            logger.info(f"SPB_ID extraído: {spb_id}")
-            
-            # Extrair Número da Nota
-            padrao_num_nota = r'Código de Verificação(0000\d{5})'
-            num_nota_match = re.search(padrao_num_nota, texto_combinado)
-            num_nota = num_nota_match.group(1) if num_nota_match else None
-            logger.info(f"Número da Nota extraído: {num_nota}")
-            
-            # Extrair Valor Total
-            padrao_valor = r'VALOR DO DOCUMENTO\s*([\d.,]+)'
-            valor_match = re.search(padrao_valor, texto_combinado)
-            valor_total = float(valor_match.group(1).replace('.', '').replace(',', '.')) if valor_match else 0.00
-            logger.info(f"Valor Total extraído: {valor_total}")
-            
-            # Extrair Cidade
-            padrao_cidade = r"CEP:\s*\d{5}-\d{3}\s*(.*?)\s*INTERMEDIÁRIO DE SERVIÇOS"
-            cidade_match = re.search(padrao_cidade, texto_combinado)
-            cidade = re.sub(r'----$', '', cidade_match.group(1)).strip() if cidade_match else None
-            logger.info(f"Cidade extraída: {cidade}")
-            
-            dados = {
-                'CNPJ': cnpj,
-                'SPB_ID': spb_id,
-                'Num_Nota': num_nota,  
-                'VALOR_TOTAL': valor_total,
-                'CIDADE': cidade
-            }
+            registro = _engine.extract(pdf_file)
+            dados = registro._asdict()
             
             logger.info(f"Dados extraídos com sucesso: {dados}")
             return dados
@@ -104,12 +88,33 @@ class SPBExtractor:
             logger.error(traceback.format_exc())
             raise
     
+    def extrair_dataframe(self, pdf_files: List[BytesIO]) -> pd.DataFrame:
+        """
+        Extrai os campos de cada PDF e retorna os registros em um DataFrame,
+        sem gerar a planilha nem enviar ao SharePoint.
+        """
+        dados_consolidados = document_batch(SPB_SPEC)
+        for i, pdf_file in enumerate(pdf_files):
+            try:
+                dados = self.extrair_dados_pdf(pdf_file)
+                if dados:
+                    dados_consolidados.append(dados)
+                else:
+                    logger.warning(f"Nenhum dado extraído do arquivo {i+1}")
+            except Exception as e:
+                logger.error(f"Erro ao processar arquivo {i+1}: {str(e)}")
+                continue
+
+        if not dados_consolidados:
+            raise ValueError("Nenhum dado foi extraído dos PDFs")
+        return dados_consolidados.to_frame()
+
     async def consolidar_spb(self, pdf_files: list) -> BytesIO:
         """
         Consolida os dados dos PDFs selecionados em um novo arquivo Excel.
         """
         logger.info(f"=== INICIANDO CONSOLIDAÇÃO DE {len(pdf_files)} ARQUIVOS SPB ===")
-        dados_consolidados = []
+        dados_consolidados = document_batch(SPB_SPEC)
         pasta_spb = '/teams/BR-TI-TIN/AutomaoFinanas/SPB'
         pasta_consolidado = '/teams/BR-TI-TIN/AutomaoFinanas/CONSOLIDADO'
         
@@ -163,11 +168,11 @@ class SPBExtractor:
 
         # Criar DataFrame e arquivo Excel
         logger.info(f"Criando DataFrame com {len(dados_consolidados)} registros")
-        df = pd.DataFrame(dados_consolidados)
+        df = dados_consolidados.to_frame()
         excel_output = BytesIO()
         
         logger.info("Criando arquivo Excel")
-        with pd.ExcelWriter(excel_output, engine='xlsxwriter') as writer:
+        with track_stage("write_xlsx", rows=len(df)), pd.ExcelWriter(excel_output, engine='xlsxwriter') as writer:
             df.to_excel(writer, index=False, sheet_name='SPB_Consolidado')
         
         excel_output.seek(0)
@@ -198,6 +203,7 @@ class SPBExtractor:
         excel_output.seek(0)
         return excel_output
 
+    @pipeline("extract_spb")
     async def process_selected_files(self, selected_files: List[str]) -> Dict[str, Any]:
         """
         Processa os arquivos SPB selecionados, consolida e envia para o SharePoint.
@@ -205,6 +211,7 @@ class SPBExtractor:
         try:
             logger.info(f"=== INICIANDO PROCESSAMENTO DE {len(selected_files)} ARQUIVOS SPB ===")
             logger.info(f"Arquivos selecionados: {selected_files}")
+            set_span_attributes(files=len(selected_files), file_names=", ".join(selected_files))
             
             if not selected_files:
                 logger.error("Nenhum arquivo selecionado para processamento")
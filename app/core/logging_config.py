@@ -1,43 +1,236 @@
-import logging
+import os
 import sys
+import copy
+import json
+import time
+import uuid
+import queue
+import atexit
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+from app.core.tracing import current_span
+
+# Variáveis de ambiente:
+#   LOG_LEVEL              nível do logger raiz (padrão: INFO)
+#   LOG_LEVELS             níveis por módulo, ex.: "app.core.auth=WARNING,app.core.reports=DEBUG"
+#   LOG_FORMAT             json (padrão) ou text
+#   LOG_FILE               arquivo de log adicional ao stdout (padrão: nenhum)
+#   LOG_MAX_MESSAGE_CHARS  tamanho máximo de uma mensagem; o excedente é truncado (padrão: 2000)
+#   LOG_SAMPLE_BURST       mensagens DEBUG/INFO aceitas por ponto do código a cada janela (padrão: 20)
+#   LOG_SAMPLE_WINDOW      duração da janela de amostragem em segundos (padrão: 1)
+#   LOG_QUEUE_SIZE         capacidade da fila; com a fila cheia os registros são descartados (padrão: 10000)
+
+# Níveis aplicados quando LOG_LEVELS não define o módulo
+DEFAULT_LEVELS = {"urllib3": "WARNING"}
+
+# Identificador da execução (requisição ou job) incluído em cada registro
+_run_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("run_id", default=None)
+
+
+def new_run_id() -> str:
+    return uuid.uuid4().hex
+
+
+def current_run_id() -> Optional[str]:
+    return _run_id.get()
+
+
+@contextmanager
+def run_context(run_id: Optional[str] = None):
+    """Define o run_id dos registros de log emitidos dentro do bloco."""
+    token = _run_id.set(run_id or new_run_id())
+    try:
+        yield _run_id.get()
+    finally:
+        _run_id.reset(token)
+
 
-def configure_logging():
+class ContextFilter(logging.Filter):
+    """Anexa ao registro o run_id e o trace_id do contexto em que o log foi emitido."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.run_id = _run_id.get()
+        record.trace_id = getattr(current_span(), "trace_id", None)
+        return True
+
+
+class SamplingFilter(logging.Filter):
     """
-    Configura o logging para exibir informações detalhadas no console
+    Limita mensagens repetidas de um mesmo ponto do código (arquivo e linha), como os
+    logs por linha de planilha ou por documento: até 'burst' registros por janela de
+    'window' segundos. Os descartados são contados e informados no próximo registro aceito.
+    WARNING e acima nunca são descartados.
     """
-    # Configuração básica
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.StreamHandler(sys.stdout),
-            logging.FileHandler('app.log')
-        ]
-    )
-    
-    # Configurar loggers específicos
-    validation_logger = logging.getLogger('app.api.routes.validation')
-    validation_logger.setLevel(logging.DEBUG)
-    
-    reports_logger = logging.getLogger('app.core.reports')
-    reports_logger.setLevel(logging.DEBUG)
-    
-    # Adicionar handler para console com formatação colorida
-    try:
-        import colorlog
-        handler = colorlog.StreamHandler()
-        handler.setFormatter(colorlog.ColoredFormatter(
-            '%(log_color)s%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            log_colors={
-                'DEBUG': 'cyan',
-                'INFO': 'green',
-                'WARNING': 'yellow',
-                'ERROR': 'red',
-                'CRITICAL': 'red,bg_white',
-            }
-        ))
-        validation_logger.addHandler(handler)
-        reports_logger.addHandler(handler)
-    except ImportError:
-        # Se colorlog não estiver disponível, usar formatação padrão
-        pass 
\ No newline at end of file
+
+    def __init__(self, burst: int = 20, window: float = 1.0, max_level: int = logging.INFO):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self.max_level = max_level
+        self._pontos: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.max_level or self.burst <= 0:
+            return True
+
+        agora = time.monotonic()
+        chave = (record.pathname, record.lineno)
+        with self._lock:
+            # [início da janela, aceitos na janela, descartados na janela]
+            estado = self._pontos.get(chave)
+            if estado is None or agora - estado[0] >= self.window:
+                descartados = estado[2] if estado else 0
+                estado = self._pontos[chave] = [agora, 0, 0]
+                if descartados:
+                    record.suppressed = descartados
+            if estado[1] >= self.burst:
+                estado[2] += 1
+                return False
+            estado[1] += 1
+        return True
+
+
+class TruncatingFilter(logging.Filter):
+    """Trunca mensagens maiores que 'max_chars' (corpos HTTP, textos de PDF, dicts inteiros)."""
+
+    def __init__(self, max_chars: int = 2000):
+        super().__init__()
+        self.max_chars = max_chars
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.max_chars <= 0:
+            return True
+        mensagem = record.getMessage()
+        if len(mensagem) > self.max_chars:
+            record.msg = f"{mensagem[:self.max_chars]}... [truncado: {len(mensagem)} caracteres]"
+            record.args = None
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Formata cada registro como uma linha JSON."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        dados = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "run_id": getattr(record, "run_id", None),
+        }
+        if getattr(record, "trace_id", None):
+            dados["trace_id"] = record.trace_id
+        if getattr(record, "suppressed", None):
+            dados["suppressed"] = record.suppressed
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            dados["exc_info"] = record.exc_text
+        return json.dumps(dados, ensure_ascii=False, default=str)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    QueueHandler que nunca bloqueia quem emite o log: com a fila cheia o registro é
+    descartado e contado em 'dropped'.
+    """
+
+    def __init__(self, fila: queue.Queue):
+        super().__init__(fila)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve a mensagem e o traceback na thread de origem, preservando-os em
+        # campos separados para o formatter da thread de escrita
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_queue_handler: Optional[NonBlockingQueueHandler] = None
+_listener: Optional[QueueListener] = None
+
+
+def _parse_levels(valor: str) -> Dict[str, str]:
+    niveis = {}
+    for item in valor.split(","):
+        if "=" in item:
+            nome, nivel = item.split("=", 1)
+            niveis[nome.strip()] = nivel.strip().upper()
+    return niveis
+
+
+def shutdown_logging() -> None:
+    """Esvazia a fila, encerra a thread de escrita e remove o handler do logger raiz."""
+    global _queue_handler, _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+
+
+def configure_logging(stream=None) -> NonBlockingQueueHandler:
+    """
+    Configura o logging da aplicação: os registros passam pelos filtros de contexto,
+    amostragem e truncamento na thread de origem e são escritos por uma thread
+    separada (QueueListener), sem bloquear o tratamento das requisições.
+    """
+    global _queue_handler, _listener
+    shutdown_logging()
+
+    if os.getenv("LOG_FORMAT", "json").lower() == "text":
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - [%(run_id)s] %(message)s')
+    else:
+        formatter = JsonFormatter()
+
+    handlers = [logging.StreamHandler(stream or sys.stdout)]
+    if os.getenv("LOG_FILE"):
+        handlers.append(logging.FileHandler(os.getenv("LOG_FILE"), encoding="utf-8"))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    _queue_handler = NonBlockingQueueHandler(queue.Queue(int(os.getenv("LOG_QUEUE_SIZE", "10000"))))
+    _queue_handler.addFilter(ContextFilter())
+    _queue_handler.addFilter(SamplingFilter(
+        burst=int(os.getenv("LOG_SAMPLE_BURST", "20")),
+        window=float(os.getenv("LOG_SAMPLE_WINDOW", "1"))
+    ))
+    _queue_handler.addFilter(TruncatingFilter(int(os.getenv("LOG_MAX_MESSAGE_CHARS", "2000"))))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+
+    niveis = {**DEFAULT_LEVELS, **_parse_levels(os.getenv("LOG_LEVELS", ""))}
+    for nome, nivel in niveis.items():
+        logging.getLogger(nome).setLevel(nivel)
+
+    _listener = QueueListener(_queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _queue_handler
+
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,178 @@
+import json
+import logging
+import os
+import sys
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Arquivo versionado com os dados mestres; MASTER_DATA_FILE aponta para outra cópia (ex.: volume montado)
+ARQUIVO_PADRAO = os.path.join(os.path.dirname(__file__), "master_data.json")
+
+
+def normalizar_codigo(codigo: Any) -> str:
+    """
+    Código de serviço como comparado na validação de CNPJs do Municipality Code: números
+    viram a parte inteira ('14.02' -> '14', '3115.0' -> '3115'); os demais textos ficam como estão.
+    """
+    codigo = str(codigo).strip()
+    try:
+        return str(int(float(codigo)))
+    except (ValueError, TypeError, OverflowError):
+        return codigo
+
+
+@dataclass(frozen=True)
+class Service:
+    """Serviço do Municipality Code: material, tipo de nota e CNPJs autorizados."""
+    code: str
+    material: str
+    type: str
+    cnpjs: FrozenSet[str]
+
+    @property
+    def name(self) -> str:
+        return f"{self.code} - {self.type}"
+
+
+@dataclass(frozen=True)
+class MasterData:
+    """
+    Versão carregada dos dados mestres, com as estruturas de consulta já montadas.
+
+    Attributes:
+        version: Versão declarada no arquivo
+        cnpj_sites: CNPJ -> sites aceitos
+        services: Código do serviço (e seus aliases), como texto -> serviço
+        services_by_code: Código normalizado (normalizar_codigo) -> primeiro serviço do arquivo com esse código
+    """
+    version: str
+    cnpj_sites: Dict[str, Tuple[str, ...]]
+    services: Dict[str, Service]
+    services_by_code: Dict[str, Service]
+
+    def sites(self, cnpj: str) -> Optional[Tuple[str, ...]]:
+        return self.cnpj_sites.get(cnpj)
+
+    def service(self, codigo: Any) -> Optional[Service]:
+        """Serviço pelo código exato (ex.: '14.02', '3115' ou '3115.0')."""
+        return self.services.get(str(codigo).strip())
+
+    def authorized(self, codigo: Any, cnpj: str) -> bool:
+        """Se o CNPJ está autorizado para o serviço do código (comparado por normalizar_codigo)."""
+        service = self.services_by_code.get(normalizar_codigo(codigo))
+        return service is not None and cnpj in service.cnpjs
+
+
+def _cnpjs(valor: Any, grupos: Dict[str, FrozenSet[str]]) -> FrozenSet[str]:
+    if isinstance(valor, str):
+        if valor not in grupos:
+            raise ValueError(f"Grupo de CNPJs desconhecido: {valor}")
+        return grupos[valor]
+    return frozenset(sys.intern(cnpj) for cnpj in valor)
+
+
+def parse_master_data(dados: Dict[str, Any]) -> MasterData:
+    """
+    Monta as estruturas de consulta a partir do conteúdo do arquivo. Os textos repetidos
+    (CNPJs e sites) são internados, e cada grupo de CNPJs vira um único frozenset
+    compartilhado pelos serviços que o usam.
+    """
+    cnpj_sites = {
+        sys.intern(cnpj): tuple(sys.intern(site) for site in sites)
+        for cnpj, sites in dados.get("cnpj_sites", {}).items()
+    }
+    grupos = {
+        nome: frozenset(sys.intern(cnpj) for cnpj in cnpjs)
+        for nome, cnpjs in dados.get("cnpj_groups", {}).items()
+    }
+
+    services: Dict[str, Service] = {}
+    services_by_code: Dict[str, Service] = {}
+    for item in dados.get("services", []):
+        service = Service(str(item["code"]), str(item["material"]), item["type"], _cnpjs(item.get("cnpjs", ()), grupos))
+        for codigo in (service.code, *item.get("aliases", ())):
+            services[str(codigo)] = service
+        services_by_code.setdefault(normalizar_codigo(service.code), service)
+
+    return MasterData(str(dados.get("version", "")), cnpj_sites, services, services_by_code)
+
+
+def load_master_data(caminho: str) -> MasterData:
+    with open(caminho, encoding="utf-8") as f:
+        return parse_master_data(json.load(f))
+
+
+class MasterDataRegistry:
+    """
+    Dados mestres (CNPJ -> sites, serviços do Municipality Code e CNPJs autorizados)
+    compartilhados pelo processo. O arquivo é lido uma vez; a cada consulta, current()
+    compara a data de modificação e o tamanho do arquivo e o recarrega quando ele muda,
+    sem reiniciar os workers. Se a nova versão não puder ser lida (ou o arquivo sumir), a
+    anterior continua em uso e o problema é registrado uma vez, até o arquivo mudar de novo.
+    """
+
+    def __init__(self, caminho: Optional[str] = None):
+        self.caminho = caminho or os.getenv("MASTER_DATA_FILE", ARQUIVO_PADRAO)
+        self._lock = threading.Lock()
+        self._dados: Optional[MasterData] = None
+        self._assinatura: Optional[Tuple[int, int]] = None
+        # Assinatura (None: arquivo ausente) da última versão que não pôde ser lida; ela só é
+        # tentada de novo quando o arquivo muda, e o erro é registrado uma vez por mudança
+        self._falhou = False
+        self._assinatura_falha: Optional[Tuple[int, int]] = None
+        self.reloads = 0
+
+    def _assinatura_arquivo(self) -> Optional[Tuple[int, int]]:
+        try:
+            info = os.stat(self.caminho)
+        except OSError:
+            return None
+        return info.st_mtime_ns, info.st_size
+
+    def _conhecida(self, assinatura: Optional[Tuple[int, int]]) -> bool:
+        """Se a assinatura é a da versão em uso ou a da última falha (nada a recarregar)."""
+        return assinatura == self._assinatura or (self._falhou and assinatura == self._assinatura_falha)
+
+    def current(self) -> MasterData:
+        assinatura = self._assinatura_arquivo()
+        dados = self._dados
+        if dados is not None and self._conhecida(assinatura):
+            return dados
+
+        with self._lock:
+            if self._dados is None or not self._conhecida(assinatura):
+                try:
+                    novos = load_master_data(self.caminho)
+                except Exception as e:
+                    if self._dados is None:
+                        raise
+                    self._falhou, self._assinatura_falha = True, assinatura
+                    if assinatura is None:
+                        logger.warning(f"Arquivo de dados mestres {self.caminho} indisponível; "
+                                       f"mantendo a versão {self._dados.version}")
+                    else:
+                        logger.error(f"Erro ao recarregar os dados mestres de {self.caminho}: {str(e)}; "
+                                     f"mantendo a versão {self._dados.version}")
+                else:
+                    self._dados, self._assinatura, self._falhou = novos, assinatura, False
+                    self.reloads += 1
+                    logger.info(f"Dados mestres carregados de {self.caminho} (versão {novos.version})")
+            return self._dados
+
+
+_registry: Optional[MasterDataRegistry] = None
+
+
+def get_master_data_registry() -> MasterDataRegistry:
+    global _registry
+    if _registry is None:
+        _registry = MasterDataRegistry()
+    return _registry
+
+
+def get_master_data() -> MasterData:
+    """Versão atual dos dados mestres, recarregada se o arquivo mudou."""
+    return get_master_data_registry().current()
@@ -0,0 +1,258 @@
+import time
+import bisect
+import inspect
+import logging
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.core.profiling import profile_run
+from app.core.tracing import start_span, set_span_attributes
+
+logger = logging.getLogger(__name__)
+
+# Buckets (segundos) das latências HTTP e das etapas dos pipelines
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _escapar_label(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _formatar_labels(nomes: Sequence[str], valores: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pares = list(zip(nomes, valores))
+    if extra:
+        pares.append(extra)
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{nome}="{_escapar_label(valor)}"' for nome, valor in pares) + "}"
+
+
+def _formatar_numero(valor: float) -> str:
+    if valor == float("inf"):
+        return "+Inf"
+    return repr(float(valor)) if not float(valor).is_integer() else str(int(valor))
+
+
+class Counter:
+    """Contador monotônico com labels, no formato do Prometheus."""
+    tipo = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._valores: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def _chave(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(nome, "")) for nome in self.labelnames)
+
+    def inc(self, value: float = 1.0, **labels) -> None:
+        chave = self._chave(labels)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0.0) + value
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._valores.get(self._chave(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            itens = sorted(self._valores.items())
+        return [f"{self.name}{_formatar_labels(self.labelnames, chave)} {_formatar_numero(valor)}" for chave, valor in itens]
+
+
+class Histogram:
+    """Histograma cumulativo com labels, no formato do Prometheus."""
+    tipo = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Por combinação de labels: contagem por bucket (não cumulativa), soma e total
+        self._series: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        chave = tuple(str(labels.get(nome, "")) for nome in self.labelnames)
+        indice = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            serie = self._series.get(chave)
+            if serie is None:
+                serie = self._series[chave] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            serie[0][indice] += 1
+            serie[1] += value
+            serie[2] += 1
+
+    def count(self, **labels) -> int:
+        chave = tuple(str(labels.get(nome, "")) for nome in self.labelnames)
+        with self._lock:
+            serie = self._series.get(chave)
+            return serie[2] if serie else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            itens = sorted((chave, [list(serie[0]), serie[1], serie[2]]) for chave, serie in self._series.items())
+
+        linhas = []
+        for chave, (contagens, soma, total) in itens:
+            acumulado = 0
+            for limite, contagem in zip(self.buckets + (float("inf"),), contagens):
+                acumulado += contagem
+                labels = _formatar_labels(self.labelnames, chave, ("le", _formatar_numero(limite)))
+                linhas.append(f"{self.name}_bucket{labels} {acumulado}")
+            labels = _formatar_labels(self.labelnames, chave)
+            linhas.append(f"{self.name}_sum{labels} {_formatar_numero(soma)}")
+            linhas.append(f"{self.name}_count{labels} {total}")
+        return linhas
+
+
+class MetricsRegistry:
+    """Registro das métricas do processo, exportadas em formato texto do Prometheus."""
+
+    def __init__(self):
+        self._metricas: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _registrar(self, metrica):
+        with self._lock:
+            if metrica.name in self._metricas:
+                return self._metricas[metrica.name]
+            self._metricas[metrica.name] = metrica
+            return metrica
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._registrar(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._registrar(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Gera o texto de exposição (text/plain; version=0.0.4)."""
+        with self._lock:
+            metricas = list(self._metricas.values())
+
+        linhas = []
+        for metrica in metricas:
+            linhas.append(f"# HELP {metrica.name} {metrica.documentation}")
+            linhas.append(f"# TYPE {metrica.name} {metrica.tipo}")
+            linhas.extend(metrica.render())
+        return "\n".join(linhas) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    "http_request_duration_seconds",
+    "Duração das requisições HTTP por método, rota e status",
+    ["method", "route", "status"]
+)
+SHAREPOINT_REQUESTS = REGISTRY.counter(
+    "sharepoint_requests_total",
+    "Chamadas ao SharePoint por operação e resultado",
+    ["operation", "outcome"]
+)
+SHAREPOINT_BYTES = REGISTRY.counter(
+    "sharepoint_bytes_total",
+    "Bytes transferidos com o SharePoint por operação e direção",
+    ["operation", "direction"]
+)
+STAGE_DURATION = REGISTRY.histogram(
+    "pipeline_stage_duration_seconds",
+    "Duração das etapas dos pipelines (download, parse, reconcile, write_xlsx, upload)",
+    ["pipeline", "stage"]
+)
+
+# Pipeline em execução no contexto atual (requisição/tarefa), usado como label das etapas
+_pipeline_atual: contextvars.ContextVar[str] = contextvars.ContextVar("pipeline_atual", default="none")
+
+
+def current_pipeline() -> str:
+    return _pipeline_atual.get()
+
+
+@contextmanager
+def track_pipeline(nome: str):
+    """
+    Define o pipeline do contexto atual; as etapas medidas dentro dele recebem esse label.
+    Também abre o span raiz do pipeline, do qual os spans das etapas são filhos.
+    """
+    token = _pipeline_atual.set(nome)
+    try:
+        with start_span(nome, pipeline=nome) as span:
+            yield span
+    finally:
+        _pipeline_atual.reset(token)
+
+
+@contextmanager
+def track_stage(stage: str, pipeline: Optional[str] = None, **attributes):
+    """
+    Mede a duração de uma etapa do pipeline atual e a registra como span.
+    Os atributos extras (ex.: rows=len(df)) são gravados no span da etapa.
+    """
+    nome_pipeline = pipeline or current_pipeline()
+    inicio = time.perf_counter()
+    try:
+        with start_span(stage, pipeline=nome_pipeline, stage=stage, **attributes) as span:
+            yield span
+    finally:
+        STAGE_DURATION.observe(time.perf_counter() - inicio, pipeline=nome_pipeline, stage=stage)
+
+
+def _decorar(gerenciador):
+    """Aplica um gerenciador de contexto a funções síncronas ou assíncronas."""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper_async(*args, **kwargs):
+                with gerenciador():
+                    return await func(*args, **kwargs)
+            return wrapper_async
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with gerenciador():
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def pipeline(nome: str):
+    """
+    Decorator: executa a função como o pipeline 'nome'. Se houver profiling habilitado
+    para o pipeline (pelo nome ou por Classe.metodo), a execução também é perfilada.
+    """
+    def decorator(func):
+        @contextmanager
+        def gerenciador():
+            with track_pipeline(nome), profile_run(nome, func.__qualname__):
+                yield
+        return _decorar(gerenciador)(func)
+    return decorator
+
+
+def stage(nome: str):
+    """Decorator: mede a função como a etapa 'nome' do pipeline atual."""
+    return _decorar(lambda: track_stage(nome))
+
+
+def record_sharepoint_call(operation: str, success: bool, bytes_received: int = 0, bytes_sent: int = 0) -> None:
+    """Registra uma chamada ao SharePoint e os bytes transferidos (também no span atual)."""
+    outcome = "success" if success else "error"
+    SHAREPOINT_REQUESTS.inc(operation=operation, outcome=outcome)
+    if bytes_received:
+        SHAREPOINT_BYTES.inc(bytes_received, operation=operation, direction="received")
+        set_span_attributes(bytes_received=bytes_received)
+    if bytes_sent:
+        SHAREPOINT_BYTES.inc(bytes_sent, operation=operation, direction="sent")
+        set_span_attributes(bytes_sent=bytes_sent)
+    if operation in ("download", "upload"):
+        set_span_attributes(outcome=outcome)
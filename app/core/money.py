@@ -0,0 +1,74 @@
+import logging
+from typing import Any, Iterable, Union
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Diferença máxima aceita entre dois valores nas conciliações (1 centavo)
+TOLERANCIA_CENTAVOS = 1
+
+# Número com pontos como separador de milhar e sem decimais (ex.: 1.234.567); um primeiro
+# grupo 0 indica ponto decimal ("0.125" é 0,125, não 125)
+_PADRAO_MILHAR = r"^-?[1-9]\d{0,2}(?:\.\d{3})+$"
+
+# Casas decimais mantidas em valor * 100 antes do arredondamento, para descartar o erro de
+# representação do float (1.005 * 100 == 100.49999999999999)
+_CASAS_CENTAVOS = 6
+
+
+def _texto_para_numero(textos: pd.Series) -> pd.Series:
+    """
+    Converte textos de valores para float. Com vírgula, o formato é o brasileiro
+    (1.234,56); sem vírgula, pontos só são separador de milhar se agruparem de 3 em 3
+    (1.234.567); nos demais casos, o ponto é o separador decimal (1234.56).
+    """
+    textos = textos.str.strip().str.replace(r"^R\$\s*", "", regex=True).str.replace(" ", "", regex=False)
+    brasileiro = textos.str.contains(",", regex=False) | textos.str.match(_PADRAO_MILHAR)
+    textos = textos.where(~brasileiro, textos.str.replace(".", "", regex=False).str.replace(",", ".", regex=False))
+    return pd.to_numeric(textos, errors="coerce")
+
+
+def to_cents(valores: Union[pd.Series, Iterable[Any]]) -> pd.Series:
+    """
+    Converte valores monetários (float, int ou texto no formato brasileiro) para centavos
+    em int64 (Int64, com <NA> para valores ausentes ou inválidos), de forma vetorizada.
+    O arredondamento para o centavo é feito com meio centavo para longe do zero.
+    """
+    serie = valores if isinstance(valores, pd.Series) else pd.Series(list(valores), dtype=object)
+
+    if pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+        numeros = serie.to_numpy(dtype="float64", na_value=np.nan)
+    else:
+        e_texto = serie.map(type).eq(str).to_numpy()
+        numeros = pd.to_numeric(serie.where(~e_texto), errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+        if e_texto.any():
+            numeros[e_texto] = _texto_para_numero(serie[e_texto].astype(str)).to_numpy(dtype="float64", na_value=np.nan)
+
+    centavos = np.sign(numeros) * np.floor(np.round(np.abs(numeros) * 100, _CASAS_CENTAVOS) + 0.5)
+    return pd.Series(centavos, index=serie.index, name=serie.name).astype("Int64")
+
+
+def from_cents(centavos: pd.Series) -> pd.Series:
+    """Valores em reais (float64, NaN para ausentes) a partir dos centavos, para exibição nos relatórios."""
+    return centavos.astype("Float64").div(100).astype("float64")
+
+
+def valores_divergentes(centavos_a, centavos_b, tolerancia: int = TOLERANCIA_CENTAVOS) -> bool:
+    """
+    Indica se dois valores em centavos diferem mais que a tolerância. Valores ausentes
+    não são comparáveis e não contam como divergência.
+    """
+    if pd.isna(centavos_a) or pd.isna(centavos_b):
+        return False
+    return abs(int(centavos_a) - int(centavos_b)) > tolerancia
+
+
+def divergencias_centavos(centavos_a: pd.Series, centavos_b: pd.Series,
+                          tolerancia: int = TOLERANCIA_CENTAVOS) -> pd.Series:
+    """
+    Versão vetorizada de valores_divergentes: máscara booleana das linhas em que os valores
+    (em centavos) diferem mais que a tolerância. Linhas com valor ausente ficam False.
+    """
+    return (centavos_a.astype("Int64") - centavos_b.astype("Int64")).abs().gt(tolerancia).fillna(False).astype(bool)
@@ -0,0 +1,219 @@
+import os
+import re
+import sys
+import time
+import pstats
+import cProfile
+import logging
+import threading
+from io import StringIO
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MODOS = ("cprofile", "sampling")
+
+# Nome dos artefatos: <timestamp>_<pipeline>_<modo>.<prof|folded>
+_NOME_ARTEFATO = re.compile(r"^(?P<timestamp>\d{8}_\d{6}_\d{6})_(?P<pipeline>[\w.]+)_(?P<modo>cprofile|sampling)\.(prof|folded)$")
+
+
+class SamplingProfiler:
+    """
+    Amostra periodicamente a pilha da thread que executa o pipeline e acumula as
+    pilhas no formato "collapsed" (uma linha 'f1;f2;f3 contagem'), usado por flamegraphs.
+    Mede o tempo de relógio, inclusive as esperas de I/O.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._thread_id = threading.get_ident()
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _amostrar(self) -> None:
+        while not self._parar.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            pilha = []
+            while frame is not None:
+                codigo = frame.f_code
+                pilha.append(f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if pilha:
+                self.samples[";".join(reversed(pilha))] += 1
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._amostrar, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def dump(self, caminho: str) -> None:
+        with open(caminho, "w", encoding="utf-8") as f:
+            for pilha, contagem in self.samples.most_common():
+                f.write(f"{pilha} {contagem}\n")
+
+
+class ProfilingManager:
+    """
+    Controla a captura de perfis sob demanda: 'arm' habilita o perfil das próximas
+    N execuções de um pipeline e cada execução consome uma captura, gravada em 'profile_dir'.
+    O pipeline pode ser indicado pelo nome usado nas métricas (ex.: report_nfserv_r189)
+    ou pelo nome qualificado do método (ex.: DivergenceReportNFSERVR189.generate_report).
+    """
+
+    def __init__(self, profile_dir: Optional[str] = None, max_files: Optional[int] = None):
+        self.profile_dir = profile_dir or os.getenv("PROFILE_DIR", os.path.join("data", "profiles"))
+        self.max_files = int(max_files if max_files is not None else os.getenv("PROFILE_MAX_FILES", "50"))
+        self._pendentes: Dict[str, Dict[str, Any]] = {}
+        # Threads com um cProfile ativo: só um perfilador determinístico por thread
+        self._threads_cprofile: set = set()
+        self._lock = threading.Lock()
+
+    def arm(self, pipeline: str, runs: int = 1, mode: str = "cprofile", interval_ms: float = 5.0) -> Dict[str, Any]:
+        if mode not in MODOS:
+            raise ValueError(f"Modo de profiling inválido: {mode}. Use um de {MODOS}")
+        if runs < 1:
+            raise ValueError("A quantidade de execuções deve ser maior que zero")
+        with self._lock:
+            self._pendentes[pipeline] = {"runs": runs, "mode": mode, "interval_ms": interval_ms,
+                                         "armed_at": datetime.now().isoformat(timespec="seconds")}
+            logger.info(f"Profiling habilitado para {pipeline}: próximas {runs} execuções ({mode})")
+            return {"pipeline": pipeline, **self._pendentes[pipeline]}
+
+    def disarm(self, pipeline: str) -> bool:
+        with self._lock:
+            return self._pendentes.pop(pipeline, None) is not None
+
+    def pending(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {pipeline: dict(config) for pipeline, config in self._pendentes.items()}
+
+    def _consumir(self, nomes: List[str]) -> Optional[Dict[str, Any]]:
+        """Reserva uma captura para a execução, se algum dos nomes estiver habilitado."""
+        thread_id = threading.get_ident()
+        with self._lock:
+            for nome in nomes:
+                config = self._pendentes.get(nome)
+                if config is None:
+                    continue
+                if config["mode"] == "cprofile":
+                    if thread_id in self._threads_cprofile:
+                        # Execução concorrente na mesma thread (event loop): fica para a próxima
+                        return None
+                    self._threads_cprofile.add(thread_id)
+                config["runs"] -= 1
+                if config["runs"] <= 0:
+                    del self._pendentes[nome]
+                return {"name": nome, **config}
+        return None
+
+    @contextmanager
+    def profile_run(self, pipeline: str, qualname: Optional[str] = None):
+        """Perfila a execução do bloco se o pipeline estiver habilitado; caso contrário não faz nada."""
+        if not self._pendentes:
+            yield None
+            return
+
+        config = self._consumir([pipeline] + ([qualname] if qualname else []))
+        if config is None:
+            yield None
+            return
+
+        if config["mode"] == "cprofile":
+            perfilador = cProfile.Profile()
+            perfilador.enable()
+        else:
+            perfilador = SamplingProfiler(config["interval_ms"] / 1000)
+            perfilador.start()
+
+        inicio = time.perf_counter()
+        try:
+            yield config
+        finally:
+            if config["mode"] == "cprofile":
+                perfilador.disable()
+                with self._lock:
+                    self._threads_cprofile.discard(threading.get_ident())
+            else:
+                perfilador.stop()
+            try:
+                caminho = self._gravar(perfilador, pipeline, config["mode"])
+                logger.info(f"Perfil de {pipeline} gravado em {caminho} ({time.perf_counter() - inicio:.2f}s)")
+            except Exception as e:
+                logger.error(f"Erro ao gravar perfil de {pipeline}: {str(e)}")
+
+    def _gravar(self, perfilador, pipeline: str, modo: str) -> str:
+        os.makedirs(self.profile_dir, exist_ok=True)
+        extensao = "prof" if modo == "cprofile" else "folded"
+        nome = f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{pipeline}_{modo}.{extensao}"
+        caminho = os.path.join(self.profile_dir, nome)
+        if modo == "cprofile":
+            perfilador.dump_stats(caminho)
+        else:
+            perfilador.dump(caminho)
+        self._aplicar_retencao()
+        return caminho
+
+    def _aplicar_retencao(self) -> None:
+        artefatos = self.list_profiles()
+        for artefato in artefatos[self.max_files:]:
+            try:
+                os.remove(os.path.join(self.profile_dir, artefato["name"]))
+            except OSError:
+                pass
+
+    def list_profiles(self) -> List[Dict[str, Any]]:
+        """Lista os perfis gravados, do mais recente para o mais antigo."""
+        if not os.path.isdir(self.profile_dir):
+            return []
+        artefatos = []
+        for nome in os.listdir(self.profile_dir):
+            correspondencia = _NOME_ARTEFATO.match(nome)
+            if not correspondencia:
+                continue
+            stat = os.stat(os.path.join(self.profile_dir, nome))
+            artefatos.append({
+                "name": nome,
+                "pipeline": correspondencia.group("pipeline"),
+                "mode": correspondencia.group("modo"),
+                "size": stat.st_size,
+                "created": datetime.fromtimestamp(stat.st_mtime).isoformat(timespec="seconds"),
+            })
+        return sorted(artefatos, key=lambda artefato: artefato["name"], reverse=True)
+
+    def profile_path(self, nome: str) -> Optional[str]:
+        """Caminho do artefato, apenas para nomes gerados pelo próprio manager."""
+        if not _NOME_ARTEFATO.match(nome):
+            return None
+        caminho = os.path.join(self.profile_dir, nome)
+        return caminho if os.path.isfile(caminho) else None
+
+    def summary(self, nome: str, limit: int = 50, sort: str = "cumulative") -> Optional[str]:
+        """Resumo em texto de um perfil cProfile (funções mais custosas)."""
+        caminho = self.profile_path(nome)
+        if caminho is None or not nome.endswith(".prof"):
+            return None
+        saida = StringIO()
+        pstats.Stats(caminho, stream=saida).strip_dirs().sort_stats(sort).print_stats(limit)
+        return saida.getvalue()
+
+
+_manager: Optional[ProfilingManager] = None
+
+
+def get_profiling_manager() -> ProfilingManager:
+    global _manager
+    if _manager is None:
+        _manager = ProfilingManager()
+    return _manager
+
+
+def profile_run(pipeline: str, qualname: Optional[str] = None):
+    return get_profiling_manager().profile_run(pipeline, qualname)
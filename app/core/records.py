@@ -0,0 +1,154 @@
+import json
+import logging
+from array import array
+from collections import namedtuple
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Mapping, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+if TYPE_CHECKING:
+    from app.core.extractors.pdf_engine import DocumentSpec
+
+logger = logging.getLogger(__name__)
+
+# Campos das linhas do R189 usadas nas comparações (valor_total é numérico)
+R189_FIELDS = ("cnpj_fornecedor", "nota_fiscal", "site_name", "valor_total")
+R189_FLOAT_FIELDS = ("valor_total",)
+
+
+class ColumnBatch:
+    """
+    Lote de registros com campos fixos, armazenado por coluna.
+
+    Cada registro ocupa uma posição em cada coluna, sem um dict por linha: os campos
+    numéricos ficam em array('d') (8 bytes por valor, sem objetos float) e os demais
+    em listas. to_frame() monta o DataFrame a partir das colunas, e as colunas numéricas
+    são compartilhadas com ele sem cópia.
+    """
+
+    __slots__ = ("fields", "float_fields", "record_type", "_columns", "_frozen")
+
+    def __init__(self, fields: Sequence[str], float_fields: Sequence[str] = ()):
+        self.fields = tuple(fields)
+        self.float_fields = frozenset(float_fields)
+        self.record_type = namedtuple("Record", self.fields, rename=True)
+        self._columns: List[Union[array, list]] = [
+            array("d") if field in self.float_fields else [] for field in self.fields
+        ]
+        self._frozen = False
+
+    def append(self, record: Union[Sequence[Any], Mapping[str, Any]]) -> None:
+        """Adiciona um registro: sequência na ordem dos campos (ex.: namedtuple) ou dict."""
+        if self._frozen:
+            raise ValueError("O lote já foi convertido em DataFrame e não aceita novos registros")
+        if isinstance(record, Mapping):
+            record = [record.get(field) for field in self.fields]
+        elif len(record) != len(self.fields):
+            raise ValueError(f"Registro com {len(record)} valores; esperado {len(self.fields)}")
+        for field, coluna, valor in zip(self.fields, self._columns, record):
+            if field in self.float_fields:
+                valor = float("nan") if valor is None else float(valor)
+            coluna.append(valor)
+
+    def extend(self, records: Iterable[Union[Sequence[Any], Mapping[str, Any]]]) -> None:
+        for record in records:
+            self.append(record)
+
+    @classmethod
+    def from_columns(cls, columns: Mapping[str, Iterable[Any]], float_fields: Sequence[str] = ()) -> "ColumnBatch":
+        """Cria o lote diretamente a partir de colunas (ex.: colunas de um DataFrame)."""
+        batch = cls(list(columns), float_fields)
+        for posicao, (field, valores) in enumerate(columns.items()):
+            if field in batch.float_fields:
+                batch._columns[posicao] = array("d", np.asarray(valores, dtype="float64").tobytes())
+            else:
+                batch._columns[posicao] = list(valores)
+        if len({len(coluna) for coluna in batch._columns}) > 1:
+            raise ValueError("As colunas do lote devem ter o mesmo tamanho")
+        return batch
+
+    def __len__(self) -> int:
+        return len(self._columns[0]) if self._columns else 0
+
+    def __iter__(self) -> Iterator[tuple]:
+        """Percorre os registros como namedtuples, montados sob demanda."""
+        return map(self.record_type._make, zip(*self._columns))
+
+    def column(self, field: str) -> Union[array, list]:
+        return self._columns[self.fields.index(field)]
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        DataFrame com uma coluna por campo. As colunas numéricas são lidas do buffer do
+        array('d') sem cópia; por isso o lote deixa de aceitar registros depois da conversão.
+        """
+        self._frozen = True
+        dados = {
+            field: np.frombuffer(coluna, dtype="float64") if field in self.float_fields else coluna
+            for field, coluna in zip(self.fields, self._columns)
+        }
+        return pd.DataFrame(dados, columns=list(self.fields), copy=False)
+
+
+def document_batch(spec: "DocumentSpec") -> ColumnBatch:
+    """Lote para os registros de um tipo de documento, com os valores monetários como float."""
+    # Importado aqui: o pacote de extratores depende deste módulo (import circular)
+    from app.core.extractors.pdf_engine import normalizar_valor
+
+    return ColumnBatch(
+        [field.name for field in spec.fields],
+        [field.name for field in spec.fields if field.normalizer is normalizar_valor],
+    )
+
+
+def r189_batch() -> ColumnBatch:
+    return ColumnBatch(R189_FIELDS, R189_FLOAT_FIELDS)
+
+
+def as_frame(dados: Union[ColumnBatch, pd.DataFrame, Iterable[Mapping[str, Any]]]) -> pd.DataFrame:
+    """DataFrame a partir de um lote, de um DataFrame ou de uma lista de dicts."""
+    if isinstance(dados, ColumnBatch):
+        return dados.to_frame()
+    if isinstance(dados, pd.DataFrame):
+        return dados
+    return pd.DataFrame(list(dados))
+
+
+def iter_records(dados: Union[ColumnBatch, pd.DataFrame]) -> Iterator[Dict[str, Any]]:
+    """
+    Percorre os registros do lote ou do DataFrame como dicts, montados um a um sob demanda
+    (NaN vira None), sem materializar a lista de registros.
+    """
+    if isinstance(dados, ColumnBatch):
+        campos, linhas = dados.fields, zip(*dados._columns)
+    else:
+        campos, linhas = tuple(dados.columns), dados.itertuples(index=False, name=None)
+    for linha in linhas:
+        yield {campo: None if isinstance(valor, float) and valor != valor else valor
+               for campo, valor in zip(campos, linha)}
+
+
+def _valor_json(valor: Any) -> Any:
+    # Escalares numpy (int64, bool_) e datas não são serializáveis pelo json
+    if isinstance(valor, np.generic):
+        return valor.item()
+    return str(valor)
+
+
+def iter_json(dados: Union[ColumnBatch, pd.DataFrame], tamanho_bloco: int = 1000) -> Iterator[str]:
+    """
+    Array JSON com os registros, gerado em blocos de 'tamanho_bloco' registros para respostas
+    em streaming (StreamingResponse). Só um bloco de texto fica em memória por vez.
+    """
+    yield "["
+    bloco: List[str] = []
+    separador = ""
+    for registro in iter_records(dados):
+        bloco.append(json.dumps(registro, ensure_ascii=False, default=_valor_json))
+        if len(bloco) >= tamanho_bloco:
+            yield separador + ",".join(bloco)
+            bloco, separador = [], ","
+    if bloco:
+        yield separador + ",".join(bloco)
+    yield "]"
@@ -1,10 +1,14 @@
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, List, Tuple, Optional
 import pandas as pd
 from datetime import datetime
 from io import BytesIO
 import logging
 from app.core.auth import SharePointAuth
-from app.core.sharepoint import SharePointClient
+from app.core.metrics import pipeline, stage, track_stage
+from app.core.tracing import set_span_attributes
+from app.core.money import divergencias_centavos, from_cents, to_cents
+from app.core.reports.report_registry import get_report_registry
+from app.core.reports.report_writer import conteudo_arquivo, export_report, write_xlsx
 
 logger = logging.getLogger(__name__)
 
@@ -13,12 +17,85 @@ class DivergenceReportNFSERVR189:
     Classe responsável por verificar divergências entre os arquivos consolidados NFSERV e R189.
     """
     
-    def __init__(self):
-        self.sharepoint_auth = SharePointAuth()
-        self.sharepoint_client = SharePointClient()
+    def __init__(self, sharepoint_auth: Optional[SharePointAuth] = None, export_format: Optional[str] = None):
+        # Uma instância compartilhada evita recarregar o .env e as credenciais a cada relatório
+        self.sharepoint_auth = sharepoint_auth or SharePointAuth()
+        # Formato adicional (csv.gz ou parquet) enviado junto com o .xlsx
+        self.export_format = export_format
         # Lista de possíveis nomes para a coluna de total
         self.colunas_total = ['Total Geral', 'Grand Total', 'Total Gera', 'Total', 'Valor Total']
 
+    @staticmethod
+    def _notas_em_ambos(nfserv_data: pd.DataFrame, r189_data: pd.DataFrame, coluna_total: str,
+                        centavos_nfserv: pd.Series, centavos_r189: pd.Series) -> pd.DataFrame:
+        """
+        Primeira linha de cada nota presente no NFSERV e no R189, unidas por um merge pelo ID
+        (a sigla vem do ID, então é a mesma nos dois lados),
+        com as comparações já calculadas: CNPJ sem pontuação, valor ausente em um dos lados
+        e valores em centavos divergentes (divergencias_centavos, tolerância de 1 centavo).
+        """
+        def sem_pontuacao(cnpjs: pd.Series) -> pd.Series:
+            return cnpjs.astype(str).str.strip().str.replace(r"[.\-/]", "", regex=True)
+
+        nfserv = pd.DataFrame({
+            'id': nfserv_data['NFSERV_ID'], 'SIGLA': nfserv_data['SIGLA'], 'cnpj_nfserv': nfserv_data['CNPJ'],
+            'valor_nfserv': nfserv_data['VALOR_TOTAL'], 'centavos_nfserv': centavos_nfserv,
+        }).dropna(subset=['id']).drop_duplicates('id')
+        r189 = pd.DataFrame({
+            'id': r189_data['Invoice number'], 'cnpj_r189': r189_data['CNPJ - WEG'],
+            'valor_r189': r189_data[coluna_total], 'centavos_r189': centavos_r189,
+        }).dropna(subset=['id']).drop_duplicates('id')
+
+        comuns = nfserv.merge(r189, on='id', how='inner')
+        comuns['cnpj_divergente'] = sem_pontuacao(comuns['cnpj_nfserv']) != sem_pontuacao(comuns['cnpj_r189'])
+        comuns['valor_ausente'] = comuns['centavos_nfserv'].isna() | comuns['centavos_r189'].isna()
+        comuns['valor_divergente'] = divergencias_centavos(comuns['centavos_nfserv'], comuns['centavos_r189'])
+        return comuns
+
+    @staticmethod
+    def _divergencias_notas_comuns(comuns: pd.DataFrame) -> List[Dict[str, Any]]:
+        """Divergências de CNPJ e de valor das notas de _notas_em_ambos; só as linhas divergentes são percorridas."""
+        divergencias: List[Dict[str, Any]] = []
+        divergentes = comuns[comuns['cnpj_divergente'] | comuns['valor_ausente'] | comuns['valor_divergente']]
+        for nota in divergentes.itertuples(index=False):
+            if nota.cnpj_divergente:
+                logger.warning(f"CNPJ divergente para {nota.id}: NFSERV={nota.cnpj_nfserv}, R189={nota.cnpj_r189}")
+                divergencias.append({
+                    'Tipo': 'CNPJ divergente',
+                    'NFSERV_ID': nota.id,
+                    'CNPJ NFSERV': nota.cnpj_nfserv,
+                    'CNPJ R189': nota.cnpj_r189,
+                    'Valor NFSERV': nota.valor_nfserv,
+                    'Valor R189': nota.valor_r189,
+                    'Detalhes': f'CNPJ diferente para nota {nota.id}: NFSERV={nota.cnpj_nfserv}, R189={nota.cnpj_r189}'
+                })
+
+            if nota.valor_ausente:
+                # Valor ausente ou em formato inválido em um dos lados
+                logger.warning(f"Erro na validação de valor para {nota.id}: Valor ausente ou em formato inválido")
+                divergencias.append({
+                    'Tipo': 'Erro na validação de valor',
+                    'NFSERV_ID': nota.id,
+                    'CNPJ NFSERV': nota.cnpj_nfserv,
+                    'CNPJ R189': nota.cnpj_r189,
+                    'Valor NFSERV': str(nota.valor_nfserv),
+                    'Valor R189': str(nota.valor_r189),
+                    'Detalhes': f'Erro ao comparar valores para nota {nota.id}: Formato inválido'
+                })
+            elif nota.valor_divergente:
+                logger.warning(f"Valor divergente para {nota.id}: NFSERV={nota.valor_nfserv}, R189={nota.valor_r189}")
+                divergencias.append({
+                    'Tipo': 'VALOR',
+                    'NFSERV_ID': nota.id,
+                    'CNPJ NFSERV': nota.cnpj_nfserv,
+                    'CNPJ R189': nota.cnpj_r189,
+                    'Valor NFSERV': nota.valor_nfserv,
+                    'Valor R189': nota.valor_r189,
+                    'Detalhes': f'Valor diferente para nota {nota.id}: NFSERV={nota.valor_nfserv}, R189={nota.valor_r189}'
+                })
+        return divergencias
+
+    @stage("reconcile")
     async def check_divergences(self, nfserv_data, r189_data):
         """
         Verifica divergências entre os dados consolidados do NFSERV e R189.
@@ -90,13 +167,20 @@ class DivergenceReportNFSERVR189:
             
             # Validação de tipos de dados
             try:
-                logger.info("Convertendo colunas de valor para numérico")
-                nfserv_data['VALOR_TOTAL'] = pd.to_numeric(nfserv_data['VALOR_TOTAL'], errors='coerce')
-                r189_data[coluna_total_encontrada] = pd.to_numeric(r189_data[coluna_total_encontrada], errors='coerce')
+                logger.info("Convertendo colunas de valor para centavos")
+                # Os valores são comparados em centavos (int64); as colunas ficam em reais para o relatório
+                centavos_nfserv = to_cents(nfserv_data['VALOR_TOTAL'])
+                centavos_r189 = to_cents(r189_data[coluna_total_encontrada])
+                nfserv_data['VALOR_TOTAL'] = from_cents(centavos_nfserv)
+                r189_data[coluna_total_encontrada] = from_cents(centavos_r189)
             except Exception as e:
                 logger.error(f"Erro ao converter valores: {str(e)}")
                 return False, f"Erro: Valores inválidos nas colunas de valor: {str(e)}", pd.DataFrame()
             
+            # Notas presentes nos dois lados, comparadas de uma vez (CNPJ e valor em centavos)
+            comuns = self._notas_em_ambos(nfserv_data, r189_data, coluna_total_encontrada,
+                                          centavos_nfserv, centavos_r189)
+            
             # Para cada sigla, verifica as contagens e divergências
             for sigla in siglas_unicas:
                 logger.info(f"Analisando sigla: {sigla}")
@@ -180,70 +264,7 @@ class DivergenceReportNFSERVR189:
                 common_ids = nfserv_ids & r189_ids
                 logger.info(f"IDs presentes em ambos os sistemas para sigla {sigla}: {len(common_ids)}")
                 
-                for nfserv_id in common_ids:
-                    nfserv_rows = nfserv_data[nfserv_data['NFSERV_ID'] == nfserv_id]
-                    r189_rows = r189_data[r189_data['Invoice number'] == nfserv_id]
-                    
-                    if nfserv_rows.empty or r189_rows.empty:
-                        continue
-                    
-                    nfserv_row = nfserv_rows.iloc[0]
-                    r189_row = r189_rows.iloc[0]
-                    
-                    # Verifica CNPJ - Normaliza removendo espaços e pontuação
-                    nfserv_cnpj = str(nfserv_row['CNPJ']).strip().replace('.', '').replace('-', '').replace('/', '')
-                    r189_cnpj = str(r189_row['CNPJ - WEG']).strip().replace('.', '').replace('-', '').replace('/', '')
-                    
-                    if nfserv_cnpj != r189_cnpj:
-                        logger.warning(f"CNPJ divergente para {nfserv_id}: NFSERV={nfserv_row['CNPJ']}, R189={r189_row['CNPJ - WEG']}")
-                        divergences.append({
-                            'Tipo': 'CNPJ divergente',
-                            'NFSERV_ID': nfserv_id,
-                            'CNPJ NFSERV': nfserv_row['CNPJ'],
-                            'CNPJ R189': r189_row['CNPJ - WEG'],
-                            'Valor NFSERV': nfserv_row['VALOR_TOTAL'],
-                            'Valor R189': r189_row[coluna_total_encontrada],
-                            'Detalhes': f'CNPJ diferente para nota {nfserv_id}: NFSERV={nfserv_row["CNPJ"]}, R189={r189_row["CNPJ - WEG"]}'
-                        })
-                    
-                    # Verifica Valor
-                    try:
-                        # Trata valores com vírgula ou ponto
-                        nfserv_valor = str(nfserv_row['VALOR_TOTAL']).strip().replace(',', '.')
-                        r189_valor = str(r189_row[coluna_total_encontrada]).strip().replace(',', '.')
-                        
-                        # Remove caracteres não numéricos exceto ponto
-                        nfserv_valor = ''.join(c for c in nfserv_valor if c.isdigit() or c == '.')
-                        r189_valor = ''.join(c for c in r189_valor if c.isdigit() or c == '.')
-                        
-                        # Converte para float
-                        nfserv_valor_float = float(nfserv_valor)
-                        r189_valor_float = float(r189_valor)
-                        
-                        # Se os valores forem diferentes (com margem de tolerância)
-                        if abs(nfserv_valor_float - r189_valor_float) > 0.01:
-                            logger.warning(f"Valor divergente para {nfserv_id}: NFSERV={nfserv_valor_float}, R189={r189_valor_float}")
-                            divergences.append({
-                                'Tipo': 'VALOR',
-                                'NFSERV_ID': nfserv_id,
-                                'CNPJ NFSERV': nfserv_row['CNPJ'],
-                                'CNPJ R189': r189_row['CNPJ - WEG'],
-                                'Valor NFSERV': nfserv_row['VALOR_TOTAL'],
-                                'Valor R189': r189_row[coluna_total_encontrada],
-                                'Detalhes': f'Valor diferente para nota {nfserv_id}: NFSERV={nfserv_row["VALOR_TOTAL"]}, R189={r189_row[coluna_total_encontrada]}'
-                            })
-                    except (ValueError, TypeError) as e:
-                        # Se houver erro na conversão, registra como divergência
-                        logger.warning(f"Erro na validação de valor para {nfserv_id}: {str(e)}")
-                        divergences.append({
-                            'Tipo': 'Erro na validação de valor',
-                            'NFSERV_ID': nfserv_id,
-                            'CNPJ NFSERV': nfserv_row['CNPJ'],
-                            'CNPJ R189': r189_row['CNPJ - WEG'],
-                            'Valor NFSERV': str(nfserv_row['VALOR_TOTAL']),
-                            'Valor R189': str(r189_row[coluna_total_encontrada]),
-                            'Detalhes': f'Erro ao comparar valores para nota {nfserv_id}: Formato inválido'
-                        })
+                divergences.extend(self._divergencias_notas_comuns(comuns[comuns['SIGLA'] == sigla]))
             
             if divergences:
                 df_divergences = pd.DataFrame(divergences)
@@ -290,21 +311,8 @@ class DivergenceReportNFSERVR189:
             try:
                 logger.info("Criando arquivo Excel na memória")
                 # Cria o arquivo Excel na memória
-                output = BytesIO()
-                with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                    divergences_df.to_excel(writer, index=False, sheet_name='Divergencias_NFSERV_R189')
-                    
-                    # Ajusta a largura das colunas
-                    workbook = writer.book
-                    worksheet = writer.sheets['Divergencias_NFSERV_R189']
-                    for i, col in enumerate(divergences_df.columns):
-                        max_length = max(
-                            divergences_df[col].astype(str).apply(len).max(),
-                            len(str(col))
-                        )
-                        worksheet.set_column(i, i, max_length + 2)
-                
-                output.seek(0)
+                with track_stage("write_xlsx", rows=len(divergences_df)):
+                    output = write_xlsx({'Divergencias_NFSERV_R189': divergences_df})
                 logger.info("Arquivo Excel criado com sucesso")
                 
                 # Nome do arquivo com timestamp
@@ -325,6 +333,115 @@ class DivergenceReportNFSERVR189:
             logger.exception(f"Erro inesperado ao gerar relatório Excel: {str(e)}")
             return {"success": False, "error": f"Erro inesperado ao gerar relatório Excel: {str(e)}"}
 
+    async def generate_report_from_data(self, df_nfserv: pd.DataFrame, df_r189: pd.DataFrame) -> Dict[str, Any]:
+        """
+        Verifica as divergências a partir dos dados NFSERV e R189 já carregados e envia o relatório
+        ao SharePoint. Em caso de sucesso, o resultado inclui o DataFrame do relatório em "report_df".
+        """
+        if df_nfserv.empty:
+            logger.error("Arquivo NFSERV_consolidado.xlsx está vazio")
+            return {
+                "success": False,
+                "error": "Erro: Arquivo NFSERV_consolidado.xlsx está vazio",
+                "show_popup": True
+            }
+            
+        if df_r189.empty:
+            logger.error("Arquivo R189_consolidado.xlsx está vazio")
+            return {
+                "success": False,
+                "error": "Erro: Arquivo R189_consolidado.xlsx está vazio",
+                "show_popup": True
+            }
+        
+        # Verifica divergências
+        logger.info("Verificando divergências")
+        success, message, divergences_df = await self.check_divergences(df_nfserv, df_r189)
+        set_span_attributes(divergences=len(divergences_df))
+        
+        if not success:
+            logger.error(f"Erro na verificação: {message}")
+            return {
+                "success": False,
+                "error": message,
+                "show_popup": True
+            }
+        
+        # Se encontrou divergências, gera o relatório Excel
+        if not divergences_df.empty:
+            logger.info(f"Gerando relatório Excel com {len(divergences_df)} divergências")
+            report_result = await self.generate_excel_report(divergences_df)
+            
+            if not report_result.get("success", False):
+                error_msg = report_result.get("error", "Erro desconhecido ao gerar relatório")
+                logger.error(f"Erro ao gerar relatório: {error_msg}")
+                return {
+                    "success": False,
+                    "error": error_msg,
+                    "show_popup": True
+                }
+            
+            # Nome do arquivo de relatório
+            report_filename = report_result.get("filename")
+            if not report_filename:
+                logger.error("Nome do arquivo de relatório não encontrado no resultado")
+                return {
+                    "success": False,
+                    "error": "Nome do arquivo de relatório não encontrado",
+                    "show_popup": True
+                }
+            
+            file_content = report_result.get("file_content")
+            if not file_content:
+                logger.error("Conteúdo do arquivo de relatório não encontrado no resultado")
+                return {
+                    "success": False,
+                    "error": "Conteúdo do arquivo de relatório não encontrado",
+                    "show_popup": True
+                }
+            
+            # Envia o relatório para o SharePoint
+            logger.info(f"Enviando relatório {report_filename} para o SharePoint")
+            relatorios_path = "/teams/BR-TI-TIN/AutomaoFinanas/RELATÓRIOS/NFSERV_R189"
+            
+            # Usar o método assíncrono do SharePointAuth
+            upload_success = await self.sharepoint_auth.enviar_arquivo_sharepoint(
+                conteudo=conteudo_arquivo(file_content),
+                nome_arquivo=report_filename,
+                pasta=relatorios_path
+            )
+            
+            if not upload_success:
+                logger.error("Erro ao enviar relatório para o SharePoint")
+                return {
+                    "success": False,
+                    "error": "Erro ao enviar relatório para o SharePoint",
+                    "show_popup": True
+                }
+            
+            logger.info("Relatório enviado com sucesso")
+            if self.export_format:
+                exportacao = await export_report(self.sharepoint_auth, divergences_df, report_filename,
+                                                 relatorios_path, self.export_format)
+                if not exportacao["success"]:
+                    return {"success": False, "error": exportacao["error"], "show_popup": True}
+            get_report_registry().register("NFSERV_vs_R189", report_filename, divergences_df)
+            return {
+                "success": True,
+                "report_df": divergences_df,
+                "message": f"Relatório de divergências gerado e salvo com sucesso!\n\nResumo das divergências encontradas:\n{message}\n\nO arquivo foi salvo na pasta RELATÓRIOS/NFSERV_R189 no SharePoint.",
+                "show_popup": True
+            }
+        
+        logger.info("Nenhuma divergência encontrada, não é necessário gerar relatório")
+        return {
+            "success": True,
+            "report_df": divergences_df,
+            "message": message,
+            "show_popup": True
+        }
+
+    @pipeline("report_nfserv_r189")
     async def generate_report(self):
         """
         Gera o relatório de divergências comparando NFSERV e R189.
@@ -367,42 +484,44 @@ class DivergenceReportNFSERVR189:
             # Lê os arquivos em DataFrames
             logger.info("Lendo arquivos Excel")
             try:
-                nfserv_io = BytesIO(nfserv_content)
-                r189_io = BytesIO(r189_content)
-                
-                # Listar todas as planilhas disponíveis nos arquivos
-                nfserv_excel = pd.ExcelFile(nfserv_io)
-                nfserv_sheets = nfserv_excel.sheet_names
-                logger.info(f"Planilhas disponíveis em NFSERV_consolidado.xlsx: {nfserv_sheets}")
-                
-                r189_excel = pd.ExcelFile(r189_io)
-                r189_sheets = r189_excel.sheet_names
-                logger.info(f"Planilhas disponíveis em R189_consolidado.xlsx: {r189_sheets}")
-                
-                # Reabrir os BytesIO pois foram consumidos pelo ExcelFile
-                nfserv_io = BytesIO(nfserv_content)
-                r189_io = BytesIO(r189_content)
-                
-                # Usar a primeira planilha disponível para NFSERV e R189 se as específicas não existirem
-                if 'NFSERV_consolidado' in nfserv_sheets:
-                    df_nfserv = pd.read_excel(nfserv_io, sheet_name='NFSERV_consolidado')
-                    logger.info("Usando planilha 'NFSERV_consolidado'")
-                elif 'Consolidado_NFSERV' in nfserv_sheets:
-                    df_nfserv = pd.read_excel(nfserv_io, sheet_name='Consolidado_NFSERV')
-                    logger.info("Usando planilha 'Consolidado_NFSERV'")
-                else:
-                    df_nfserv = pd.read_excel(nfserv_io, sheet_name=nfserv_sheets[0])
-                    logger.info(f"Usando primeira planilha disponível para NFSERV: {nfserv_sheets[0]}")
-                
-                if 'Consolidado_R189' in r189_sheets:
-                    df_r189 = pd.read_excel(r189_io, sheet_name='Consolidado_R189')
-                    logger.info("Usando planilha 'Consolidado_R189'")
-                else:
-                    df_r189 = pd.read_excel(r189_io, sheet_name=r189_sheets[0])
-                    logger.info(f"Usando primeira planilha disponível para R189: {r189_sheets[0]}")
-                
-                logger.info(f"Linhas em NFSERV: {len(df_nfserv)}")
-                logger.info(f"Linhas em R189: {len(df_r189)}")
+                with track_stage("parse") as span:
+                    nfserv_io = BytesIO(nfserv_content)
+                    r189_io = BytesIO(r189_content)
+                
+                    # Listar todas as planilhas disponíveis nos arquivos
+                    nfserv_excel = pd.ExcelFile(nfserv_io)
+                    nfserv_sheets = nfserv_excel.sheet_names
+                    logger.info(f"Planilhas disponíveis em NFSERV_consolidado.xlsx: {nfserv_sheets}")
+                
+                    r189_excel = pd.ExcelFile(r189_io)
+                    r189_sheets = r189_excel.sheet_names
+                    logger.info(f"Planilhas disponíveis em R189_consolidado.xlsx: {r189_sheets}")
+                
+                    # Reabrir os BytesIO pois foram consumidos pelo ExcelFile
+                    nfserv_io = BytesIO(nfserv_content)
+                    r189_io = BytesIO(r189_content)
+                
+                    # Usar a primeira planilha disponível para NFSERV e R189 se as específicas não existirem
+                    if 'NFSERV_consolidado' in nfserv_sheets:
+                        df_nfserv = pd.read_excel(nfserv_io, sheet_name='NFSERV_consolidado')
+                        logger.info("Usando planilha 'NFSERV_consolidado'")
+                    elif 'Consolidado_NFSERV' in nfserv_sheets:
+                        df_nfserv = pd.read_excel(nfserv_io, sheet_name='Consolidado_NFSERV')
+                        logger.info("Usando planilha 'Consolidado_NFSERV'")
+                    else:
+                        df_nfserv = pd.read_excel(nfserv_io, sheet_name=nfserv_sheets[0])
+                        logger.info(f"Usando primeira planilha disponível para NFSERV: {nfserv_sheets[0]}")
+                
+                    if 'Consolidado_R189' in r189_sheets:
+                        df_r189 = pd.read_excel(r189_io, sheet_name='Consolidado_R189')
+                        logger.info("Usando planilha 'Consolidado_R189'")
+                    else:
+                        df_r189 = pd.read_excel(r189_io, sheet_name=r189_sheets[0])
+                        logger.info(f"Usando primeira planilha disponível para R189: {r189_sheets[0]}")
+                
+                    logger.info(f"Linhas em NFSERV: {len(df_nfserv)}")
+                    logger.info(f"Linhas em R189: {len(df_r189)}")
+                    span.set_attributes({"rows_nfserv": len(df_nfserv), "rows_r189": len(df_r189)})
             except Exception as e:
                 logger.error(f"Erro ao ler arquivos Excel: {str(e)}")
                 return {
@@ -411,100 +530,10 @@ class DivergenceReportNFSERVR189:
                     "show_popup": True
                 }
             
-            if df_nfserv.empty:
-                logger.error("Arquivo NFSERV_consolidado.xlsx está vazio")
-                return {
-                    "success": False,
-                    "error": "Erro: Arquivo NFSERV_consolidado.xlsx está vazio",
-                    "show_popup": True
-                }
-                
-            if df_r189.empty:
-                logger.error("Arquivo R189_consolidado.xlsx está vazio")
-                return {
-                    "success": False,
-                    "error": "Erro: Arquivo R189_consolidado.xlsx está vazio",
-                    "show_popup": True
-                }
-            
-            # Verifica divergências
-            logger.info("Verificando divergências")
-            success, message, divergences_df = await self.check_divergences(df_nfserv, df_r189)
-            
-            if not success:
-                logger.error(f"Erro na verificação: {message}")
-                return {
-                    "success": False,
-                    "error": message,
-                    "show_popup": True
-                }
-            
-            # Se encontrou divergências, gera o relatório Excel
-            if not divergences_df.empty:
-                logger.info(f"Gerando relatório Excel com {len(divergences_df)} divergências")
-                report_result = await self.generate_excel_report(divergences_df)
-                
-                if not report_result.get("success", False):
-                    error_msg = report_result.get("error", "Erro desconhecido ao gerar relatório")
-                    logger.error(f"Erro ao gerar relatório: {error_msg}")
-                    return {
-                        "success": False,
-                        "error": error_msg,
-                        "show_popup": True
-                    }
-                
-                # Nome do arquivo de relatório
-                report_filename = report_result.get("filename")
-                if not report_filename:
-                    logger.error("Nome do arquivo de relatório não encontrado no resultado")
-                    return {
-                        "success": False,
-                        "error": "Nome do arquivo de relatório não encontrado",
-                        "show_popup": True
-                    }
-                
-                file_content = report_result.get("file_content")
-                if not file_content:
-                    logger.error("Conteúdo do arquivo de relatório não encontrado no resultado")
-                    return {
-                        "success": False,
-                        "error": "Conteúdo do arquivo de relatório não encontrado",
-                        "show_popup": True
-                    }
-                
-                # Envia o relatório para o SharePoint
-                logger.info(f"Enviando relatório {report_filename} para o SharePoint")
-                relatorios_path = "/teams/BR-TI-TIN/AutomaoFinanas/RELATÓRIOS/NFSERV_R189"
-                
-                # Usar o método assíncrono do SharePointAuth
-                upload_success = await self.sharepoint_auth.enviar_arquivo_sharepoint(
-                    conteudo=file_content.getvalue(),
-                    nome_arquivo=report_filename,
-                    pasta=relatorios_path
-                )
-                
-                if not upload_success:
-                    logger.error("Erro ao enviar relatório para o SharePoint")
-                    return {
-                        "success": False,
-                        "error": "Erro ao enviar relatório para o SharePoint",
-                        "show_popup": True
-                    }
-                
-                logger.info("Relatório enviado com sucesso")
-                return {
-                    "success": True,
-                    "message": f"Relatório de divergências gerado e salvo com sucesso!\n\nResumo das divergências encontradas:\n{message}\n\nO arquivo foi salvo na pasta RELATÓRIOS/NFSERV_R189 no SharePoint.",
-                    "show_popup": True
-                }
-            
-            logger.info("Nenhuma divergência encontrada, não é necessário gerar relatório")
-            return {
-                "success": True,
-                "message": message,
-                "show_popup": True
-            }
-            
+            resultado = await self.generate_report_from_data(df_nfserv, df_r189)
+            resultado.pop("report_df", None)
+            return resultado
+
         except Exception as e:
             logger.exception(f"Erro inesperado ao gerar relatório: {str(e)}")
             return {
@@ -1,11 +1,15 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import pandas as pd
 from datetime import datetime
 from io import BytesIO
 import logging
 import traceback
 from app.core.auth import SharePointAuth
-from app.core.sharepoint import SharePointClient
+from app.core.metrics import pipeline, stage, track_stage
+from app.core.tracing import set_span_attributes
+from app.core.money import divergencias_centavos, from_cents, to_cents
+from app.core.reports.report_registry import get_report_registry
+from app.core.reports.report_writer import conteudo_arquivo, export_report, write_xlsx
 
 logger = logging.getLogger(__name__)
 
@@ -14,12 +18,85 @@ class DivergenceReportQPER189:
     Classe responsável por verificar divergências entre os arquivos consolidados QPE e R189.
     """
     
-    def __init__(self):
-        self.sharepoint_auth = SharePointAuth()
-        self.sharepoint_client = SharePointClient()
+    def __init__(self, sharepoint_auth: Optional[SharePointAuth] = None, export_format: Optional[str] = None):
+        # Uma instância compartilhada evita recarregar o .env e as credenciais a cada relatório
+        self.sharepoint_auth = sharepoint_auth or SharePointAuth()
+        # Formato adicional (csv.gz ou parquet) enviado junto com o .xlsx
+        self.export_format = export_format
         # Lista de possíveis nomes para a coluna de total
         self.colunas_total = ['Total Geral', 'Grand Total', 'Total Gera', 'Total', 'Valor Total']
 
+    @staticmethod
+    def _divergencias_por_linha(qpe_data: pd.DataFrame, r189_data: pd.DataFrame, coluna_total: str,
+                                centavos_qpe: pd.Series, centavos_r189: pd.Series,
+                                missing_in_r189: set) -> List[Dict[str, Any]]:
+        """
+        Divergências de cada linha do QPE, na ordem das linhas: QPE_ID vazio, CNPJ inválido,
+        QPE_ID não encontrado no R189 (se ainda não listado na contagem), CNPJ e VALOR.
+        O QPE é comparado com a primeira nota do R189 de mesmo ID por um merge, e os valores
+        em centavos com divergencias_centavos (tolerância de 1 centavo).
+        """
+        ids = qpe_data['QPE_ID'].astype(str).str.strip()
+        cnpjs = qpe_data['CNPJ'].astype(str).str.strip()
+        vazio = ids.eq('')
+        cnpj_invalido = ~vazio & cnpjs.str.len().ne(18)  # Formato XX.XXX.XXX/XXXX-XX
+
+        r189 = pd.DataFrame({
+            'chave': r189_data['Invoice number'].str.lower(),
+            'cnpj_r189': r189_data['CNPJ - WEG'].astype(str).str.strip(),
+            'valor_r189': r189_data[coluna_total],
+            'centavos_r189': centavos_r189,
+        }).dropna(subset=['chave']).drop_duplicates('chave')
+        qpe = pd.DataFrame({
+            'chave': ids.str.lower().to_numpy(),
+            'centavos_qpe': centavos_qpe.to_numpy(),
+        })
+        merged = qpe.merge(r189, on='chave', how='left', indicator=True)
+
+        encontrado = merged['_merge'].eq('both').to_numpy() & ~vazio.to_numpy() & ~cnpj_invalido.to_numpy()
+        nao_encontrado = (merged['_merge'].eq('left_only').to_numpy() & ~vazio.to_numpy()
+                          & ~cnpj_invalido.to_numpy() & ~merged['chave'].isin(missing_in_r189).to_numpy())
+        cnpj_divergente = encontrado & merged['cnpj_r189'].ne(cnpjs.to_numpy()).to_numpy()
+        valor_divergente = encontrado & divergencias_centavos(merged['centavos_qpe'], merged['centavos_r189']).to_numpy()
+
+        valores_qpe = qpe_data['VALOR_TOTAL'].astype(float).tolist()
+        divergencias: List[Dict[str, Any]] = []
+        com_divergencia = vazio.to_numpy() | cnpj_invalido.to_numpy() | nao_encontrado | cnpj_divergente | valor_divergente
+        for pos in com_divergencia.nonzero()[0]:
+            qpe_id, qpe_cnpj, qpe_valor = ids.iat[pos], cnpjs.iat[pos], valores_qpe[pos]
+            if vazio.iat[pos]:
+                divergencias.append({'Tipo': 'QPE_ID vazio', 'QPE_ID': 'VAZIO', 'CNPJ QPE': qpe_cnpj,
+                                     'CNPJ R189': 'N/A', 'Valor QPE': qpe_valor, 'Valor R189': 'N/A'})
+                continue
+            if cnpj_invalido.iat[pos]:
+                divergencias.append({'Tipo': 'CNPJ inválido', 'QPE_ID': qpe_id, 'CNPJ QPE': qpe_cnpj,
+                                     'CNPJ R189': 'N/A', 'Valor QPE': qpe_valor, 'Valor R189': 'N/A'})
+                continue
+            if nao_encontrado[pos]:
+                divergencias.append({'Tipo': 'QPE_ID não encontrado no R189', 'QPE_ID': qpe_id, 'CNPJ QPE': qpe_cnpj,
+                                     'CNPJ R189': 'Não encontrado', 'Valor QPE': qpe_valor,
+                                     'Valor R189': 'Não encontrado'})
+                continue
+            r189_cnpj, r189_valor = merged.at[pos, 'cnpj_r189'], float(merged.at[pos, 'valor_r189'])
+            if cnpj_divergente[pos]:
+                divergencias.append({
+                    'Tipo': 'CNPJ', 'QPE_ID': qpe_id, 'CNPJ QPE': qpe_cnpj, 'CNPJ R189': r189_cnpj,
+                    'Valor QPE': qpe_valor, 'Valor R189': r189_valor,
+                    'Detalhes': f'CNPJ diferente para QPE {qpe_id}: QPE={qpe_cnpj}, R189={r189_cnpj}'
+                })
+            if valor_divergente[pos]:
+                divergencias.append({
+                    'Tipo': 'VALOR', 'QPE_ID': qpe_id, 'CNPJ QPE': qpe_cnpj, 'CNPJ R189': r189_cnpj,
+                    'Valor QPE': qpe_valor, 'Valor R189': r189_valor,
+                    'Detalhes': f'Valor diferente para QPE {qpe_id}: QPE={qpe_valor}, R189={r189_valor}'
+                })
+
+        logger.info(f"Linhas do QPE: {int(vazio.sum())} sem ID, {int(cnpj_invalido.sum())} com CNPJ inválido, "
+                    f"{int(nao_encontrado.sum())} não encontradas no R189, {int(cnpj_divergente.sum())} com CNPJ "
+                    f"divergente e {int(valor_divergente.sum())} com valor divergente")
+        return divergencias
+
+    @stage("reconcile")
     async def check_divergences(self, qpe_data: pd.DataFrame, r189_data: pd.DataFrame) -> tuple[bool, str, pd.DataFrame]:
         """
         Verifica divergências entre os dados consolidados do QPE e R189.
@@ -58,6 +135,7 @@ class DivergenceReportQPER189:
                 return False, f"Erro: Nenhuma das colunas de total foi encontrada no R189. Esperado uma das seguintes: {self.colunas_total}", pd.DataFrame()
             
             divergences = []
+            missing_in_r189 = set()
             
             # Contagem de QPE_ID
             logger.info("Contando QPE_IDs únicos")
@@ -130,9 +208,12 @@ class DivergenceReportQPER189:
             
             # Validação de tipos de dados
             try:
-                logger.info("Convertendo colunas de valor para numérico")
-                qpe_data['VALOR_TOTAL'] = pd.to_numeric(qpe_data['VALOR_TOTAL'], errors='coerce')
-                r189_data[coluna_total_encontrada] = pd.to_numeric(r189_data[coluna_total_encontrada], errors='coerce')
+                logger.info("Convertendo colunas de valor para centavos")
+                # Os valores são comparados em centavos (int64); as colunas ficam em reais para o relatório
+                centavos_qpe = to_cents(qpe_data['VALOR_TOTAL'])
+                centavos_r189 = to_cents(r189_data[coluna_total_encontrada])
+                qpe_data['VALOR_TOTAL'] = from_cents(centavos_qpe)
+                r189_data[coluna_total_encontrada] = from_cents(centavos_r189)
             except Exception as e:
                 logger.error(f"Erro ao converter valores: {str(e)}")
                 return False, f"Erro: Valores inválidos nas colunas de valor: {str(e)}", pd.DataFrame()
@@ -153,84 +234,12 @@ class DivergenceReportQPER189:
                     f"VALOR_TOTAL: {null_qpe_valor} valores nulos"
                 ), pd.DataFrame()
             
-            # Itera sobre cada linha do QPE
-            logger.info("Verificando cada linha do QPE")
-            for idx, qpe_row in qpe_data.iterrows():
-                qpe_id = str(qpe_row['QPE_ID']).strip()
-                qpe_cnpj = str(qpe_row['CNPJ']).strip()
-                qpe_valor = float(qpe_row['VALOR_TOTAL'])
-                
-                # Validação do QPE_ID
-                if not qpe_id:
-                    logger.warning(f"QPE_ID vazio encontrado na linha {idx}")
-                    divergences.append({
-                        'Tipo': 'QPE_ID vazio',
-                        'QPE_ID': 'VAZIO',
-                        'CNPJ QPE': qpe_cnpj,
-                        'CNPJ R189': 'N/A',
-                        'Valor QPE': qpe_valor,
-                        'Valor R189': 'N/A'
-                    })
-                    continue
-                
-                # Validação do CNPJ
-                if not qpe_cnpj or len(qpe_cnpj) != 18:  # Formato XX.XXX.XXX/XXXX-XX
-                    logger.warning(f"CNPJ inválido para QPE_ID {qpe_id}: {qpe_cnpj}")
-                    divergences.append({
-                        'Tipo': 'CNPJ inválido',
-                        'QPE_ID': qpe_id,
-                        'CNPJ QPE': qpe_cnpj,
-                        'CNPJ R189': 'N/A',
-                        'Valor QPE': qpe_valor,
-                        'Valor R189': 'N/A'
-                    })
-                    continue
-                
-                # Procura o QPE_ID no R189
-                r189_match = r189_data[r189_data['Invoice number'].str.lower() == qpe_id.lower()]
-                
-                if r189_match.empty:
-                    # Não adiciona novamente se já foi registrado como ausente
-                    if qpe_id.lower() not in missing_in_r189:
-                        logger.warning(f"QPE_ID {qpe_id} não encontrado no R189")
-                        divergences.append({
-                            'Tipo': 'QPE_ID não encontrado no R189',
-                            'QPE_ID': qpe_id,
-                            'CNPJ QPE': qpe_cnpj,
-                            'CNPJ R189': 'Não encontrado',
-                            'Valor QPE': qpe_valor,
-                            'Valor R189': 'Não encontrado'
-                        })
-                else:
-                    r189_row = r189_match.iloc[0]
-                    r189_cnpj = str(r189_row['CNPJ - WEG']).strip()
-                    r189_valor = float(r189_row[coluna_total_encontrada])
-                    
-                    # Verifica CNPJ
-                    if qpe_cnpj != r189_cnpj:
-                        logger.warning(f"CNPJ divergente para {qpe_id}: QPE={qpe_cnpj}, R189={r189_cnpj}")
-                        divergences.append({
-                            'Tipo': 'CNPJ',
-                            'QPE_ID': qpe_id,
-                            'CNPJ QPE': qpe_cnpj,
-                            'CNPJ R189': r189_cnpj,
-                            'Valor QPE': qpe_valor,
-                            'Valor R189': r189_valor,
-                            'Detalhes': f'CNPJ diferente para QPE {qpe_id}: QPE={qpe_cnpj}, R189={r189_cnpj}'
-                        })
-                    
-                    # Verifica Valor
-                    if abs(qpe_valor - r189_valor) > 0.01:  # Margem de tolerância de 1 centavo
-                        logger.warning(f"Valor divergente para {qpe_id}: QPE={qpe_valor}, R189={r189_valor}")
-                        divergences.append({
-                            'Tipo': 'VALOR',
-                            'QPE_ID': qpe_id,
-                            'CNPJ QPE': qpe_cnpj,
-                            'CNPJ R189': r189_cnpj,
-                            'Valor QPE': qpe_valor,
-                            'Valor R189': r189_row[coluna_total_encontrada],
-                            'Detalhes': f'Valor diferente para QPE {qpe_id}: QPE={qpe_valor}, R189={r189_valor}'
-                        })
+            # Compara as linhas do QPE com a primeira nota do R189 de mesmo ID (sem diferenciar
+            # maiúsculas) por um merge; só as linhas com divergência são percorridas
+            logger.info("Verificando as linhas do QPE")
+            divergences.extend(self._divergencias_por_linha(
+                qpe_data, r189_data, coluna_total_encontrada, centavos_qpe, centavos_r189, missing_in_r189
+            ))
             
             if divergences:
                 df_divergences = pd.DataFrame(divergences)
@@ -283,21 +292,8 @@ class DivergenceReportQPER189:
             try:
                 logger.info("Criando arquivo Excel na memória")
                 # Cria o arquivo Excel na memória
-                output = BytesIO()
-                with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                    divergences_df.to_excel(writer, index=False, sheet_name='Divergencias_QPE_R189')
-                    
-                    # Ajusta a largura das colunas
-                    workbook = writer.book
-                    worksheet = writer.sheets['Divergencias_QPE_R189']
-                    for i, col in enumerate(divergences_df.columns):
-                        max_length = max(
-                            divergences_df[col].astype(str).apply(len).max(),
-                            len(str(col))
-                        )
-                        worksheet.set_column(i, i, max_length + 2)
-                
-                output.seek(0)
+                with track_stage("write_xlsx", rows=len(divergences_df)):
+                    output = write_xlsx({'Divergencias_QPE_R189': divergences_df})
                 logger.info("Arquivo Excel criado com sucesso")
                 
                 # Nome do arquivo com timestamp
@@ -318,6 +314,115 @@ class DivergenceReportQPER189:
             logger.exception(f"Erro inesperado ao gerar relatório Excel: {str(e)}")
             return {"success": False, "error": f"Erro inesperado ao gerar relatório Excel: {str(e)}"}
 
+    async def generate_report_from_data(self, df_qpe: pd.DataFrame, df_r189: pd.DataFrame) -> Dict[str, Any]:
+        """
+        Verifica as divergências a partir dos dados QPE e R189 já carregados e envia o relatório
+        ao SharePoint. Em caso de sucesso, o resultado inclui o DataFrame do relatório em "report_df".
+        """
+        if df_qpe.empty:
+            logger.error("Arquivo QPE_consolidado.xlsx está vazio")
+            return {
+                "success": False,
+                "error": "Erro: Arquivo QPE_consolidado.xlsx está vazio",
+                "show_popup": True
+            }
+            
+        if df_r189.empty:
+            logger.error("Arquivo R189_consolidado.xlsx está vazio")
+            return {
+                "success": False,
+                "error": "Erro: Arquivo R189_consolidado.xlsx está vazio",
+                "show_popup": True
+            }
+        
+        # Verifica divergências
+        logger.info("Verificando divergências")
+        success, message, divergences_df = await self.check_divergences(df_qpe, df_r189)
+        set_span_attributes(divergences=len(divergences_df))
+        
+        if not success:
+            logger.error(f"Erro na verificação: {message}")
+            return {
+                "success": False,
+                "error": message,
+                "show_popup": True
+            }
+        
+        # Se encontrou divergências, gera o relatório Excel
+        if not divergences_df.empty:
+            logger.info(f"Gerando relatório Excel com {len(divergences_df)} divergências")
+            report_result = await self.generate_excel_report(divergences_df)
+            
+            if not report_result.get("success", False):
+                error_msg = report_result.get("error", "Erro desconhecido ao gerar relatório")
+                logger.error(f"Erro ao gerar relatório: {error_msg}")
+                return {
+                    "success": False,
+                    "error": error_msg,
+                    "show_popup": True
+                }
+            
+            # Nome do arquivo de relatório
+            report_filename = report_result.get("filename")
+            if not report_filename:
+                logger.error("Nome do arquivo de relatório não encontrado no resultado")
+                return {
+                    "success": False,
+                    "error": "Nome do arquivo de relatório não encontrado",
+                    "show_popup": True
+                }
+            
+            file_content = report_result.get("file_content")
+            if not file_content:
+                logger.error("Conteúdo do arquivo de relatório não encontrado no resultado")
+                return {
+                    "success": False,
+                    "error": "Conteúdo do arquivo de relatório não encontrado",
+                    "show_popup": True
+                }
+            
+            # Envia o relatório para o SharePoint
+            logger.info(f"Enviando relatório {report_filename} para o SharePoint")
+            relatorios_path = "/teams/BR-TI-TIN/AutomaoFinanas/RELATÓRIOS/QPE_R189"
+            
+            # Usar o método assíncrono do SharePointAuth
+            upload_success = await self.sharepoint_auth.enviar_arquivo_sharepoint(
+                conteudo=conteudo_arquivo(file_content),
+                nome_arquivo=report_filename,
+                pasta=relatorios_path
+            )
+            
+            if not upload_success:
+                logger.error("Erro ao enviar relatório para o SharePoint")
+                return {
+                    "success": False,
+                    "error": "Erro ao enviar relatório para o SharePoint",
+                    "show_popup": True
+                }
+            
+            logger.info("Relatório enviado com sucesso")
+            if self.export_format:
+                exportacao = await export_report(self.sharepoint_auth, divergences_df, report_filename,
+                                                 relatorios_path, self.export_format)
+                if not exportacao["success"]:
+                    return {"success": False, "error": exportacao["error"], "show_popup": True}
+            get_report_registry().register("QPE_vs_R189", report_filename, divergences_df)
+            return {
+                "success": True,
+                "report_df": divergences_df,
+                "message": f"Relatório de divergências gerado e salvo com sucesso!\n\nResumo das divergências encontradas:\n{message}\n\nO arquivo foi salvo na pasta RELATÓRIOS/QPE_R189 no SharePoint.",
+                "show_popup": True
+            }
+        
+        logger.info("Nenhuma divergência encontrada, não é necessário gerar relatório")
+        return {
+            "success": True,
+            "report_df": divergences_df,
+            "message": message,
+            "show_popup": True
+        }
+
+    @pipeline("report_qpe_r189")
     async def generate_report(self):
         """
         Gera o relatório de divergências comparando QPE e R189.
@@ -363,35 +468,37 @@ class DivergenceReportQPER189:
             # Lê os arquivos em DataFrames
             logger.info("Lendo arquivos Excel")
             try:
-                qpe_io = BytesIO(qpe_content)
-                r189_io = BytesIO(r189_content)
+                with track_stage("parse") as span:
+                    qpe_io = BytesIO(qpe_content)
+                    r189_io = BytesIO(r189_content)
                 
-                # Listar todas as planilhas disponíveis no arquivo R189
-                r189_excel = pd.ExcelFile(r189_io)
-                r189_sheets = r189_excel.sheet_names
-                logger.info(f"Planilhas disponíveis em R189_consolidado.xlsx: {r189_sheets}")
+                    # Listar todas as planilhas disponíveis no arquivo R189
+                    r189_excel = pd.ExcelFile(r189_io)
+                    r189_sheets = r189_excel.sheet_names
+                    logger.info(f"Planilhas disponíveis em R189_consolidado.xlsx: {r189_sheets}")
                 
-                # Usar a primeira planilha disponível no R189
-                if len(r189_sheets) > 0:
-                    r189_sheet_name = r189_sheets[0]
-                    logger.info(f"Usando planilha R189: {r189_sheet_name}")
+                    # Usar a primeira planilha disponível no R189
+                    if len(r189_sheets) > 0:
+                        r189_sheet_name = r189_sheets[0]
+                        logger.info(f"Usando planilha R189: {r189_sheet_name}")
                     
-                    # Reabrir o BytesIO para o R189 pois ele foi consumido pelo ExcelFile
-                    r189_io = BytesIO(r189_content)
+                        # Reabrir o BytesIO para o R189 pois ele foi consumido pelo ExcelFile
+                        r189_io = BytesIO(r189_content)
                     
-                    # Ler os DataFrames
-                    df_qpe = pd.read_excel(qpe_io, sheet_name='QPE_Consolidado')
-                    df_r189 = pd.read_excel(r189_io, sheet_name=r189_sheet_name)
-                else:
-                    logger.error("Nenhuma planilha encontrada no arquivo R189_consolidado.xlsx")
-                    return {
-                        "success": False,
-                        "error": "Nenhuma planilha encontrada no arquivo R189_consolidado.xlsx",
-                        "show_popup": True
-                    }
+                        # Ler os DataFrames
+                        df_qpe = pd.read_excel(qpe_io, sheet_name='QPE_Consolidado')
+                        df_r189 = pd.read_excel(r189_io, sheet_name=r189_sheet_name)
+                    else:
+                        logger.error("Nenhuma planilha encontrada no arquivo R189_consolidado.xlsx")
+                        return {
+                            "success": False,
+                            "error": "Nenhuma planilha encontrada no arquivo R189_consolidado.xlsx",
+                            "show_popup": True
+                        }
                 
-                logger.info(f"Linhas em QPE: {len(df_qpe)}")
-                logger.info(f"Linhas em R189: {len(df_r189)}")
+                    logger.info(f"Linhas em QPE: {len(df_qpe)}")
+                    logger.info(f"Linhas em R189: {len(df_r189)}")
+                    span.set_attributes({"rows_qpe": len(df_qpe), "rows_r189": len(df_r189)})
             except Exception as e:
                 logger.error(f"Erro ao ler arquivos Excel: {str(e)}")
                 return {
@@ -400,100 +507,10 @@ class DivergenceReportQPER189:
                     "show_popup": True
                 }
             
-            if df_qpe.empty:
-                logger.error("Arquivo QPE_consolidado.xlsx está vazio")
-                return {
-                    "success": False,
-                    "error": "Erro: Arquivo QPE_consolidado.xlsx está vazio",
-                    "show_popup": True
-                }
-                
-            if df_r189.empty:
-                logger.error("Arquivo R189_consolidado.xlsx está vazio")
-                return {
-                    "success": False,
-                    "error": "Erro: Arquivo R189_consolidado.xlsx está vazio",
-                    "show_popup": True
-                }
-            
-            # Verifica divergências
-            logger.info("Verificando divergências")
-            success, message, divergences_df = await self.check_divergences(df_qpe, df_r189)
-            
-            if not success:
-                logger.error(f"Erro na verificação: {message}")
-                return {
-                    "success": False,
-                    "error": message,
-                    "show_popup": True
-                }
-            
-            # Se encontrou divergências, gera o relatório Excel
-            if not divergences_df.empty:
-                logger.info(f"Gerando relatório Excel com {len(divergences_df)} divergências")
-                report_result = await self.generate_excel_report(divergences_df)
-                
-                if not report_result.get("success", False):
-                    error_msg = report_result.get("error", "Erro desconhecido ao gerar relatório")
-                    logger.error(f"Erro ao gerar relatório: {error_msg}")
-                    return {
-                        "success": False,
-                        "error": error_msg,
-                        "show_popup": True
-                    }
-                
-                # Nome do arquivo de relatório
-                report_filename = report_result.get("filename")
-                if not report_filename:
-                    logger.error("Nome do arquivo de relatório não encontrado no resultado")
-                    return {
-                        "success": False,
-                        "error": "Nome do arquivo de relatório não encontrado",
-                        "show_popup": True
-                    }
-                
-                file_content = report_result.get("file_content")
-                if not file_content:
-                    logger.error("Conteúdo do arquivo de relatório não encontrado no resultado")
-                    return {
-                        "success": False,
-                        "error": "Conteúdo do arquivo de relatório não encontrado",
-                        "show_popup": True
-                    }
-                
-                # Envia o relatório para o SharePoint
-                logger.info(f"Enviando relatório {report_filename} para o SharePoint")
-                relatorios_path = "/teams/BR-TI-TIN/AutomaoFinanas/RELATÓRIOS/QPE_R189"
-                
-                # Usar o método assíncrono do SharePointAuth
-                upload_success = await self.sharepoint_auth.enviar_arquivo_sharepoint(
-                    conteudo=file_content.getvalue(),
-                    nome_arquivo=report_filename,
-                    pasta=relatorios_path
-                )
-                
-                if not upload_success:
-                    logger.error("Erro ao enviar relatório para o SharePoint")
-                    return {
-                        "success": False,
-                        "error": "Erro ao enviar relatório para o SharePoint",
-                        "show_popup": True
-                    }
-                
-                logger.info("Relatório enviado com sucesso")
-                return {
-                    "success": True,
-                    "message": f"Relatório de divergências gerado e salvo com sucesso!\n\nResumo das divergências encontradas:\n{message}\n\nO arquivo foi salvo na pasta RELATÓRIOS/QPE_R189 no SharePoint.",
-                    "show_popup": True
-                }
-            
-            logger.info("Nenhuma divergência encontrada, não é necessário gerar relatório")
-            return {
-                "success": True,
-                "message": message,
-                "show_popup": True
-            }
-            
+            resultado = await self.generate_report_from_data(df_qpe, df_r189)
+            resultado.pop("report_df", None)
+            return resultado
+
         except Exception as e:
             logger.exception(f"Erro inesperado ao gerar relatório: {str(e)}")
             return {
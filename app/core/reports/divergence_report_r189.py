@@ -1,10 +1,14 @@
-from typing import Dict, Any, Tuple, List
+from typing import Dict, Any, Tuple, List, Optional
 import pandas as pd
 from io import BytesIO
 from datetime import datetime
 import logging
 from app.core.auth import SharePointAuth
-from app.core.sharepoint import SharePointClient
+from app.core.master_data import get_master_data
+from app.core.metrics import pipeline, stage, track_stage
+from app.core.tracing import set_span_attributes
+from app.core.reports.report_registry import get_report_registry
+from app.core.reports.report_writer import conteudo_arquivo, export_report, write_xlsx
 import aiohttp
 import traceback
 
@@ -16,33 +20,21 @@ class DivergenceReportR189:
     Classe responsável por verificar divergências no arquivo R189.
     """
     
-    def __init__(self):
-        self.sharepoint_auth = SharePointAuth()
-        self.sharepoint_client = SharePointClient()
-        
-        # Mapeamento de CNPJ para Site Name esperado
-        self.cnpj_site_mapping = {
-            "60.621.141/0005-87": ["PMAR_BRCSA"],
-            "07.175.725/0030-02": ["WEL_BRGCV"],
-            "60.621.141/0006-68": ["PMAR_BRMUA"],
-            "07.175.725/0010-50": ["WEL_BRJGS"],
-            "10.885.321/0001-74": ["WLI_BRLNH"],
-            "84.584.994/0007-16": ["WTB_BRSZO"],
-            "07.175.725/0042-38": ["WEL_BRBTI"],
-            "14.759.173/0001-00": ["WCES_BRMTT"],
-            "14.759.173/0002-83": ["WCES_BRBGV"],
-            "07.175.725/0024-56": ["WEL_BRRPO"],
-            "07.175.725/0014-84": ["WEL_BRBNU"],
-            "13.772.125/0007-77": ["RF_BRCOR"],
-            "07.175.725/0004-02": ["WEL_BRITJ"],
-            "60.621.141/0004-04": ["PMAR_BRGRM"],
-            "07.175.725/0021-03": ["WEL_BRSBC"],
-            "07.175.725/0026-18": ["WEL_BRSPO"]
-        }
+    def __init__(self, sharepoint_auth: Optional[SharePointAuth] = None, export_format: Optional[str] = None):
+        # Uma instância compartilhada evita recarregar o .env e as credenciais a cada relatório
+        self.sharepoint_auth = sharepoint_auth or SharePointAuth()
+        # Formato adicional (csv.gz ou parquet) enviado junto com o .xlsx
+        self.export_format = export_format
         
         # Lista de possíveis nomes para a coluna de total
         self.colunas_total = ['Total Geral', 'Grand Total', 'Total Gera']
 
+    @property
+    def cnpj_site_mapping(self) -> Dict[str, Tuple[str, ...]]:
+        """Mapeamento de CNPJ para os Site Names esperados (dados mestres, ver app/core/master_data.json)."""
+        return get_master_data().cnpj_sites
+
+    @stage("reconcile")
     async def check_divergences(self, consolidated_data: pd.DataFrame) -> tuple[bool, str, pd.DataFrame]:
         """
         Verifica divergências entre os dados consolidados e o mapeamento esperado.
@@ -115,6 +107,9 @@ class DivergenceReportR189:
                     f"{coluna_total_encontrada}: {null_total} valores nulos"
                 ), pd.DataFrame()
             
+            # Mapeamento da versão atual dos dados mestres, lido uma vez por verificação
+            cnpj_site_mapping = self.cnpj_site_mapping
+
             # Itera sobre cada linha do DataFrame
             logger.info("Iniciando verificação linha a linha")
             for idx, row in consolidated_data.iterrows():
@@ -150,16 +145,16 @@ class DivergenceReportR189:
                     continue
                 
                 # Verifica se o CNPJ existe no mapeamento
-                if cnpj in self.cnpj_site_mapping:
+                if cnpj in cnpj_site_mapping:
                     # Verifica se o Site Name está correto
-                    if site_name not in self.cnpj_site_mapping[cnpj]:
-                        logger.warning(f"Site Name incorreto para CNPJ: {cnpj}, Encontrado: {site_name}, Esperado: {self.cnpj_site_mapping[cnpj]}")
+                    if site_name not in cnpj_site_mapping[cnpj]:
+                        logger.warning(f"Site Name incorreto para CNPJ: {cnpj}, Encontrado: {site_name}, Esperado: {cnpj_site_mapping[cnpj]}")
                         divergences.append({
                             'Tipo': 'Site Name incorreto',
                             'Invoice Number': invoice,
                             'CNPJ': cnpj,
                             'Site Name Encontrado': site_name,
-                            'Site Name Esperado': ', '.join(self.cnpj_site_mapping[cnpj]),
+                            'Site Name Esperado': ', '.join(cnpj_site_mapping[cnpj]),
                             'Total Geral': valor
                         })
                 else:
@@ -224,20 +219,8 @@ class DivergenceReportR189:
             try:
                 logger.info("Criando arquivo Excel na memória")
                 # Cria o arquivo Excel na memória
-                excel_file = BytesIO()
-                with pd.ExcelWriter(excel_file, engine='xlsxwriter') as writer:
-                    divergences_df.to_excel(writer, index=False, sheet_name='Divergencias_R189')
-                    
-                    # Ajusta a largura das colunas
-                    worksheet = writer.sheets['Divergencias_R189']
-                    for i, col in enumerate(divergences_df.columns):
-                        max_length = max(
-                            divergences_df[col].astype(str).apply(len).max(),
-                            len(str(col))
-                        )
-                        worksheet.set_column(i, i, max_length + 2)
-                
-                excel_file.seek(0)
+                with track_stage("write_xlsx", rows=len(divergences_df)):
+                    excel_file = write_xlsx({'Divergencias_R189': divergences_df})
                 logger.info("Arquivo Excel criado com sucesso")
                 
                 # Nome do arquivo com timestamp no início
@@ -257,6 +240,82 @@ class DivergenceReportR189:
             logger.exception(f"Erro inesperado ao gerar relatório Excel: {str(e)}")
             return {"success": False, "error": f"Erro inesperado ao gerar relatório Excel: {str(e)}"}
 
+    async def generate_report_from_data(self, df: pd.DataFrame) -> Dict[str, Any]:
+        """
+        Verifica as divergências a partir dos dados R189 já carregado e envia o relatório
+        ao SharePoint. Em caso de sucesso, o resultado inclui o DataFrame do relatório em "report_df".
+        """
+        # Verifica divergências
+        success, message, divergences_df = await self.check_divergences(df)
+        set_span_attributes(divergences=len(divergences_df))
+        
+        if not success:
+            logger.error(f"Erro na verificação: {message}")
+            return {
+                "success": False,
+                "error": message,
+                "show_popup": True
+            }
+        
+        # Se encontrou divergências, gera o relatório Excel
+        if not divergences_df.empty:
+            logger.info(f"Gerando relatório Excel com {len(divergences_df)} divergências")
+            
+            # Adiciona data e hora ao DataFrame
+            now = datetime.now()
+            divergences_df['Data Verificação'] = now.strftime('%Y-%m-%d')
+            divergences_df['Hora Verificação'] = now.strftime('%H:%M:%S')
+            
+            # Cria o arquivo Excel na memória
+            with track_stage("write_xlsx", rows=len(divergences_df)):
+                output = write_xlsx({'Divergencias_R189': divergences_df})
+            
+            # Nome do arquivo com timestamp
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            report_filename = f'report_divergencias_r189_{timestamp}.xlsx'
+            
+            # Envia o relatório para o SharePoint
+            logger.info(f"Enviando relatório {report_filename} para o SharePoint")
+            relatorios_path = "/teams/BR-TI-TIN/AutomaoFinanas/RELATÓRIOS/R189"
+            
+            # Usar o método assíncrono do SharePointAuth
+            upload_success = await self.sharepoint_auth.enviar_arquivo_sharepoint(
+                conteudo=conteudo_arquivo(output),
+                nome_arquivo=report_filename,
+                pasta=relatorios_path
+            )
+            
+            if not upload_success:
+                logger.error("Erro ao enviar relatório para o SharePoint")
+                return {
+                    "success": False,
+                    "error": "Erro ao enviar relatório para o SharePoint",
+                    "show_popup": True
+                }
+            
+            logger.info("Relatório enviado com sucesso")
+            if self.export_format:
+                exportacao = await export_report(self.sharepoint_auth, divergences_df, report_filename,
+                                                 relatorios_path, self.export_format)
+                if not exportacao["success"]:
+                    return {"success": False, "error": exportacao["error"], "show_popup": True}
+            get_report_registry().register("Divergencias_R189", report_filename, divergences_df)
+            return {
+                "success": True,
+                "report_df": divergences_df,
+                "message": f"Relatório de divergências gerado e salvo com sucesso!\n\nResumo das divergências encontradas:\n{message}\n\nO arquivo foi salvo na pasta RELATÓRIOS/R189 no SharePoint.",
+                "show_popup": True
+            }
+        
+        logger.info("Nenhuma divergência encontrada, não é necessário gerar relatório")
+        return {
+            "success": True,
+            "report_df": divergences_df,
+            "message": "Validação concluída. Nenhuma divergência encontrada.",
+            "show_popup": True
+        }
+
+    @pipeline("report_r189")
     async def generate_report(self):
         """
         Gera o relatório de divergências a partir do arquivo consolidado.
@@ -285,9 +344,11 @@ class DivergenceReportR189:
             # Lê o arquivo em DataFrame
             logger.info("Lendo arquivo Excel")
             try:
-                r189_io = BytesIO(r189_content)
-                df = pd.read_excel(r189_io, sheet_name='Consolidado_R189')
-                logger.info(f"Arquivo lido com {len(df)} linhas")
+                with track_stage("parse", file_name="R189_consolidado.xlsx") as span:
+                    r189_io = BytesIO(r189_content)
+                    df = pd.read_excel(r189_io, sheet_name='Consolidado_R189')
+                    logger.info(f"Arquivo lido com {len(df)} linhas")
+                    span.set_attribute("rows", len(df))
             except Exception as e:
                 logger.error(f"Erro ao ler arquivo Excel: {str(e)}")
                 return {
@@ -296,80 +357,10 @@ class DivergenceReportR189:
                     "show_popup": True
                 }
             
-            # Verifica divergências
-            success, message, divergences_df = await self.check_divergences(df)
-            
-            if not success:
-                logger.error(f"Erro na verificação: {message}")
-                return {
-                    "success": False,
-                    "error": message,
-                    "show_popup": True
-                }
-            
-            # Se encontrou divergências, gera o relatório Excel
-            if not divergences_df.empty:
-                logger.info(f"Gerando relatório Excel com {len(divergences_df)} divergências")
-                
-                # Adiciona data e hora ao DataFrame
-                now = datetime.now()
-                divergences_df['Data Verificação'] = now.strftime('%Y-%m-%d')
-                divergences_df['Hora Verificação'] = now.strftime('%H:%M:%S')
-                
-                # Cria o arquivo Excel na memória
-                output = BytesIO()
-                with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                    divergences_df.to_excel(writer, index=False, sheet_name='Divergencias_R189')
-                    
-                    # Ajusta a largura das colunas
-                    workbook = writer.book
-                    worksheet = writer.sheets['Divergencias_R189']
-                    for i, col in enumerate(divergences_df.columns):
-                        max_length = max(
-                            divergences_df[col].astype(str).apply(len).max(),
-                            len(str(col))
-                        )
-                        worksheet.set_column(i, i, max_length + 2)
-                
-                output.seek(0)
-                
-                # Nome do arquivo com timestamp
-                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                report_filename = f'report_divergencias_r189_{timestamp}.xlsx'
-                
-                # Envia o relatório para o SharePoint
-                logger.info(f"Enviando relatório {report_filename} para o SharePoint")
-                relatorios_path = "/teams/BR-TI-TIN/AutomaoFinanas/RELATÓRIOS/R189"
-                
-                # Usar o método assíncrono do SharePointAuth
-                upload_success = await self.sharepoint_auth.enviar_arquivo_sharepoint(
-                    conteudo=output.getvalue(),
-                    nome_arquivo=report_filename,
-                    pasta=relatorios_path
-                )
-                
-                if not upload_success:
-                    logger.error("Erro ao enviar relatório para o SharePoint")
-                    return {
-                        "success": False,
-                        "error": "Erro ao enviar relatório para o SharePoint",
-                        "show_popup": True
-                    }
-                
-                logger.info("Relatório enviado com sucesso")
-                return {
-                    "success": True,
-                    "message": f"Relatório de divergências gerado e salvo com sucesso!\n\nResumo das divergências encontradas:\n{message}\n\nO arquivo foi salvo na pasta RELATÓRIOS/R189 no SharePoint.",
-                    "show_popup": True
-                }
-            
-            logger.info("Nenhuma divergência encontrada, não é necessário gerar relatório")
-            return {
-                "success": True,
-                "message": "Validação concluída. Nenhuma divergência encontrada.",
-                "show_popup": True
-            }
-            
+            resultado = await self.generate_report_from_data(df)
+            resultado.pop("report_df", None)
+            return resultado
+
         except Exception as e:
             logger.error(f"Erro inesperado ao gerar relatório: {str(e)}")
             logger.error(traceback.format_exc())
@@ -1,11 +1,15 @@
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Tuple, Optional
 import pandas as pd
 from datetime import datetime
 from io import BytesIO
 import logging
 import traceback
 from app.core.auth import SharePointAuth
-from app.core.sharepoint import SharePointClient
+from app.core.metrics import pipeline, stage, track_stage
+from app.core.tracing import set_span_attributes
+from app.core.money import divergencias_centavos, from_cents, to_cents
+from app.core.reports.report_registry import get_report_registry
+from app.core.reports.report_writer import conteudo_arquivo, export_report, write_xlsx
 
 logger = logging.getLogger(__name__)
 
@@ -14,12 +18,68 @@ class DivergenceReportSPBR189:
     Classe responsável por verificar divergências entre os arquivos consolidados SPB e R189.
     """
     
-    def __init__(self):
-        self.sharepoint_auth = SharePointAuth()
-        self.sharepoint_client = SharePointClient()
+    def __init__(self, sharepoint_auth: Optional[SharePointAuth] = None, export_format: Optional[str] = None):
+        # Uma instância compartilhada evita recarregar o .env e as credenciais a cada relatório
+        self.sharepoint_auth = sharepoint_auth or SharePointAuth()
+        # Formato adicional (csv.gz ou parquet) enviado junto com o .xlsx
+        self.export_format = export_format
         # Lista de possíveis nomes para a coluna de total
         self.colunas_total = ['Total Geral', 'Grand Total', 'Total Gera', 'Total', 'Valor Total']
 
+    @staticmethod
+    def _divergencias_em_ambos(spb_data: pd.DataFrame, nfserv_data: pd.DataFrame, r189_data: pd.DataFrame,
+                               coluna_total: str, centavos_spb: pd.Series, centavos_nfserv: pd.Series,
+                               centavos_r189: pd.Series, ids_em_ambos: set) -> List[Dict[str, Any]]:
+        """
+        Divergências de CNPJ e de valor dos IDs presentes no R189 e nos consolidados. A linha
+        de origem é a primeira do SPB_consolidado com o ID ou, se não houver, a primeira do
+        NFSERV; ela é unida à primeira nota do R189 por um merge pelo ID, e os valores em
+        centavos são comparados com divergencias_centavos (tolerância de 1 centavo).
+        """
+        def primeiras(ids: pd.Series, cnpjs: pd.Series, valores: pd.Series, centavos: pd.Series,
+                      origem: Optional[str] = None) -> pd.DataFrame:
+            linhas = pd.DataFrame({'id': ids, 'cnpj': cnpjs, 'valor': valores, 'centavos': centavos})
+            if origem is not None:
+                linhas['origem'] = origem
+            return linhas.dropna(subset=['id']).drop_duplicates('id')
+
+        fontes = pd.concat([
+            primeiras(spb_data['SPB_ID'], spb_data['CNPJ'], spb_data['VALOR_TOTAL'], centavos_spb, "SPB"),
+            primeiras(nfserv_data['NFSERV_ID'], nfserv_data['CNPJ'], nfserv_data['VALOR_TOTAL'], centavos_nfserv, "NFSERV"),
+        ], ignore_index=True).drop_duplicates('id')
+        r189 = primeiras(r189_data['Invoice number'], r189_data['CNPJ - WEG'], r189_data[coluna_total], centavos_r189)
+
+        merged = fontes[fontes['id'].isin(ids_em_ambos)].merge(r189, on='id', how='inner', suffixes=('', '_r189'))
+        cnpj_divergente = merged['cnpj'].ne(merged['cnpj_r189']).to_numpy()
+        valor_divergente = divergencias_centavos(merged['centavos'], merged['centavos_r189']).to_numpy()
+
+        divergencias: List[Dict[str, Any]] = []
+        for pos in (cnpj_divergente | valor_divergente).nonzero()[0]:
+            nota = merged.iloc[pos]
+            if cnpj_divergente[pos]:
+                logger.warning(f"CNPJ divergente para {nota['id']}: {nota['origem']}={nota['cnpj']}, R189={nota['cnpj_r189']}")
+                divergencias.append({
+                    'Tipo': 'CNPJ divergente',
+                    'SPB_ID': nota['id'],
+                    'CNPJ SPB': nota['cnpj'],
+                    'CNPJ R189': nota['cnpj_r189'],
+                    'Valor SPB': nota['valor'],
+                    'Valor R189': nota['valor_r189']
+                })
+            if valor_divergente[pos]:
+                logger.warning(f"Valor divergente para {nota['id']}: {nota['origem']}={round(float(nota['valor']), 2)}, "
+                               f"R189={round(float(nota['valor_r189']), 2)}")
+                divergencias.append({
+                    'Tipo': 'Valor divergente',
+                    'SPB_ID': nota['id'],
+                    'CNPJ SPB': nota['cnpj'],
+                    'CNPJ R189': nota['cnpj_r189'],
+                    'Valor SPB': nota['valor'],
+                    'Valor R189': nota['valor_r189']
+                })
+        return divergencias
+
+    @stage("reconcile")
     async def check_divergences(self, spb_data: pd.DataFrame, r189_data: pd.DataFrame, nfserv_data: pd.DataFrame) -> Tuple[bool, str, pd.DataFrame]:
         """
         Verifica divergências entre os dados consolidados do SPB e R189.
@@ -67,10 +127,14 @@ class DivergenceReportSPBR189:
             
             # Validação de tipos de dados
             try:
-                logger.info("Convertendo colunas de valor para numérico")
-                spb_data['VALOR_TOTAL'] = pd.to_numeric(spb_data['VALOR_TOTAL'].astype(str).str.replace(',', '.'), errors='coerce')
-                nfserv_data['VALOR_TOTAL'] = pd.to_numeric(nfserv_data['VALOR_TOTAL'].astype(str).str.replace(',', '.'), errors='coerce')
-                r189_data[coluna_total_encontrada] = pd.to_numeric(r189_data[coluna_total_encontrada].astype(str).str.replace(',', '.'), errors='coerce')
+                logger.info("Convertendo colunas de valor para centavos")
+                # Os valores são comparados em centavos (int64); as colunas ficam em reais para o relatório
+                centavos_spb = to_cents(spb_data['VALOR_TOTAL'])
+                centavos_nfserv = to_cents(nfserv_data['VALOR_TOTAL'])
+                centavos_r189 = to_cents(r189_data[coluna_total_encontrada])
+                spb_data['VALOR_TOTAL'] = from_cents(centavos_spb)
+                nfserv_data['VALOR_TOTAL'] = from_cents(centavos_nfserv)
+                r189_data[coluna_total_encontrada] = from_cents(centavos_r189)
             except Exception as e:
                 logger.error(f"Erro ao converter valores: {str(e)}")
                 return False, f"Erro: Valores inválidos nas colunas de valor: {str(e)}", pd.DataFrame()
@@ -156,53 +220,10 @@ class DivergenceReportSPBR189:
             ids_em_ambos = r189_spb_ids.intersection(todos_spb_ids)
             logger.info(f"IDs presentes em ambos os sistemas: {len(ids_em_ambos)}")
             
-            for spb_id in ids_em_ambos:
-                r189_rows = r189_data[r189_data['Invoice number'] == spb_id]
-                if r189_rows.empty:
-                    logger.warning(f"ID {spb_id} não encontrado no R189 (inconsistência)")
-                    continue
-                
-                r189_row = r189_rows.iloc[0]
-                
-                # Procura primeiro no SPB_consolidado
-                spb_row = spb_data[spb_data['SPB_ID'] == spb_id]
-                if not spb_row.empty:
-                    row = spb_row.iloc[0]
-                    origem = "SPB"
-                else:
-                    # Se não encontrou, procura no NFSERV
-                    nfserv_row = nfserv_data[nfserv_data['NFSERV_ID'] == spb_id]
-                    if nfserv_row.empty:
-                        logger.warning(f"ID {spb_id} não encontrado nem no SPB nem no NFSERV (inconsistência)")
-                        continue
-                    row = nfserv_row.iloc[0]
-                    origem = "NFSERV"
-                
-                # Verifica CNPJ
-                if row['CNPJ'] != r189_row['CNPJ - WEG']:
-                    logger.warning(f"CNPJ divergente para {spb_id}: {origem}={row['CNPJ']}, R189={r189_row['CNPJ - WEG']}")
-                    divergences.append({
-                        'Tipo': 'CNPJ divergente',
-                        'SPB_ID': spb_id,
-                        'CNPJ SPB': row['CNPJ'],
-                        'CNPJ R189': r189_row['CNPJ - WEG'],
-                        'Valor SPB': row['VALOR_TOTAL'],
-                        'Valor R189': r189_row[coluna_total_encontrada]
-                    })
-                
-                # Verifica valor
-                valor_spb = round(float(row['VALOR_TOTAL']), 2)
-                valor_r189 = round(float(r189_row[coluna_total_encontrada]), 2)
-                if abs(valor_spb - valor_r189) > 0.01:  # Tolerância de 1 centavo
-                    logger.warning(f"Valor divergente para {spb_id}: {origem}={valor_spb}, R189={valor_r189}")
-                    divergences.append({
-                        'Tipo': 'Valor divergente',
-                        'SPB_ID': spb_id,
-                        'CNPJ SPB': row['CNPJ'],
-                        'CNPJ R189': r189_row['CNPJ - WEG'],
-                        'Valor SPB': row['VALOR_TOTAL'],
-                        'Valor R189': r189_row[coluna_total_encontrada]
-                    })
+            divergences.extend(self._divergencias_em_ambos(
+                spb_data, nfserv_data, r189_data, coluna_total_encontrada,
+                centavos_spb, centavos_nfserv, centavos_r189, ids_em_ambos
+            ))
             
             if divergences:
                 df_divergences = pd.DataFrame(divergences)
@@ -252,21 +273,8 @@ class DivergenceReportSPBR189:
             try:
                 logger.info("Criando arquivo Excel na memória")
                 # Cria o arquivo Excel na memória
-                output = BytesIO()
-                with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                    divergences_df.to_excel(writer, index=False, sheet_name='Divergencias_SPB_R189')
-                    
-                    # Ajusta a largura das colunas
-                    workbook = writer.book
-                    worksheet = writer.sheets['Divergencias_SPB_R189']
-                    for i, col in enumerate(divergences_df.columns):
-                        max_length = max(
-                            divergences_df[col].astype(str).apply(len).max(),
-                            len(str(col))
-                        )
-                        worksheet.set_column(i, i, max_length + 2)
-                
-                output.seek(0)
+                with track_stage("write_xlsx", rows=len(divergences_df)):
+                    output = write_xlsx({'Divergencias_SPB_R189': divergences_df})
                 logger.info("Arquivo Excel criado com sucesso")
                 
                 # Nome do arquivo com timestamp
@@ -286,6 +294,123 @@ class DivergenceReportSPBR189:
             logger.exception(f"Erro inesperado ao gerar relatório Excel: {str(e)}")
             return {"success": False, "error": f"Erro inesperado ao gerar relatório Excel: {str(e)}"}
 
+    async def generate_report_from_data(self, df_spb: pd.DataFrame, df_r189: pd.DataFrame, df_nfserv: pd.DataFrame) -> Dict[str, Any]:
+        """
+        Verifica as divergências a partir dos dados SPB, R189 e NFSERV já carregados e envia o relatório
+        ao SharePoint. Em caso de sucesso, o resultado inclui o DataFrame do relatório em "report_df".
+        """
+        if df_spb.empty:
+            logger.error("Arquivo SPB_consolidado.xlsx está vazio")
+            return {
+                "success": False,
+                "error": "Erro: Arquivo SPB_consolidado.xlsx está vazio",
+                "show_popup": True
+            }
+            
+        if df_r189.empty:
+            logger.error("Arquivo R189_consolidado.xlsx está vazio")
+            return {
+                "success": False,
+                "error": "Erro: Arquivo R189_consolidado.xlsx está vazio",
+                "show_popup": True
+            }
+            
+        if df_nfserv.empty:
+            logger.error("Arquivo NFSERV_consolidado.xlsx está vazio")
+            return {
+                "success": False,
+                "error": "Erro: Arquivo NFSERV_consolidado.xlsx está vazio",
+                "show_popup": True
+            }
+        
+        # Verifica divergências
+        logger.info("Verificando divergências")
+        success, message, divergences_df = await self.check_divergences(df_spb, df_r189, df_nfserv)
+        set_span_attributes(divergences=len(divergences_df))
+        
+        if not success:
+            logger.error(f"Erro na verificação: {message}")
+            return {
+                "success": False,
+                "error": message,
+                "show_popup": True
+            }
+        
+        # Se encontrou divergências, gera o relatório Excel
+        if not divergences_df.empty:
+            logger.info(f"Gerando relatório Excel com {len(divergences_df)} divergências")
+            report_result = await self.generate_excel_report(divergences_df)
+            
+            if not report_result.get("success", False):
+                error_msg = report_result.get("error", "Erro desconhecido ao gerar relatório")
+                logger.error(f"Erro ao gerar relatório: {error_msg}")
+                return {
+                    "success": False,
+                    "error": error_msg,
+                    "show_popup": True
+                }
+            
+            # Nome do arquivo de relatório
+            report_filename = report_result.get("filename")
+            if not report_filename:
+                logger.error("Nome do arquivo de relatório não encontrado no resultado")
+                return {
+                    "success": False,
+                    "error": "Nome do arquivo de relatório não encontrado",
+                    "show_popup": True
+                }
+            
+            file_content = report_result.get("file_content")
+            if not file_content:
+                logger.error("Conteúdo do arquivo de relatório não encontrado no resultado")
+                return {
+                    "success": False,
+                    "error": "Conteúdo do arquivo de relatório não encontrado",
+                    "show_popup": True
+                }
+            
+            # Envia o relatório para o SharePoint
+            logger.info(f"Enviando relatório {report_filename} para o SharePoint")
+            relatorios_path = "/teams/BR-TI-TIN/AutomaoFinanas/RELATÓRIOS/SPO_R189"
+            
+            # Usar o método assíncrono do SharePointAuth
+            upload_success = await self.sharepoint_auth.enviar_arquivo_sharepoint(
+                conteudo=conteudo_arquivo(file_content),
+                nome_arquivo=report_filename,
+                pasta=relatorios_path
+            )
+            
+            if not upload_success:
+                logger.error("Erro ao enviar relatório para o SharePoint")
+                return {
+                    "success": False,
+                    "error": "Erro ao enviar relatório para o SharePoint",
+                    "show_popup": True
+                }
+            
+            logger.info("Relatório enviado com sucesso")
+            if self.export_format:
+                exportacao = await export_report(self.sharepoint_auth, divergences_df, report_filename,
+                                                 relatorios_path, self.export_format)
+                if not exportacao["success"]:
+                    return {"success": False, "error": exportacao["error"], "show_popup": True}
+            get_report_registry().register("SPB_vs_R189", report_filename, divergences_df)
+            return {
+                "success": True,
+                "report_df": divergences_df,
+                "message": f"Relatório de divergências gerado e salvo com sucesso!\n\nResumo das divergências encontradas:\n{message}\n\nO arquivo foi salvo na pasta RELATÓRIOS/SPO_R189 no SharePoint.",
+                "show_popup": True
+            }
+        
+        logger.info("Nenhuma divergência encontrada, não é necessário gerar relatório")
+        return {
+            "success": True,
+            "report_df": divergences_df,
+            "message": message,
+            "show_popup": True
+        }
+
+    @pipeline("report_spb_r189")
     async def generate_report(self):
         """
         Gera o relatório de divergências comparando SPB e R189.
@@ -345,47 +470,49 @@ class DivergenceReportSPBR189:
             # Lê os arquivos em DataFrames
             logger.info("Lendo arquivos Excel")
             try:
-                spb_io = BytesIO(spb_content)
-                r189_io = BytesIO(r189_content)
-                nfserv_io = BytesIO(nfserv_content)
+                with track_stage("parse") as span:
+                    spb_io = BytesIO(spb_content)
+                    r189_io = BytesIO(r189_content)
+                    nfserv_io = BytesIO(nfserv_content)
                 
-                # Listar todas as planilhas disponíveis nos arquivos
-                spb_excel = pd.ExcelFile(spb_io)
-                spb_sheets = spb_excel.sheet_names
-                logger.info(f"Planilhas disponíveis em SPB_consolidado.xlsx: {spb_sheets}")
+                    # Listar todas as planilhas disponíveis nos arquivos
+                    spb_excel = pd.ExcelFile(spb_io)
+                    spb_sheets = spb_excel.sheet_names
+                    logger.info(f"Planilhas disponíveis em SPB_consolidado.xlsx: {spb_sheets}")
                 
-                r189_excel = pd.ExcelFile(r189_io)
-                r189_sheets = r189_excel.sheet_names
-                logger.info(f"Planilhas disponíveis em R189_consolidado.xlsx: {r189_sheets}")
+                    r189_excel = pd.ExcelFile(r189_io)
+                    r189_sheets = r189_excel.sheet_names
+                    logger.info(f"Planilhas disponíveis em R189_consolidado.xlsx: {r189_sheets}")
                 
-                nfserv_excel = pd.ExcelFile(nfserv_io)
-                nfserv_sheets = nfserv_excel.sheet_names
-                logger.info(f"Planilhas disponíveis em NFSERV_consolidado.xlsx: {nfserv_sheets}")
+                    nfserv_excel = pd.ExcelFile(nfserv_io)
+                    nfserv_sheets = nfserv_excel.sheet_names
+                    logger.info(f"Planilhas disponíveis em NFSERV_consolidado.xlsx: {nfserv_sheets}")
                 
-                # Reabrir os BytesIO pois foram consumidos pelo ExcelFile
-                spb_io = BytesIO(spb_content)
-                r189_io = BytesIO(r189_content)
-                nfserv_io = BytesIO(nfserv_content)
+                    # Reabrir os BytesIO pois foram consumidos pelo ExcelFile
+                    spb_io = BytesIO(spb_content)
+                    r189_io = BytesIO(r189_content)
+                    nfserv_io = BytesIO(nfserv_content)
                 
-                # Usar o nome correto da planilha 'SPB_Consolidado' em vez de 'Consolidado_SPB'
-                df_spb = pd.read_excel(spb_io, sheet_name='SPB_Consolidado')
+                    # Usar o nome correto da planilha 'SPB_Consolidado' em vez de 'Consolidado_SPB'
+                    df_spb = pd.read_excel(spb_io, sheet_name='SPB_Consolidado')
                 
-                # Usar a primeira planilha disponível para R189 e NFSERV se as específicas não existirem
-                if 'Consolidado_R189' in r189_sheets:
-                    df_r189 = pd.read_excel(r189_io, sheet_name='Consolidado_R189')
-                else:
-                    df_r189 = pd.read_excel(r189_io, sheet_name=r189_sheets[0])
-                    logger.info(f"Usando planilha alternativa para R189: {r189_sheets[0]}")
+                    # Usar a primeira planilha disponível para R189 e NFSERV se as específicas não existirem
+                    if 'Consolidado_R189' in r189_sheets:
+                        df_r189 = pd.read_excel(r189_io, sheet_name='Consolidado_R189')
+                    else:
+                        df_r189 = pd.read_excel(r189_io, sheet_name=r189_sheets[0])
+                        logger.info(f"Usando planilha alternativa para R189: {r189_sheets[0]}")
                 
-                if 'Consolidado_NFSERV' in nfserv_sheets:
-                    df_nfserv = pd.read_excel(nfserv_io, sheet_name='Consolidado_NFSERV')
-                else:
-                    df_nfserv = pd.read_excel(nfserv_io, sheet_name=nfserv_sheets[0])
-                    logger.info(f"Usando planilha alternativa para NFSERV: {nfserv_sheets[0]}")
+                    if 'Consolidado_NFSERV' in nfserv_sheets:
+                        df_nfserv = pd.read_excel(nfserv_io, sheet_name='Consolidado_NFSERV')
+                    else:
+                        df_nfserv = pd.read_excel(nfserv_io, sheet_name=nfserv_sheets[0])
+                        logger.info(f"Usando planilha alternativa para NFSERV: {nfserv_sheets[0]}")
                 
-                logger.info(f"Linhas em SPB: {len(df_spb)}")
-                logger.info(f"Linhas em R189: {len(df_r189)}")
-                logger.info(f"Linhas em NFSERV: {len(df_nfserv)}")
+                    logger.info(f"Linhas em SPB: {len(df_spb)}")
+                    span.set_attributes({"rows_spb": len(df_spb), "rows_r189": len(df_r189), "rows_nfserv": len(df_nfserv)})
+                    logger.info(f"Linhas em R189: {len(df_r189)}")
+                    logger.info(f"Linhas em NFSERV: {len(df_nfserv)}")
             except Exception as e:
                 logger.error(f"Erro ao ler arquivos Excel: {str(e)}")
                 return {
@@ -394,107 +521,9 @@ class DivergenceReportSPBR189:
                     "show_popup": True
                 }
             
-            if df_spb.empty:
-                logger.error("Arquivo SPB_consolidado.xlsx está vazio")
-                return {
-                    "success": False,
-                    "error": "Erro: Arquivo SPB_consolidado.xlsx está vazio",
-                    "show_popup": True
-                }
-                
-            if df_r189.empty:
-                logger.error("Arquivo R189_consolidado.xlsx está vazio")
-                return {
-                    "success": False,
-                    "error": "Erro: Arquivo R189_consolidado.xlsx está vazio",
-                    "show_popup": True
-                }
-                
-            if df_nfserv.empty:
-                logger.error("Arquivo NFSERV_consolidado.xlsx está vazio")
-                return {
-                    "success": False,
-                    "error": "Erro: Arquivo NFSERV_consolidado.xlsx está vazio",
-                    "show_popup": True
-                }
-            
-            # Verifica divergências
-            logger.info("Verificando divergências")
-            success, message, divergences_df = await self.check_divergences(df_spb, df_r189, df_nfserv)
-            
-            if not success:
-                logger.error(f"Erro na verificação: {message}")
-                return {
-                    "success": False,
-                    "error": message,
-                    "show_popup": True
-                }
-            
-            # Se encontrou divergências, gera o relatório Excel
-            if not divergences_df.empty:
-                logger.info(f"Gerando relatório Excel com {len(divergences_df)} divergências")
-                report_result = await self.generate_excel_report(divergences_df)
-                
-                if not report_result.get("success", False):
-                    error_msg = report_result.get("error", "Erro desconhecido ao gerar relatório")
-                    logger.error(f"Erro ao gerar relatório: {error_msg}")
-                    return {
-                        "success": False,
-                        "error": error_msg,
-                        "show_popup": True
-                    }
-                
-                # Nome do arquivo de relatório
-                report_filename = report_result.get("filename")
-                if not report_filename:
-                    logger.error("Nome do arquivo de relatório não encontrado no resultado")
-                    return {
-                        "success": False,
-                        "error": "Nome do arquivo de relatório não encontrado",
-                        "show_popup": True
-                    }
-                
-                file_content = report_result.get("file_content")
-                if not file_content:
-                    logger.error("Conteúdo do arquivo de relatório não encontrado no resultado")
-                    return {
-                        "success": False,
-                        "error": "Conteúdo do arquivo de relatório não encontrado",
-                        "show_popup": True
-                    }
-                
-                # Envia o relatório para o SharePoint
-                logger.info(f"Enviando relatório {report_filename} para o SharePoint")
-                relatorios_path = "/teams/BR-TI-TIN/AutomaoFinanas/RELATÓRIOS/SPO_R189"
-                
-                # Usar o método assíncrono do SharePointAuth
-                upload_success = await self.sharepoint_auth.enviar_arquivo_sharepoint(
-                    conteudo=file_content.getvalue(),
-                    nome_arquivo=report_filename,
-                    pasta=relatorios_path
-                )
-                
-                if not upload_success:
-                    logger.error("Erro ao enviar relatório para o SharePoint")
-                    return {
-                        "success": False,
-                        "error": "Erro ao enviar relatório para o SharePoint",
-                        "show_popup": True
-                    }
-                
-                logger.info("Relatório enviado com sucesso")
-                return {
-                    "success": True,
-                    "message": f"Relatório de divergências gerado e salvo com sucesso!\n\nResumo das divergências encontradas:\n{message}\n\nO arquivo foi salvo na pasta RELATÓRIOS/SPO_R189 no SharePoint.",
-                    "show_popup": True
-                }
-            
-            logger.info("Nenhuma divergência encontrada, não é necessário gerar relatório")
-            return {
-                "success": True,
-                "message": message,
-                "show_popup": True
-            }
+            resultado = await self.generate_report_from_data(df_spb, df_r189, df_nfserv)
+            resultado.pop("report_df", None)
+            return resultado
 
         except Exception as e:
             logger.exception(f"Erro inesperado ao gerar relatório: {str(e)}")
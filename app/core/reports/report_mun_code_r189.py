@@ -1,10 +1,14 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import pandas as pd
 from datetime import datetime
 from io import BytesIO
 import logging
 from app.core.auth import SharePointAuth
-from app.core.sharepoint import SharePointClient
+from app.core.master_data import MasterData, get_master_data
+from app.core.metrics import pipeline, stage, track_stage
+from app.core.tracing import set_span_attributes
+from app.core.reports.report_registry import get_report_registry
+from app.core.reports.report_writer import conteudo_arquivo, export_report, write_xlsx
 
 logger = logging.getLogger(__name__)
 
@@ -13,129 +17,38 @@ class ReportMunCodeR189:
     Classe responsável por verificar divergências entre os arquivos consolidados de códigos municipais e R189.
     """
     
-    def __init__(self):
-        self.sharepoint_auth = SharePointAuth()
-        self.sharepoint_client = SharePointClient()
-        
-        # Mapeamento de serviços para material e tipo
-        self.service_mapping = {
-            "14.02": {"material": "80001098", "type": "Assistência Técnica"},
-            "17.01": {"material": "80001110", "type": "Acessoria ou Consultoria"},
-            "14.01": {"material": "80001097", "type": "LUBRIFICACAO, LIMPEZA"},
-            "1.07": {"material": "80001019", "type": "SUPORTE TECNICO EM INFORMATICA"},
-            "3115": {"material": "80001110", "type": "Assessoria E Consultoria"},
-            3115: {"material": "80001110", "type": "Assessoria E Consultoria"},  # Adicionando como inteiro
-            "3115.0": {"material": "80001110", "type": "Assessoria E Consultoria"},  # Adicionando como string de float
-            "1880": {"material": "80001098", "type": "Assistência Técnica - Instalação"},
-            "1.03": {"material": "80001680", "type": "Processamento e Armazenamento"}
-        }
-        
-        self.service_cnpj_mapping = {
-            "14.02 - Assistência Técnica": {
-                "14.759.173/0002-83", "07.175.725/0042-38", "07.175.725/0014-84",
-                "60.621.141/0005-87", "13.772.125/0007-77", "07.175.725/0030-02",
-                "60.621.141/0004-04", "07.175.725/0004-02", "07.175.725/0010-50",
-                "10.885.321/0001-74", "60.621.141/0006-68", "14.759.173/0001-00",
-                "07.175.725/0024-56", "07.175.725/0021-03", "07.175.725/0026-18",
-                "84.584.994/0007-16"
-            },
-            "17.01 - Acessoria ou Consultoria": {
-                "14.759.173/0002-83", "07.175.725/0042-38", "07.175.725/0014-84",
-                "60.621.141/0005-87", "13.772.125/0007-77", "07.175.725/0030-02",
-                "60.621.141/0004-04", "07.175.725/0004-02", "07.175.725/0010-50",
-                "10.885.321/0001-74", "60.621.141/0006-68", "14.759.173/0001-00",
-                "07.175.725/0024-56", "07.175.725/0021-03", "07.175.725/0026-18",
-                "84.584.994/0007-16"
-            },
-            "14.01 - LUBRIFICACAO, LIMPEZA": {
-                "14.759.173/0002-83", "07.175.725/0042-38", "07.175.725/0014-84",
-                "60.621.141/0005-87", "13.772.125/0007-77", "07.175.725/0030-02",
-                "60.621.141/0004-04", "07.175.725/0004-02", "07.175.725/0010-50",
-                "10.885.321/0001-74", "60.621.141/0006-68", "14.759.173/0001-00",
-                "07.175.725/0024-56", "07.175.725/0021-03", "07.175.725/0026-18",
-                "84.584.994/0007-16"
-            },
-            "1.07 - SUPORTE TECNICO EM INFORMATICA": {
-                "14.759.173/0002-83", "07.175.725/0042-38", "07.175.725/0014-84",
-                "60.621.141/0005-87", "13.772.125/0007-77", "07.175.725/0030-02",
-                "60.621.141/0004-04", "07.175.725/0004-02", "07.175.725/0010-50",
-                "10.885.321/0001-74", "60.621.141/0006-68", "14.759.173/0001-00",
-                "07.175.725/0024-56", "07.175.725/0021-03", "07.175.725/0026-18",
-                "84.584.994/0007-16"
-            },
-            "3115 - Assessoria E Consultoria": {
-                "14.759.173/0002-83", "07.175.725/0042-38", "07.175.725/0014-84",
-                "60.621.141/0005-87", "13.772.125/0007-77", "07.175.725/0030-02",
-                "60.621.141/0004-04", "07.175.725/0004-02", "07.175.725/0010-50",
-                "10.885.321/0001-74", "60.621.141/0006-68", "14.759.173/0001-00",
-                "07.175.725/0024-56", "07.175.725/0021-03", "07.175.725/0026-18",
-                "84.584.994/0007-16"
-            },
-            "1880 - Assistência Técnica - Instalação": {
-                "14.759.173/0002-83", "07.175.725/0042-38", "07.175.725/0014-84",
-                "60.621.141/0005-87", "13.772.125/0007-77", "07.175.725/0030-02",
-                "60.621.141/0004-04", "07.175.725/0004-02", "07.175.725/0010-50",
-                "10.885.321/0001-74", "60.621.141/0006-68", "14.759.173/0001-00",
-                "07.175.725/0024-56", "07.175.725/0021-03", "07.175.725/0026-18",
-                "84.584.994/0007-16"
-            },
-            "1.03 - Processamento e Armazenamento": {
-                "14.759.173/0002-83", "07.175.725/0042-38", "07.175.725/0014-84",
-                "60.621.141/0005-87", "13.772.125/0007-77", "07.175.725/0030-02",
-                "60.621.141/0004-04", "07.175.725/0004-02", "07.175.725/0010-50",
-                "10.885.321/0001-74", "60.621.141/0006-68", "14.759.173/0001-00",
-                "07.175.725/0024-56", "07.175.725/0021-03", "07.175.725/0026-18",
-                "84.584.994/0007-16"
-            }
-        }
+    def __init__(self, sharepoint_auth: Optional[SharePointAuth] = None, export_format: Optional[str] = None):
+        # Uma instância compartilhada evita recarregar o .env e as credenciais a cada relatório
+        self.sharepoint_auth = sharepoint_auth or SharePointAuth()
+        # Formato adicional (csv.gz ou parquet) enviado junto com o .xlsx
+        self.export_format = export_format
         
+        # Serviços (material, tipo) e CNPJs autorizados por serviço vêm dos dados mestres
+        # (app/core/master_data.json), lidos a cada verificação
+
         # Lista de possíveis nomes para a coluna de total
         self.colunas_total = ['Total Geral', 'Grand Total', 'Total Gera', 'Total', 'Valor Total']
 
-    def validate_service_cnpj(self, row) -> bool:
+    def validate_service_cnpj(self, row, master_data: Optional[MasterData] = None) -> bool:
         """
         Valida se o CNPJ está autorizado para o serviço específico.
         """
         try:
             municipality_code = str(row['Municipality Code']).strip()
-            try:
-                # Tenta converter para formato numérico se for um número
-                municipality_code = str(int(float(municipality_code)))
-            except (ValueError, TypeError):
-                pass
-                
             cnpj = str(row['CNPJ - WEG']).strip()
             
             logger.debug(f"Validando: Municipality Code={municipality_code}, CNPJ={cnpj}")
             
-            # Procura o serviço que corresponde ao código municipal
-            service = None
-            for service_name in self.service_cnpj_mapping:
-                service_code = service_name.split(' - ')[0].strip()
-                try:
-                    # Tenta converter para formato numérico se for um número
-                    service_code = str(int(float(service_code)))
-                except (ValueError, TypeError):
-                    pass
-                    
-                logger.debug(f"Comparando: {service_code} == {municipality_code}")
-                if service_code == municipality_code:
-                    service = service_name
-                    logger.debug(f"Serviço encontrado: {service}")
-                    break
-            
-            if not service:
-                logger.debug(f"Nenhum serviço encontrado para o código {municipality_code}")
-                return False
-            
-            is_authorized = cnpj in self.service_cnpj_mapping[service]
-            logger.debug(f"CNPJ {cnpj} {'está' if is_authorized else 'não está'} autorizado para o serviço {service}")
+            # Os códigos são comparados pela parte inteira (ex.: 14.02 -> 14, 3115.0 -> 3115)
+            is_authorized = (master_data or get_master_data()).authorized(municipality_code, cnpj)
+            logger.debug(f"CNPJ {cnpj} {'está' if is_authorized else 'não está'} autorizado para o código {municipality_code}")
             return is_authorized
             
         except Exception as e:
             logger.error(f"Erro ao validar CNPJ: {str(e)}")
             return False
 
+    @stage("reconcile")
     async def check_municipality_codes(self, mun_code_data, r189_data, qpe_data=None, spb_data=None):
         """
         Verifica divergências entre os dados consolidados dos códigos municipais e R189.
@@ -154,8 +67,12 @@ class ReportMunCodeR189:
                     "error": f"Nenhuma coluna de total encontrada. Colunas disponíveis: {', '.join(mun_code_data.columns)}"
                 }
 
+            # Versão atual dos dados mestres, usada em toda a verificação
+            master_data = get_master_data()
+
             # Primeiro, valida os CNPJs por serviço
-            mun_code_data['CNPJ_Autorizado'] = mun_code_data.apply(self.validate_service_cnpj, axis=1)
+            mun_code_data['CNPJ_Autorizado'] = mun_code_data.apply(self.validate_service_cnpj, axis=1,
+                                                                   master_data=master_data)
             
             # Filtra apenas os registros com CNPJs não autorizados
             cnpj_divergences = mun_code_data[~mun_code_data['CNPJ_Autorizado']].copy()
@@ -166,7 +83,8 @@ class ReportMunCodeR189:
             
             # Agrupa os dados por Municipality Code, CNPJ - WEG e Invoice number
             grouped_data = valid_data.groupby(
-                ['Municipality Code', 'CNPJ - WEG', 'Invoice number']
+                ['Municipality Code', 'CNPJ - WEG', 'Invoice number'],
+                observed=True
             ).agg({
                 coluna_total: 'sum',
                 'Site Name - WEG 2': 'first'  # Mantém o primeiro Site Name encontrado
@@ -212,27 +130,11 @@ class ReportMunCodeR189:
                     # Log para debug
                     logger.debug(f"Processando código: '{service_code}', tipo: {type(service_code)}")
                     
-                    # Verificar se o código está no mapeamento
-                    if service_code in self.service_mapping:
+                    # Verificar se o código está no mapeamento (código exato ou alias, ex.: 3115.0)
+                    service = master_data.service(service_code)
+                    if service is not None:
                         logger.debug(f"Código '{service_code}' encontrado no mapeamento")
-                        return pd.Series([
-                            self.service_mapping[service_code]['material'],
-                            self.service_mapping[service_code]['type']
-                        ])
-                    
-                    # Se não encontrou diretamente, tenta outras formas
-                    for key in self.service_mapping.keys():
-                        if str(key) == str(service_code):
-                            logger.debug(f"Código '{service_code}' corresponde a '{key}' após conversão")
-                            return pd.Series([
-                                self.service_mapping[key]['material'],
-                                self.service_mapping[key]['type']
-                            ])
-                    
-                    # Caso específico para 3115
-                    if service_code == "3115":
-                        logger.debug("Aplicando mapeamento direto para código 3115")
-                        return pd.Series(["80001110", "Assessoria E Consultoria"])
+                        return pd.Series([service.material, service.type])
                     
                     logger.warning(f"Código '{service_code}' não encontrado no mapeamento")
                     return pd.Series(['', ''])
@@ -288,52 +190,15 @@ class ReportMunCodeR189:
         Gera relatório Excel com as divergências encontradas e dados agrupados.
         """
         try:
-            # Criar arquivo Excel em memória
-            output = BytesIO()
-            
-            with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                # Aba de divergências (se houver)
-                if divergences:
-                    div_df = pd.DataFrame(divergences)
-                    div_df.to_excel(
-                        writer, 
-                        index=False, 
-                        sheet_name='Divergencias_CNPJs'
-                    )
-                
-                # Aba de dados agrupados
-                grouped_df = pd.DataFrame(grouped_data)
-                grouped_df.to_excel(
-                    writer, 
-                    index=False, 
-                    sheet_name='Dados_Agrupados'
-                )
-                
-                # Ajusta o formato das colunas
-                workbook = writer.book
-                
-                # Formato para valores monetários
-                money_format = workbook.add_format({'num_format': '#,##0.00'})
-                
-                # Aplica formato nas abas
-                for sheet_name in writer.sheets:
-                    worksheet = writer.sheets[sheet_name]
-                    # Ajusta largura das colunas
-                    for idx, col in enumerate(grouped_df.columns):
-                        max_length = max(
-                            grouped_df[col].astype(str).apply(len).max(),
-                            len(col)
-                        ) if not grouped_df.empty else len(col)
-                        worksheet.set_column(idx, idx, max_length + 2)
-                    
-                    # Aplica formato monetário na coluna de total
-                    for col in self.colunas_total:
-                        if col in grouped_df.columns:
-                            total_col = grouped_df.columns.get_loc(col)
-                            worksheet.set_column(total_col, total_col, None, money_format)
-                            break
+            # Aba de divergências (se houver) e aba de dados agrupados
+            abas = {}
+            if divergences:
+                abas['Divergencias_CNPJs'] = pd.DataFrame(divergences)
+            abas['Dados_Agrupados'] = pd.DataFrame(grouped_data)
             
-            output.seek(0)
+            # Formato monetário nas colunas de total
+            with track_stage("write_xlsx", rows=len(divergences)):
+                output = write_xlsx(abas, money_columns=self.colunas_total)
             
             # Define o nome do arquivo com timestamp
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -354,6 +219,80 @@ class ReportMunCodeR189:
                 "error": f"Erro ao gerar relatório Excel: {str(e)}"
             }
 
+    async def generate_report_from_data(self, mun_code_df: pd.DataFrame, r189_df: pd.DataFrame, qpe_df: Optional[pd.DataFrame] = None, spb_df: Optional[pd.DataFrame] = None) -> Dict[str, Any]:
+        """
+        Verifica as divergências a partir dos dados Municipality Code, R189, QPE e SPB já carregados e envia o relatório
+        ao SharePoint. Em caso de sucesso, o resultado inclui o DataFrame do relatório em "report_df".
+        """
+        # Verifica divergências e obtém dados agrupados
+        logger.info("Verificando divergências")
+        result = await self.check_municipality_codes(mun_code_df, r189_df, qpe_df, spb_df)
+        
+        if not result["success"]:
+            logger.error(f"Erro na verificação: {result.get('error')}")
+            return {
+                "success": False,
+                "error": result.get("error"),
+                "show_popup": True
+            }
+        
+        divergences = result.get("divergences", [])
+        grouped_data = result.get("grouped_data", [])
+        message = result.get("message", "")
+        set_span_attributes(divergences=len(divergences))
+        
+        logger.info(f"Resultado da verificação: {message}")
+        
+        # Gera o arquivo de relatório
+        logger.info("Gerando relatório Excel")
+        report_result = await self.generate_excel_report(divergences, grouped_data)
+        
+        if not report_result["success"]:
+            logger.error(f"Erro ao gerar relatório: {report_result.get('error')}")
+            return {
+                "success": False,
+                "error": report_result.get("error"),
+                "show_popup": True
+            }
+        
+        # Nome do arquivo de relatório
+        report_filename = report_result["filename"]
+        
+        # Envia o relatório para o SharePoint
+        logger.info(f"Enviando relatório {report_filename} para o SharePoint")
+        relatorios_path = "/teams/BR-TI-TIN/AutomaoFinanas/RELATÓRIOS/MUN_CODE"
+
+        # Usar o método assíncrono do SharePointAuth em vez do SharePointClient
+        upload_success = await self.sharepoint_auth.enviar_arquivo_sharepoint(
+            conteudo=conteudo_arquivo(report_result["file_content"]),
+            nome_arquivo=report_filename,
+            pasta=relatorios_path
+        )
+        
+        if not upload_success:
+            logger.error("Erro ao enviar relatório para o SharePoint")
+            return {
+                "success": False,
+                "error": "Erro ao enviar relatório para o SharePoint",
+                "show_popup": True
+            }
+        
+        logger.info("Relatório enviado com sucesso")
+        relatorio_df = pd.DataFrame(divergences) if divergences else pd.DataFrame(grouped_data)
+        if self.export_format:
+            exportacao = await export_report(self.sharepoint_auth, relatorio_df, report_filename,
+                                             relatorios_path, self.export_format)
+            if not exportacao["success"]:
+                return {"success": False, "error": exportacao["error"], "show_popup": True}
+        get_report_registry().register("Mun_Code_R189", report_filename, relatorio_df)
+        return {
+            "success": True,
+            "report_df": relatorio_df,
+            "message": f"{message}\nRelatório gerado com sucesso: {report_filename}",
+            "show_popup": True
+        }
+
+    @pipeline("report_mun_code_r189")
     async def generate_report(self):
         """
         Gera o relatório de divergências entre códigos municipais e R189.
@@ -409,19 +348,26 @@ class ReportMunCodeR189:
             # Lê os arquivos em DataFrames
             logger.info("Lendo arquivos Excel")
             try:
-                mun_code_io = BytesIO(mun_code_content)
-                r189_io = BytesIO(r189_content)
+                with track_stage("parse") as span:
+                    mun_code_io = BytesIO(mun_code_content)
+                    r189_io = BytesIO(r189_content)
                 
-                mun_code_df = pd.read_excel(mun_code_io)
-                r189_df = pd.read_excel(r189_io)
+                    mun_code_df = pd.read_excel(mun_code_io)
+                    r189_df = pd.read_excel(r189_io)
                 
-                qpe_df = pd.read_excel(BytesIO(qpe_content)) if qpe_content else None
-                spb_df = pd.read_excel(BytesIO(spb_content)) if spb_content else None
+                    qpe_df = pd.read_excel(BytesIO(qpe_content)) if qpe_content else None
+                    spb_df = pd.read_excel(BytesIO(spb_content)) if spb_content else None
                 
-                logger.info(f"Linhas em Municipality_Code: {len(mun_code_df)}")
-                logger.info(f"Linhas em R189: {len(r189_df)}")
-                logger.info(f"Linhas em QPE: {len(qpe_df) if qpe_df is not None else 0}")
-                logger.info(f"Linhas em SPB: {len(spb_df) if spb_df is not None else 0}")
+                    logger.info(f"Linhas em Municipality_Code: {len(mun_code_df)}")
+                    logger.info(f"Linhas em R189: {len(r189_df)}")
+                    logger.info(f"Linhas em QPE: {len(qpe_df) if qpe_df is not None else 0}")
+                    logger.info(f"Linhas em SPB: {len(spb_df) if spb_df is not None else 0}")
+                    span.set_attributes({
+                        "rows_mun_code": len(mun_code_df),
+                        "rows_r189": len(r189_df),
+                        "rows_qpe": len(qpe_df) if qpe_df is not None else 0,
+                        "rows_spb": len(spb_df) if spb_df is not None else 0
+                    })
             except Exception as e:
                 logger.error(f"Erro ao ler arquivos Excel: {str(e)}")
                 return {
@@ -430,65 +376,10 @@ class ReportMunCodeR189:
                     "show_popup": True
                 }
             
-            # Verifica divergências e obtém dados agrupados
-            logger.info("Verificando divergências")
-            result = await self.check_municipality_codes(mun_code_df, r189_df, qpe_df, spb_df)
-            
-            if not result["success"]:
-                logger.error(f"Erro na verificação: {result.get('error')}")
-                return {
-                    "success": False,
-                    "error": result.get("error"),
-                    "show_popup": True
-                }
-            
-            divergences = result.get("divergences", [])
-            grouped_data = result.get("grouped_data", [])
-            message = result.get("message", "")
-            
-            logger.info(f"Resultado da verificação: {message}")
-            
-            # Gera o arquivo de relatório
-            logger.info("Gerando relatório Excel")
-            report_result = await self.generate_excel_report(divergences, grouped_data)
-            
-            if not report_result["success"]:
-                logger.error(f"Erro ao gerar relatório: {report_result.get('error')}")
-                return {
-                    "success": False,
-                    "error": report_result.get("error"),
-                    "show_popup": True
-                }
-            
-            # Nome do arquivo de relatório
-            report_filename = report_result["filename"]
-            
-            # Envia o relatório para o SharePoint
-            logger.info(f"Enviando relatório {report_filename} para o SharePoint")
-            relatorios_path = "/teams/BR-TI-TIN/AutomaoFinanas/RELATÓRIOS/MUN_CODE"
+            resultado = await self.generate_report_from_data(mun_code_df, r189_df, qpe_df, spb_df)
+            resultado.pop("report_df", None)
+            return resultado
 
-            # Usar o método assíncrono do SharePointAuth em vez do SharePointClient
-            upload_success = await self.sharepoint_auth.enviar_arquivo_sharepoint(
-                conteudo=report_result["file_content"].getvalue(),
-                nome_arquivo=report_filename,
-                pasta=relatorios_path
-            )
-            
-            if not upload_success:
-                logger.error("Erro ao enviar relatório para o SharePoint")
-                return {
-                    "success": False,
-                    "error": "Erro ao enviar relatório para o SharePoint",
-                    "show_popup": True
-                }
-            
-            logger.info("Relatório enviado com sucesso")
-            return {
-                "success": True,
-                "message": f"{message}\nRelatório gerado com sucesso: {report_filename}",
-                "show_popup": True
-            }
-            
         except Exception as e:
             import traceback
             logger.error(f"Erro na geração do relatório: {str(e)}")
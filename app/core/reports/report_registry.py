@@ -0,0 +1,116 @@
+import asyncio
+import logging
+import threading
+from io import BytesIO
+from typing import Any, Dict, Optional, Tuple
+
+import pandas as pd
+
+from app.core.auth import SharePointAuth
+from app.core.metrics import track_stage
+from app.core.reports.report_writer import FORMATOS_EXPORTACAO
+
+logger = logging.getLogger(__name__)
+
+RELATORIOS_PATH = "/teams/BR-TI-TIN/AutomaoFinanas/RELATÓRIOS"
+
+# Aba do relatório consolidado -> subpasta de RELATÓRIOS onde o relatório é salvo
+PASTAS_RELATORIOS = {
+    "Mun_Code_R189": "MUN_CODE",
+    "Divergencias_R189": "R189",
+    "QPE_vs_R189": "QPE_R189",
+    "SPB_vs_R189": "SPO_R189",
+    "NFSERV_vs_R189": "NFSERV_R189",
+}
+
+
+class ReportRegistry:
+    """
+    Localiza o relatório mais recente de cada subpasta de RELATÓRIOS e mantém em memória
+    os relatórios gerados pelas validações deste processo. Na consolidação, o arquivo mais
+    recente de cada pasta é identificado com uma listagem ordenada ($top) e, se for o mesmo
+    gerado aqui, o DataFrame em memória é usado sem baixar o arquivo.
+    """
+
+    def __init__(self):
+        # aba -> (nome do arquivo, DataFrame do relatório)
+        self._relatorios: Dict[str, Tuple[str, pd.DataFrame]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.downloads = 0
+
+    def register(self, aba: str, nome_arquivo: str, df: pd.DataFrame) -> None:
+        """Registra o relatório enviado ao SharePoint pela validação correspondente à aba."""
+        with self._lock:
+            self._relatorios[aba] = (nome_arquivo, df)
+        logger.debug(f"Relatório {nome_arquivo} registrado para a aba {aba}")
+
+    def cached(self, aba: str, nome_arquivo: str) -> Optional[pd.DataFrame]:
+        with self._lock:
+            registrado = self._relatorios.get(aba)
+        if registrado and registrado[0] == nome_arquivo:
+            return registrado[1]
+        return None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._relatorios.clear()
+
+    async def latest_report(self, sharepoint_auth: SharePointAuth, aba: str) -> Optional[Dict[str, Any]]:
+        """
+        Relatório mais recente da pasta da aba: {"filename", "df", "cached"}, ou None se a
+        pasta estiver vazia ou o arquivo não puder ser lido.
+        """
+        pasta = f"{RELATORIOS_PATH}/{PASTAS_RELATORIOS[aba]}"
+        # As exportações (csv.gz/parquet) são enviadas logo após o .xlsx do mesmo relatório,
+        # então o .xlsx mais recente está entre os arquivos mais recentes da pasta
+        arquivos = await sharepoint_auth.listar_arquivos_sharepoint(
+            pasta, extensoes=(".xlsx",), top=len(FORMATOS_EXPORTACAO) + 1)
+        if not arquivos:
+            logger.warning(f"Nenhum relatório encontrado na pasta {pasta}")
+            return None
+        nome_arquivo = arquivos[0]["nome"]
+
+        df = self.cached(aba, nome_arquivo)
+        if df is not None:
+            self.hits += 1
+            logger.info(f"Relatório {nome_arquivo} reaproveitado da memória")
+            return {"filename": nome_arquivo, "df": df, "cached": True}
+
+        conteudo = await asyncio.to_thread(sharepoint_auth.baixar_arquivo_sharepoint, nome_arquivo, pasta)
+        if conteudo is None:
+            logger.warning(f"Arquivo {nome_arquivo} não encontrado na pasta {pasta}")
+            return None
+        self.downloads += 1
+        try:
+            with track_stage("parse", file_name=nome_arquivo) as span:
+                df = await asyncio.to_thread(pd.read_excel, BytesIO(conteudo))
+                span.set_attribute("rows", len(df))
+        except Exception as e:
+            logger.error(f"Erro ao ler arquivo {nome_arquivo}: {str(e)}")
+            return None
+        self.register(aba, nome_arquivo, df)
+        return {"filename": nome_arquivo, "df": df, "cached": False}
+
+    async def latest_reports(self, sharepoint_auth: SharePointAuth) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Relatório mais recente de cada aba, com as pastas consultadas em paralelo."""
+        abas = list(PASTAS_RELATORIOS)
+        resultados = await asyncio.gather(*(self.latest_report(sharepoint_auth, aba) for aba in abas),
+                                          return_exceptions=True)
+        relatorios = {}
+        for aba, resultado in zip(abas, resultados):
+            if isinstance(resultado, Exception):
+                logger.error(f"Erro ao localizar o relatório da aba {aba}: {str(resultado)}")
+                resultado = None
+            relatorios[aba] = resultado
+        return relatorios
+
+
+_registry: Optional[ReportRegistry] = None
+
+
+def get_report_registry() -> ReportRegistry:
+    global _registry
+    if _registry is None:
+        _registry = ReportRegistry()
+    return _registry
@@ -0,0 +1,148 @@
+import importlib.util
+import logging
+import os
+from io import BytesIO
+from typing import Any, Dict, List, Optional, Sequence
+
+import pandas as pd
+import xlsxwriter
+
+from app.core.metrics import track_stage
+
+logger = logging.getLogger(__name__)
+
+# Mesmo formato de cabeçalho aplicado pelo pandas (to_excel) nos relatórios
+FORMATO_CABECALHO = {"bold": True, "border": 1, "align": "center", "valign": "top"}
+FORMATO_MONETARIO = {"num_format": "#,##0.00"}
+
+# Formatos adicionais de exportação do DataFrame do relatório, gravados ao lado do .xlsx
+FORMATOS_EXPORTACAO = ("csv.gz", "parquet")
+
+# Acima deste número de linhas, a largura das colunas é estimada por uma amostra
+AMOSTRA_LARGURA = int(os.getenv("REPORT_WIDTH_SAMPLE_ROWS", "50000"))
+# Largura máxima de coluna aceita pelo Excel
+LARGURA_MAXIMA = 255
+
+
+def _valores_coluna(serie: pd.Series) -> List:
+    """Valores da coluna como objetos Python, com células vazias no lugar de NaN/NaT."""
+    valores = serie.astype(object)
+    return valores.where(serie.notna(), None).tolist()
+
+
+def _largura_coluna(serie: pd.Series, nome) -> int:
+    """
+    Largura da coluna: o maior texto entre o cabeçalho e os valores, mais 2. Os comprimentos
+    são calculados de forma vetorizada; em abas grandes, sobre as primeiras linhas e uma
+    amostra fixa das demais.
+    """
+    if len(serie) > AMOSTRA_LARGURA:
+        metade = AMOSTRA_LARGURA // 2
+        serie = pd.concat([serie.iloc[:metade], serie.iloc[metade:].sample(metade, random_state=0)])
+    maior = serie.astype(str).str.len().max() if len(serie) else 0
+    return min(max(int(maior), len(str(nome))) + 2, LARGURA_MAXIMA)
+
+
+def write_xlsx(abas: Dict[str, pd.DataFrame], money_columns: Sequence[str] = ()) -> BytesIO:
+    """
+    Grava as abas (nome -> DataFrame) em um arquivo Excel e devolve o BytesIO posicionado no início.
+
+    O xlsxwriter é usado no modo constant_memory: cada linha é enviada ao arquivo temporário
+    da aba assim que a próxima começa, então o workbook nunca fica inteiro em memória. As
+    linhas são montadas diretamente dos arrays de cada coluna, sem a cópia célula a célula
+    do to_excel. Colunas em 'money_columns' recebem o formato monetário.
+
+    Para enviar o resultado sem mais uma cópia do arquivo, use conteudo_arquivo(output).
+    """
+    output = BytesIO()
+    # in_memory desativaria o constant_memory; os temporários ficam no diretório padrão
+    workbook = xlsxwriter.Workbook(output, {
+        "constant_memory": True,
+        "remove_timezone": True,
+        "default_date_format": "yyyy-mm-dd hh:mm:ss",
+    })
+    try:
+        # Formatos criados uma vez por workbook e compartilhados por todas as abas
+        formato_cabecalho = workbook.add_format(FORMATO_CABECALHO)
+        formato_monetario = workbook.add_format(FORMATO_MONETARIO) if money_columns else None
+
+        for nome_aba, df in abas.items():
+            # Limita o nome da aba a 31 caracteres (limite do Excel)
+            worksheet = workbook.add_worksheet(nome_aba[:31])
+
+            # As colunas são configuradas antes das linhas
+            for i, col in enumerate(df.columns):
+                formato = formato_monetario if col in money_columns else None
+                worksheet.set_column(i, i, _largura_coluna(df.iloc[:, i], col), formato)
+
+            worksheet.write_row(0, 0, [str(col) for col in df.columns], formato_cabecalho)
+            colunas = [_valores_coluna(df.iloc[:, i]) for i in range(df.shape[1])]
+            for linha, valores in enumerate(zip(*colunas), start=1):
+                worksheet.write_row(linha, 0, valores)
+    finally:
+        workbook.close()
+
+    output.seek(0)
+    return output
+
+
+def conteudo_arquivo(output: BytesIO) -> memoryview:
+    """Conteúdo do BytesIO para o upload, sem copiar o buffer como o getvalue()."""
+    return output.getbuffer()
+
+
+def parquet_disponivel() -> bool:
+    """O Parquet depende de pyarrow ou fastparquet, que são opcionais."""
+    return any(importlib.util.find_spec(engine) is not None for engine in ("pyarrow", "fastparquet"))
+
+
+def validar_formato_exportacao(formato: Optional[str]) -> Optional[str]:
+    """Mensagem de erro se o formato de exportação pedido não puder ser usado, ou None."""
+    if formato is None:
+        return None
+    if formato not in FORMATOS_EXPORTACAO:
+        return f"Formato de exportação inválido: {formato}. Use um de {list(FORMATOS_EXPORTACAO)}"
+    if formato == "parquet" and not parquet_disponivel():
+        return "Exportação em Parquet indisponível: instale o pacote pyarrow"
+    return None
+
+
+def nome_exportacao(report_filename: str, formato: str) -> str:
+    """Nome do arquivo exportado: o nome do .xlsx com a extensão do formato."""
+    return f"{os.path.splitext(report_filename)[0]}.{formato}"
+
+
+def export_frame(df: pd.DataFrame, formato: str) -> BytesIO:
+    """Grava o DataFrame do relatório como CSV compactado (gzip) ou Parquet."""
+    output = BytesIO()
+    if formato == "csv.gz":
+        # mtime fixo: o mesmo relatório gera sempre o mesmo arquivo
+        df.to_csv(output, index=False, encoding="utf-8", compression={"method": "gzip", "mtime": 0})
+    elif formato == "parquet":
+        # Colunas object podem misturar números e textos, o que o Parquet não aceita
+        colunas_texto = {col: "string" for col in df.columns[df.dtypes == object]}
+        df.astype(colunas_texto).to_parquet(output, index=False)
+    else:
+        raise ValueError(f"Formato de exportação inválido: {formato}")
+    output.seek(0)
+    return output
+
+
+async def export_report(sharepoint_auth, df: pd.DataFrame, report_filename: str, pasta: str,
+                        formato: str) -> Dict[str, Any]:
+    """
+    Exporta o DataFrame do relatório no formato pedido e o envia para a mesma pasta do .xlsx.
+    """
+    nome_arquivo = nome_exportacao(report_filename, formato)
+    try:
+        with track_stage("write_export", rows=len(df), format=formato):
+            output = export_frame(df, formato)
+    except Exception as e:
+        logger.exception(f"Erro ao exportar relatório em {formato}: {str(e)}")
+        return {"success": False, "error": f"Erro ao exportar relatório em {formato}: {str(e)}"}
+
+    logger.info(f"Enviando exportação {nome_arquivo} para o SharePoint")
+    if not await sharepoint_auth.enviar_arquivo_sharepoint(conteudo=conteudo_arquivo(output),
+                                                           nome_arquivo=nome_arquivo, pasta=pasta):
+        return {"success": False, "error": f"Erro ao enviar {nome_arquivo} para o SharePoint"}
+    return {"success": True, "filename": nome_arquivo}
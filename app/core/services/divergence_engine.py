@@ -0,0 +1,105 @@
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.core.money import TOLERANCIA_CENTAVOS, divergencias_centavos, from_cents, to_cents
+
+logger = logging.getLogger(__name__)
+
+NOTA_NAO_ENCONTRADA = "Nota fiscal não encontrada"
+DIVERGENCIA_VALORES = "Divergência de valores"
+SITE_INCORRETO = "Site incorreto"
+CNPJ_NAO_MAPEADO = "CNPJ não mapeado"
+
+
+@dataclass(frozen=True)
+class ReconciliationSpec:
+    """
+    Declaração de uma conciliação entre o R189 e uma fonte (QPE, NFSERV, SPB).
+
+    Attributes:
+        source: Nome da fonte, usado como sufixo das colunas (ex.: 'qpe' -> valor_qpe)
+        keys: Colunas que identificam a nota nos dois lados
+        value: Coluna com o valor comparado
+        supplier: Coluna com o fornecedor na fonte
+        r189_supplier: Coluna com o fornecedor no R189 (como montada por ProcessingService.process_files)
+        tolerance: Diferença máxima aceita, em centavos
+    """
+    source: str
+    keys: Tuple[str, ...] = ("empresa", "nota_fiscal")
+    value: str = "valor_total"
+    supplier: str = "fornecedor"
+    r189_supplier: str = "fornecedor_r189"
+    tolerance: int = TOLERANCIA_CENTAVOS
+
+    @property
+    def columns(self) -> List[str]:
+        """Colunas do DataFrame de divergências, na ordem do relatório."""
+        return ["tipo", *self.keys, "fornecedor_r189", f"fornecedor_{self.source}",
+                "valor_r189", f"valor_{self.source}", "diferenca"]
+
+
+def find_divergences(r189: pd.DataFrame, fonte: pd.DataFrame, spec: ReconciliationSpec) -> pd.DataFrame:
+    """
+    Compara o R189 com a fonte por um merge externo pelas chaves e classifica as linhas por
+    máscaras, sem percorrer o resultado:
+        - presente em apenas um dos lados (indicator do merge): 'Nota fiscal não encontrada'
+        - presente nos dois com valores que diferem mais que a tolerância: 'Divergência de valores',
+          com a diferença (R189 - fonte) calculada em centavos
+
+    Devolve um DataFrame com as colunas de spec.columns; as linhas sem divergência são descartadas.
+    """
+    sufixo = f"_{spec.source}"
+    # Os dois lados usam o mesmo nome para o fornecedor, diferenciados pelos sufixos do merge
+    esquerda = (r189[[*spec.keys, spec.value, spec.r189_supplier]]
+                .rename(columns={spec.r189_supplier: spec.supplier})
+                .assign(centavos=to_cents(r189[spec.value])))
+    direita = fonte[[*spec.keys, spec.value, spec.supplier]].assign(centavos=to_cents(fonte[spec.value]))
+
+    merged = esquerda.merge(direita, on=list(spec.keys), how="outer",
+                            suffixes=("_r189", sufixo), indicator=True)
+
+    centavos_r189, centavos_fonte = merged["centavos_r189"], merged[f"centavos{sufixo}"]
+    ausente = merged["_merge"].ne("both").to_numpy()
+    divergente = ~ausente & divergencias_centavos(centavos_r189, centavos_fonte, spec.tolerance).to_numpy()
+
+    resultado = pd.DataFrame({
+        "tipo": np.where(ausente, NOTA_NAO_ENCONTRADA, DIVERGENCIA_VALORES),
+        **{chave: merged[chave] for chave in spec.keys},
+        "fornecedor_r189": merged[f"{spec.supplier}_r189"],
+        f"fornecedor{sufixo}": merged[f"{spec.supplier}{sufixo}"],
+        "valor_r189": merged[f"{spec.value}_r189"],
+        f"valor{sufixo}": merged[f"{spec.value}{sufixo}"],
+        # A diferença só é informada nas divergências de valor
+        "diferenca": from_cents((centavos_r189 - centavos_fonte).where(divergente)),
+    }, columns=spec.columns)
+
+    divergencias = resultado[ausente | divergente].reset_index(drop=True)
+    logger.info(f"Conciliação R189 x {spec.source}: {int(ausente.sum())} notas sem correspondência, "
+                f"{int(divergente.sum())} divergências de valor")
+    return divergencias
+
+
+def check_sites(r189: pd.DataFrame, mapeamento: Dict[str, Sequence[str]], cnpj: str = "empresa",
+                site: str = "site", nota: str = "nota_fiscal") -> pd.DataFrame:
+    """
+    Confere o site de cada linha do R189 contra o mapeamento CNPJ -> sites aceitos, por máscaras:
+    CNPJs fora do mapeamento ('CNPJ não mapeado') e sites fora da lista do CNPJ ('Site incorreto').
+    """
+    pares = [(chave, valor) for chave, sites in mapeamento.items() for valor in sites]
+    pares = pd.MultiIndex.from_arrays([[par[0] for par in pares], [par[1] for par in pares]], names=[cnpj, site])
+    mapeado = r189[cnpj].isin(list(mapeamento)).to_numpy()
+    site_aceito = pd.MultiIndex.from_frame(r189[[cnpj, site]]).isin(pares)
+    incorreto = mapeado & ~site_aceito
+
+    resultado = pd.DataFrame({
+        "tipo": np.where(mapeado, SITE_INCORRETO, CNPJ_NAO_MAPEADO),
+        "empresa": r189[cnpj].to_numpy(),
+        "nota_fiscal": r189[nota].to_numpy(),
+        "site_atual": r189[site].where(mapeado).to_numpy(),
+        "sites_esperados": r189[cnpj].map(mapeamento).to_numpy(),
+    })
+    return resultado[incorreto | ~mapeado].reset_index(drop=True)
@@ -0,0 +1,173 @@
+import asyncio
+import logging
+from io import BytesIO
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from app.core.auth import SharePointAuth
+from app.core.metrics import track_stage
+from app.core.extractors.r189_extractor import R189Extractor, ler_planilha_r189
+from app.core.extractors.municipality_code_extractor import MunicipalityCodeExtractor
+from app.core.extractors.qpe_extractor import QPEExtractor
+from app.core.extractors.nfserv_extractor import NFSERVExtractor
+from app.core.extractors.spb_extractor import SPBExtractor
+from app.core.services.orchestrator import DagRunner, Stage, load_manifest
+from app.core.services.validation_engine import CONSOLIDADO_PATH, validation_stages
+from app.core.reports.report_writer import conteudo_arquivo, write_xlsx
+
+logger = logging.getLogger(__name__)
+
+BASE_PATH = "/teams/BR-TI-TIN/AutomaoFinanas"
+
+# Documentos em PDF: pasta de origem, extrator e arquivo/aba do consolidado publicado
+DOCUMENTOS = {
+    "qpe": {"pasta": f"{BASE_PATH}/QPE", "extrator": QPEExtractor,
+            "arquivo": "QPE_consolidado.xlsx", "aba": "QPE_Consolidado"},
+    "nfserv": {"pasta": f"{BASE_PATH}/NFSERV", "extrator": NFSERVExtractor,
+               "arquivo": "NFSERV_consolidado.xlsx", "aba": "NFSERV_Consolidado"},
+    "spb": {"pasta": f"{BASE_PATH}/SPB", "extrator": SPBExtractor,
+            "arquivo": "SPB_consolidado.xlsx", "aba": "SPB_Consolidado"},
+}
+
+
+class MonthClose:
+    """
+    Fechamento do mês executado no servidor como um DAG: baixa o R189 uma única vez,
+    consolida R189 e Municipality Code a partir das mesmas planilhas, extrai QPE, NFSERV
+    e SPB em paralelo, executa as cinco validações com os DataFrames em memória e gera
+    o relatório consolidado. Os consolidados também são publicados na pasta CONSOLIDADO
+    (fora do caminho crítico), para manter o fluxo manual funcionando com os mesmos dados.
+    """
+
+    def __init__(self, sharepoint_auth: Optional[SharePointAuth] = None, runs_dir: Optional[str] = None):
+        self.sharepoint_auth = sharepoint_auth or SharePointAuth()
+        self.runs_dir = runs_dir
+
+    async def _baixar(self, nome: str, pasta: str) -> bytes:
+        conteudo = await asyncio.to_thread(self.sharepoint_auth.baixar_arquivo_sharepoint, nome, pasta)
+        if conteudo is None:
+            raise FileNotFoundError(f"Não foi possível baixar o arquivo {pasta}/{nome}")
+        return conteudo
+
+    async def _listar(self, pasta: str, extensoes: tuple, nomes: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Arquivos da pasta (nome, tamanho e data de modificação), do mais recente para o mais antigo,
+        restritos a 'nomes' quando informados. Os metadados identificam as entradas ao retomar uma execução.
+        """
+        arquivos = await self.sharepoint_auth.listar_arquivos_sharepoint(pasta, extensoes)
+        if nomes:
+            por_nome = {arquivo["nome"]: arquivo for arquivo in arquivos}
+            faltantes = [nome for nome in nomes if nome not in por_nome]
+            if faltantes:
+                raise FileNotFoundError(f"Arquivos não encontrados em {pasta}: {faltantes}")
+            arquivos = [por_nome[nome] for nome in nomes]
+        if not arquivos:
+            raise FileNotFoundError(f"Nenhum arquivo {'/'.join(extensoes)} encontrado em {pasta}")
+        return arquivos
+
+    async def _publicar(self, df: pd.DataFrame, nome_arquivo: str, aba: str) -> Dict[str, Any]:
+        with track_stage("write_xlsx", rows=len(df)):
+            saida = write_xlsx({aba: df})
+        sucesso = await self.sharepoint_auth.enviar_arquivo_sharepoint(conteudo_arquivo(saida), nome_arquivo, CONSOLIDADO_PATH)
+        if not sucesso:
+            return {"success": False, "error": f"Falha ao enviar {nome_arquivo} para o SharePoint"}
+        return {"success": True, "file_name": nome_arquivo}
+
+    def build_stages(self, r189_file: Optional[str] = None, qpe_files: Optional[List[str]] = None,
+                     nfserv_files: Optional[List[str]] = None, spb_files: Optional[List[str]] = None,
+                     publish: bool = True) -> List[Stage]:
+        """
+        Monta as etapas do fechamento. Sem arquivos informados, usa o R189 (.xlsb/.xlsx)
+        mais recente da pasta R189 e todos os PDFs das pastas QPE, NFSERV e SPB.
+        As listagens sempre executam; as demais etapas podem ser reaproveitadas na retomada.
+        """
+        arquivos_pdf = {"qpe": qpe_files, "nfserv": nfserv_files, "spb": spb_files}
+
+        async def listar_r189(resultados):
+            arquivos = await self._listar(f"{BASE_PATH}/R189", (".xlsb", ".xlsx"), [r189_file] if r189_file else None)
+            logger.info(f"Arquivo R189 selecionado: {arquivos[0]['nome']}")
+            return arquivos[0]
+
+        async def baixar_r189(resultados):
+            nome = resultados["list_r189"]["nome"]
+            return {"file_name": nome, "content": await self._baixar(nome, f"{BASE_PATH}/R189")}
+
+        async def ler_r189(resultados):
+            return await asyncio.to_thread(ler_planilha_r189, BytesIO(resultados["download_r189"]["content"]))
+
+        async def consolidar_r189(resultados):
+            extrator = R189Extractor(self.sharepoint_auth)
+            return await asyncio.to_thread(extrator.consolidar_r189_dataframe, resultados["parse_r189"])
+
+        async def consolidar_mun_code(resultados):
+            extrator = MunicipalityCodeExtractor(self.sharepoint_auth)
+            return await asyncio.to_thread(extrator.consolidar_municipality_code_dataframe, resultados["parse_r189"])
+
+        def listar_pdfs(tipo):
+            async def executar(resultados):
+                return await self._listar(DOCUMENTOS[tipo]["pasta"], (".pdf",), arquivos_pdf[tipo])
+            return executar
+
+        def baixar_pdfs(tipo):
+            async def executar(resultados):
+                pasta = DOCUMENTOS[tipo]["pasta"]
+                nomes = [arquivo["nome"] for arquivo in resultados[f"list_{tipo}"]]
+                conteudos = await asyncio.gather(*(self._baixar(nome, pasta) for nome in nomes))
+                return [BytesIO(conteudo) for conteudo in conteudos]
+            return executar
+
+        def extrair_pdfs(tipo):
+            async def executar(resultados):
+                extrator = DOCUMENTOS[tipo]["extrator"](self.sharepoint_auth)
+                return await asyncio.to_thread(extrator.extrair_dataframe, resultados[f"download_{tipo}"])
+            return executar
+
+        def publicar(origem, nome_arquivo, aba):
+            async def executar(resultados):
+                return await self._publicar(resultados[origem], nome_arquivo, aba)
+            return executar
+
+        stages = [
+            Stage("list_r189", listar_r189, pipeline="month_close", checkpoint=False),
+            Stage("download_r189", baixar_r189, ("list_r189",), pipeline="month_close"),
+            Stage("parse_r189", ler_r189, ("download_r189",), pipeline="month_close"),
+            Stage("consolidate_r189", consolidar_r189, ("parse_r189",), pipeline="extract_r189"),
+            Stage("consolidate_mun_code", consolidar_mun_code, ("parse_r189",), pipeline="extract_mun_code"),
+        ]
+        for tipo in DOCUMENTOS:
+            stages.append(Stage(f"list_{tipo}", listar_pdfs(tipo), pipeline=f"extract_{tipo}", checkpoint=False))
+            stages.append(Stage(f"download_{tipo}", baixar_pdfs(tipo), (f"list_{tipo}",), pipeline=f"extract_{tipo}"))
+            stages.append(Stage(f"extract_{tipo}", extrair_pdfs(tipo), (f"download_{tipo}",), pipeline=f"extract_{tipo}"))
+
+        if publish:
+            stages.append(Stage("publish_r189", publicar("consolidate_r189", "R189_consolidado.xlsx", "Consolidado_R189"),
+                                ("consolidate_r189",), pipeline="extract_r189"))
+            stages.append(Stage("publish_mun_code", publicar("consolidate_mun_code", "Municipality_Code_consolidado.xlsx",
+                                                             "Municipality_Code_consolidado"),
+                                ("consolidate_mun_code",), pipeline="extract_mun_code"))
+            for tipo, documento in DOCUMENTOS.items():
+                stages.append(Stage(f"publish_{tipo}", publicar(f"extract_{tipo}", documento["arquivo"], documento["aba"]),
+                                    (f"extract_{tipo}",), pipeline=f"extract_{tipo}"))
+
+        return stages + validation_stages(self.sharepoint_auth, {
+            "r189": "consolidate_r189",
+            "mun_code": "consolidate_mun_code",
+            "qpe": "extract_qpe",
+            "nfserv": "extract_nfserv",
+            "spb": "extract_spb",
+        })
+
+    async def run(self, run_id: Optional[str] = None, resume: bool = False, **opcoes) -> Dict[str, Any]:
+        """
+        Executa o fechamento e devolve o manifesto da execução (sem os resultados em memória).
+        Com 'resume', retoma a execução 'run_id' com as mesmas opções, reaproveitando as etapas
+        cujas entradas não mudaram; só executam as etapas com falha e as afetadas por arquivos alterados.
+        """
+        if resume and not opcoes:
+            anterior = load_manifest(run_id, self.runs_dir) if run_id else None
+            opcoes = (anterior or {}).get("options") or {}
+        runner = DagRunner("month_close", self.build_stages(**opcoes), runs_dir=self.runs_dir)
+        manifesto = await runner.run(run_id, resume=resume, options=opcoes)
+        manifesto.pop("results", None)
+        return manifesto
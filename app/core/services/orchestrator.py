@@ -0,0 +1,324 @@
+import os
+import re
+import json
+import time
+import pickle
+import shutil
+import asyncio
+import hashlib
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from app.core.logging_config import run_context
+from app.core.metrics import track_pipeline
+from app.core.tracing import start_span
+
+logger = logging.getLogger(__name__)
+
+# run_id aceito em caminhos de arquivo (evita '..' e separadores)
+_RUN_ID_VALIDO = re.compile(r"^[\w.-]{1,128}$")
+
+
+class StageError(Exception):
+    """Falha de uma etapa que devolveu {"success": False, ...}."""
+
+
+@dataclass
+class Stage:
+    """
+    Etapa do DAG. 'func' recebe o dict com os resultados das dependências
+    (indexado pelo nome da etapa) e devolve o resultado desta etapa.
+    'pipeline' é o label das métricas e do span da etapa (padrão: o nome da etapa).
+    Com 'run_if_deps_failed', a etapa executa mesmo se alguma dependência falhar;
+    o resultado da dependência com falha chega como None.
+    Com 'checkpoint' (padrão), o resultado é gravado na execução e reaproveitado ao
+    retomá-la se as entradas não mudaram; etapas que consultam o estado externo
+    (ex.: listagem de arquivos no SharePoint) devem usar checkpoint=False para sempre executar.
+    """
+    name: str
+    func: Callable[[Dict[str, Any]], Awaitable[Any]]
+    deps: Tuple[str, ...] = ()
+    pipeline: Optional[str] = None
+    run_if_deps_failed: bool = False
+    checkpoint: bool = True
+
+
+def resumir_resultado(valor: Any) -> Any:
+    """Resumo serializável do resultado de uma etapa para o manifesto."""
+    if isinstance(valor, pd.DataFrame):
+        return {"rows": len(valor), "columns": len(valor.columns)}
+    if isinstance(valor, (bytes, bytearray)):
+        return {"bytes": len(valor)}
+    if isinstance(valor, (list, tuple)):
+        return {"items": len(valor)}
+    if isinstance(valor, dict):
+        resumo = {}
+        for chave, item in valor.items():
+            if isinstance(item, str):
+                resumo[chave] = item[:200]
+            elif item is None or isinstance(item, (bool, int, float)):
+                resumo[chave] = item
+            elif isinstance(item, (pd.DataFrame, bytes, bytearray, list, tuple, dict)):
+                resumo[chave] = resumir_resultado(item)
+        return resumo
+    if valor is None or isinstance(valor, (bool, int, float, str)):
+        return valor
+    return type(valor).__name__
+
+
+def caminho_execucao(run_id: str, runs_dir: Optional[str] = None) -> Optional[str]:
+    """Diretório da execução, apenas para run_ids válidos."""
+    if not _RUN_ID_VALIDO.match(run_id) or run_id in (".", ".."):
+        return None
+    return os.path.join(runs_dir or os.getenv("RUNS_DIR", os.path.join("data", "runs")), run_id)
+
+
+def load_manifest(run_id: str, runs_dir: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Lê o manifesto de uma execução; None se não existir."""
+    diretorio = caminho_execucao(run_id, runs_dir)
+    if diretorio is None:
+        return None
+    caminho = os.path.join(diretorio, "manifest.json")
+    if not os.path.isfile(caminho):
+        return None
+    with open(caminho, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class DagRunner:
+    """
+    Executa um conjunto de etapas respeitando as dependências: cada etapa inicia assim
+    que suas dependências terminam, e as independentes executam em paralelo.
+    Os resultados passam de uma etapa para a outra em memória. A cada mudança de estado
+    o manifesto da execução (status, dependências e duração por etapa) é gravado em
+    <runs_dir>/<run_id>/manifest.json, e o resultado de cada etapa concluída em
+    <runs_dir>/<run_id>/checkpoints/<etapa>.pkl, com o hash das entradas e do resultado.
+    Os checkpoints são arquivos locais gerados pela própria aplicação (pickle).
+    A cada nova execução, as execuções anteriores com mais de 'max_age_days' dias são
+    removidas, e das restantes ficam apenas as 'max_runs' mais recentes.
+    """
+
+    def __init__(self, name: str, stages: List[Stage], runs_dir: Optional[str] = None,
+                 max_age_days: Optional[float] = None, max_runs: Optional[int] = None):
+        self.name = name
+        self.stages = {stage.name: stage for stage in stages}
+        if len(self.stages) != len(stages):
+            raise ValueError("Nomes de etapas duplicados")
+        self.runs_dir = runs_dir or os.getenv("RUNS_DIR", os.path.join("data", "runs"))
+        self.max_age_seconds = float(
+            max_age_days if max_age_days is not None else os.getenv("RUNS_MAX_AGE_DAYS", "30")
+        ) * 86400
+        self.max_runs = int(max_runs if max_runs is not None else os.getenv("RUNS_MAX_COUNT", "100"))
+        self.order = self._ordenar()
+
+    def _ordenar(self) -> List[str]:
+        """Ordem topológica das etapas; falha com dependências desconhecidas ou ciclos."""
+        for stage in self.stages.values():
+            desconhecidas = [dep for dep in stage.deps if dep not in self.stages]
+            if desconhecidas:
+                raise ValueError(f"Etapa {stage.name} depende de etapas inexistentes: {desconhecidas}")
+
+        ordem: List[str] = []
+        visitando: set = set()
+        visitadas: set = set()
+
+        def visitar(nome: str, caminho: List[str]) -> None:
+            if nome in visitadas:
+                return
+            if nome in visitando:
+                raise ValueError(f"Ciclo entre as etapas: {' -> '.join(caminho + [nome])}")
+            visitando.add(nome)
+            for dep in self.stages[nome].deps:
+                visitar(dep, caminho + [nome])
+            visitando.discard(nome)
+            visitadas.add(nome)
+            ordem.append(nome)
+
+        for nome in self.stages:
+            visitar(nome, [])
+        return ordem
+
+    def _gravar_manifesto(self, manifesto: Dict[str, Any]) -> None:
+        diretorio = os.path.join(self.runs_dir, manifesto["run_id"])
+        os.makedirs(diretorio, exist_ok=True)
+        temporario = os.path.join(diretorio, "manifest.json.tmp")
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump(manifesto, f, ensure_ascii=False, indent=2, default=str)
+        os.replace(temporario, os.path.join(diretorio, "manifest.json"))
+
+    def _aplicar_retencao(self, run_id_atual: str) -> int:
+        """Remove as execuções expiradas e as que excedem max_runs; devolve quantas foram removidas."""
+        if not os.path.isdir(self.runs_dir):
+            return 0
+        execucoes = []
+        for nome in os.listdir(self.runs_dir):
+            manifesto = os.path.join(self.runs_dir, nome, "manifest.json")
+            if nome == run_id_atual or not os.path.isfile(manifesto):
+                continue
+            execucoes.append((os.stat(manifesto).st_mtime, nome))
+        execucoes.sort(reverse=True)
+
+        limite = time.time() - self.max_age_seconds
+        # A execução atual ocupa uma das vagas de max_runs
+        manter = max(self.max_runs - 1, 0)
+        removidas = 0
+        for posicao, (modificado, nome) in enumerate(execucoes):
+            if posicao < manter and modificado >= limite:
+                continue
+            shutil.rmtree(os.path.join(self.runs_dir, nome), ignore_errors=True)
+            removidas += 1
+        if removidas:
+            logger.info(f"{removidas} execuções antigas removidas de {self.runs_dir}")
+        return removidas
+
+    def _caminho_checkpoint(self, run_id: str, etapa: str) -> str:
+        return os.path.join(self.runs_dir, run_id, "checkpoints", f"{etapa}.pkl")
+
+    def _hash_entrada(self, stage: Stage, manifesto: Dict[str, Any]) -> str:
+        """Hash das entradas da etapa: nome e hash do resultado de cada dependência."""
+        entradas = {dep: manifesto["stages"][dep]["output_hash"] for dep in stage.deps}
+        return hashlib.sha256(json.dumps([stage.name, entradas], sort_keys=True).encode()).hexdigest()
+
+    def _gravar_checkpoint(self, caminho: str, resultado: Any) -> str:
+        """Grava o resultado (pickle) e devolve o hash do conteúdo gravado."""
+        conteudo = pickle.dumps(resultado, protocol=pickle.HIGHEST_PROTOCOL)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        temporario = f"{caminho}.tmp"
+        with open(temporario, "wb") as f:
+            f.write(conteudo)
+        os.replace(temporario, caminho)
+        return hashlib.sha256(conteudo).hexdigest()
+
+    @staticmethod
+    def _ler_checkpoint(caminho: str) -> Any:
+        with open(caminho, "rb") as f:
+            return pickle.load(f)
+
+    async def run(self, run_id: Optional[str] = None, resume: bool = False,
+                  options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Executa o DAG e devolve o manifesto. Com 'resume', retoma a execução 'run_id':
+        as etapas concluídas cujas entradas não mudaram são reaproveitadas do checkpoint
+        e apenas as demais executam. 'options' são gravadas no manifesto para a retomada.
+        """
+        with run_context(run_id) as run_id:
+            if caminho_execucao(run_id, self.runs_dir) is None:
+                raise ValueError(f"run_id inválido: {run_id}")
+
+            anterior = load_manifest(run_id, self.runs_dir) if resume else None
+            if resume and anterior is None:
+                raise FileNotFoundError(f"Execução {run_id} não encontrada para retomada")
+
+            resultados: Dict[str, Any] = {}
+            manifesto: Dict[str, Any] = {
+                "run_id": run_id,
+                "name": self.name,
+                "status": "running",
+                "attempt": (anterior or {}).get("attempt", 0) + 1,
+                "options": options if options is not None else (anterior or {}).get("options"),
+                "started_at": datetime.now().isoformat(timespec="seconds"),
+                "finished_at": None,
+                "duration_ms": None,
+                "stages": {
+                    nome: {"status": "pending", "deps": list(self.stages[nome].deps), "cached": False,
+                           "started_at": None, "duration_ms": None, "error": None, "summary": None,
+                           "input_hash": None, "output_hash": None}
+                    for nome in self.order
+                },
+            }
+            self._gravar_manifesto(manifesto)
+            self._aplicar_retencao(run_id)
+            inicio = time.perf_counter()
+            logger.info(f"Execução {self.name} {'retomada' if resume else 'iniciada'}: {len(self.order)} etapas")
+
+            with start_span(self.name, run_id=run_id, attempt=manifesto["attempt"]):
+                tarefas: Dict[str, asyncio.Task] = {}
+                for nome in self.order:
+                    dependencias = [tarefas[dep] for dep in self.stages[nome].deps]
+                    etapa_anterior = (anterior or {}).get("stages", {}).get(nome)
+                    tarefas[nome] = asyncio.create_task(
+                        self._executar_etapa(self.stages[nome], dependencias, resultados, manifesto, etapa_anterior)
+                    )
+                await asyncio.gather(*tarefas.values())
+
+            etapas = manifesto["stages"].values()
+            manifesto["status"] = "success" if all(e["status"] == "success" for e in etapas) else "failed"
+            manifesto["finished_at"] = datetime.now().isoformat(timespec="seconds")
+            manifesto["duration_ms"] = round((time.perf_counter() - inicio) * 1000, 1)
+            self._gravar_manifesto(manifesto)
+            reaproveitadas = sum(1 for e in etapas if e["cached"])
+            logger.info(f"Execução {self.name} finalizada: {manifesto['status']} em {manifesto['duration_ms']} ms "
+                        f"({reaproveitadas} etapas reaproveitadas)")
+            manifesto["results"] = resultados
+            return manifesto
+
+    async def _resultado(self, dep: str, resultados: Dict[str, Any], manifesto: Dict[str, Any]) -> Any:
+        """Resultado de uma dependência; as reaproveitadas são lidas do checkpoint só quando necessárias."""
+        if dep not in resultados:
+            caminho = self._caminho_checkpoint(manifesto["run_id"], dep)
+            resultados[dep] = await asyncio.to_thread(self._ler_checkpoint, caminho)
+        return resultados[dep]
+
+    async def _executar_etapa(self, stage: Stage, dependencias: List[asyncio.Task], resultados: Dict[str, Any],
+                              manifesto: Dict[str, Any], anterior: Optional[Dict[str, Any]]) -> None:
+        if dependencias:
+            await asyncio.gather(*dependencias)
+
+        estado = manifesto["stages"][stage.name]
+        falhas = [dep for dep in stage.deps if manifesto["stages"][dep]["status"] != "success"]
+        if falhas and not stage.run_if_deps_failed:
+            estado["status"] = "skipped"
+            estado["error"] = f"Dependências sem sucesso: {falhas}"
+            logger.warning(f"Etapa {stage.name} ignorada: dependências sem sucesso {falhas}")
+            self._gravar_manifesto(manifesto)
+            return
+
+        caminho = self._caminho_checkpoint(manifesto["run_id"], stage.name)
+        if stage.checkpoint and not falhas:
+            estado["input_hash"] = self._hash_entrada(stage, manifesto)
+            if (anterior and anterior.get("status") == "success" and anterior.get("input_hash") == estado["input_hash"]
+                    and anterior.get("output_hash") and os.path.isfile(caminho)):
+                estado.update(status="success", cached=True, duration_ms=0.0, summary=anterior.get("summary"),
+                              output_hash=anterior["output_hash"])
+                logger.info(f"Etapa {stage.name} reaproveitada do checkpoint")
+                self._gravar_manifesto(manifesto)
+                return
+
+        estado["status"] = "running"
+        estado["started_at"] = datetime.now().isoformat(timespec="seconds")
+        self._gravar_manifesto(manifesto)
+        inicio = time.perf_counter()
+        try:
+            entrada = {}
+            for dep in stage.deps:
+                entrada[dep] = None if dep in falhas else await self._resultado(dep, resultados, manifesto)
+
+            with track_pipeline(stage.pipeline or stage.name) as span:
+                span.set_attribute("dag_stage", stage.name)
+                resultado = await stage.func(entrada)
+            if isinstance(resultado, dict) and resultado.get("success") is False:
+                raise StageError(resultado.get("error") or "Etapa retornou falha")
+            resultados[stage.name] = resultado
+
+            if stage.checkpoint and not falhas:
+                estado["output_hash"] = await asyncio.to_thread(self._gravar_checkpoint, caminho, resultado)
+            else:
+                # Sem checkpoint, o hash do resultado ainda identifica as entradas dos dependentes
+                estado["output_hash"] = hashlib.sha256(
+                    pickle.dumps(resultado, protocol=pickle.HIGHEST_PROTOCOL)).hexdigest()
+            estado["status"] = "success"
+            estado["summary"] = resumir_resultado(resultado)
+        except Exception as e:
+            estado["status"] = "failed"
+            estado["error"] = str(e)
+            if isinstance(e, StageError):
+                logger.error(f"Etapa {stage.name} falhou: {str(e)}")
+            else:
+                logger.exception(f"Erro inesperado na etapa {stage.name}: {str(e)}")
+        finally:
+            estado["duration_ms"] = round((time.perf_counter() - inicio) * 1000, 1)
+            self._gravar_manifesto(manifesto)
@@ -6,24 +6,29 @@ import logging
 
 from ..extractors.r189_extractor import R189Extractor
 from ..extractors.qpe_extractor import QPEExtractor
-from ..extractors.nfserv_extractor import NFServExtractor
+from ..extractors.nfserv_extractor import NFSERVExtractor
 from ..extractors.spb_extractor import SPBExtractor
 from ..extractors.municipality_code_extractor import MunicipalityCodeExtractor
 from ..sharepoint import SharePointClient
+from ..master_data import get_master_data
+from ..records import ColumnBatch, as_frame, iter_records
+from .divergence_engine import ReconciliationSpec, check_sites, find_divergences
 
 logger = logging.getLogger(__name__)
 
+# Conciliações do R189 com cada fonte (notas por empresa e nota fiscal, valores em centavos)
+CONCILIACAO_QPE = ReconciliationSpec("qpe")
+CONCILIACAO_NFSERV = ReconciliationSpec("nfserv")
+CONCILIACAO_SPB = ReconciliationSpec("spb")
+
 class ProcessingService:
     def __init__(self):
         self.r189_extractor = R189Extractor()
         self.qpe_extractor = QPEExtractor()
-        self.nfserv_extractor = NFServExtractor()
+        self.nfserv_extractor = NFSERVExtractor()
         self.spb_extractor = SPBExtractor()
         self.municipality_code_extractor = MunicipalityCodeExtractor()
         self.sharepoint_client = SharePointClient()
-        
-        # Mapeamento de CNPJ para sites aceitos - poderá ser carregado de um arquivo de configuração
-        self.cnpj_site_mapping = {}
 
     async def process_r189(self, file_content: BytesIO, file_name: str) -> Dict[str, Any]:
         try:
@@ -86,21 +91,12 @@ class ProcessingService:
                 
             logger.info("Iniciando processamento do arquivo R189")
             # Extrair dados do R189 usando o novo método process_file
-            r189_result = await self.r189_extractor.process_file(files.get('r189'))
+            r189_result = await self.r189_extractor.process_file(files.get('r189'), as_dataframe=True)
             if not r189_result['success']:
                 logger.error(f"Erro no processamento do R189: {r189_result.get('error')}")
                 return r189_result
                 
-            # Formatar dados do R189 para compatibilidade
-            r189_data = []
-            for item in r189_result['data']:
-                r189_data.append({
-                    'empresa': item['cnpj_fornecedor'],
-                    'nota_fiscal': item['nota_fiscal'],
-                    'site': item['site_name'],
-                    'valor_total': item['valor_total'],
-                    'fornecedor_r189': item['cnpj_fornecedor']
-                })
+            r189_data = self._r189_batch(r189_result['data'])
 
             # Determinar tipo de verificação
             if 'qpe' in files:
@@ -125,7 +121,7 @@ class ProcessingService:
             logger.info("Processamento concluído com sucesso")
             return {
                 "success": True,
-                "divergences": divergences
+                "divergences": list(iter_records(divergences))
             }
 
         except Exception as e:
@@ -135,177 +131,41 @@ class ProcessingService:
                 "error": f"Erro durante o processamento: {str(e)}"
             }
 
-    def _check_r189_consistency(self, r189_data: List[Dict]) -> List[Dict]:
+    @staticmethod
+    def _r189_batch(r189: pd.DataFrame) -> ColumnBatch:
         """
-        Verifica consistência dos dados do R189 (sites e CNPJs)
+        Formata os registros do R189 (R189_FIELDS) para as verificações, coluna a coluna
+        (sem um dict por linha)
         """
-        divergences = []
-        df = pd.DataFrame(r189_data)
-        
-        # Se o mapeamento não estiver carregado, carregá-lo
-        if not self.cnpj_site_mapping:
-            self._load_cnpj_mapping()
-        
-        for _, row in df.iterrows():
-            cnpj = row['empresa']
-            if cnpj in self.cnpj_site_mapping:
-                expected_sites = self.cnpj_site_mapping[cnpj]
-                if row['site'] not in expected_sites:
-                    divergences.append({
-                        "tipo": "Site incorreto",
-                        "empresa": cnpj,
-                        "nota_fiscal": row['nota_fiscal'],
-                        "site_atual": row['site'],
-                        "sites_esperados": expected_sites
-                    })
-            else:
-                divergences.append({
-                    "tipo": "CNPJ não mapeado",
-                    "empresa": cnpj,
-                    "nota_fiscal": row['nota_fiscal']
-                })
-        
-        return divergences
-        
-    def _load_cnpj_mapping(self):
+        return ColumnBatch.from_columns({
+            'empresa': r189['cnpj_fornecedor'],
+            'nota_fiscal': r189['nota_fiscal'],
+            'site': r189['site_name'],
+            'valor_total': r189['valor_total'],
+            'fornecedor_r189': r189['cnpj_fornecedor']
+        }, float_fields=('valor_total',))
+
+    def _check_r189_consistency(self, r189_data: ColumnBatch) -> pd.DataFrame:
         """
-        Carrega o mapeamento de CNPJ para sites aceitos.
-        Pode ser implementado para carregar de um arquivo Excel, banco de dados, etc.
+        Verifica consistência dos dados do R189 (sites e CNPJs)
         """
-        # Exemplo simples - em produção deve ser carregado de uma fonte externa
-        self.cnpj_site_mapping = {
-            "12345678000190": ["SITE1", "SITE2"],
-            "98765432000190": ["SITE3", "SITE4"],
-            # Adicionar outros mapeamentos conforme necessário
-        }
+        # Mapeamento de CNPJ para sites aceitos, dos dados mestres (recarregados se o arquivo mudar)
+        return check_sites(as_frame(r189_data), get_master_data().cnpj_sites)
 
-    def _find_divergences_qpe(self, r189_data: List[Dict], qpe_data: List[Dict]) -> List[Dict]:
+    def _find_divergences_qpe(self, r189_data: ColumnBatch, qpe_data: List[Dict]) -> pd.DataFrame:
         """
         Encontra divergências entre os dados do R189 e QPE
         """
-        divergences = []
-
-        # Criar DataFrames para facilitar a comparação
-        r189_df = pd.DataFrame(r189_data)
-        qpe_df = pd.DataFrame(qpe_data)
-
-        # Merge dos dados usando nota fiscal e empresa como chaves
-        merged = pd.merge(
-            r189_df, 
-            qpe_df, 
-            on=['empresa', 'nota_fiscal'], 
-            how='outer',
-            suffixes=('_r189', '_qpe')
-        )
-
-        # Encontrar divergências
-        for _, row in merged.iterrows():
-            if pd.isna(row.get('fornecedor_r189')) or pd.isna(row.get('fornecedor_qpe')):
-                # Nota fiscal presente em um arquivo mas não no outro
-                divergences.append({
-                    "tipo": "Nota fiscal não encontrada",
-                    "empresa": row['empresa'],
-                    "nota_fiscal": row['nota_fiscal'],
-                    "fornecedor_r189": row.get('fornecedor_r189'),
-                    "fornecedor_qpe": row.get('fornecedor_qpe'),
-                    "valor_r189": row.get('valor_total_r189'),
-                    "valor_qpe": row.get('valor_total_qpe')
-                })
-            elif abs(row['valor_total_r189'] - row['valor_total_qpe']) > 0.01:
-                # Divergência de valores
-                divergences.append({
-                    "tipo": "Divergência de valores",
-                    "empresa": row['empresa'],
-                    "nota_fiscal": row['nota_fiscal'],
-                    "fornecedor_r189": row['fornecedor_r189'],
-                    "fornecedor_qpe": row['fornecedor_qpe'],
-                    "valor_r189": row['valor_total_r189'],
-                    "valor_qpe": row['valor_total_qpe'],
-                    "diferenca": row['valor_total_r189'] - row['valor_total_qpe']
-                })
+        return find_divergences(as_frame(r189_data), as_frame(qpe_data), CONCILIACAO_QPE)
 
-        return divergences
-
-    def _find_divergences_nfserv(self, r189_data: List[Dict], nfserv_data: List[Dict]) -> List[Dict]:
+    def _find_divergences_nfserv(self, r189_data: ColumnBatch, nfserv_data: List[Dict]) -> pd.DataFrame:
         """
         Encontra divergências entre os dados do R189 e NFSERV
         """
-        divergences = []
-        r189_df = pd.DataFrame(r189_data)
-        nfserv_df = pd.DataFrame(nfserv_data)
-
-        # Merge dos dados
-        merged = pd.merge(
-            r189_df,
-            nfserv_df,
-            on=['empresa', 'nota_fiscal'],
-            how='outer',
-            suffixes=('_r189', '_nfserv')
-        )
-
-        for _, row in merged.iterrows():
-            if pd.isna(row.get('fornecedor_r189')) or pd.isna(row.get('fornecedor_nfserv')):
-                divergences.append({
-                    "tipo": "Nota fiscal não encontrada",
-                    "empresa": row['empresa'],
-                    "nota_fiscal": row['nota_fiscal'],
-                    "fornecedor_r189": row.get('fornecedor_r189'),
-                    "fornecedor_nfserv": row.get('fornecedor_nfserv'),
-                    "valor_r189": row.get('valor_total_r189'),
-                    "valor_nfserv": row.get('valor_total_nfserv')
-                })
-            elif abs(row['valor_total_r189'] - row['valor_total_nfserv']) > 0.01:
-                divergences.append({
-                    "tipo": "Divergência de valores",
-                    "empresa": row['empresa'],
-                    "nota_fiscal": row['nota_fiscal'],
-                    "fornecedor_r189": row['fornecedor_r189'],
-                    "fornecedor_nfserv": row['fornecedor_nfserv'],
-                    "valor_r189": row['valor_total_r189'],
-                    "valor_nfserv": row['valor_total_nfserv'],
-                    "diferenca": row['valor_total_r189'] - row['valor_total_nfserv']
-                })
-
-        return divergences
+        return find_divergences(as_frame(r189_data), as_frame(nfserv_data), CONCILIACAO_NFSERV)
 
-    def _find_divergences_spb(self, r189_data: List[Dict], spb_data: List[Dict]) -> List[Dict]:
+    def _find_divergences_spb(self, r189_data: ColumnBatch, spb_data: List[Dict]) -> pd.DataFrame:
         """
         Encontra divergências entre os dados do R189 e SPB
         """
-        divergences = []
-        r189_df = pd.DataFrame(r189_data)
-        spb_df = pd.DataFrame(spb_data)
-
-        # Merge dos dados
-        merged = pd.merge(
-            r189_df,
-            spb_df,
-            on=['empresa', 'nota_fiscal'],
-            how='outer',
-            suffixes=('_r189', '_spb')
-        )
-
-        for _, row in merged.iterrows():
-            if pd.isna(row.get('fornecedor_r189')) or pd.isna(row.get('fornecedor_spb')):
-                divergences.append({
-                    "tipo": "Nota fiscal não encontrada",
-                    "empresa": row['empresa'],
-                    "nota_fiscal": row['nota_fiscal'],
-                    "fornecedor_r189": row.get('fornecedor_r189'),
-                    "fornecedor_spb": row.get('fornecedor_spb'),
-                    "valor_r189": row.get('valor_total_r189'),
-                    "valor_spb": row.get('valor_total_spb')
-                })
-            elif abs(row['valor_total_r189'] - row['valor_total_spb']) > 0.01:
-                divergences.append({
-                    "tipo": "Divergência de valores",
-                    "empresa": row['empresa'],
-                    "nota_fiscal": row['nota_fiscal'],
-                    "fornecedor_r189": row['fornecedor_r189'],
-                    "fornecedor_spb": row['fornecedor_spb'],
-                    "valor_r189": row['valor_total_r189'],
-                    "valor_spb": row['valor_total_spb'],
-                    "diferenca": row['valor_total_r189'] - row['valor_total_spb']
-                })
-
-        return divergences
\ No newline at end of file
+        return find_divergences(as_frame(r189_data), as_frame(spb_data), CONCILIACAO_SPB)
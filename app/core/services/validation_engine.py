@@ -0,0 +1,171 @@
+import asyncio
+import logging
+from io import BytesIO
+from typing import Any, Dict, List, Optional, Sequence
+
+import pandas as pd
+
+from app.core.auth import SharePointAuth
+from app.core.metrics import track_stage
+from app.core.reports.divergence_report_r189 import DivergenceReportR189
+from app.core.reports.report_mun_code_r189 import ReportMunCodeR189
+from app.core.reports.divergence_report_qpe_r189 import DivergenceReportQPER189
+from app.core.reports.divergence_report_nfserv_r189 import DivergenceReportNFSERVR189
+from app.core.reports.divergence_report_spb_r189 import DivergenceReportSPBR189
+from app.core.reports.consolidated_report import ConsolidatedReport
+from app.core.services.orchestrator import DagRunner, Stage
+
+logger = logging.getLogger(__name__)
+
+CONSOLIDADO_PATH = "/teams/BR-TI-TIN/AutomaoFinanas/CONSOLIDADO"
+
+# Entradas das validações: arquivo na pasta CONSOLIDADO e abas preferidas (senão, a primeira aba)
+CONSOLIDADOS = {
+    "r189": ("R189_consolidado.xlsx", ("Consolidado_R189",)),
+    "mun_code": ("Municipality_Code_consolidado.xlsx", ("Municipality_Code_consolidado",)),
+    "qpe": ("QPE_consolidado.xlsx", ("QPE_Consolidado",)),
+    "nfserv": ("NFSERV_consolidado.xlsx", ("NFSERV_consolidado", "Consolidado_NFSERV")),
+    "spb": ("SPB_consolidado.xlsx", ("SPB_Consolidado",)),
+}
+
+
+def ler_consolidado(conteudo: bytes, abas: Sequence[str] = ()) -> pd.DataFrame:
+    """Lê a aba preferida do arquivo consolidado, ou a primeira aba, como fazem os relatórios."""
+    with pd.ExcelFile(BytesIO(conteudo)) as arquivo:
+        aba = next((nome for nome in abas if nome in arquivo.sheet_names), arquivo.sheet_names[0])
+        return arquivo.parse(aba)
+
+
+async def em_thread(gerar_corrotina):
+    """
+    Executa a corrotina de um relatório em uma thread, com um event loop próprio. As
+    verificações e a gravação do .xlsx são síncronas dentro dos métodos async dos relatórios;
+    assim elas não bloqueiam o event loop da API e as validações de fato executam em paralelo.
+    """
+    return await asyncio.to_thread(lambda: asyncio.run(gerar_corrotina()))
+
+
+def validation_stages(sharepoint_auth: SharePointAuth, fontes: Dict[str, str],
+                      export_format: Optional[str] = None) -> List[Stage]:
+    """
+    Etapas das cinco validações e do relatório consolidado. 'fontes' indica a etapa que
+    produz cada entrada (r189, mun_code, qpe, nfserv, spb). As validações recebem cópias dos
+    DataFrames e executam em paralelo, cada uma em uma thread (em_thread); o relatório consolidado executa mesmo se alguma falhar.
+    Com 'export_format', cada relatório também é exportado nesse formato (csv.gz ou parquet).
+    """
+    def validar(classe, obrigatorias, opcionais=()):
+        async def executar(resultados):
+            faltantes = [entrada for entrada in obrigatorias if resultados.get(fontes[entrada]) is None]
+            if faltantes:
+                arquivos = ", ".join(CONSOLIDADOS[entrada][0] for entrada in faltantes)
+                return {"success": False, "error": f"Dados consolidados indisponíveis: {arquivos}"}
+            argumentos = [resultados[fontes[entrada]] for entrada in obrigatorias]
+            argumentos += [resultados.get(fontes[entrada]) for entrada in opcionais]
+            # Os relatórios alteram as colunas recebidas (totais, SIGLA, CNPJ_Autorizado); cada
+            # thread trabalha em uma cópia, e os DataFrames compartilhados (também publicados
+            # pelo fechamento mensal) ficam intactos
+            argumentos = [df.copy() if isinstance(df, pd.DataFrame) else df for df in argumentos]
+            relatorio = classe(sharepoint_auth, export_format)
+            return await em_thread(lambda: relatorio.generate_report_from_data(*argumentos))
+        return executar
+
+    def deps(*entradas):
+        return tuple(dict.fromkeys(fontes[entrada] for entrada in entradas))
+
+    async def consolidar_relatorios(resultados):
+        def relatorio(etapa):
+            resultado = resultados.get(etapa)
+            return resultado.get("report_df") if resultado else None
+
+        relatorios = {
+            "Mun_Code_R189": relatorio("validate_mun_code"),
+            "Divergencias_R189": relatorio("validate_r189"),
+            "QPE_vs_R189": relatorio("validate_qpe"),
+            "SPB_vs_R189": relatorio("validate_spb"),
+            "NFSERV_vs_R189": relatorio("validate_nfserv"),
+        }
+        return await em_thread(lambda: ConsolidatedReport(sharepoint_auth).consolidate_from_data(relatorios))
+
+    return [
+        Stage("validate_r189", validar(DivergenceReportR189, ("r189",)), deps("r189"), pipeline="report_r189"),
+        # QPE e SPB são opcionais na validação de Municipality Code
+        Stage("validate_mun_code", validar(ReportMunCodeR189, ("mun_code", "r189"), ("qpe", "spb")),
+              deps("mun_code", "r189", "qpe", "spb"), pipeline="report_mun_code_r189", run_if_deps_failed=True),
+        Stage("validate_qpe", validar(DivergenceReportQPER189, ("qpe", "r189")), deps("qpe", "r189"),
+              pipeline="report_qpe_r189"),
+        Stage("validate_nfserv", validar(DivergenceReportNFSERVR189, ("nfserv", "r189")), deps("nfserv", "r189"),
+              pipeline="report_nfserv_r189"),
+        Stage("validate_spb", validar(DivergenceReportSPBR189, ("spb", "r189", "nfserv")), deps("spb", "r189", "nfserv"),
+              pipeline="report_spb_r189"),
+        Stage("consolidate_reports", consolidar_relatorios,
+              ("validate_r189", "validate_mun_code", "validate_qpe", "validate_nfserv", "validate_spb"),
+              pipeline="report_consolidated", run_if_deps_failed=True),
+    ]
+
+
+class ValidationEngine:
+    """
+    Executa as cinco validações de uma vez: cada arquivo consolidado é baixado e lido
+    uma única vez, as validações executam em paralelo (em threads) sobre cópias dos DataFrames e, ao
+    final, o relatório consolidado é gerado com os relatórios em memória.
+    """
+
+    def __init__(self, sharepoint_auth: Optional[SharePointAuth] = None, runs_dir: Optional[str] = None,
+                 export_format: Optional[str] = None):
+        self.sharepoint_auth = sharepoint_auth or SharePointAuth()
+        self.runs_dir = runs_dir
+        self.export_format = export_format
+
+    def build_stages(self) -> List[Stage]:
+        def carregar(entrada):
+            nome_arquivo, abas = CONSOLIDADOS[entrada]
+
+            async def executar(resultados):
+                conteudo = await asyncio.to_thread(
+                    self.sharepoint_auth.baixar_arquivo_sharepoint, nome_arquivo, CONSOLIDADO_PATH)
+                if conteudo is None:
+                    logger.warning(f"Não foi possível baixar o arquivo {nome_arquivo}")
+                    return None
+                with track_stage("parse", file_name=nome_arquivo) as span:
+                    df = await asyncio.to_thread(ler_consolidado, conteudo, abas)
+                    span.set_attribute("rows", len(df))
+                return df
+            return executar
+
+        # Os consolidados podem mudar entre execuções: a leitura sempre executa
+        stages = [Stage(f"load_{entrada}", carregar(entrada), pipeline="validations", checkpoint=False)
+                  for entrada in CONSOLIDADOS]
+        fontes = {entrada: f"load_{entrada}" for entrada in CONSOLIDADOS}
+        return stages + validation_stages(self.sharepoint_auth, fontes, self.export_format)
+
+    async def run(self, run_id: Optional[str] = None, resume: bool = False) -> Dict[str, Any]:
+        """
+        Executa as validações e devolve o resultado de cada uma (sem os DataFrames),
+        o do relatório consolidado e o manifesto da execução.
+        """
+        runner = DagRunner("validations", self.build_stages(), runs_dir=self.runs_dir)
+        manifesto = await runner.run(run_id, resume=resume, options={"export_format": self.export_format})
+        resultados = manifesto.pop("results")
+
+        validacoes = {}
+        for etapa in ("validate_mun_code", "validate_r189", "validate_qpe", "validate_spb", "validate_nfserv"):
+            estado = manifesto["stages"][etapa]
+            resultado = resultados.get(etapa)
+            if isinstance(resultado, dict):
+                validacoes[etapa] = {chave: valor for chave, valor in resultado.items() if chave != "report_df"}
+            elif estado["cached"]:
+                validacoes[etapa] = {"success": True, "message": (estado["summary"] or {}).get("message")}
+            else:
+                validacoes[etapa] = {"success": False, "error": estado["error"]}
+
+        consolidado = resultados.get("consolidate_reports") or {
+            "success": manifesto["stages"]["consolidate_reports"]["status"] == "success",
+            "error": manifesto["stages"]["consolidate_reports"]["error"],
+        }
+        return {
+            "success": manifesto["status"] == "success",
+            "run_id": manifesto["run_id"],
+            "validations": validacoes,
+            "consolidated": consolidado,
+            "manifest": manifesto,
+        }
@@ -6,6 +6,8 @@ from typing import Optional, List, Dict, Any
 import logging
 import aiohttp
 import asyncio
+from app.core.metrics import stage, record_sharepoint_call
+from app.core.tracing import set_span_attributes
 
 logger = logging.getLogger(__name__)
 
@@ -36,7 +38,8 @@ class SharePointAuth:
     def acquire_token(self) -> Optional[str]:
         """Adquire um token de acesso para o SharePoint."""
         try:
-            token_endpoint = f"https://login.microsoftonline.com/{self.tenant_id}/oauth2/token"
+            token_endpoint = os.getenv("SHAREPOINT_TOKEN_URL") or \
+                f"https://login.microsoftonline.com/{self.tenant_id}/oauth2/token"
             
             data = {
                 'grant_type': 'client_credentials',
@@ -46,11 +49,14 @@ class SharePointAuth:
             }
             
             response = requests.post(token_endpoint, data=data)
+            record_sharepoint_call("token", response.ok)
             response.raise_for_status()  # Lança exceção para status codes de erro
             
             return response.json().get("access_token")
             
         except Exception as e:
+            if not isinstance(e, requests.HTTPError):
+                record_sharepoint_call("token", False)
             logger.error(f"Erro ao adquirir token: {str(e)}")
             return None
 
@@ -83,6 +89,7 @@ class SharePointClient:
             }
 
             async with session.get(url, headers=headers) as response:
+                record_sharepoint_call("list", response.status == 200)
                 if response.status == 200:
                     data = await response.json()
                     return data.get("d", {}).get("results", [])
@@ -91,11 +98,14 @@ class SharePointClient:
                     return None
                     
         except Exception as e:
+            record_sharepoint_call("list", False)
             self.logger.error(f"Error listing files: {str(e)}")
             return None
 
+    @stage("download")
     async def download_file(self, folder_path: str, file_name: str) -> Optional[BytesIO]:
         """Download de arquivo do SharePoint de forma assíncrona"""
+        set_span_attributes(file_name=file_name, folder=folder_path)
         try:
             token = self.auth.acquire_token()
             if not token:
@@ -112,17 +122,22 @@ class SharePointClient:
             async with session.get(url, headers=headers) as response:
                 if response.status == 200:
                     content = await response.read()
+                    record_sharepoint_call("download", True, bytes_received=len(content))
                     return BytesIO(content)
                 else:
+                    record_sharepoint_call("download", False)
                     self.logger.error(f"Error downloading file: {response.status}")
                     return None
                     
         except Exception as e:
+            record_sharepoint_call("download", False)
             self.logger.error(f"Error downloading file: {str(e)}")
             return None
 
+    @stage("upload")
     async def upload_file(self, file_content: BytesIO, destination_name: str, folder_path: str) -> bool:
         """Upload a file to SharePoint asynchronously"""
+        set_span_attributes(file_name=destination_name, folder=folder_path)
         try:
             token = self.auth.acquire_token()
             if not token:
@@ -145,6 +160,8 @@ class SharePointClient:
             self.logger.info(f"Tamanho do arquivo: {file_content.getbuffer().nbytes} bytes")
             
             async with session.post(url, data=file_content.getvalue(), headers=headers) as response:
+                record_sharepoint_call("upload", response.status in [200, 201],
+                                       bytes_sent=file_content.getbuffer().nbytes)
                 if response.status in [200, 201]:
                     self.logger.info(f"Arquivo {destination_name} enviado com sucesso")
                     return True
@@ -155,6 +172,7 @@ class SharePointClient:
                     return False
             
         except Exception as e:
+            record_sharepoint_call("upload", False)
             self.logger.error(f"Error uploading file: {str(e)}")
             import traceback
             self.logger.error(traceback.format_exc())
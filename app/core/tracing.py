@@ -0,0 +1,264 @@
+import os
+import sys
+import json
+import time
+import logging
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Exportadores disponíveis em TRACING_EXPORTER (separados por vírgula):
+#   none    - spans desligados (padrão)
+#   memory  - mantém os últimos TRACING_MEMORY_MAX_SPANS spans em memória
+#   console - escreve cada span finalizado como uma linha JSON no stderr
+#   otel    - delega ao SDK do OpenTelemetry configurado no processo, se instalado
+EXPORTADORES_VALIDOS = ("none", "memory", "console", "otel")
+
+
+def _valor_atributo(valor: Any):
+    """Converte o valor para um tipo aceito como atributo de span (str, int, float, bool)."""
+    if isinstance(valor, (str, bool, int, float)):
+        return valor
+    if valor is None:
+        return ""
+    return str(valor)
+
+
+class Span:
+    """Span de uma etapa, com atributos e duração, compatível com o modelo do OpenTelemetry."""
+
+    def __init__(self, name: str, trace_id: str, span_id: str, parent_id: Optional[str] = None,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.attributes: Dict[str, Any] = {}
+        self.status = "OK"
+        self.error: Optional[str] = None
+        self.start_time = time.time_ns()
+        self.end_time: Optional[int] = None
+        self._inicio = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        if attributes:
+            self.set_attributes(attributes)
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = _valor_atributo(value)
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def update_name(self, name: str) -> None:
+        self.name = name
+
+    def record_exception(self, exc: BaseException) -> None:
+        self.status = "ERROR"
+        self.error = f"{type(exc).__name__}: {exc}"
+
+    def end(self) -> None:
+        self.end_time = time.time_ns()
+        self.duration_ms = round((time.perf_counter() - self._inicio) * 1000, 3)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "error": self.error,
+            "attributes": dict(self.attributes),
+        }
+
+
+class _SpanInerte:
+    """Span usado quando o tracing está desligado: aceita as mesmas chamadas e não registra nada."""
+    name = ""
+    trace_id = span_id = parent_id = None
+    attributes: Dict[str, Any] = {}
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        pass
+
+    def update_name(self, name: str) -> None:
+        pass
+
+    def record_exception(self, exc: BaseException) -> None:
+        pass
+
+
+SPAN_INERTE = _SpanInerte()
+
+
+class InMemorySpanExporter:
+    """Guarda os spans finalizados em memória (limitado aos mais recentes)."""
+
+    def __init__(self, max_spans: int = 2000):
+        self._spans = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self._spans.append(span)
+
+    def get_finished_spans(self, trace_id: Optional[str] = None) -> List[Span]:
+        with self._lock:
+            spans = list(self._spans)
+        if trace_id:
+            spans = [span for span in spans if span.trace_id == trace_id]
+        return spans
+
+    def clear(self) -> None:
+        with self._lock:
+            self._spans.clear()
+
+
+class ConsoleSpanExporter:
+    """Escreve cada span finalizado como uma linha JSON."""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stderr
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        linha = json.dumps(span.to_dict(), ensure_ascii=False, default=str)
+        with self._lock:
+            self.stream.write(linha + "\n")
+            self.stream.flush()
+
+
+# Span ativo no contexto atual (requisição/tarefa); os spans abertos dentro dele viram filhos
+_span_atual: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("span_atual", default=None)
+
+
+class Tracer:
+    """
+    Cria spans aninhados pelo contexto atual e os entrega aos exportadores.
+    Sem exportadores, start_span não registra nada e devolve um span inerte.
+    """
+
+    def __init__(self, exporters: Iterable = (), otel_tracer=None):
+        self.exporters = list(exporters)
+        self._otel_tracer = otel_tracer
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.exporters) or self._otel_tracer is not None
+
+    def memory_exporter(self) -> Optional[InMemorySpanExporter]:
+        for exporter in self.exporters:
+            if isinstance(exporter, InMemorySpanExporter):
+                return exporter
+        return None
+
+    @contextmanager
+    def start_span(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+        if self._otel_tracer is not None:
+            atributos = {key: _valor_atributo(value) for key, value in (attributes or {}).items()}
+            with self._otel_tracer.start_as_current_span(name, attributes=atributos) as span:
+                yield span
+            return
+
+        if not self.exporters:
+            yield SPAN_INERTE
+            return
+
+        pai = _span_atual.get()
+        span = Span(
+            name,
+            trace_id=pai.trace_id if pai else os.urandom(16).hex(),
+            span_id=os.urandom(8).hex(),
+            parent_id=pai.span_id if pai else None,
+            attributes=attributes
+        )
+        token = _span_atual.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            _span_atual.reset(token)
+            span.end()
+            for exporter in self.exporters:
+                try:
+                    exporter.export(span)
+                except Exception as e:
+                    logger.warning(f"Erro ao exportar span {span.name}: {str(e)}")
+
+    def current_span(self):
+        if self._otel_tracer is not None:
+            from opentelemetry import trace
+            return trace.get_current_span()
+        return _span_atual.get() or SPAN_INERTE
+
+
+def _criar_tracer_otel():
+    try:
+        from opentelemetry import trace
+    except ImportError:
+        logger.warning("TRACING_EXPORTER=otel, mas o pacote opentelemetry não está instalado; usando 'memory'")
+        return None
+    return trace.get_tracer("automacao_financas")
+
+
+def configure_tracing(exporter: Optional[str] = None) -> Tracer:
+    """
+    Configura o tracer do processo a partir de 'exporter' ou da variável TRACING_EXPORTER.
+    Retorna o tracer configurado.
+    """
+    global _tracer
+    nomes = [nome.strip().lower() for nome in (exporter or os.getenv("TRACING_EXPORTER", "none")).split(",") if nome.strip()]
+    invalidos = [nome for nome in nomes if nome not in EXPORTADORES_VALIDOS]
+    if invalidos:
+        logger.warning(f"Exportadores de tracing desconhecidos ignorados: {invalidos}")
+
+    otel_tracer = _criar_tracer_otel() if "otel" in nomes else None
+    if "otel" in nomes and otel_tracer is None:
+        nomes.append("memory")
+
+    exporters = []
+    if "memory" in nomes:
+        exporters.append(InMemorySpanExporter(int(os.getenv("TRACING_MEMORY_MAX_SPANS", "2000"))))
+    if "console" in nomes:
+        exporters.append(ConsoleSpanExporter())
+
+    _tracer = Tracer(exporters, otel_tracer)
+    return _tracer
+
+
+_tracer: Optional[Tracer] = None
+
+
+def get_tracer() -> Tracer:
+    if _tracer is None:
+        return configure_tracing()
+    return _tracer
+
+
+def start_span(name: str, **attributes):
+    """Abre um span filho do span atual (context manager)."""
+    return get_tracer().start_span(name, attributes)
+
+
+def current_span():
+    return get_tracer().current_span()
+
+
+def set_span_attributes(**attributes) -> None:
+    """Acrescenta atributos (linhas, bytes, nomes de arquivo...) ao span atual."""
+    span = current_span()
+    for key, value in attributes.items():
+        span.set_attribute(key, _valor_atributo(value))
@@ -1,6 +1,11 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.routes import r189, qpe, spb, nfserv, municipality_code, validation
+from app.core.logging_config import configure_logging
+from app.api.middleware import MetricsMiddleware, RunContextMiddleware
+from app.api.routes import r189, qpe, spb, nfserv, municipality_code, validation, extraction_store, metrics, admin, month_close
+
+# Logging estruturado e não bloqueante (ver app/core/logging_config.py)
+configure_logging()
 
 app = FastAPI(
     title="Automação Finanças API",
@@ -17,10 +22,20 @@ app.add_middleware(
     allow_headers=["*"]
 )
 
+# Métricas de latência por rota (adicionado por último para envolver os demais middlewares)
+app.add_middleware(MetricsMiddleware)
+
+# run_id da requisição nos logs (mais externo, para valer também para os middlewares acima)
+app.add_middleware(RunContextMiddleware)
+
 # Depois adicionar as rotas
 app.include_router(r189.router)
 app.include_router(qpe.router)
 app.include_router(spb.router)
 app.include_router(nfserv.router)
 app.include_router(municipality_code.router)
-app.include_router(validation.router, prefix="/api/validations", tags=["Validations"])
\ No newline at end of file
+app.include_router(validation.router, prefix="/api/validations", tags=["Validations"])
+app.include_router(extraction_store.router)
+app.include_router(metrics.router)
+app.include_router(admin.router)
+app.include_router(month_close.router)
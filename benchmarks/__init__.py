@@ -0,0 +1,16 @@
+import os
+
+# Os benchmarks não acessam o SharePoint, mas os extratores exigem as credenciais na criação
+CREDENCIAIS_FICTICIAS = {
+    "CLIENT_ID": "benchmark",
+    "CLIENT_SECRET": "benchmark",
+    "TENANT_ID": "benchmark",
+    "RESOURCE": "00000003-0000-0ff1-ce00-000000000000/localhost",
+    "SITE_URL": "http://localhost",
+}
+
+
+def usar_credenciais_ficticias() -> None:
+    """Define credenciais fictícias nas variáveis de ambiente que ainda não estiverem definidas."""
+    for chave, valor in CREDENCIAIS_FICTICIAS.items():
+        os.environ.setdefault(chave, valor)
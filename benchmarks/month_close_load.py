@@ -0,0 +1,375 @@
+"""
+Teste de carga do fechamento mensal contra a API real (app.main) e o SharePoint local.
+
+Sobe o benchmarks.sharepoint_standin e a API (uvicorn) em subprocessos, popula as
+pastas do SharePoint local com uma planilha R189 e PDFs sintéticos e executa, com N
+usuários simultâneos, o fluxo do frontend:
+
+    1. lista os arquivos de cada tipo (/api/arquivos/{tipo})
+    2. processa R189, QPE, NFSERV, SPB e MUN_CODE
+    3. executa todas as validações (/api/validations/*)
+    4. consolida os relatórios (/api/validations/consolidate_reports)
+
+Ao final informa, por endpoint, as latências p50/p95/p99 e a taxa de erro, e o
+consumo de CPU e RSS do servidor (processo principal e workers, lidos de /proc).
+
+Uso:
+    python -m benchmarks.month_close_load --users 4 --iterations 2 [--workers 2] [--latency-ms 30] [--output month_close.json]
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import asyncio
+import argparse
+import platform
+import subprocess
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+
+from benchmarks import CREDENCIAIS_FICTICIAS
+from benchmarks.pdf_backends import percentil
+from benchmarks.pdf_corpus import gerar_corpus
+from benchmarks.r189_workbook import gerar_xlsx, converter_para_xlsb
+
+BASE_SHAREPOINT = "/teams/BR-TI-TIN/AutomaoFinanas"
+PASTAS = {
+    "R189": f"{BASE_SHAREPOINT}/R189",
+    "QPE": f"{BASE_SHAREPOINT}/QPE",
+    "NFSERV": f"{BASE_SHAREPOINT}/NFSERV",
+    "SPB": f"{BASE_SHAREPOINT}/SPB",
+}
+
+# Endpoints de processamento por tipo, na ordem do frontend
+PROCESSAMENTO = [
+    ("R189", "/api/processar/r189"),
+    ("QPE", "/qpe/process"),
+    ("NFSERV", "/nfserv/process"),
+    ("SPB", "/spb/process"),
+    ("MUN_CODE", "/mun_code/process"),
+]
+
+VALIDACOES = [
+    "/api/validations/r189",
+    "/api/validations/qpe_r189",
+    "/api/validations/nfserv_r189",
+    "/api/validations/spb_r189",
+    "/api/validations/mun_code_r189",
+]
+
+CONSOLIDACAO = "/api/validations/consolidate_reports"
+
+
+def porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def popular_sharepoint(raiz: str, linhas_r189: int, pdfs_por_tipo: int) -> None:
+    """Cria as pastas do SharePoint local com uma planilha R189 e PDFs sintéticos."""
+    pasta_r189 = os.path.join(raiz, PASTAS["R189"].strip("/"))
+    os.makedirs(pasta_r189, exist_ok=True)
+    caminho_xlsx = gerar_xlsx(os.path.join(raiz, "R189_sintetico.xlsx"), linhas_r189)
+    destino = os.path.join(pasta_r189, "R189_sintetico.xlsb")
+    try:
+        converter_para_xlsb(caminho_xlsx, destino)
+    except (RuntimeError, subprocess.CalledProcessError):
+        # A listagem do R189 só considera arquivos .xlsb; sem o LibreOffice o conteúdo
+        # continua xlsx, o que o pandas identifica pelo conteúdo na leitura
+        shutil.copyfile(caminho_xlsx, destino)
+    os.remove(caminho_xlsx)
+
+    corpus = os.path.join(raiz, "_corpus")
+    golden = gerar_corpus(corpus, pdfs_por_tipo)
+    for arquivo, referencia in golden.items():
+        pasta = os.path.join(raiz, PASTAS[referencia["type"]].strip("/"))
+        os.makedirs(pasta, exist_ok=True)
+        shutil.move(os.path.join(corpus, arquivo), os.path.join(pasta, arquivo))
+    shutil.rmtree(corpus)
+
+
+class MonitorProcesso:
+    """Amostra CPU e RSS de um processo e de seus descendentes a partir de /proc (Linux)."""
+
+    def __init__(self, pid: int, intervalo: float = 0.5):
+        self.pid = pid
+        self.intervalo = intervalo
+        self.amostras: List[Dict[str, float]] = []
+        self._ticks = os.sysconf("SC_CLK_TCK")
+        self._pagina = os.sysconf("SC_PAGE_SIZE")
+
+    def _descendentes(self) -> List[int]:
+        filhos = defaultdict(list)
+        for entrada in os.listdir("/proc"):
+            if not entrada.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entrada}/stat") as f:
+                    campos = f.read().rsplit(")", 1)[1].split()
+                filhos[int(campos[1])].append(int(entrada))
+            except (OSError, IndexError):
+                continue
+
+        pids, pendentes = [], [self.pid]
+        while pendentes:
+            pid = pendentes.pop()
+            pids.append(pid)
+            pendentes.extend(filhos.get(pid, []))
+        return pids
+
+    def _ler(self) -> Dict[str, float]:
+        cpu_ticks = rss_paginas = 0
+        for pid in self._descendentes():
+            try:
+                with open(f"/proc/{pid}/stat") as f:
+                    campos = f.read().rsplit(")", 1)[1].split()
+                # campos a partir do estado (3º campo do stat): utime=14, stime=15, rss=24
+                cpu_ticks += int(campos[11]) + int(campos[12])
+                rss_paginas += int(campos[21])
+            except (OSError, IndexError, ValueError):
+                continue
+        return {"time": time.monotonic(), "cpu_seconds": cpu_ticks / self._ticks,
+                "rss_mb": rss_paginas * self._pagina / 1024 / 1024}
+
+    async def executar(self, parar: asyncio.Event) -> None:
+        while not parar.is_set():
+            self.amostras.append(self._ler())
+            try:
+                await asyncio.wait_for(parar.wait(), self.intervalo)
+            except asyncio.TimeoutError:
+                pass
+        self.amostras.append(self._ler())
+
+    def resumo(self) -> Dict[str, Any]:
+        if len(self.amostras) < 2:
+            return {}
+        usos = []
+        for anterior, atual in zip(self.amostras, self.amostras[1:]):
+            intervalo = atual["time"] - anterior["time"]
+            if intervalo > 0:
+                usos.append((atual["cpu_seconds"] - anterior["cpu_seconds"]) / intervalo * 100)
+        primeira, ultima = self.amostras[0], self.amostras[-1]
+        duracao = ultima["time"] - primeira["time"]
+        return {
+            "cpu_seconds": round(ultima["cpu_seconds"] - primeira["cpu_seconds"], 2),
+            "cpu_percent_avg": round((ultima["cpu_seconds"] - primeira["cpu_seconds"]) / duracao * 100, 1) if duracao else 0.0,
+            "cpu_percent_max": round(max(usos), 1) if usos else 0.0,
+            "rss_mb_max": round(max(a["rss_mb"] for a in self.amostras), 1),
+            "rss_mb_end": round(ultima["rss_mb"], 1),
+        }
+
+
+class Medicoes:
+    """Latências e erros por endpoint."""
+
+    def __init__(self):
+        self.latencias: Dict[str, List[float]] = defaultdict(list)
+        self.erros: Dict[str, int] = defaultdict(int)
+        self.exemplos_erro: Dict[str, str] = {}
+
+    def registrar(self, endpoint: str, segundos: float, erro: Optional[str]) -> None:
+        self.latencias[endpoint].append(segundos * 1000)
+        if erro:
+            self.erros[endpoint] += 1
+            self.exemplos_erro.setdefault(endpoint, erro[:300])
+
+    def resumo(self) -> Dict[str, Any]:
+        endpoints = {}
+        for endpoint, valores in self.latencias.items():
+            endpoints[endpoint] = {
+                "requests": len(valores),
+                "errors": self.erros[endpoint],
+                "error_rate": round(self.erros[endpoint] / len(valores), 4),
+                "latency_ms": {
+                    "p50": round(percentil(valores, 50), 1),
+                    "p95": round(percentil(valores, 95), 1),
+                    "p99": round(percentil(valores, 99), 1),
+                    "max": round(max(valores), 1),
+                },
+                "error_sample": self.exemplos_erro.get(endpoint),
+            }
+        return endpoints
+
+
+async def chamar(session: aiohttp.ClientSession, medicoes: Medicoes, metodo: str, url: str,
+                 endpoint: str, corpo: Any = None) -> Optional[Dict[str, Any]]:
+    """Executa uma requisição e registra a latência; respostas com success=false contam como erro."""
+    inicio = time.perf_counter()
+    erro = None
+    dados = None
+    try:
+        async with session.request(metodo, url, json=corpo) as resposta:
+            texto = await resposta.text()
+            try:
+                dados = json.loads(texto)
+            except ValueError:
+                dados = None
+            if resposta.status >= 400:
+                erro = f"HTTP {resposta.status}: {texto}"
+            elif isinstance(dados, dict) and dados.get("success") is False:
+                erro = f"success=false: {dados.get('error') or dados.get('message')}"
+    except Exception as e:
+        erro = f"{type(e).__name__}: {e}"
+    medicoes.registrar(endpoint, time.perf_counter() - inicio, erro)
+    return dados
+
+
+async def usuario(api: str, iteracoes: int, arquivos_por_tipo: int, medicoes: Medicoes, timeout: float) -> None:
+    """Executa o fluxo de fechamento mensal 'iteracoes' vezes."""
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        for _ in range(iteracoes):
+            arquivos: Dict[str, List[str]] = {}
+            for tipo, _ in PROCESSAMENTO:
+                dados = await chamar(session, medicoes, "GET", f"{api}/api/arquivos/{tipo}", "/api/arquivos/{tipo}")
+                lista = (dados or {}).get("arquivos", []) if isinstance(dados, dict) else []
+                arquivos[tipo] = [arquivo["nome"] for arquivo in lista][:arquivos_por_tipo]
+
+            for tipo, endpoint in PROCESSAMENTO:
+                await chamar(session, medicoes, "POST", f"{api}{endpoint}", endpoint, arquivos[tipo])
+
+            for endpoint in VALIDACOES:
+                await chamar(session, medicoes, "POST", f"{api}{endpoint}", endpoint)
+
+            await chamar(session, medicoes, "POST", f"{api}{CONSOLIDACAO}", CONSOLIDACAO)
+
+
+async def aguardar_servidor(url: str, processo: subprocess.Popen, limite: float = 60) -> None:
+    fim = time.monotonic() + limite
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < fim:
+            if processo.poll() is not None:
+                raise RuntimeError(f"Processo encerrado antes de responder em {url}")
+            try:
+                async with session.get(url) as resposta:
+                    if resposta.status < 500:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Servidor não respondeu em {url}")
+
+
+async def executar(args) -> Dict[str, Any]:
+    workdir = os.path.abspath(args.workdir)
+    raiz_sharepoint = os.path.join(workdir, "sharepoint")
+    if os.path.exists(raiz_sharepoint):
+        shutil.rmtree(raiz_sharepoint)
+    popular_sharepoint(raiz_sharepoint, args.r189_rows, args.pdfs)
+
+    porta_sp, porta_api = porta_livre(), porta_livre()
+    sharepoint = f"http://127.0.0.1:{porta_sp}"
+    api = f"http://127.0.0.1:{porta_api}"
+
+    ambiente = {
+        **os.environ,
+        **CREDENCIAIS_FICTICIAS,
+        "SITE_URL": f"{sharepoint}{BASE_SHAREPOINT}",
+        "SHAREPOINT_TOKEN_URL": f"{sharepoint}/benchmark/tokens/OAuth/2",
+        "EXTRACTION_STORE_DIR": os.path.join(workdir, "extraction_store"),
+    }
+    if args.no_extraction_store:
+        ambiente["EXTRACTION_STORE_ENABLED"] = "false"
+
+    saida_logs = open(os.path.join(workdir, "month_close_servers.log"), "w")
+    processos = []
+    try:
+        processos.append(subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.sharepoint_standin", "--root", raiz_sharepoint,
+             "--port", str(porta_sp), "--latency-ms", str(args.latency_ms),
+             "--bandwidth-kbps", str(args.bandwidth_kbps), "--throttle-rate", str(args.throttle_rate)],
+            env=ambiente, stdout=saida_logs, stderr=subprocess.STDOUT
+        ))
+        await aguardar_servidor(f"{sharepoint}/_standin/stats", processos[0])
+
+        processos.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(porta_api),
+             "--workers", str(args.workers), "--log-level", "warning"],
+            env=ambiente, stdout=saida_logs, stderr=subprocess.STDOUT
+        ))
+        await aguardar_servidor(f"{api}/openapi.json", processos[1])
+
+        medicoes = Medicoes()
+        monitor = MonitorProcesso(processos[1].pid)
+        parar = asyncio.Event()
+        tarefa_monitor = asyncio.create_task(monitor.executar(parar))
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*[
+            usuario(api, args.iterations, args.files_per_type, medicoes, args.timeout)
+            for _ in range(args.users)
+        ])
+        duracao = time.perf_counter() - inicio
+        parar.set()
+        await tarefa_monitor
+
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f"{sharepoint}/_standin/stats") as resposta:
+                estatisticas_sharepoint = await resposta.json()
+    finally:
+        for processo in reversed(processos):
+            processo.terminate()
+            try:
+                processo.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                processo.kill()
+        saida_logs.close()
+
+    endpoints = medicoes.resumo()
+    total = sum(e["requests"] for e in endpoints.values())
+    return {
+        "benchmark": "month_close_load",
+        "python": platform.python_version(),
+        "config": {
+            "users": args.users, "iterations": args.iterations, "workers": args.workers,
+            "r189_rows": args.r189_rows, "pdfs_per_type": args.pdfs, "files_per_type": args.files_per_type,
+            "latency_ms": args.latency_ms, "bandwidth_kbps": args.bandwidth_kbps, "throttle_rate": args.throttle_rate,
+        },
+        "duration_seconds": round(duracao, 2),
+        "requests": total,
+        "requests_per_sec": round(total / duracao, 2) if duracao else 0.0,
+        "error_rate": round(sum(e["errors"] for e in endpoints.values()) / total, 4) if total else 0.0,
+        "endpoints": endpoints,
+        "server": monitor.resumo(),
+        "sharepoint": estatisticas_sharepoint,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Teste de carga do fechamento mensal")
+    parser.add_argument("--users", type=int, default=2, help="Usuários simultâneos")
+    parser.add_argument("--iterations", type=int, default=1, help="Execuções do fluxo por usuário")
+    parser.add_argument("--workers", type=int, default=1, help="Workers do uvicorn")
+    parser.add_argument("--r189-rows", type=int, default=10000)
+    parser.add_argument("--pdfs", type=int, default=20, help="PDFs sintéticos de cada tipo no SharePoint local")
+    parser.add_argument("--files-per-type", type=int, default=20, help="Arquivos enviados em cada processamento")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Latência do SharePoint local")
+    parser.add_argument("--bandwidth-kbps", type=float, default=0.0, help="Banda do SharePoint local (KB/s)")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fração de respostas 429 do SharePoint local")
+    parser.add_argument("--timeout", type=float, default=600, help="Timeout de cada requisição (s)")
+    parser.add_argument("--no-extraction-store", action="store_true", help="Desabilita o ExtractionStore na API")
+    parser.add_argument("--workdir", default=os.path.join("data", "month_close"))
+    parser.add_argument("--output", default="month_close_load.json")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.workdir, exist_ok=True)
+    relatorio = asyncio.run(executar(args))
+
+    print(f"{'endpoint':<42} {'req':>5} {'erro%':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for endpoint, dados in relatorio["endpoints"].items():
+        print(f"{endpoint:<42} {dados['requests']:>5} {dados['error_rate'] * 100:>6.1f} "
+              f"{dados['latency_ms']['p50']:>9} {dados['latency_ms']['p95']:>9} {dados['latency_ms']['p99']:>9}")
+    print(f"Servidor: {relatorio['server']}")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(relatorio, f, indent=2, ensure_ascii=False)
+    print(f"Resultados gravados em {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+Compara os backends de extração de texto de PDF instalados sobre um corpus de PDFs.
+
+Para cada backend mede a latência de extração por página e a acurácia dos
+campos extraídos (QPE/NFSERV/SPB) em relação aos valores de referência.
+
+Uso:
+    python -m benchmarks.pdf_backends --corpus <pasta> --golden <golden.json> [--backends pypdf2,pymupdf] [--output resultado.json]
+
+O arquivo golden.json mapeia o nome de cada PDF do corpus para o tipo de
+documento e os valores esperados:
+    {"nota_1.pdf": {"type": "QPE", "fields": {"QPE_ID": "QPE-123", "VALOR_TOTAL": 10.5, ...}}}
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+from io import BytesIO
+from typing import Any, Dict, List
+
+from app.core.extractors.pdf_backends import available_backends, get_backend
+from app.core.extractors.pdf_engine import PDFExtractionEngine
+from app.core.extractors.document_specs import QPE_SPEC, NFSERV_SPEC, SPB_SPEC
+
+SPECS = {spec.name: spec for spec in (QPE_SPEC, NFSERV_SPEC, SPB_SPEC)}
+
+
+def valores_iguais(obtido: Any, esperado: Any) -> bool:
+    """Compara valores extraídos; números são comparados com tolerância de meio centavo."""
+    if isinstance(esperado, (int, float)) and isinstance(obtido, (int, float)):
+        return abs(obtido - esperado) < 0.005
+    return obtido == esperado
+
+
+def percentil(valores: List[float], p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[indice]
+
+
+def avaliar_backend(nome: str, corpus: str, golden: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Executa o backend sobre todo o corpus e calcula latência por página e acurácia."""
+    backend = get_backend(nome)
+    engines = {tipo: PDFExtractionEngine(spec, backend=backend) for tipo, spec in SPECS.items()}
+
+    latencias_ms: List[float] = []
+    campos_total = campos_corretos = documentos_corretos = 0
+    erros: List[Dict[str, Any]] = []
+
+    for arquivo, referencia in golden.items():
+        with open(os.path.join(corpus, arquivo), "rb") as f:
+            conteudo = f.read()
+
+        engine = engines[referencia["type"]]
+        try:
+            documento = backend.open(BytesIO(conteudo))
+            textos = []
+            for indice in range(min(documento.page_count, engine.spec.max_pages)):
+                inicio = time.perf_counter()
+                textos.append(documento.page_text(indice))
+                latencias_ms.append((time.perf_counter() - inicio) * 1000)
+            registro = engine.extract_fields(engine.join_pages(textos))._asdict()
+        except Exception as e:
+            erros.append({"arquivo": arquivo, "erro": str(e)})
+            campos_total += len(referencia["fields"])
+            continue
+
+        documento_correto = True
+        for campo, esperado in referencia["fields"].items():
+            campos_total += 1
+            if valores_iguais(registro.get(campo), esperado):
+                campos_corretos += 1
+            else:
+                documento_correto = False
+                erros.append({"arquivo": arquivo, "campo": campo, "esperado": esperado, "obtido": registro.get(campo)})
+        documentos_corretos += documento_correto
+
+    return {
+        "backend": nome,
+        "documents": len(golden),
+        "pages": len(latencias_ms),
+        "page_latency_ms": {
+            "mean": round(statistics.fmean(latencias_ms), 3) if latencias_ms else 0.0,
+            "p50": round(percentil(latencias_ms, 50), 3),
+            "p95": round(percentil(latencias_ms, 95), 3),
+            "max": round(max(latencias_ms), 3) if latencias_ms else 0.0
+        },
+        "field_accuracy": round(campos_corretos / campos_total, 4) if campos_total else 0.0,
+        "document_accuracy": round(documentos_corretos / len(golden), 4) if golden else 0.0,
+        "mismatches": erros
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark dos backends de texto de PDF")
+    parser.add_argument("--corpus", required=True, help="Pasta com os PDFs")
+    parser.add_argument("--golden", required=True, help="Arquivo JSON com os valores de referência")
+    parser.add_argument("--backends", help="Lista separada por vírgula (padrão: todos os instalados)")
+    parser.add_argument("--output", help="Arquivo JSON de saída com os resultados")
+    args = parser.parse_args(argv)
+
+    with open(args.golden, encoding="utf-8") as f:
+        golden = json.load(f)
+
+    backends = args.backends.split(",") if args.backends else available_backends()
+    resultados = [avaliar_backend(nome, args.corpus, golden) for nome in backends]
+
+    print(f"{'backend':<12} {'páginas':>8} {'média ms':>10} {'p95 ms':>10} {'acurácia':>9}")
+    for r in resultados:
+        print(f"{r['backend']:<12} {r['pages']:>8} {r['page_latency_ms']['mean']:>10} "
+              f"{r['page_latency_ms']['p95']:>10} {r['field_accuracy']:>9}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"results": resultados}, f, indent=2, ensure_ascii=False, default=str)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
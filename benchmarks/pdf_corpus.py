@@ -0,0 +1,193 @@
+"""
+Gerador de um corpus sintético de PDFs QPE, NFSERV e SPB, com os valores de referência.
+
+Os PDFs reproduzem os trechos de layout que os padrões de document_specs.py
+procuram ("TOMADOR DE SERVIÇOS", "VALOR DO DOCUMENTO", "N. CONTROLE:",
+"Código de Verificação", ...) com dados fictícios, sem informação de fornecedores.
+Parte dos documentos tem duas páginas, com o valor na segunda, para exercitar a
+leitura sob demanda de páginas.
+
+Os PDFs são montados diretamente (texto em Helvetica/WinAnsiEncoding), sem
+dependências externas. O arquivo golden.json gerado segue o formato usado por
+benchmarks.pdf_backends e benchmarks.pdf_throughput.
+
+Uso:
+    python -m benchmarks.pdf_corpus --output data/pdf_corpus --count 200 [--seed 42]
+"""
+import os
+import sys
+import json
+import random
+import argparse
+from typing import Any, Dict, List, Tuple
+
+from benchmarks.r189_workbook import CNPJ_SITES
+
+CIDADES = [("JARAGUA DO SUL", "SC"), ("BLUMENAU", "SC"), ("SAO BERNARDO DO CAMPO", "SP"),
+           ("GRAVATAI", "RS"), ("BETIM", "MG"), ("ITAJAI", "SC"), ("LINHARES", "ES")]
+CIDADES_ACENTUADAS = [("SÃO PAULO", "SP"), ("GUARAMIRIM", "SC"), ("MAUÁ", "SP"), ("CONTAGEM", "MG")]
+RUAS = ["RUA DAS FLORES", "AVENIDA PREFEITO WALDEMAR GRUBBA", "RUA JOINVILLE", "RODOVIA BR 280"]
+SIGLAS_NFSERV = ["ABC", "WEL", "PMA", "WTB", "RFC"]
+
+
+def _escapar(texto: str) -> bytes:
+    """Codifica uma linha como string literal de PDF (WinAnsiEncoding)."""
+    texto = texto.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return texto.encode("cp1252")
+
+
+def montar_pdf(paginas: List[List[str]]) -> bytes:
+    """Monta um PDF mínimo com uma linha de texto por item de cada página."""
+    objetos: List[bytes] = []
+    ids_paginas = []
+    proximo_id = 4  # 1: catálogo, 2: árvore de páginas, 3: fonte
+
+    for linhas in paginas:
+        conteudo = b"BT /F1 10 Tf 14 TL 50 800 Td " + b" T* ".join(b"(" + _escapar(linha) + b") Tj" for linha in linhas) + b" ET"
+        id_pagina, id_conteudo = proximo_id, proximo_id + 1
+        proximo_id += 2
+        ids_paginas.append(id_pagina)
+        objetos.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {id_conteudo} 0 R >>".encode()
+        )
+        objetos.append(b"<< /Length " + str(len(conteudo)).encode() + b" >>\nstream\n" + conteudo + b"\nendstream")
+
+    kids = " ".join(f"{i} 0 R" for i in ids_paginas)
+    objetos = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{kids}] /Count {len(ids_paginas)} >>".encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ] + objetos
+
+    saida = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for numero, objeto in enumerate(objetos, start=1):
+        offsets.append(len(saida))
+        saida += f"{numero} 0 obj\n".encode() + objeto + b"\nendobj\n"
+
+    inicio_xref = len(saida)
+    saida += f"xref\n0 {len(objetos) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        saida += f"{offset:010d} 00000 n \n".encode()
+    saida += f"trailer\n<< /Size {len(objetos) + 1} /Root 1 0 R >>\nstartxref\n{inicio_xref}\n%%EOF\n".encode()
+    return bytes(saida)
+
+
+def _valor(rng: random.Random) -> Tuple[float, str]:
+    """Sorteia um valor e o formata no padrão brasileiro (1.234,56)."""
+    valor = round(rng.uniform(50, 250000), 2)
+    texto = f"{valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+    return valor, texto
+
+
+def _paginar(rng: random.Random, linhas: List[str], linha_valor: str) -> List[List[str]]:
+    """Distribui as linhas em uma ou duas páginas; em parte dos documentos o valor fica na segunda."""
+    if rng.random() < 0.3:
+        segunda = ["OUTRAS INFORMAÇÕES", "DOCUMENTO EMITIDO POR ME OU EPP OPTANTE PELO SIMPLES NACIONAL"]
+        if rng.random() < 0.5:
+            return [linhas, segunda + [linha_valor]]
+        return [linhas + [linha_valor], segunda]
+    return [linhas + [linha_valor]]
+
+
+def gerar_qpe(rng: random.Random, indice: int) -> Tuple[List[List[str]], Dict[str, Any]]:
+    cnpj = rng.choice(CNPJ_SITES)[0]
+    cidade, uf = rng.choice(CIDADES)
+    valor, valor_texto = _valor(rng)
+    campos = {
+        "CNPJ": cnpj,
+        "QPE_ID": f"QPE-{indice:06d}",
+        "NOTA_FISCAL": f"{rng.randint(0, 9999999):07d}",
+        "VALOR_TOTAL": valor,
+        "CIDADE": cidade,
+    }
+    linhas = [
+        "PREFEITURA MUNICIPAL - NOTA FISCAL DE SERVIÇOS ELETRÔNICA",
+        "PRESTADOR DE SERVIÇOS",
+        "SERVICOS INDUSTRIAIS EXEMPLO LTDA",
+        f"{rng.choice(RUAS)}, {rng.randint(1, 9999)}, {cidade} - {uf}",
+        "TOMADOR DE SERVIÇOS",
+        f"WEG EQUIPAMENTOS ELETRICOS S/A CNPJ {cnpj}",
+        f"CODIGO DO PEDIDO {campos['QPE_ID']}",
+        f"NUMERO DO DOCUMENTO GERADOR{campos['NOTA_FISCAL']}",
+    ]
+    return _paginar(rng, linhas, f"VALOR DO DOCUMENTO {valor_texto}"), campos
+
+
+def gerar_nfserv(rng: random.Random, indice: int) -> Tuple[List[List[str]], Dict[str, Any]]:
+    cnpj = rng.choice(CNPJ_SITES)[0]
+    cidade, uf = rng.choice(CIDADES + CIDADES_ACENTUADAS)
+    valor, valor_texto = _valor(rng)
+    nfserv_id = f"{rng.choice(SIGLAS_NFSERV)}-{indice:06d}"
+    prefixo = f"{rng.choice(SIGLAS_NFSERV)}_" if rng.random() < 0.5 else ""
+    campos = {"CNPJ": cnpj, "NFSERV_ID": nfserv_id, "VALOR_TOTAL": valor, "CIDADE": cidade}
+    linhas = [
+        "NOTA FISCAL DE SERVIÇO",
+        f"N. CONTROLE: {prefixo}{nfserv_id}",
+        "DADOS DO TOMADOR",
+        f"CNPJ: {cnpj}",
+        f"CIDADE {cidade} ESTADO {uf}",
+    ]
+    return _paginar(rng, linhas, f"VALOR DO DOCUMENTO {valor_texto}"), campos
+
+
+def gerar_spb(rng: random.Random, indice: int) -> Tuple[List[List[str]], Dict[str, Any]]:
+    cnpj = rng.choice(CNPJ_SITES)[0]
+    cidade, _ = rng.choice(CIDADES + CIDADES_ACENTUADAS)
+    valor, valor_texto = _valor(rng)
+    campos = {
+        "CNPJ": cnpj,
+        "SPB_ID": f"SPB-{indice:06d}",
+        "Num_Nota": f"0000{rng.randint(0, 99999):05d}",
+        "VALOR_TOTAL": valor,
+        "CIDADE": cidade,
+    }
+    separador = "----" if rng.random() < 0.5 else ""
+    linhas = [
+        "PREFEITURA DE SAO PAULO - NOTA FISCAL ELETRÔNICA DE SERVIÇOS",
+        f"Código de Verificação{campos['Num_Nota']}",
+        f"PEDIDO {campos['SPB_ID']}",
+        "TOMADOR DE SERVIÇOS",
+        f"CPF/CNPJ: {cnpj}",
+        f"CEP: {rng.randint(10000, 99999)}-{rng.randint(0, 999):03d} {cidade}{separador} INTERMEDIÁRIO DE SERVIÇOS",
+    ]
+    return _paginar(rng, linhas, f"VALOR DO DOCUMENTO {valor_texto}"), campos
+
+
+GERADORES = {"QPE": gerar_qpe, "NFSERV": gerar_nfserv, "SPB": gerar_spb}
+
+
+def gerar_corpus(destino: str, quantidade: int, seed: int = 42) -> Dict[str, Dict[str, Any]]:
+    """Gera 'quantidade' PDFs de cada tipo em 'destino' e grava o golden.json correspondente."""
+    rng = random.Random(seed)
+    os.makedirs(destino, exist_ok=True)
+    golden: Dict[str, Dict[str, Any]] = {}
+
+    for tipo, gerador in GERADORES.items():
+        for indice in range(1, quantidade + 1):
+            paginas, campos = gerador(rng, indice)
+            nome = f"{tipo}_{indice:06d}.pdf"
+            with open(os.path.join(destino, nome), "wb") as f:
+                f.write(montar_pdf(paginas))
+            golden[nome] = {"type": tipo, "fields": campos}
+
+    with open(os.path.join(destino, "golden.json"), "w", encoding="utf-8") as f:
+        json.dump(golden, f, indent=2, ensure_ascii=False)
+    return golden
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Gera um corpus sintético de PDFs QPE/NFSERV/SPB")
+    parser.add_argument("--output", default=os.path.join("data", "pdf_corpus"), help="Pasta de destino")
+    parser.add_argument("--count", type=int, default=100, help="Quantidade de PDFs de cada tipo")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    golden = gerar_corpus(args.output, args.count, args.seed)
+    print(f"{len(golden)} PDFs gerados em {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
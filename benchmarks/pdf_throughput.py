@@ -0,0 +1,162 @@
+"""
+Benchmark de vazão (documentos/s) dos extratores QPE, NFSERV e SPB.
+
+Executa extrair_dados_pdf de cada extrator sobre o corpus em modo serial e em
+paralelo (ProcessPoolExecutor), e confere os campos extraídos contra o
+golden.json: assim um ganho de velocidade só é aceito se os resultados não mudam.
+O ExtractionStore é desabilitado para que todos os documentos sejam realmente analisados.
+
+Uso:
+    python -m benchmarks.pdf_corpus --output data/pdf_corpus --count 200
+    python -m benchmarks.pdf_throughput --corpus data/pdf_corpus [--workers 4] [--output pdf_throughput.json]
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import Any, Dict, List, Tuple
+
+from benchmarks import usar_credenciais_ficticias
+from benchmarks.pdf_backends import valores_iguais
+
+EXTRATORES = {
+    "QPE": "app.core.extractors.qpe_extractor:QPEExtractor",
+    "NFSERV": "app.core.extractors.nfserv_extractor:NFSERVExtractor",
+    "SPB": "app.core.extractors.spb_extractor:SPBExtractor",
+}
+
+# Extratores criados no processo (um por tipo), reaproveitados entre documentos
+_extratores: Dict[str, Any] = {}
+
+
+def _preparar_processo() -> None:
+    """Configura o processo para o benchmark: sem ExtractionStore, sem logs por documento."""
+    os.environ["EXTRACTION_STORE_ENABLED"] = "false"
+    usar_credenciais_ficticias()
+    logging.getLogger().setLevel(logging.ERROR)
+
+
+def _extrator(tipo: str):
+    if tipo not in _extratores:
+        import importlib
+
+        modulo, classe = EXTRATORES[tipo].split(":")
+        _extratores[tipo] = getattr(importlib.import_module(modulo), classe)()
+        logging.getLogger().setLevel(logging.ERROR)
+    return _extratores[tipo]
+
+
+def extrair(tarefa: Tuple[str, bytes]) -> Dict[str, Any]:
+    """Extrai os campos de um PDF com o extrator do tipo informado."""
+    tipo, conteudo = tarefa
+    return _extrator(tipo).extrair_dados_pdf(BytesIO(conteudo)) or {}
+
+
+def executar_serial(tarefas: List[Tuple[str, bytes]]) -> Tuple[float, List[Dict[str, Any]]]:
+    inicio = time.perf_counter()
+    resultados = [extrair(tarefa) for tarefa in tarefas]
+    return time.perf_counter() - inicio, resultados
+
+
+def executar_paralelo(tarefas: List[Tuple[str, bytes]], workers: int) -> Tuple[float, List[Dict[str, Any]]]:
+    with ProcessPoolExecutor(max_workers=workers, initializer=_preparar_processo) as executor:
+        # Aquece os processos (importação e criação dos extratores) fora da medição
+        list(executor.map(extrair, tarefas[:workers]))
+        inicio = time.perf_counter()
+        resultados = list(executor.map(extrair, tarefas, chunksize=max(1, len(tarefas) // (workers * 4))))
+        return time.perf_counter() - inicio, resultados
+
+
+def acuracia(resultados: List[Dict[str, Any]], referencias: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Compara os campos extraídos com o golden e lista as divergências."""
+    campos_total = campos_corretos = 0
+    divergencias = []
+    for obtido, referencia in zip(resultados, referencias):
+        for campo, esperado in referencia["fields"].items():
+            campos_total += 1
+            if valores_iguais(obtido.get(campo), esperado):
+                campos_corretos += 1
+            else:
+                divergencias.append({"arquivo": referencia["arquivo"], "campo": campo,
+                                     "esperado": esperado, "obtido": obtido.get(campo)})
+    return {
+        "field_accuracy": round(campos_corretos / campos_total, 4) if campos_total else 0.0,
+        "mismatches": divergencias,
+    }
+
+
+def avaliar_tipo(tipo: str, corpus: str, golden: Dict[str, Dict[str, Any]], workers: int) -> Dict[str, Any]:
+    referencias = []
+    tarefas = []
+    for arquivo, referencia in golden.items():
+        if referencia["type"] != tipo:
+            continue
+        with open(os.path.join(corpus, arquivo), "rb") as f:
+            tarefas.append((tipo, f.read()))
+        referencias.append({"arquivo": arquivo, **referencia})
+
+    if not tarefas:
+        return {"type": tipo, "documents": 0}
+
+    segundos_serial, serial = executar_serial(tarefas)
+    segundos_paralelo, paralelo = executar_paralelo(tarefas, workers)
+    resultado_serial = acuracia(serial, referencias)
+
+    return {
+        "type": tipo,
+        "documents": len(tarefas),
+        "serial": {
+            "seconds": round(segundos_serial, 3),
+            "docs_per_sec": round(len(tarefas) / segundos_serial, 1),
+        },
+        "parallel": {
+            "workers": workers,
+            "seconds": round(segundos_paralelo, 3),
+            "docs_per_sec": round(len(tarefas) / segundos_paralelo, 1),
+        },
+        "speedup": round(segundos_serial / segundos_paralelo, 2) if segundos_paralelo else 0.0,
+        "field_accuracy": resultado_serial["field_accuracy"],
+        "parallel_matches_serial": serial == paralelo,
+        "mismatches": resultado_serial["mismatches"],
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de vazão dos extratores de PDF")
+    parser.add_argument("--corpus", default=os.path.join("data", "pdf_corpus"), help="Pasta com os PDFs e o golden.json")
+    parser.add_argument("--golden", help="Arquivo golden (padrão: <corpus>/golden.json)")
+    parser.add_argument("--types", default=",".join(EXTRATORES), help="Tipos separados por vírgula")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--output", help="Arquivo JSON de saída com os resultados")
+    args = parser.parse_args(argv)
+
+    _preparar_processo()
+    with open(args.golden or os.path.join(args.corpus, "golden.json"), encoding="utf-8") as f:
+        golden = json.load(f)
+
+    resultados = [avaliar_tipo(tipo, args.corpus, golden, args.workers) for tipo in args.types.split(",")]
+
+    print(f"{'tipo':<8} {'docs':>6} {'serial docs/s':>14} {'paralelo docs/s':>16} {'speedup':>8} {'acurácia':>9} {'iguais':>7}")
+    for r in resultados:
+        if not r["documents"]:
+            continue
+        print(f"{r['type']:<8} {r['documents']:>6} {r['serial']['docs_per_sec']:>14} "
+              f"{r['parallel']['docs_per_sec']:>16} {r['speedup']:>8} {r['field_accuracy']:>9} "
+              f"{str(r['parallel_matches_serial']):>7}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"benchmark": "pdf_throughput", "python": platform.python_version(),
+                       "results": resultados}, f, indent=2, ensure_ascii=False, default=str)
+
+    ok = all(r.get("field_accuracy", 1.0) == 1.0 and r.get("parallel_matches_serial", True) for r in resultados)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,276 @@
+"""
+Benchmark do processamento de planilhas R189 sintéticas.
+
+Mede o tempo de parede, o pico de memória (RSS) e as linhas por segundo de:
+    - ler_planilha_r189 (também o tamanho em memória das abas lidas)
+    - R189Extractor.consolidar_r189
+    - MunicipalityCodeExtractor.consolidar_municipality_code (sem o envio ao SharePoint)
+    - DivergenceReportR189.check_divergences (sobre o R189 consolidado)
+
+Cada medição roda em um processo próprio, para que o pico de RSS de uma etapa
+não contamine as demais. Linhas por segundo são calculadas sobre as linhas
+da planilha R189 gerada. As planilhas são geradas por benchmarks.r189_workbook
+e reaproveitadas entre execuções (pasta --workdir).
+
+Com --dtypes category,object cada etapa é medida com as colunas repetitivas do R189
+(app.core.extractors.r189_schema) como category e como object, e o resultado inclui
+a economia de tempo e memória do category ("savings").
+
+Uso:
+    python -m benchmarks.r189_parsing --rows 10000,100000,1000000 [--format xlsx|xlsb] [--dtypes category,object] [--output r189_benchmark.json]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import platform
+import multiprocessing
+from datetime import datetime
+from io import BytesIO
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows: sem getrusage, o pico de RSS fica None
+    resource = None
+
+from benchmarks import usar_credenciais_ficticias
+from benchmarks.r189_workbook import gerar_r189
+
+ETAPAS = ["ler_planilha_r189", "consolidar_r189", "consolidar_municipality_code", "check_divergences"]
+
+
+# Modos das colunas CNPJ, site, tipo de nota e código do município (ver r189_schema)
+DTYPES = ["category", "object"]
+
+
+def rss_pico_mb() -> Optional[float]:
+    """
+    Pico de RSS do processo atual, em MB (ru_maxrss é KB no Linux e bytes no macOS);
+    None onde o módulo resource não existe (Windows).
+    """
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        pico /= 1024
+    return round(pico / 1024, 1)
+
+
+class _EnvioDescartado:
+    """Substitui o SharePointAuth no envio do arquivo consolidado, descartando o upload."""
+
+    async def enviar_arquivo_sharepoint(self, conteudo: bytes, nome_arquivo: str, pasta: str) -> bool:
+        return True
+
+
+def _ler_planilha_r189(caminho: str) -> Callable[[], Any]:
+    from app.core.extractors.r189_extractor import ler_planilha_r189
+
+    with open(caminho, "rb") as f:
+        conteudo = f.read()
+    return lambda: ler_planilha_r189(BytesIO(conteudo))
+
+
+def _consolidar_r189(caminho: str) -> Callable[[], Any]:
+    from app.core.extractors.r189_extractor import R189Extractor
+
+    extractor = R189Extractor()
+    with open(caminho, "rb") as f:
+        conteudo = f.read()
+    return lambda: asyncio.run(extractor.consolidar_r189(BytesIO(conteudo)))
+
+
+def _consolidar_municipality_code(caminho: str) -> Callable[[], Any]:
+    from app.core.extractors.municipality_code_extractor import MunicipalityCodeExtractor
+
+    extractor = MunicipalityCodeExtractor()
+    extractor.sharepoint_auth = _EnvioDescartado()
+    with open(caminho, "rb") as f:
+        conteudo = f.read()
+    return lambda: asyncio.run(extractor.consolidar_municipality_code(BytesIO(conteudo)))
+
+
+def _check_divergences(caminho: str) -> Callable[[], Any]:
+    import pandas as pd
+    from app.core.extractors.r189_schema import aplicar_schema_r189
+    from app.core.reports.divergence_report_r189 import DivergenceReportR189
+
+    report = DivergenceReportR189()
+    # Mesmos dtypes do R189 consolidado em memória no fechamento do mês
+    consolidado = aplicar_schema_r189(pd.read_excel(caminho, sheet_name='Consolidado_R189'))
+    return lambda: asyncio.run(report.check_divergences(consolidado))
+
+
+PREPARACAO = {
+    "ler_planilha_r189": _ler_planilha_r189,
+    "consolidar_r189": _consolidar_r189,
+    "consolidar_municipality_code": _consolidar_municipality_code,
+    "check_divergences": _check_divergences,
+}
+
+
+def tamanho_mb(resultado: Any) -> Optional[float]:
+    """Memória ocupada pelo DataFrame (ou pelas abas) devolvido pela etapa, em MB."""
+    import pandas as pd
+
+    if isinstance(resultado, pd.DataFrame):
+        resultado = {"": resultado}
+    if not isinstance(resultado, dict):
+        return None
+    total = sum(df.memory_usage(deep=True).sum() for df in resultado.values())
+    return round(total / 1024 / 1024, 1)
+
+
+def medir_etapa(etapa: str, caminho: str, dtypes: str = "category") -> Dict[str, Any]:
+    """Executa uma etapa no processo atual e retorna tempo e memória."""
+    usar_credenciais_ficticias()
+    from app.core.extractors import r189_schema
+
+    r189_schema.DTYPES_CATEGORICOS = dtypes == "category"
+    executar = PREPARACAO[etapa](caminho)
+    # Os logs por linha (DEBUG/WARNING) dominariam o tempo medido e a saída do benchmark
+    logging.getLogger().setLevel(logging.ERROR)
+    rss_inicial = rss_pico_mb()
+
+    inicio = time.perf_counter()
+    resultado = executar()
+    segundos = time.perf_counter() - inicio
+
+    return {
+        "seconds": round(segundos, 3),
+        "baseline_rss_mb": rss_inicial,
+        "peak_rss_mb": rss_pico_mb(),
+        "frame_mb": tamanho_mb(resultado),
+    }
+
+
+def medir_isolado(etapa: str, caminho: str, dtypes: str = "category") -> Dict[str, Any]:
+    """Executa a etapa em um processo novo (spawn), para medir o pico de RSS isoladamente."""
+    contexto = multiprocessing.get_context("spawn")
+    with contexto.Pool(1) as pool:
+        return pool.apply(medir_etapa, (etapa, caminho, dtypes))
+
+
+def preparar_planilhas(rows: int, formato: str, workdir: str) -> Dict[str, str]:
+    """Gera (ou reaproveita) a planilha R189 e o R189 consolidado usado por check_divergences."""
+    os.makedirs(workdir, exist_ok=True)
+    caminho = os.path.join(workdir, f"R189_{rows}.{formato}")
+    if not os.path.exists(caminho):
+        print(f"Gerando {caminho}...")
+        gerar_r189(caminho, rows, formato)
+
+    consolidado = os.path.join(workdir, f"R189_{rows}_consolidado.xlsx")
+    if not os.path.exists(consolidado):
+        usar_credenciais_ficticias()
+        from app.core.extractors.r189_extractor import R189Extractor
+
+        with open(caminho, "rb") as f:
+            resultado = asyncio.run(R189Extractor().consolidar_r189(BytesIO(f.read())))
+        with open(consolidado, "wb") as f:
+            f.write(resultado.getvalue())
+
+    return {
+        "ler_planilha_r189": caminho,
+        "consolidar_r189": caminho,
+        "consolidar_municipality_code": caminho,
+        "check_divergences": consolidado,
+    }
+
+
+def economia(resultados: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Tempo e memória economizados com as colunas category, por etapa e tamanho."""
+    medicoes = {(r["stage"], r["rows"], r["dtypes"]): r for r in resultados}
+    economias = []
+    for (etapa, rows, dtypes), categorico in medicoes.items():
+        objeto = medicoes.get((etapa, rows, "object"))
+        if dtypes != "category" or objeto is None:
+            continue
+        item = {
+            "stage": etapa,
+            "rows": rows,
+            "seconds_saved": round(objeto["seconds"] - categorico["seconds"], 3),
+            "speedup": round(objeto["seconds"] / categorico["seconds"], 2) if categorico["seconds"] else None,
+        }
+        if objeto["peak_rss_mb"] is not None and categorico["peak_rss_mb"] is not None:
+            item["peak_rss_mb_saved"] = round(objeto["peak_rss_mb"] - categorico["peak_rss_mb"], 1)
+        if objeto["frame_mb"] is not None and categorico["frame_mb"] is not None:
+            item["frame_mb_saved"] = round(objeto["frame_mb"] - categorico["frame_mb"], 1)
+        economias.append(item)
+    return economias
+
+
+def executar(tamanhos: List[int], formato: str, etapas: List[str], workdir: str,
+             dtypes: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Executa todas as etapas para cada tamanho de planilha e modo de dtypes."""
+    resultados = []
+    for rows in tamanhos:
+        arquivos = preparar_planilhas(rows, formato, workdir)
+        for etapa in etapas:
+            for modo in dtypes or DTYPES[:1]:
+                medicao = medir_isolado(etapa, arquivos[etapa], modo)
+                resultado = {
+                    "stage": etapa,
+                    "rows": rows,
+                    "format": formato,
+                    "dtypes": modo,
+                    "input_mb": round(os.path.getsize(arquivos[etapa]) / 1024 / 1024, 2),
+                    **medicao,
+                    "rows_per_sec": round(rows / medicao["seconds"], 1) if medicao["seconds"] else 0.0,
+                }
+                print(f"{etapa:<30} {modo:<9} {rows:>9} {resultado['seconds']:>9}s "
+                      f"{resultado['peak_rss_mb']!s:>9} MB {resultado['rows_per_sec']:>12} linhas/s")
+                resultados.append(resultado)
+
+    economias = economia(resultados)
+    for item in economias:
+        print(f"{item['stage']:<30} {item['rows']:>9} category economiza {item['seconds_saved']}s "
+              f"({item['speedup']}x) e {item.get('peak_rss_mb_saved')} MB de pico")
+
+    import pandas as pd
+
+    return {
+        "benchmark": "r189_parsing",
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "results": resultados,
+        "savings": economias,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark do processamento de planilhas R189")
+    parser.add_argument("--rows", default="10000,100000", help="Tamanhos separados por vírgula (ex.: 10000,100000,1000000)")
+    parser.add_argument("--format", choices=["xlsx", "xlsb"], default="xlsx")
+    parser.add_argument("--stages", default=",".join(ETAPAS), help="Etapas separadas por vírgula")
+    parser.add_argument("--dtypes", default="category",
+                        help="Modos das colunas repetitivas do R189, separados por vírgula (category,object)")
+    parser.add_argument("--workdir", default=os.path.join("data", "benchmarks"), help="Pasta das planilhas geradas")
+    parser.add_argument("--output", default="r189_benchmark.json", help="Arquivo JSON de saída com os resultados")
+    args = parser.parse_args(argv)
+
+    etapas = args.stages.split(",")
+    desconhecidas = [etapa for etapa in etapas if etapa not in PREPARACAO]
+    if desconhecidas:
+        parser.error(f"Etapas desconhecidas: {desconhecidas}")
+
+    dtypes = args.dtypes.split(",")
+    if any(modo not in DTYPES for modo in dtypes):
+        parser.error(f"Modos de dtypes inválidos: {dtypes}; use {DTYPES}")
+
+    tamanhos = [int(valor) for valor in args.rows.split(",")]
+    relatorio = executar(tamanhos, args.format, etapas, args.workdir, dtypes)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(relatorio, f, indent=2, ensure_ascii=False)
+    print(f"Resultados gravados em {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
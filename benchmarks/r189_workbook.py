@@ -0,0 +1,152 @@
+"""
+Gerador de planilhas R189 sintéticas para benchmarks.
+
+A planilha segue o layout esperado por consolidar_r189 e
+consolidar_municipality_code: aba BRASIL com o cabeçalho na linha 13,
+CNPJ/Invoice/Site preenchidos apenas na primeira linha de cada nota e uma
+linha de subtotal ("Total" em Account number) ao final de cada nota.
+
+Uso:
+    python -m benchmarks.r189_workbook --rows 100000 --output R189_sintetico.xlsx [--format xlsb]
+"""
+import os
+import sys
+import random
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+import xlsxwriter
+
+# Pares CNPJ -> Site Name usados nas notas geradas
+CNPJ_SITES = [
+    ("60.621.141/0005-87", "PMAR_BRCSA"), ("07.175.725/0030-02", "WEL_BRGCV"),
+    ("60.621.141/0006-68", "PMAR_BRMUA"), ("07.175.725/0010-50", "WEL_BRJGS"),
+    ("10.885.321/0001-74", "WLI_BRLNH"), ("84.584.994/0007-16", "WTB_BRSZO"),
+    ("07.175.725/0042-38", "WEL_BRBTI"), ("14.759.173/0001-00", "WCES_BRMTT"),
+    ("14.759.173/0002-83", "WCES_BRBGV"), ("07.175.725/0024-56", "WEL_BRRPO"),
+    ("07.175.725/0014-84", "WEL_BRBNU"), ("13.772.125/0007-77", "RF_BRCOR"),
+    ("07.175.725/0004-02", "WEL_BRITJ"), ("60.621.141/0004-04", "PMAR_BRGRM"),
+    ("07.175.725/0021-03", "WEL_BRSBC"), ("07.175.725/0026-18", "WEL_BRSPO"),
+]
+
+MUNICIPALITY_CODES = ["14.02", "17.01", "14.01", "1.07", "3115", "1880", "1.03"]
+SIGLAS = ["QPE", "SPB", "WEL", "PMA", "WTB", "WCE"]
+ACCOUNTS = ["4110001", "4110002", "4120010", "4130005", "4210001"]
+
+COLUNAS = [
+    "Company", "CNPJ - WEG", "Site Name - WEG 2", "Invoice number", "Invoice Type",
+    "Municipality Code", "Account number", "Supplier", "Total Geral"
+]
+
+# Linha (0-based) do cabeçalho, equivalente a header=12 no read_excel
+LINHA_CABECALHO = 12
+
+
+def gerar_linhas(rows: int, seed: int = 42):
+    """Gera as linhas de dados (notas + subtotais) até completar a quantidade pedida."""
+    rng = random.Random(seed)
+    geradas = 0
+    nota = 0
+
+    while geradas < rows:
+        nota += 1
+        cnpj, site = rng.choice(CNPJ_SITES)
+        # 2% das notas com site divergente do mapeamento
+        if rng.random() < 0.02:
+            site = rng.choice(CNPJ_SITES)[1]
+        sigla = rng.choice(SIGLAS)
+        invoice = f"{sigla}-{nota:06d}"
+        invoice_type = "SRV" if rng.random() < 0.8 else "MAT"
+        municipality_code = rng.choice(MUNICIPALITY_CODES)
+        supplier = f"FORNECEDOR {rng.randint(1, 500):03d}"
+
+        total_nota = 0.0
+        for linha in range(rng.randint(1, 4)):
+            if geradas >= rows:
+                return
+            valor = round(rng.uniform(10, 50000), 2)
+            total_nota += valor
+            primeira = linha == 0
+            yield [
+                "WEG",
+                cnpj if primeira else None,
+                site if primeira else None,
+                invoice if primeira else None,
+                invoice_type,
+                municipality_code,
+                rng.choice(ACCOUNTS),
+                supplier,
+                valor,
+            ]
+            geradas += 1
+
+        if geradas >= rows:
+            return
+        yield ["WEG", None, None, None, None, None, "Total", None, round(total_nota, 2)]
+        geradas += 1
+
+
+def gerar_xlsx(caminho: str, rows: int, seed: int = 42) -> str:
+    """Grava a planilha R189 sintética em formato xlsx."""
+    workbook = xlsxwriter.Workbook(caminho, {"constant_memory": True})
+    brasil = workbook.add_worksheet("BRASIL")
+
+    brasil.write_row(0, 0, ["R189 - Relatório de Notas Fiscais de Serviço"])
+    brasil.write_row(2, 0, ["Empresa", "WEG"])
+    brasil.write_row(3, 0, ["Linhas geradas", rows])
+    brasil.write_row(LINHA_CABECALHO, 0, COLUNAS)
+
+    for indice, linha in enumerate(gerar_linhas(rows, seed), start=LINHA_CABECALHO + 1):
+        brasil.write_row(indice, 0, linha)
+
+    workbook.close()
+    return caminho
+
+
+def converter_para_xlsb(caminho_xlsx: str, caminho_xlsb: str) -> str:
+    """
+    Converte o xlsx para xlsb com o LibreOffice (soffice), pois nenhuma
+    biblioteca Python disponível grava o formato xlsb.
+    """
+    soffice = shutil.which("soffice") or shutil.which("libreoffice")
+    if not soffice:
+        raise RuntimeError("Conversão para xlsb requer o LibreOffice (soffice) instalado")
+
+    with tempfile.TemporaryDirectory() as destino:
+        subprocess.run(
+            [soffice, "--headless", "--convert-to", 'xlsb:Calc MS Excel 2007 Binary', "--outdir", destino, caminho_xlsx],
+            check=True, capture_output=True
+        )
+        gerado = os.path.join(destino, os.path.splitext(os.path.basename(caminho_xlsx))[0] + ".xlsb")
+        shutil.move(gerado, caminho_xlsb)
+    return caminho_xlsb
+
+
+def gerar_r189(caminho: str, rows: int, formato: str = "xlsx", seed: int = 42) -> str:
+    """Gera a planilha R189 sintética no formato pedido (xlsx ou xlsb)."""
+    if formato == "xlsx":
+        return gerar_xlsx(caminho, rows, seed)
+    if formato == "xlsb":
+        with tempfile.TemporaryDirectory() as temporario:
+            caminho_xlsx = gerar_xlsx(os.path.join(temporario, "r189.xlsx"), rows, seed)
+            return converter_para_xlsb(caminho_xlsx, caminho)
+    raise ValueError(f"Formato não suportado: {formato}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Gera uma planilha R189 sintética")
+    parser.add_argument("--rows", type=int, default=10000, help="Quantidade de linhas de dados na aba BRASIL")
+    parser.add_argument("--output", required=True, help="Arquivo de saída")
+    parser.add_argument("--format", choices=["xlsx", "xlsb"], default="xlsx")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    gerar_r189(args.output, args.rows, args.format, args.seed)
+    print(f"Planilha gerada: {args.output} ({args.rows} linhas)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
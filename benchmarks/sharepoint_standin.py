@@ -0,0 +1,302 @@
+"""
+Servidor local que imita a API REST do SharePoint e o endpoint de token (ACS/Azure AD)
+usados pela aplicação, para testes de carga e de integração sem acesso ao tenant.
+
+Endpoints atendidos:
+    POST .../tokens/OAuth/2 e .../oauth2/token                          -> token fictício
+    GET  .../_api/web/GetFolderByServerRelativeUrl('<pasta>')/Files     -> lista os arquivos da pasta
+                                                                         (aceita $orderby e $top)
+    POST .../_api/web/GetFolderByServerRelativeUrl('<pasta>')/Files/add(url='<nome>',overwrite=true)
+    GET  .../_api/web/GetFileByServerRelativeUrl('<arquivo>')/$value   -> conteúdo do arquivo
+    POST .../_api/web/GetFileByServerRelativeUrl('<arquivo>')/DeleteObject()
+    POST .../_api/contextinfo                                          -> FormDigestValue fictício
+    GET  /_standin/stats                                               -> contadores de requisições
+
+Os arquivos ficam em um diretório local: a pasta '/teams/X/R189' corresponde a <root>/teams/X/R189.
+Latência, banda e respostas 429 (throttling) são configuráveis.
+
+Uso:
+    python -m benchmarks.sharepoint_standin --root data/sharepoint --port 8765 [--latency-ms 50] [--bandwidth-kbps 2048] [--throttle-rate 0.05]
+
+Para apontar a aplicação para o servidor local:
+    SITE_URL=http://127.0.0.1:8765/teams/BR-TI-TIN/AutomaoFinanas
+    SHAREPOINT_TOKEN_URL=http://127.0.0.1:8765/<tenant>/tokens/OAuth/2
+"""
+import os
+import re
+import sys
+import uuid
+import socket
+import random
+import asyncio
+import threading
+import logging
+import argparse
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable, Optional, Tuple
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+_LISTAR = re.compile(r"/_api/web/GetFolderByServerRelativeUrl\('(?P<pasta>[^']*)'\)/Files/?$", re.IGNORECASE)
+_ENVIAR = re.compile(
+    r"/_api/web/GetFolderByServerRelativeUrl\('(?P<pasta>[^']*)'\)/Files/add\(url='(?P<nome>[^']*)'(?:,overwrite=(?P<overwrite>true|false))?\)$",
+    re.IGNORECASE
+)
+_BAIXAR = re.compile(r"/_api/web/GetFileByServerRelativeUrl\('(?P<arquivo>[^']*)'\)/\$value$", re.IGNORECASE)
+_EXCLUIR = re.compile(r"/_api/web/GetFileByServerRelativeUrl\('(?P<arquivo>[^']*)'\)/DeleteObject\(\)$", re.IGNORECASE)
+_CONTEXTINFO = re.compile(r"/_api/contextinfo$", re.IGNORECASE)
+_TOKEN = re.compile(r"/(tokens/OAuth/2|oauth2/token)$", re.IGNORECASE)
+
+
+@dataclass
+class StandinConfig:
+    """
+    Configuração do servidor.
+
+    Attributes:
+        root: Diretório local com os arquivos
+        latency_ms: Latência fixa adicionada a cada requisição
+        jitter_ms: Variação aleatória (0..jitter_ms) somada à latência
+        bandwidth_kbps: Banda simulada (KB/s) para os corpos enviados e recebidos; 0 = ilimitada
+        throttle_rate: Probabilidade (0..1) de responder 429 a uma requisição da API
+        retry_after: Valor do cabeçalho Retry-After das respostas 429, em segundos
+        require_token: Exige o cabeçalho Authorization: Bearer nas requisições da API
+    """
+    root: str = os.path.join("data", "sharepoint")
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    bandwidth_kbps: float = 0.0
+    throttle_rate: float = 0.0
+    retry_after: int = 1
+    require_token: bool = True
+    seed: Optional[int] = None
+
+
+class SharePointStandin:
+    """Implementação dos endpoints sobre o diretório local."""
+
+    def __init__(self, config: StandinConfig):
+        self.config = config
+        self.random = random.Random(config.seed)
+        self.stats = Counter()
+        os.makedirs(config.root, exist_ok=True)
+
+    def caminho_local(self, caminho_servidor: str) -> str:
+        """Converte o caminho relativo ao servidor (/teams/...) em um caminho dentro de root."""
+        raiz = os.path.abspath(self.config.root)
+        caminho = os.path.abspath(os.path.join(raiz, caminho_servidor.strip("/")))
+        if caminho != raiz and not caminho.startswith(raiz + os.sep):
+            raise web.HTTPBadRequest(text="Caminho fora da raiz do servidor")
+        return caminho
+
+    async def _atrasar(self, tamanho: int = 0) -> None:
+        """Aplica a latência configurada e o tempo de transferência de 'tamanho' bytes."""
+        atraso = self.config.latency_ms + self.random.uniform(0, self.config.jitter_ms)
+        if self.config.bandwidth_kbps and tamanho:
+            atraso += tamanho / (self.config.bandwidth_kbps * 1024) * 1000
+        if atraso > 0:
+            await asyncio.sleep(atraso / 1000)
+
+    @web.middleware
+    async def middleware(self, request: web.Request, handler):
+        if request.path.startswith("/_standin/"):
+            return await handler(request)
+
+        self.stats["requests"] += 1
+        if "/_api/" in request.path and self.random.random() < self.config.throttle_rate:
+            self.stats["throttled"] += 1
+            await self._atrasar()
+            return web.json_response(
+                {"error": {"code": "-2147024860, Microsoft.SharePoint.SPRequestLimitExceededException",
+                           "message": {"value": "Request limit exceeded"}}},
+                status=429,
+                headers={"Retry-After": str(self.config.retry_after)}
+            )
+
+        if ("/_api/" in request.path and self.config.require_token
+                and not request.headers.get("Authorization", "").startswith("Bearer ")):
+            self.stats["unauthorized"] += 1
+            return web.json_response({"error": "invalid_token"}, status=401)
+
+        await self._atrasar(request.content_length or 0)
+        response = await handler(request)
+        corpo = getattr(response, "body", None)
+        if isinstance(corpo, (bytes, bytearray)) and self.config.bandwidth_kbps:
+            await asyncio.sleep(len(corpo) / (self.config.bandwidth_kbps * 1024))
+        self.stats[f"status_{response.status}"] += 1
+        return response
+
+    async def rotear(self, request: web.Request) -> web.StreamResponse:
+        """Despacha a requisição para a operação correspondente ao caminho."""
+        caminho = request.path
+
+        if request.method == "POST" and _TOKEN.search(caminho):
+            return await self.token(request)
+        if request.method == "POST" and _CONTEXTINFO.search(caminho):
+            return self.contextinfo()
+
+        match = _ENVIAR.search(caminho)
+        if match and request.method == "POST":
+            return await self.enviar(request, match.group("pasta"), match.group("nome"), match.group("overwrite"))
+        match = _LISTAR.search(caminho)
+        if match and request.method == "GET":
+            return self.listar(match.group("pasta"), request.query.get("$orderby"), request.query.get("$top"))
+        match = _BAIXAR.search(caminho)
+        if match and request.method == "GET":
+            return self.baixar(match.group("arquivo"))
+        match = _EXCLUIR.search(caminho)
+        if match and request.method == "POST":
+            return self.excluir(match.group("arquivo"))
+
+        self.stats["not_implemented"] += 1
+        return web.json_response({"error": f"Endpoint não suportado: {request.method} {caminho}"}, status=404)
+
+    async def token(self, request: web.Request) -> web.Response:
+        await request.post()
+        self.stats["token"] += 1
+        return web.json_response({
+            "token_type": "Bearer",
+            "expires_in": "3599",
+            "access_token": f"standin-{uuid.uuid4().hex}"
+        })
+
+    def contextinfo(self) -> web.Response:
+        self.stats["contextinfo"] += 1
+        return web.json_response({
+            "d": {"GetContextWebInformation": {"FormDigestValue": f"0x{uuid.uuid4().hex.upper()},{datetime.now(timezone.utc).isoformat()}"}}
+        })
+
+    def listar(self, pasta: str, orderby: Optional[str] = None, top: Optional[str] = None) -> web.Response:
+        self.stats["list"] += 1
+        diretorio = self.caminho_local(pasta)
+        if not os.path.isdir(diretorio):
+            return web.json_response({"error": {"message": {"value": "File Not Found."}}}, status=404)
+
+        arquivos = []
+        for nome in sorted(os.listdir(diretorio)):
+            caminho = os.path.join(diretorio, nome)
+            if os.path.isfile(caminho):
+                arquivos.append((nome, os.stat(caminho)))
+
+        if orderby:
+            campo, _, direcao = orderby.strip().partition(" ")
+            chaves = {"Name": lambda a: a[0], "Length": lambda a: a[1].st_size,
+                      "TimeCreated": lambda a: a[1].st_ctime_ns, "TimeLastModified": lambda a: a[1].st_mtime_ns}
+            if campo not in chaves:
+                return web.json_response({"error": {"message": {"value": f"Campo inválido em $orderby: {campo}"}}}, status=400)
+            arquivos.sort(key=chaves[campo], reverse=direcao.strip().lower() == "desc")
+        if top:
+            arquivos = arquivos[:int(top)]
+
+        resultados = []
+        for nome, info in arquivos:
+            resultados.append({
+                "Name": nome,
+                "Length": str(info.st_size),
+                "ServerRelativeUrl": f"{pasta.rstrip('/')}/{nome}",
+                "TimeCreated": datetime.fromtimestamp(info.st_ctime, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "TimeLastModified": datetime.fromtimestamp(info.st_mtime, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            })
+        return web.json_response({"d": {"results": resultados}})
+
+    def baixar(self, arquivo: str) -> web.Response:
+        self.stats["download"] += 1
+        caminho = self.caminho_local(arquivo)
+        if not os.path.isfile(caminho):
+            return web.json_response({"error": {"message": {"value": "File Not Found."}}}, status=404)
+        with open(caminho, "rb") as f:
+            return web.Response(body=f.read(), content_type="application/octet-stream")
+
+    async def enviar(self, request: web.Request, pasta: str, nome: str, overwrite: Optional[str]) -> web.Response:
+        self.stats["upload"] += 1
+        conteudo = await request.read()
+        caminho = self.caminho_local(f"{pasta}/{nome}")
+        if os.path.exists(caminho) and (overwrite or "false").lower() != "true":
+            return web.json_response({"error": {"message": {"value": f"A file with the name {nome} already exists."}}}, status=400)
+
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        temporario = f"{caminho}.{uuid.uuid4().hex}.tmp"
+        with open(temporario, "wb") as f:
+            f.write(conteudo)
+        os.replace(temporario, caminho)
+        return web.json_response({"d": {"Name": nome, "Length": str(len(conteudo)), "ServerRelativeUrl": f"{pasta.rstrip('/')}/{nome}"}})
+
+    def excluir(self, arquivo: str) -> web.Response:
+        self.stats["delete"] += 1
+        caminho = self.caminho_local(arquivo)
+        if not os.path.isfile(caminho):
+            return web.json_response({"error": {"message": {"value": "File Not Found."}}}, status=404)
+        os.remove(caminho)
+        return web.Response(status=200)
+
+    async def estatisticas(self, request: web.Request) -> web.Response:
+        return web.json_response(dict(self.stats))
+
+
+def criar_app(config: StandinConfig) -> web.Application:
+    """Cria a aplicação aiohttp do servidor."""
+    standin = SharePointStandin(config)
+    app = web.Application(middlewares=[standin.middleware], client_max_size=1024 ** 3)
+    app["standin"] = standin
+    app.router.add_get("/_standin/stats", standin.estatisticas)
+    app.router.add_route("*", "/{caminho:.*}", standin.rotear)
+    return app
+
+
+def iniciar_em_thread(config: StandinConfig, host: str = "127.0.0.1") -> Tuple[str, SharePointStandin, Callable[[], None]]:
+    """
+    Sobe o servidor em uma thread, numa porta livre (uso em testes).
+    Retorna a URL base, a instância do servidor e a função que o encerra.
+    """
+    with socket.socket() as s:
+        s.bind((host, 0))
+        porta = s.getsockname()[1]
+
+    loop = asyncio.new_event_loop()
+    app = criar_app(config)
+    runner = web.AppRunner(app)
+    loop.run_until_complete(runner.setup())
+    loop.run_until_complete(web.TCPSite(runner, host, porta).start())
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+
+    def parar():
+        asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+
+    return f"http://{host}:{porta}", app["standin"], parar
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Servidor local que imita a API REST do SharePoint")
+    parser.add_argument("--root", default=os.getenv("SHAREPOINT_STANDIN_ROOT", os.path.join("data", "sharepoint")))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--bandwidth-kbps", type=float, default=0.0, help="Banda em KB/s (0 = ilimitada)")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fração das requisições respondidas com 429")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    config = StandinConfig(
+        root=args.root,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        bandwidth_kbps=args.bandwidth_kbps,
+        throttle_rate=args.throttle_rate,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+    logger.info(f"SharePoint local em http://{args.host}:{args.port} (raiz: {os.path.abspath(args.root)})")
+    web.run_app(criar_app(config), host=args.host, port=args.port, access_log=None)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+import pandas as pd
+
+from app.core.services.divergence_engine import ReconciliationSpec, check_sites, find_divergences
+
+
+def test_conciliacao_classifica_por_mascaras():
+    r189 = pd.DataFrame({
+        "empresa": ["A", "A", "B", "C"],
+        "nota_fiscal": ["1", "2", "3", "4"],
+        "valor_total": [100.0, 10.0, 1.16, 5.0],
+        "fornecedor_r189": ["F1", "F1", "F2", "F3"],
+    })
+    qpe = pd.DataFrame({
+        "empresa": ["A", "A", "B", "D"],
+        "nota_fiscal": ["1", "2", "3", "9"],
+        "valor_total": ["100,01", "12,50", "1,15", "7,00"],
+        "fornecedor": ["F1", "F1", "F2", "F9"],
+    })
+
+    spec = ReconciliationSpec("qpe")
+    divergencias = find_divergences(r189, qpe, spec)
+
+    assert divergencias.columns.tolist() == spec.columns
+    por_nota = divergencias.set_index("nota_fiscal")
+    # 1 centavo de diferença fica dentro da tolerância
+    assert sorted(por_nota.index) == ["2", "4", "9"]
+    assert por_nota.at["2", "tipo"] == "Divergência de valores"
+    assert por_nota.at["2", "diferenca"] == -2.5
+    assert por_nota.at["4", "tipo"] == por_nota.at["9", "tipo"] == "Nota fiscal não encontrada"
+    assert pd.isna(por_nota.at["4", "fornecedor_qpe"]) and pd.isna(por_nota.at["9", "diferenca"])
+    assert por_nota.at["9", "valor_qpe"] == "7,00"
+
+    assert find_divergences(r189, qpe, ReconciliationSpec("qpe", tolerance=0)).shape[0] == 5
+
+
+def test_consistencia_de_sites():
+    r189 = pd.DataFrame({
+        "empresa": ["X", "X", "Y"],
+        "nota_fiscal": ["1", "2", "3"],
+        "site": ["S1", "S9", "S1"],
+    })
+
+    divergencias = check_sites(r189, {"X": ["S1", "S2"]})
+
+    assert divergencias["tipo"].tolist() == ["Site incorreto", "CNPJ não mapeado"]
+    assert divergencias["nota_fiscal"].tolist() == ["2", "3"]
+    assert divergencias.at[0, "sites_esperados"] == ["S1", "S2"]
+    assert pd.isna(divergencias.at[1, "site_atual"])
+    assert check_sites(r189, {}).shape[0] == 3
+
+
+def test_conciliacoes_do_processing_service_com_o_lote_de_process_files():
+    from app.core.records import as_frame
+    from app.core.services.processing_service import ProcessingService
+
+    # Registros como devolvidos por R189Extractor.process_file(as_dataframe=True)
+    r189 = pd.DataFrame({
+        "cnpj_fornecedor": ["A", "A"],
+        "nota_fiscal": ["1", "2"],
+        "site_name": ["S1", "S1"],
+        "valor_total": [100.0, 10.0],
+    })
+    fonte = pd.DataFrame({
+        "empresa": ["A", "A"],
+        "nota_fiscal": ["1", "2"],
+        "valor_total": [100.0, 12.5],
+        "fornecedor": ["F1", "F1"],
+    })
+
+    servico = ProcessingService.__new__(ProcessingService)
+    for origem in ("qpe", "nfserv", "spb"):
+        divergencias = getattr(servico, f"_find_divergences_{origem}")(servico._r189_batch(r189), fonte)
+        assert divergencias["nota_fiscal"].tolist() == ["2"]
+        assert divergencias.at[0, "fornecedor_r189"] == "A"
+        assert divergencias.at[0, f"fornecedor_{origem}"] == "F1"
+        assert divergencias.at[0, "diferenca"] == -2.5
+
+    assert as_frame(servico._check_r189_consistency(servico._r189_batch(r189)))["tipo"].tolist() == ["CNPJ não mapeado"] * 2
@@ -0,0 +1,42 @@
+from app.core.extraction_store import ExtractionStore
+
+
+def test_get_or_extract_usa_resultado_armazenado(tmp_path):
+    store = ExtractionStore(db_path=str(tmp_path / "store.sqlite3"))
+    chamadas = []
+
+    def extrair():
+        chamadas.append(1)
+        return {"CNPJ": "07.175.725/0010-50", "VALOR_TOTAL": 10.5}
+
+    primeiro = store.get_or_extract(b"%PDF-conteudo", "QPE", "1", extrair)
+    segundo = store.get_or_extract(b"%PDF-conteudo", "QPE", "1", extrair)
+
+    assert primeiro == segundo
+    assert len(chamadas) == 1
+    stats = store.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+
+
+def test_versao_diferente_invalida_resultado(tmp_path):
+    store = ExtractionStore(db_path=str(tmp_path / "store.sqlite3"))
+    store.put(b"pdf", "NFSERV", "1", {"NFSERV_ID": "ABC-123456"})
+
+    assert store.get(b"pdf", "NFSERV", "1") == {"NFSERV_ID": "ABC-123456"}
+    assert store.get(b"pdf", "NFSERV", "2") is None
+
+
+def test_remove_registros_excedentes_e_expirados(tmp_path):
+    store = ExtractionStore(db_path=str(tmp_path / "store.sqlite3"), max_entries=2)
+    for i in range(4):
+        store.put(f"pdf-{i}".encode(), "SPB", "1", {"SPB_ID": f"SPB-{i}"})
+
+    assert store.stats()["entries"] == 2
+    assert store.get(b"pdf-3", "SPB", "1") == {"SPB_ID": "SPB-3"}
+    assert store.get(b"pdf-0", "SPB", "1") is None
+
+    expirado = ExtractionStore(db_path=str(tmp_path / "expira.sqlite3"), max_age_days=0)
+    expirado.put(b"pdf", "SPB", "1", {"SPB_ID": "SPB-1"})
+    assert expirado.get(b"pdf", "SPB", "1") is None
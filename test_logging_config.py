@@ -0,0 +1,60 @@
+import io
+import json
+import logging
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.logging_config import configure_logging, run_context, shutdown_logging
+
+
+@pytest.fixture
+def saida(monkeypatch):
+    monkeypatch.setenv("LOG_LEVELS", "teste.silenciado=WARNING")
+    monkeypatch.setenv("LOG_MAX_MESSAGE_CHARS", "50")
+    monkeypatch.setenv("LOG_SAMPLE_BURST", "3")
+    monkeypatch.setenv("LOG_SAMPLE_WINDOW", "60")
+    stream = io.StringIO()
+    configure_logging(stream)
+
+    def registros():
+        shutdown_logging()
+        return [json.loads(linha) for linha in stream.getvalue().splitlines()]
+
+    yield registros
+    shutdown_logging()
+
+
+def test_registros_json_com_run_id_truncamento_e_niveis(saida):
+    logger = logging.getLogger("teste.logging")
+    with run_context("execucao-1"):
+        logger.info("x" * 200)
+        try:
+            raise ValueError("falha")
+        except ValueError:
+            logger.exception("Erro ao processar")
+    logging.getLogger("teste.silenciado").info("não deve aparecer")
+
+    registros = saida()
+    assert [r["logger"] for r in registros] == ["teste.logging", "teste.logging"]
+    assert all(r["run_id"] == "execucao-1" for r in registros)
+    assert registros[0]["message"].startswith("x" * 50 + "... [truncado: 200 caracteres]")
+    assert "ValueError: falha" in registros[1]["exc_info"]
+
+
+def test_amostragem_por_ponto_do_codigo(saida):
+    logger = logging.getLogger("teste.logging")
+    for linha in range(10):
+        logger.info(f"Linha {linha} processada")
+    logger.warning("aviso sempre registrado")
+
+    mensagens = [r["message"] for r in saida()]
+    assert mensagens == ["Linha 0 processada", "Linha 1 processada", "Linha 2 processada", "aviso sempre registrado"]
+
+
+def test_requisicao_devolve_run_id(saida):
+    from app.main import app
+
+    resposta = TestClient(app).get("/metrics", headers={"X-Request-ID": "req-123"})
+    assert resposta.headers["x-run-id"] == "req-123"
+    assert TestClient(app).get("/metrics").headers["x-run-id"]
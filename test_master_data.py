@@ -0,0 +1,75 @@
+import json
+import os
+
+import pandas as pd
+
+from app.core import master_data
+from app.core.master_data import MasterDataRegistry, load_master_data
+
+
+def test_dados_mestres_versionados():
+    dados = load_master_data(master_data.ARQUIVO_PADRAO)
+
+    assert len(dados.cnpj_sites) == 16
+    assert dados.sites("60.621.141/0005-87") == ("PMAR_BRCSA",)
+    assert dados.service("3115.0") is dados.service("3115")
+    assert (dados.service("1.07").material, dados.service("1.07").type) == ("80001019", "SUPORTE TECNICO EM INFORMATICA")
+    assert dados.service("9.99") is None
+    # Códigos comparados pela parte inteira, como no relatório Municipality Code
+    assert dados.authorized(14.01, "07.175.725/0010-50")
+    assert dados.authorized("3115.0", "07.175.725/0010-50")
+    assert not dados.authorized("14.02", "00.000.000/0000-00")
+    assert not dados.authorized("9999", "07.175.725/0010-50")
+    # Um único conjunto de CNPJs compartilhado pelos serviços do mesmo grupo
+    assert dados.service("14.02").cnpjs is dados.service("1.03").cnpjs
+
+
+def test_recarrega_quando_o_arquivo_muda(tmp_path, monkeypatch, caplog):
+    caminho = tmp_path / "master_data.json"
+
+    def gravar(conteudo, mtime):
+        caminho.write_text(conteudo, encoding="utf-8")
+        os.utime(caminho, (mtime, mtime))
+
+    gravar(json.dumps({"version": "1", "cnpj_sites": {"A": ["S1"]}}), 1_000)
+    registry = MasterDataRegistry(str(caminho))
+    monkeypatch.setattr(master_data, "_registry", registry)
+
+    from app.core.reports.divergence_report_r189 import DivergenceReportR189
+
+    report = DivergenceReportR189()
+    assert report.cnpj_site_mapping == {"A": ("S1",)}
+    assert registry.current() is registry.current() and registry.reloads == 1
+
+    gravar(json.dumps({"version": "2", "cnpj_sites": {"A": ["S1", "S2"]}}), 2_000)
+    assert report.cnpj_site_mapping == {"A": ("S1", "S2")}
+    assert registry.current().version == "2" and registry.reloads == 2
+
+    # Arquivo inválido ou ausente: a versão anterior continua em uso, e o problema é lido
+    # e registrado uma única vez até o arquivo mudar de novo
+    leituras = []
+    load = master_data.load_master_data
+    monkeypatch.setattr(master_data, "load_master_data", lambda c: leituras.append(c) or load(c))
+
+    gravar("{", 3_000)
+    assert [registry.current().version for _ in range(3)] == ["2"] * 3
+    assert len(leituras) == 1 and caplog.text.count("Erro ao recarregar") == 1
+
+    caminho.unlink()
+    assert [registry.current().version for _ in range(3)] == ["2"] * 3
+    assert len(leituras) == 2 and caplog.text.count("indisponível") == 1
+
+    gravar(json.dumps({"version": "3"}), 4_000)
+    assert registry.current().version == "3" and registry.reloads == 3
+
+
+def test_validacao_de_cnpj_por_servico_usa_os_dados_mestres():
+    from app.core.reports.report_mun_code_r189 import ReportMunCodeR189
+
+    report = ReportMunCodeR189()
+    linhas = pd.DataFrame({
+        "Municipality Code": [14.02, "3115", 1880.0, 12.0],
+        "CNPJ - WEG": ["07.175.725/0010-50", "11.111.111/1111-11", "84.584.994/0007-16", "07.175.725/0010-50"],
+    })
+
+    assert linhas.apply(report.validate_service_cnpj, axis=1).tolist() == [True, False, True, False]
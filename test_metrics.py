@@ -0,0 +1,50 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from app.core.metrics import MetricsRegistry, STAGE_DURATION, pipeline, stage
+from app.main import app
+
+
+def test_registry_exporta_formato_prometheus():
+    registry = MetricsRegistry()
+    contador = registry.counter("chamadas_total", "Chamadas", ["operation", "outcome"])
+    histograma = registry.histogram("duracao_seconds", "Duração", ["stage"], buckets=(0.1, 1.0))
+
+    contador.inc(operation="download", outcome="success")
+    contador.inc(2, operation="download", outcome="success")
+    histograma.observe(0.05, stage="parse")
+    histograma.observe(0.5, stage="parse")
+
+    texto = registry.render()
+    assert "# TYPE chamadas_total counter" in texto
+    assert 'chamadas_total{operation="download",outcome="success"} 3' in texto
+    assert 'duracao_seconds_bucket{stage="parse",le="0.1"} 1' in texto
+    assert 'duracao_seconds_bucket{stage="parse",le="+Inf"} 2' in texto
+    assert 'duracao_seconds_count{stage="parse"} 2' in texto
+
+
+def test_etapas_recebem_o_pipeline_do_contexto():
+    @stage("reconcile")
+    async def reconciliar():
+        return "ok"
+
+    @pipeline("report_teste")
+    async def gerar():
+        return await reconciliar()
+
+    antes = STAGE_DURATION.count(pipeline="report_teste", stage="reconcile")
+    assert asyncio.run(gerar()) == "ok"
+    assert STAGE_DURATION.count(pipeline="report_teste", stage="reconcile") == antes + 1
+
+
+def test_endpoint_metrics_registra_rota_e_status():
+    client = TestClient(app)
+    assert client.get("/extraction_store/stats").status_code == 200
+    client.get("/rota/inexistente")
+
+    resposta = client.get("/metrics")
+    assert resposta.status_code == 200
+    assert resposta.headers["content-type"].startswith("text/plain")
+    assert 'http_request_duration_seconds_count{method="GET",route="/extraction_store/stats",status="200"}' in resposta.text
+    assert 'route="unmatched",status="404"' in resposta.text
@@ -0,0 +1,67 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+
+from app.core.money import from_cents, to_cents, valores_divergentes
+
+
+def test_to_cents_formatos_e_ausentes():
+    valores = pd.Series(["1.234,56", "R$ 10,00", "1234.56", "1.234.567", None, "abc", 12.345, 7, np.nan, -0.125])
+    assert to_cents(valores).tolist() == [123456, 1000, 123456, 123456700, pd.NA, pd.NA, 1235, 700, pd.NA, -13]
+    assert str(to_cents(pd.Series([1.5, 2.0])).dtype) == "Int64"
+    assert from_cents(to_cents(pd.Series([1.5, None]))).tolist()[0] == 1.5
+
+
+def test_to_cents_ponto_decimal_com_zero_e_meio_centavo_em_float():
+    # "0.125" é decimal (primeiro grupo 0), não milhar; 1.005 * 100 é 100.4999... em float
+    valores = pd.Series(["0.125", "-0.125", 1.005, -1.005, "1,005", 2.675], dtype=object)
+    assert to_cents(valores).tolist() == [13, -13, 101, -101, 101, 268]
+
+
+def test_tolerancia_de_um_centavo_e_exata():
+    # Em float, 1.16 - 1.15 > 0.01; em centavos a diferença é exatamente 1
+    assert abs(1.16 - 1.15) > 0.01
+    centavos = to_cents(pd.Series([1.15, 1.16, 1.17]))
+    assert not valores_divergentes(centavos[0], centavos[1])
+    assert valores_divergentes(centavos[0], centavos[2])
+    assert not valores_divergentes(centavos[0], pd.NA)
+
+
+def test_qpe_compara_valores_em_centavos():
+    from app.core.reports.divergence_report_qpe_r189 import DivergenceReportQPER189
+
+    qpe = pd.DataFrame({"QPE_ID": ["QPE-1", "QPE-2"], "CNPJ": ["60.621.141/0005-87"] * 2, "VALOR_TOTAL": [1.16, 20.0]})
+    r189 = pd.DataFrame({"Invoice number": ["QPE-1", "QPE-2"], "CNPJ - WEG": ["60.621.141/0005-87"] * 2,
+                         "Total Geral": ["1,15", "20,05"]})
+
+    sucesso, _, divergencias = asyncio.run(DivergenceReportQPER189().check_divergences(qpe, r189))
+
+    assert sucesso
+    valores = divergencias[divergencias["Tipo"] == "VALOR"]
+    assert valores["QPE_ID"].tolist() == ["QPE-2"]
+    assert valores["Valor R189"].tolist() == [20.05]
+
+
+def test_nfserv_e_spb_comparam_valores_em_centavos():
+    from app.core.reports.divergence_report_nfserv_r189 import DivergenceReportNFSERVR189
+    from app.core.reports.divergence_report_spb_r189 import DivergenceReportSPBR189
+
+    cnpj = "60.621.141/0005-87"
+    nfserv = pd.DataFrame({"NFSERV_ID": ["ABC-1", "ABC-2", "ABC-3", "SPB-4"], "CNPJ": [cnpj, cnpj, "60621141000587", cnpj],
+                           "VALOR_TOTAL": [1.16, 20.0, "abc", 4.0]})
+    r189 = pd.DataFrame({"Invoice number": ["ABC-1", "ABC-2", "ABC-3", "SPB-1", "SPB-4", "ABC-2"],
+                         "CNPJ - WEG": [cnpj] * 6, "Total Geral": ["1,15", "20,05", 3, "1,00", "4,10", 1]})
+    spb = pd.DataFrame({"SPB_ID": ["SPB-1", "SPB-1"], "CNPJ": ["07.175.725/0030-02", cnpj], "VALOR_TOTAL": [1.01, 9]})
+
+    sucesso, _, divergencias = asyncio.run(DivergenceReportNFSERVR189().check_divergences(nfserv.copy(), r189.copy()))
+    assert sucesso
+    # CNPJ comparado sem pontuação; valores em centavos contra a primeira nota de cada ID
+    por_tipo = divergencias.groupby("Tipo")["NFSERV_ID"].apply(list).to_dict()
+    assert por_tipo["VALOR"] == ["ABC-2"] and por_tipo["Erro na validação de valor"] == ["ABC-3"]
+    assert "CNPJ divergente" not in por_tipo
+
+    sucesso, _, divergencias = asyncio.run(DivergenceReportSPBR189().check_divergences(spb, r189, nfserv))
+    assert sucesso
+    por_tipo = divergencias.groupby("Tipo")["SPB_ID"].apply(list).to_dict()
+    assert por_tipo["CNPJ divergente"] == ["SPB-1"] and por_tipo["Valor divergente"] == ["SPB-4"]
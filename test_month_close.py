@@ -0,0 +1,280 @@
+import os
+import time
+import asyncio
+
+import pytest
+
+from app.core.services.orchestrator import DagRunner, Stage, load_manifest
+from benchmarks.month_close_load import popular_sharepoint
+from benchmarks.sharepoint_standin import StandinConfig, iniciar_em_thread
+
+BASE = "teams/BR-TI-TIN/AutomaoFinanas"
+
+
+def test_dag_paralelo_com_dependencias_e_falhas(tmp_path):
+    inicios = {}
+
+    def etapa(nome, valor=None, erro=None):
+        async def executar(resultados):
+            inicios[nome] = asyncio.get_running_loop().time()
+            await asyncio.sleep(0.05)
+            if erro:
+                raise RuntimeError(erro)
+            return valor(resultados) if valor else nome
+        return executar
+
+    stages = [
+        Stage("a", etapa("a")),
+        Stage("b", etapa("b")),
+        Stage("c", etapa("c", lambda r: r["a"] + r["b"]), ("a", "b")),
+        Stage("falha", etapa("falha", erro="sem dados"), ("a",)),
+        Stage("depois_da_falha", etapa("depois_da_falha"), ("falha",)),
+        Stage("final", etapa("final", lambda r: [r["c"], r["depois_da_falha"]]), ("c", "depois_da_falha"), run_if_deps_failed=True),
+    ]
+    manifesto = asyncio.run(DagRunner("teste", stages, runs_dir=str(tmp_path)).run("exec-1"))
+
+    assert abs(inicios["a"] - inicios["b"]) < 0.04
+    assert manifesto["results"]["c"] == "ab"
+    assert manifesto["results"]["final"] == ["ab", None]
+    etapas = manifesto["stages"]
+    assert [etapas[n]["status"] for n in ("c", "falha", "depois_da_falha", "final")] == \
+        ["success", "failed", "skipped", "success"]
+    assert etapas["falha"]["error"] == "sem dados"
+    assert load_manifest("exec-1", str(tmp_path))["status"] == "failed"
+    assert load_manifest("../exec-1", str(tmp_path)) is None
+
+    with pytest.raises(ValueError):
+        DagRunner("ciclo", [Stage("x", etapa("x"), ("y",)), Stage("y", etapa("y"), ("x",))])
+
+
+def test_retomada_executa_apenas_etapas_com_falha_ou_entradas_alteradas(tmp_path):
+    execucoes = []
+    estado = {"fonte": "v1", "falhar": True}
+
+    def etapa(nome, func):
+        async def executar(resultados):
+            execucoes.append(nome)
+            return func(resultados)
+        return executar
+
+    def validar(resultados):
+        if estado["falhar"]:
+            raise RuntimeError("falha temporária")
+        return resultados["processar"].upper()
+
+    stages = lambda: [
+        Stage("listar", etapa("listar", lambda r: estado["fonte"]), checkpoint=False),
+        Stage("processar", etapa("processar", lambda r: r["listar"] + "-ok"), ("listar",)),
+        Stage("outra", etapa("outra", lambda r: 1)),
+        Stage("validar", etapa("validar", validar), ("processar", "outra")),
+    ]
+
+    runs = str(tmp_path)
+    assert asyncio.run(DagRunner("t", stages(), runs).run("r1"))["status"] == "failed"
+
+    execucoes.clear()
+    estado["falhar"] = False
+    manifesto = asyncio.run(DagRunner("t", stages(), runs).run("r1", resume=True))
+    assert manifesto["status"] == "success" and manifesto["attempt"] == 2
+    assert execucoes == ["listar", "validar"]
+    assert manifesto["results"]["validar"] == "V1-OK"
+    assert manifesto["stages"]["processar"]["cached"]
+
+    execucoes.clear()
+    estado["fonte"] = "v2"
+    manifesto = asyncio.run(DagRunner("t", stages(), runs).run("r1", resume=True))
+    assert sorted(execucoes) == ["listar", "processar", "validar"]
+    assert manifesto["results"]["validar"] == "V2-OK"
+
+
+def test_retencao_remove_execucoes_expiradas_e_excedentes(tmp_path):
+    async def etapa(resultados):
+        return 1
+
+    runs = str(tmp_path)
+    agora = time.time()
+    for i, idade_dias in enumerate([0, 1, 2, 3, 40]):
+        diretorio = tmp_path / f"antiga-{i}"
+        (diretorio / "checkpoints").mkdir(parents=True)
+        (diretorio / "manifest.json").write_text("{}")
+        os.utime(diretorio / "manifest.json", (agora - idade_dias * 86400,) * 2)
+    (tmp_path / "outro-arquivo").mkdir()
+
+    runner = DagRunner("t", [Stage("a", etapa)], runs, max_age_days=30, max_runs=3)
+    assert asyncio.run(runner.run("nova"))["status"] == "success"
+    assert sorted(os.listdir(tmp_path)) == ["antiga-0", "antiga-1", "nova", "outro-arquivo"]
+
+
+def test_fechamento_completo_contra_sharepoint_local(tmp_path, monkeypatch):
+    from app.core.services.month_close import MonthClose
+
+    raiz = str(tmp_path / "sp")
+    popular_sharepoint(raiz, linhas_r189=300, pdfs_por_tipo=3)
+    os.makedirs(os.path.join(raiz, BASE, "CONSOLIDADO"))
+
+    base, standin, parar = iniciar_em_thread(StandinConfig(root=raiz))
+    try:
+        monkeypatch.setenv("SITE_URL", f"{base}/teams/BR-TI-TIN/AutomaoFinanas")
+        monkeypatch.setenv("SHAREPOINT_TOKEN_URL", f"{base}/tenant/tokens/OAuth/2")
+        fechamento = MonthClose(runs_dir=str(tmp_path / "runs"))
+        manifesto = asyncio.run(fechamento.run("fechamento-1"))
+        downloads = standin.stats["download"]
+
+        # Retomada sem mudanças: nada é baixado nem processado novamente
+        retomada = asyncio.run(fechamento.run("fechamento-1", resume=True))
+        assert standin.stats["download"] == downloads
+        assert {n for n, e in retomada["stages"].items() if not e["cached"]} == \
+            {"list_r189", "list_qpe", "list_nfserv", "list_spb"}
+
+        # Um PDF de NFSERV alterado refaz apenas a cadeia do NFSERV e o que depende dela
+        pasta_nfserv = os.path.join(raiz, BASE, "NFSERV")
+        alterado = os.path.join(pasta_nfserv, sorted(os.listdir(pasta_nfserv))[0])
+        with open(alterado, "ab") as f:
+            f.write(b"\n")
+        retomada = asyncio.run(fechamento.run("fechamento-1", resume=True))
+    finally:
+        parar()
+
+    executadas = {n for n, e in retomada["stages"].items() if not e["cached"]}
+    assert executadas - {"list_r189", "list_qpe", "list_nfserv", "list_spb"} <= \
+        {"download_nfserv", "extract_nfserv", "publish_nfserv", "validate_nfserv", "validate_spb", "consolidate_reports"}
+    assert "download_nfserv" in executadas and retomada["status"] == "success"
+
+    etapas = manifesto["stages"]
+    assert manifesto["status"] == "success", {n: e["error"] for n, e in etapas.items() if e["error"]}
+    assert etapas["extract_qpe"]["summary"]["rows"] == 3
+    # O R189 é baixado uma única vez e as validações não leem a pasta CONSOLIDADO
+    assert downloads == 1 + 3 * 3
+    for nome in ("R189", "Municipality_Code", "QPE", "NFSERV", "SPB"):
+        assert os.path.isfile(os.path.join(raiz, BASE, "CONSOLIDADO", f"{nome}_consolidado.xlsx"))
+    assert os.listdir(os.path.join(raiz, BASE, "RELATÓRIOS", "RELATORIO_CONSOLIDADO"))
+    assert load_manifest("fechamento-1", str(tmp_path / "runs"))["stages"]["consolidate_reports"]["status"] == "success"
+
+
+def test_validacao_combinada_le_cada_consolidado_uma_vez(tmp_path, monkeypatch):
+    from app.core.services.month_close import MonthClose
+    import pandas as pd
+
+    from app.core.services import validation_engine
+    from app.core.services.validation_engine import ValidationEngine
+    from app.core.reports.divergence_report_qpe_r189 import DivergenceReportQPER189
+    from app.core.reports.divergence_report_nfserv_r189 import DivergenceReportNFSERVR189
+    from app.core.reports.divergence_report_spb_r189 import DivergenceReportSPBR189
+
+    raiz = str(tmp_path / "sp")
+    popular_sharepoint(raiz, linhas_r189=300, pdfs_por_tipo=3)
+    os.makedirs(os.path.join(raiz, BASE, "CONSOLIDADO"))
+
+    base, standin, parar = iniciar_em_thread(StandinConfig(root=raiz))
+    try:
+        monkeypatch.setenv("SITE_URL", f"{base}/teams/BR-TI-TIN/AutomaoFinanas")
+        monkeypatch.setenv("SHAREPOINT_TOKEN_URL", f"{base}/tenant/tokens/OAuth/2")
+        monkeypatch.setenv("RUNS_DIR", str(tmp_path / "runs"))
+        # Publica os consolidados na pasta CONSOLIDADO
+        asyncio.run(MonthClose().run("publicacao"))
+
+        # Guarda os DataFrames lidos e uma cópia de cada, para conferir que as validações
+        # (em threads paralelas) não alteram as entradas compartilhadas
+        lidos = []
+        ler_consolidado = validation_engine.ler_consolidado
+
+        def ler_e_guardar(conteudo, abas=()):
+            df = ler_consolidado(conteudo, abas)
+            lidos.append((df, df.copy()))
+            return df
+
+        monkeypatch.setattr(validation_engine, "ler_consolidado", ler_e_guardar)
+        downloads = standin.stats["download"]
+        resultado = asyncio.run(ValidationEngine().run())
+        assert standin.stats["download"] - downloads == 5
+
+        # Mesmo resultado das validações individuais (fluxo por abas)
+        individuais = {
+            "validate_qpe": asyncio.run(DivergenceReportQPER189().generate_report()),
+            "validate_nfserv": asyncio.run(DivergenceReportNFSERVR189().generate_report()),
+            "validate_spb": asyncio.run(DivergenceReportSPBR189().generate_report()),
+        }
+    finally:
+        parar()
+
+    assert resultado["success"], resultado["validations"]
+    assert len(lidos) == 5
+    for df, original in lidos:
+        pd.testing.assert_frame_equal(df, original)
+    assert set(resultado["validations"]) == {"validate_mun_code", "validate_r189", "validate_qpe",
+                                             "validate_spb", "validate_nfserv"}
+    for etapa, individual in individuais.items():
+        assert resultado["validations"][etapa]["message"] == individual["message"]
+    assert resultado["consolidated"]["filename"].startswith("RELATORIOS-ORANGE_")
+
+
+def test_validacoes_executam_em_threads_sem_bloquear_o_event_loop(monkeypatch):
+    import time
+
+    import pandas as pd
+
+    from app.core.reports.divergence_report_qpe_r189 import DivergenceReportQPER189
+    from app.core.reports.divergence_report_r189 import DivergenceReportR189
+    from app.core.services.validation_engine import validation_stages
+
+    async def verificacao_sincrona(self, *dados):
+        time.sleep(0.3)  # como o iterrows e a gravação do .xlsx dos relatórios
+        return {"success": True}
+
+    monkeypatch.setattr(DivergenceReportR189, "generate_report_from_data", verificacao_sincrona)
+    monkeypatch.setattr(DivergenceReportQPER189, "generate_report_from_data", verificacao_sincrona)
+    fontes = {entrada: entrada for entrada in ("r189", "mun_code", "qpe", "nfserv", "spb")}
+    etapas = {etapa.name: etapa.func for etapa in validation_stages(object(), fontes)}
+    dados = {"r189": pd.DataFrame(), "qpe": pd.DataFrame()}
+
+    async def executar():
+        batidas = 0
+
+        async def relogio():
+            nonlocal batidas
+            while True:
+                await asyncio.sleep(0.01)
+                batidas += 1
+
+        tarefa = asyncio.create_task(relogio())
+        inicio = time.perf_counter()
+        await asyncio.gather(etapas["validate_r189"](dados), etapas["validate_qpe"](dados))
+        tarefa.cancel()
+        return time.perf_counter() - inicio, batidas
+
+    segundos, batidas = asyncio.run(executar())
+    assert segundos < 0.55
+    assert batidas >= 10
+
+
+def test_run_recusa_run_id_em_andamento(monkeypatch):
+    from fastapi import HTTPException
+
+    from app.api.routes import month_close as rotas
+    from app.core.services.month_close import MonthClose
+
+    liberar = asyncio.Event()
+    iniciadas = []
+
+    async def executar(self, run_id, **opcoes):
+        iniciadas.append(run_id)
+        await liberar.wait()
+        return {"status": "success"}
+
+    monkeypatch.setattr(MonthClose, "__init__", lambda self: None)
+    monkeypatch.setattr(MonthClose, "run", executar)
+
+    async def cenario():
+        assert (await rotas.executar_fechamento(rotas.MonthCloseRequest(run_id="r1")))["run_id"] == "r1"
+        with pytest.raises(HTTPException) as erro:
+            await rotas.executar_fechamento(rotas.MonthCloseRequest(run_id="r1"), wait=True)
+        assert erro.value.status_code == 409
+
+        liberar.set()
+        await rotas._execucoes["r1"]
+        await asyncio.sleep(0)
+        assert "r1" not in rotas._execucoes
+        assert (await rotas.executar_fechamento(rotas.MonthCloseRequest(run_id="r1"), wait=True))["success"]
+
+    asyncio.run(cenario())
+    assert iniciadas == ["r1", "r1"]
@@ -0,0 +1,19 @@
+from io import BytesIO
+
+from benchmarks.pdf_backends import valores_iguais
+from benchmarks.pdf_corpus import gerar_corpus
+from app.core.extractors.pdf_engine import PDFExtractionEngine
+from app.core.extractors.document_specs import QPE_SPEC, NFSERV_SPEC, SPB_SPEC
+
+
+def test_corpus_sintetico_e_extraido_conforme_golden(tmp_path):
+    golden = gerar_corpus(str(tmp_path), quantidade=10, seed=7)
+    engines = {spec.name: PDFExtractionEngine(spec) for spec in (QPE_SPEC, NFSERV_SPEC, SPB_SPEC)}
+
+    for arquivo, referencia in golden.items():
+        conteudo = (tmp_path / arquivo).read_bytes()
+        registro = engines[referencia["type"]].extract(BytesIO(conteudo))._asdict()
+        for campo, esperado in referencia["fields"].items():
+            assert valores_iguais(registro[campo], esperado), (arquivo, campo, registro[campo], esperado)
+
+    assert any(engine.stats()["pages_skipped"] for engine in engines.values())
@@ -0,0 +1,120 @@
+from app.core.extractors.pdf_engine import PDFExtractionEngine
+from app.core.extractors.document_specs import QPE_SPEC, NFSERV_SPEC, SPB_SPEC
+
+TEXTO_QPE = (
+    "PRESTADOR DE SERVIÇOS\nRUA DAS FLORES, JARAGUA DO SUL - SC\n"
+    "TOMADOR DE SERVIÇOS\nWEG EQUIPAMENTOS 07.175.725/0010-50\n"
+    "QPE-123456\nNUMERO DO DOCUMENTO GERADOR0001234\n"
+    "VALOR DO DOCUMENTO 1.234,56\n"
+)
+
+TEXTO_NFSERV = (
+    "N. CONTROLE: WEL_ABC-123456\nCNPJ: 60.621.141/0005-87\n"
+    "CIDADE SÃO PAULO ESTADO SP\nVALOR DO DOCUMENTO 99,90\n"
+)
+
+TEXTO_SPB = (
+    "TOMADOR DE SERVIÇOS\nCPF/CNPJ: 14.759.173/0001-00\n"
+    "CEP: 89256-900 JARAGUA DO SUL---- INTERMEDIÁRIO DE SERVIÇOS\n"
+    "SPB-000321\nCódigo de Verificação000012345\nVALOR DO DOCUMENTO 10.000,00\n"
+)
+
+
+def test_qpe_spec_extrai_campos_na_ordem_do_consolidado():
+    registro = PDFExtractionEngine(QPE_SPEC).extract_fields(TEXTO_QPE)
+
+    assert registro._fields == ('CNPJ', 'QPE_ID', 'NOTA_FISCAL', 'VALOR_TOTAL', 'CIDADE')
+    assert registro._asdict() == {
+        'CNPJ': '07.175.725/0010-50',
+        'QPE_ID': 'QPE-123456',
+        'NOTA_FISCAL': '0001234',
+        'VALOR_TOTAL': 1234.56,
+        'CIDADE': 'JARAGUA DO SUL'
+    }
+
+
+def test_nfserv_spec_extrai_campos():
+    registro = PDFExtractionEngine(NFSERV_SPEC).extract_fields(TEXTO_NFSERV)
+
+    assert registro.NFSERV_ID == 'ABC-123456'
+    assert registro.CNPJ == '60.621.141/0005-87'
+    assert registro.CIDADE == 'SÃO PAULO'
+    assert registro.VALOR_TOTAL == 99.9
+
+
+def test_spb_spec_extrai_campos_e_aplica_valores_padrao():
+    engine = PDFExtractionEngine(SPB_SPEC)
+    registro = engine.extract_fields(TEXTO_SPB)
+
+    assert registro.CNPJ == '14.759.173/0001-00'
+    assert registro.SPB_ID == 'SPB-000321'
+    assert registro.Num_Nota == '000012345'
+    assert registro.VALOR_TOTAL == 10000.0
+    assert registro.CIDADE == 'JARAGUA DO SUL'
+
+    vazio = engine.extract_fields("")
+    assert vazio.VALOR_TOTAL == 0.0
+    assert vazio.SPB_ID is None
+
+
+class _DocumentoFalso:
+    def __init__(self, paginas):
+        self.paginas = paginas
+
+    @property
+    def page_count(self):
+        return len(self.paginas)
+
+    def page_text(self, index):
+        return self.paginas[index]
+
+
+class _BackendFalso:
+    name = "falso"
+
+    def __init__(self, paginas):
+        self.paginas = paginas
+
+    def open(self, arquivo):
+        return _DocumentoFalso(self.paginas[arquivo])
+
+
+def test_segunda_pagina_so_e_lida_quando_falta_campo():
+    paginas = {}
+    engine = PDFExtractionEngine(QPE_SPEC, backend=_BackendFalso(paginas))
+
+    paginas["completo"] = [TEXTO_QPE, "PAGINA 2"]
+    assert engine.extract("completo").QPE_ID == 'QPE-123456'
+    assert engine.stats()["pages_parsed"] == 1
+    assert engine.stats()["pages_skipped"] == 1
+
+    paginas["dividido"] = [TEXTO_QPE.replace("VALOR DO DOCUMENTO 1.234,56\n", ""), "VALOR DO DOCUMENTO 7,00"]
+    assert engine.extract("dividido").VALOR_TOTAL == 7.0
+    assert engine.stats() == {
+        "documents": 2,
+        "pages_parsed": 3,
+        "pages_skipped": 1,
+        "pages_per_document": 1.5
+    }
+
+
+def test_engine_stats_soma_os_motores_vivos_por_tipo():
+    import gc
+
+    from app.core.extractors.pdf_engine import engine_stats
+
+    def contagens():
+        return {chave: engine_stats().get("QPE", {}).get(chave, 0) for chave in ("documents", "pages_parsed")}
+
+    antes = contagens()
+    paginas = {"doc": [TEXTO_QPE, "PAGINA 2"]}
+    engines = [PDFExtractionEngine(QPE_SPEC, backend=_BackendFalso(paginas)) for _ in range(2)]
+    for engine in engines:
+        engine.extract("doc")
+    # Motores do mesmo tipo somam os contadores, em vez de um sobrescrever o outro
+    assert contagens() == {"documents": antes["documents"] + 2, "pages_parsed": antes["pages_parsed"] + 2}
+
+    # Motores descartados deixam de ser acompanhados
+    del engine, engines
+    gc.collect()
+    assert contagens() == antes
@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core import profiling
+from app.core.metrics import pipeline
+from app.core.profiling import ProfilingManager
+from app.main import app
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "_manager", ProfilingManager(str(tmp_path)))
+    monkeypatch.setenv("ADMIN_TOKEN", "segredo")
+    return profiling.get_profiling_manager()
+
+
+class RelatorioTeste:
+    @pipeline("report_profiling_teste")
+    async def generate_report(self):
+        await asyncio.sleep(0.02)
+        return sum(i * i for i in range(20000))
+
+
+def test_perfila_apenas_as_proximas_execucoes(manager):
+    manager.arm("RelatorioTeste.generate_report", runs=2)
+    manager.arm("report_profiling_teste", runs=1, mode="sampling", interval_ms=1)
+
+    for _ in range(4):
+        asyncio.run(RelatorioTeste().generate_report())
+
+    # O nome da métrica tem precedência; depois o nome qualificado é consumido
+    modos = sorted(perfil["mode"] for perfil in manager.list_profiles())
+    assert modos == ["cprofile", "cprofile", "sampling"]
+    assert manager.pending() == {}
+    assert "generate_report" in manager.summary(next(
+        p["name"] for p in manager.list_profiles() if p["mode"] == "cprofile"))
+
+
+def test_endpoints_admin(manager):
+    client = TestClient(app)
+    assert client.get("/admin/profiles").status_code == 401
+    headers = {"X-Admin-Token": "segredo"}
+
+    resposta = client.post("/admin/profiling", json={"pipeline": "report_profiling_teste", "runs": 1}, headers=headers)
+    assert resposta.json()["armed"]["runs"] == 1
+    assert client.post("/admin/profiling", json={"pipeline": "x", "mode": "perf"}, headers=headers).status_code == 400
+
+    asyncio.run(RelatorioTeste().generate_report())
+    perfis = client.get("/admin/profiles", headers=headers).json()["profiles"]
+    assert len(perfis) == 1 and perfis[0]["pipeline"] == "report_profiling_teste"
+
+    download = client.get(f"/admin/profiles/{perfis[0]['name']}", headers=headers)
+    assert download.status_code == 200 and len(download.content) == perfis[0]["size"]
+    resumo = client.get(f"/admin/profiles/{perfis[0]['name']}?format=text", headers=headers)
+    assert "function calls" in resumo.text
+    assert client.get("/admin/profiles/..%2Fsegredo.prof", headers=headers).status_code == 404
+
+
+def test_endpoints_admin_desabilitados_sem_token(monkeypatch):
+    monkeypatch.delenv("ADMIN_TOKEN", raising=False)
+    assert TestClient(app).get("/admin/profiles", headers={"X-Admin-Token": "x"}).status_code == 403
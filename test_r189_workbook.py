@@ -0,0 +1,48 @@
+import asyncio
+from io import BytesIO
+
+import pandas as pd
+import pytest
+
+from benchmarks.r189_workbook import gerar_r189
+from app.core.extractors.r189_extractor import R189Extractor
+
+
+def test_planilha_sintetica_segue_layout_do_r189(tmp_path):
+    caminho = str(tmp_path / "R189.xlsx")
+    gerar_r189(caminho, rows=500)
+
+    df = pd.read_excel(caminho, sheet_name="BRASIL", header=12)
+    assert len(df) == 500
+    subtotais = df["Account number"] == "Total"
+    assert subtotais.any()
+
+    with open(caminho, "rb") as f:
+        consolidado = asyncio.run(R189Extractor().consolidar_r189(BytesIO(f.read())))
+
+    resultado = pd.read_excel(consolidado, sheet_name="Consolidado_R189")
+    assert resultado["Invoice number"].is_unique
+    assert resultado["Total Geral"].sum() == pytest.approx(df.loc[~subtotais, "Total Geral"].sum())
+
+
+def test_colunas_category_nao_mudam_as_consolidacoes(tmp_path):
+    from app.core.extractors.municipality_code_extractor import MunicipalityCodeExtractor
+    from app.core.extractors.r189_extractor import ler_planilha_r189
+    from app.core.extractors.r189_schema import aplicar_schema_planilhas
+
+    caminho = str(tmp_path / "R189.xlsx")
+    gerar_r189(caminho, rows=2000)
+    planilhas = ler_planilha_r189(caminho)
+    assert isinstance(planilhas["BRASIL"]["CNPJ - WEG"].dtype, pd.CategoricalDtype)
+    assert planilhas["BRASIL"]["Invoice number"].dtype == object
+
+    objetos = {aba: df.astype({col: object for col in df.columns[df.dtypes == "category"]})
+               for aba, df in planilhas.items()}
+    assert aplicar_schema_planilhas(objetos, categorico=False) is objetos
+
+    for consolidar in (R189Extractor().consolidar_r189_dataframe,
+                       MunicipalityCodeExtractor().consolidar_municipality_code_dataframe):
+        categorico, objeto = consolidar(planilhas), consolidar(objetos)
+        assert len(categorico) == len(objeto)
+        pd.testing.assert_frame_equal(categorico.astype(object).reset_index(drop=True),
+                                      objeto.astype(object).reset_index(drop=True))
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core.extractors.document_specs import QPE_SPEC
+from app.core.records import ColumnBatch, as_frame, document_batch, r189_batch
+
+
+def test_lote_por_coluna_gera_dataframe_sem_copiar_valores():
+    lote = document_batch(QPE_SPEC)
+    assert lote.float_fields == {"VALOR_TOTAL"}
+
+    lote.append(("12.345.678/0001-90", "QPE-1", "0000001", 10.5, "JARAGUA DO SUL"))
+    lote.append({"CNPJ": "98.765.432/0001-10", "QPE_ID": "QPE-2", "VALOR_TOTAL": None})
+    assert len(lote) == 2
+    assert [registro.QPE_ID for registro in lote] == ["QPE-1", "QPE-2"]
+
+    df = lote.to_frame()
+    assert df.columns.tolist() == ["CNPJ", "QPE_ID", "NOTA_FISCAL", "VALOR_TOTAL", "CIDADE"]
+    assert df["VALOR_TOTAL"].dtype == "float64"
+    assert df["NOTA_FISCAL"].tolist() == ["0000001", None]
+    assert np.isnan(df["VALOR_TOTAL"].iloc[1])
+    assert np.shares_memory(df["VALOR_TOTAL"].to_numpy(), np.frombuffer(lote.column("VALOR_TOTAL")))
+
+    with pytest.raises(ValueError):
+        lote.append(("x",) * 5)
+
+
+def test_lote_a_partir_de_colunas():
+    r189 = pd.DataFrame({"cnpj_fornecedor": ["a", "b"], "nota_fiscal": ["1", "2"],
+                         "site_name": ["S1", "S2"], "valor_total": [1, 2.5]})
+    lote = ColumnBatch.from_columns({coluna: r189[coluna] for coluna in r189}, float_fields=("valor_total",))
+
+    assert lote.fields == r189_batch().fields
+    pd.testing.assert_frame_equal(as_frame(lote), r189.astype({"valor_total": "float64"}))
+    with pytest.raises(ValueError):
+        ColumnBatch.from_columns({"a": [1], "b": [1, 2]})
+
+
+def test_extract_data_r189_coluna_a_coluna_e_json_sob_demanda(caplog):
+    import asyncio
+    import json
+    from io import BytesIO
+
+    from app.core.extractors.r189_extractor import R189Extractor
+    from app.core.records import iter_json, iter_records
+
+    consolidado = pd.DataFrame({
+        "CNPJ - WEG": ["60.621.141/0005-87", "07.175.725/0030-02", "07.175.725/0030-02", "07.175.725/0030-02"],
+        "Invoice number": ["QPE-1", 123, "SPB-2", "SPB-3"],
+        "Site Name - WEG 2": ["PMAR_BRCSA", "WEL_BRJGS", "WEL_BRJGS", "WEL_BRJGS"],
+        "Total Geral": [100.5, None, "1.234,56", "abc"],
+    })
+    arquivo = BytesIO()
+    consolidado.to_excel(arquivo, index=False, sheet_name="Consolidado_R189")
+
+    extrator = R189Extractor()
+    lote = asyncio.run(extrator.extract_data(BytesIO(arquivo.getvalue())))
+    df = asyncio.run(extrator.extract_data(BytesIO(arquivo.getvalue()), as_dataframe=True))["data"]
+
+    assert lote["count"] == 4
+    assert df.columns.tolist() == list(r189_batch().fields)
+    assert df["nota_fiscal"].tolist() == ["QPE-1", "123", "SPB-2", "SPB-3"]
+    # Vazios e inválidos ficam NaN (não zero); só o inválido é registrado no log
+    assert df["valor_total"].tolist()[::2] == [100.5, 1234.56]
+    assert df["valor_total"].isna().tolist() == [False, True, False, True]
+    assert "1 totais do R189 consolidado" in caplog.text
+    pd.testing.assert_frame_equal(as_frame(lote["data"]), df)
+
+    blocos = list(iter_json(df, tamanho_bloco=2))
+    assert len(blocos) == 4
+    registros = json.loads("".join(blocos))
+    assert registros == list(iter_records(df)) == list(iter_records(lote["data"]))
+    assert [registro["valor_total"] for registro in registros] == [100.5, None, 1234.56, None]
+    assert json.loads("".join(iter_json(r189_batch()))) == []
+
+
+def test_modulo_importavel_isoladamente():
+    import subprocess
+    import sys
+
+    # O pacote de extratores importa records; records não pode depender dele na importação
+    resultado = subprocess.run([sys.executable, "-c", "import app.core.records"], capture_output=True, text=True)
+    assert resultado.returncode == 0, resultado.stderr
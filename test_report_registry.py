@@ -0,0 +1,82 @@
+import os
+import asyncio
+
+import pandas as pd
+import pytest
+
+from app.core.reports import report_registry
+from app.core.reports.report_registry import ReportRegistry
+from benchmarks.sharepoint_standin import StandinConfig, iniciar_em_thread
+
+RELATORIOS = "teams/BR-TI-TIN/AutomaoFinanas/RELATÓRIOS"
+
+
+@pytest.fixture
+def sharepoint(tmp_path, monkeypatch):
+    monkeypatch.setattr(report_registry, "_registry", ReportRegistry())
+    base, standin, parar = iniciar_em_thread(StandinConfig(root=str(tmp_path)))
+    monkeypatch.setenv("SITE_URL", f"{base}/teams/BR-TI-TIN/AutomaoFinanas")
+    monkeypatch.setenv("SHAREPOINT_TOKEN_URL", f"{base}/tenant/tokens/OAuth/2")
+    yield tmp_path, standin
+    parar()
+
+
+def gravar_relatorio(raiz, pasta, nome, df, mtime):
+    caminho = os.path.join(raiz, RELATORIOS, pasta, nome)
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    df.to_excel(caminho, index=False)
+    os.utime(caminho, (mtime, mtime))
+
+
+def test_consolidacao_usa_o_relatorio_mais_recente_e_a_memoria(sharepoint):
+    from app.core.reports.consolidated_report import ConsolidatedReport
+
+    raiz, standin = sharepoint
+    gravar_relatorio(raiz, "R189", "report_divergencias_r189_20250101_000000.xlsx", pd.DataFrame({"v": [1]}), 1_000)
+    gravar_relatorio(raiz, "R189", "report_divergencias_r189_20250201_000000.xlsx", pd.DataFrame({"v": [2, 3]}), 2_000)
+    gravar_relatorio(raiz, "NFSERV_R189", "20250201_divergencias_nfserv_r189.xlsx", pd.DataFrame({"v": [9]}), 2_000)
+    os.makedirs(os.path.join(raiz, RELATORIOS, "RELATORIO_CONSOLIDADO"))
+
+    # Relatório NFSERV gerado neste processo: não deve ser baixado de novo
+    report_registry.get_report_registry().register(
+        "NFSERV_vs_R189", "20250201_divergencias_nfserv_r189.xlsx", pd.DataFrame({"v": [7, 8]}))
+
+    resultado = asyncio.run(ConsolidatedReport().consolidate_reports())
+
+    assert resultado["success"], resultado
+    assert standin.stats["list"] == 5 and standin.stats["download"] == 1
+    consolidado = os.path.join(raiz, RELATORIOS, "RELATORIO_CONSOLIDADO", resultado["filename"])
+    abas = pd.read_excel(consolidado, sheet_name=None)
+    assert list(abas) == ["Mun_Code_R189", "Divergencias_R189", "QPE_vs_R189", "SPB_vs_R189", "NFSERV_vs_R189"]
+    assert abas["Divergencias_R189"]["v"].tolist() == [2, 3]
+    assert abas["NFSERV_vs_R189"]["v"].tolist() == [7, 8]
+    assert abas["QPE_vs_R189"]["Mensagem"].tolist() == ["Relatório não disponível"]
+
+
+def test_exportacao_csv_gz_ao_lado_do_xlsx(sharepoint):
+    from app.core.reports.divergence_report_r189 import DivergenceReportR189
+
+    raiz, standin = sharepoint
+    pasta = os.path.join(raiz, RELATORIOS, "R189")
+    os.makedirs(pasta)
+    r189 = pd.DataFrame({
+        "CNPJ - WEG": ["60.621.141/0005-87", "07.175.725/0030-02"],
+        "Site Name - WEG 2": ["PMAR_BRCSA", "PMAR_BRCSA"],
+        "Invoice number": ["NF-1", "NF-2"],
+        "Total Geral": [100.0, 250.5],
+    })
+
+    resultado = asyncio.run(DivergenceReportR189(export_format="csv.gz").generate_report_from_data(r189))
+
+    assert resultado["success"], resultado
+    xlsx = [nome for nome in os.listdir(pasta) if nome.endswith(".xlsx")]
+    assert len(xlsx) == 1
+    exportado = pd.read_csv(os.path.join(pasta, xlsx[0][:-len(".xlsx")] + ".csv.gz"))
+    assert exportado["Invoice Number"].tolist() == ["NF-2"]
+    assert exportado.columns.tolist() == resultado["report_df"].columns.tolist()
+
+    # O relatório mais recente da pasta continua sendo o .xlsx
+    report_registry.get_report_registry().clear()
+    mais_recente = asyncio.run(report_registry.get_report_registry().latest_report(
+        DivergenceReportR189().sharepoint_auth, "Divergencias_R189"))
+    assert mais_recente["filename"] == xlsx[0]
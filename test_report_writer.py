@@ -0,0 +1,67 @@
+from datetime import datetime
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+from app.core.reports import report_writer
+from app.core.reports.report_writer import conteudo_arquivo, write_xlsx
+
+
+def test_write_xlsx_preserva_abas_e_valores():
+    divergencias = pd.DataFrame({
+        "Tipo": ["CNPJ divergente", None],
+        "CNPJ": ["12.345.678/0001-90", "98.765.432/0001-10"],
+        "Total Geral": [1234.5, np.nan],
+        "Linhas": np.array([3, 4], dtype="int64"),
+        "Data": [datetime(2025, 1, 31, 10, 30), pd.NaT],
+    })
+    vazio = pd.DataFrame({"Mensagem": []})
+
+    output = write_xlsx({"Divergencias_R189": divergencias, "Uma aba com nome muito comprido demais": vazio},
+                        money_columns=["Total Geral"])
+
+    abas = pd.read_excel(output, sheet_name=None)
+    assert list(abas) == ["Divergencias_R189", "Uma aba com nome muito comprido"]
+    lido = abas["Divergencias_R189"]
+    assert lido.columns.tolist() == divergencias.columns.tolist()
+    assert lido["Tipo"].isna().tolist() == [False, True]
+    assert lido["Total Geral"].iloc[0] == 1234.5 and pd.isna(lido["Total Geral"].iloc[1])
+    assert lido["Linhas"].tolist() == [3, 4]
+    assert lido["Data"].iloc[0] == pd.Timestamp("2025-01-31 10:30")
+
+    output.seek(0)
+    planilha = openpyxl.load_workbook(output)["Divergencias_R189"]
+    assert planilha["C2"].number_format == "#,##0.00"
+    assert planilha["A1"].font.bold
+    assert planilha.column_dimensions["B"].width >= len("12.345.678/0001-90")
+
+
+def test_conteudo_arquivo_nao_copia_o_buffer():
+    output = write_xlsx({"Aba": pd.DataFrame({"v": [1, 2]})})
+    conteudo = conteudo_arquivo(output)
+    assert isinstance(conteudo, memoryview)
+    assert bytes(conteudo) == output.getvalue()
+    assert bytes(conteudo[:2]) == b"PK"
+
+
+def test_largura_das_colunas_por_amostra(monkeypatch):
+    monkeypatch.setattr(report_writer, "AMOSTRA_LARGURA", 100)
+    serie = pd.Series(["x" * 5] * 10_000)
+
+    assert report_writer._largura_coluna(serie, "Nome") == 7
+    assert report_writer._largura_coluna(pd.Series([], dtype=object), "Nome") == 6
+    assert report_writer._largura_coluna(pd.Series(["x" * 1000]), "Nome") == report_writer.LARGURA_MAXIMA
+
+
+def test_formatos_de_exportacao(monkeypatch):
+    df = pd.DataFrame({"Tipo": ["Divergência"], "Valor": [10.5]})
+
+    assert report_writer.nome_exportacao("report_divergencias_r189_20250101_000000.xlsx", "csv.gz") == \
+        "report_divergencias_r189_20250101_000000.csv.gz"
+    assert pd.read_csv(report_writer.export_frame(df, "csv.gz"), compression="gzip").equals(df)
+    assert report_writer.validar_formato_exportacao(None) is None
+    assert "inválido" in report_writer.validar_formato_exportacao("json")
+
+    monkeypatch.setattr(report_writer, "parquet_disponivel", lambda: False)
+    assert "pyarrow" in report_writer.validar_formato_exportacao("parquet")
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+import requests
+
+from benchmarks.sharepoint_standin import StandinConfig, iniciar_em_thread
+from app.core.auth import SharePointAuth
+
+PASTA = "/teams/BR-TI-TIN/AutomaoFinanas/R189"
+
+
+@pytest.fixture
+def standin(tmp_path, monkeypatch):
+    base, servidor, parar = iniciar_em_thread(StandinConfig(root=str(tmp_path)))
+    monkeypatch.setenv("SITE_URL", f"{base}/teams/BR-TI-TIN/AutomaoFinanas")
+    monkeypatch.setenv("SHAREPOINT_TOKEN_URL", f"{base}/tenant/tokens/OAuth/2")
+    yield base, servidor
+    parar()
+
+
+def test_sharepoint_auth_contra_servidor_local(standin):
+    base, servidor = standin
+    auth = SharePointAuth()
+
+    assert asyncio.run(auth.enviar_arquivo_sharepoint(b"conteudo", "R189.xlsb", PASTA))
+    assert auth.baixar_arquivo_sharepoint("R189.xlsb", PASTA) == b"conteudo"
+
+    token = auth.acquire_token()
+    listagem = requests.get(
+        f"{auth.site_url}/_api/web/GetFolderByServerRelativeUrl('{PASTA}')/Files",
+        headers={"Authorization": f"Bearer {token}"}
+    ).json()
+    assert [(f["Name"], f["Length"]) for f in listagem["d"]["results"]] == [("R189.xlsb", "8")]
+
+    assert auth.excluir_arquivo_sharepoint("R189.xlsb", PASTA)
+    assert auth.baixar_arquivo_sharepoint("R189.xlsb", PASTA) is None
+    assert servidor.stats["contextinfo"] == 1
+
+
+def test_logs_nao_incluem_o_token_nem_a_resposta_completa(standin, caplog):
+    import logging
+
+    auth = SharePointAuth()
+    token = auth.acquire_token()
+    with caplog.at_level(logging.DEBUG, logger="app.core.auth"):
+        assert asyncio.run(auth.enviar_arquivo_sharepoint(b"conteudo", "R189.xlsb", PASTA))
+        url = f"{auth.site_url}/_api/web/GetFolderByServerRelativeUrl('{PASTA}')/Files"
+        asyncio.run(auth.fazer_requisicao_sharepoint(url, {"Authorization": f"Bearer {token}"}))
+
+    assert token not in caplog.text
+    assert "Bearer ***" in caplog.text
+    assert max(len(registro.getMessage()) for registro in caplog.records) < 1000
+
+
+def test_injecao_de_429(tmp_path):
+    base, servidor, parar = iniciar_em_thread(StandinConfig(root=str(tmp_path), throttle_rate=1.0, retry_after=7))
+    try:
+        resposta = requests.get(
+            f"{base}/_api/web/GetFolderByServerRelativeUrl('{PASTA}')/Files",
+            headers={"Authorization": "Bearer x"}
+        )
+        assert resposta.status_code == 429
+        assert resposta.headers["Retry-After"] == "7"
+        assert servidor.stats["throttled"] == 1
+    finally:
+        parar()
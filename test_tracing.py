@@ -0,0 +1,86 @@
+import os
+import asyncio
+
+import pytest
+
+from app.core.metrics import pipeline, stage, track_stage
+from app.core.tracing import configure_tracing, set_span_attributes
+from benchmarks.r189_workbook import gerar_r189
+from benchmarks.sharepoint_standin import StandinConfig, iniciar_em_thread
+
+CONSOLIDADO = "teams/BR-TI-TIN/AutomaoFinanas/CONSOLIDADO"
+
+
+@pytest.fixture
+def memoria():
+    tracer = configure_tracing("memory")
+    yield tracer.memory_exporter()
+    configure_tracing("none")
+
+
+def test_etapas_viram_spans_filhos_do_pipeline(memoria):
+    @stage("reconcile")
+    async def reconciliar():
+        set_span_attributes(rows=10)
+
+    @pipeline("report_teste")
+    async def gerar():
+        with track_stage("parse", file_name="R189_consolidado.xlsx"):
+            pass
+        await reconciliar()
+        with pytest.raises(ValueError), track_stage("write_xlsx"):
+            raise ValueError("falha")
+
+    asyncio.run(gerar())
+
+    spans = {span.name: span for span in memoria.get_finished_spans()}
+    raiz = spans["report_teste"]
+    assert raiz.parent_id is None
+    for nome in ("parse", "reconcile", "write_xlsx"):
+        assert spans[nome].parent_id == raiz.span_id
+        assert spans[nome].trace_id == raiz.trace_id
+        assert spans[nome].attributes["pipeline"] == "report_teste"
+    assert spans["parse"].attributes["file_name"] == "R189_consolidado.xlsx"
+    assert spans["reconcile"].attributes["rows"] == 10
+    assert spans["write_xlsx"].status == "ERROR"
+    assert raiz.duration_ms >= spans["parse"].duration_ms
+
+
+def test_tracing_desligado_nao_registra_spans():
+    tracer = configure_tracing("none")
+    with track_stage("parse") as span:
+        set_span_attributes(rows=1)
+        span.set_attribute("bytes", 2)
+    assert not tracer.enabled
+    assert tracer.memory_exporter() is None
+
+
+def test_relatorio_r189_decomposto_por_etapa(tmp_path, monkeypatch, memoria):
+    from app.core.extractors.r189_extractor import R189Extractor
+    from app.core.reports.divergence_report_r189 import DivergenceReportR189
+
+    planilha = gerar_r189(str(tmp_path / "R189.xlsx"), rows=200)
+    with open(planilha, "rb") as f:
+        consolidado = asyncio.run(R189Extractor().consolidar_r189(f))
+    os.makedirs(tmp_path / "sp" / CONSOLIDADO)
+    with open(tmp_path / "sp" / CONSOLIDADO / "R189_consolidado.xlsx", "wb") as f:
+        f.write(consolidado.getvalue())
+
+    base, _, parar = iniciar_em_thread(StandinConfig(root=str(tmp_path / "sp")))
+    try:
+        monkeypatch.setenv("SITE_URL", f"{base}/teams/BR-TI-TIN/AutomaoFinanas")
+        monkeypatch.setenv("SHAREPOINT_TOKEN_URL", f"{base}/tenant/tokens/OAuth/2")
+        memoria.clear()
+        resultado = asyncio.run(DivergenceReportR189().generate_report())
+    finally:
+        parar()
+
+    assert resultado["success"], resultado
+    spans = memoria.get_finished_spans()
+    raiz = next(span for span in spans if span.name == "report_r189")
+    etapas = {span.name: span for span in spans if span.parent_id == raiz.span_id}
+    assert {"download", "parse", "reconcile"} <= set(etapas)
+    assert etapas["download"].attributes["file_name"] == "R189_consolidado.xlsx"
+    assert etapas["download"].attributes["bytes_received"] == len(consolidado.getvalue())
+    assert etapas["parse"].attributes["rows"] > 0
+    assert "divergences" in raiz.attributes